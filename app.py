@@ -8,6 +8,7 @@ PhotoDedup 桌面应用入口
   python run.py          → 等同于 --dev 模式
 """
 
+import multiprocessing
 import sys
 import threading
 import time
@@ -87,6 +88,7 @@ def run_dev_mode():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包后 RAW 解码进程（spawn）从同一可执行文件启动
     if "--dev" in sys.argv:
         run_dev_mode()
     else:
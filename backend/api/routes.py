@@ -6,24 +6,46 @@ import asyncio
 import os
 import json
 import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from send2trash import send2trash
 
-from backend.core.scanner import scan_directory, PhotoInfo
-from backend.core.thumbnail import extract_thumbnail, extract_thumbnails_batch
-from backend.core.hasher import compute_phash_batch
-from backend.core.grouper import group_similar_photos, PhotoGroup
+# 解码/哈希/分组相关模块依赖 rawpy、PIL、imagehash、NumPy、SciPy，在用到时才导入，
+# 服务启动后由 backend.main 在后台线程预热（见 HEAVY_MODULES）
+from backend.core.scanner import resolve_scan_roots
 from backend.core.lightroom import LightroomCatalog
-from backend.core.recommender import recommend_all
-from backend.config import DEFAULT_SIMILARITY_THRESHOLD
+from backend.core.metrics import ScanMetrics, StageMetrics
+from backend.core.profiling import ScanProfiler
+from backend.config import (
+    DEFAULT_SIMILARITY_THRESHOLD, MAX_REGROUP_THRESHOLD, REPORTS_DIR, EXPORTS_DIR, PROFILE_SCANS,
+    WATCH_DEBOUNCE, WATCH_POLL_INTERVAL, ARCHIVE_SCANS, QUALITY_SCORING, ORIENTATION_MATCHING,
+    ORIENTATION_MODES, CASCADE_VERIFICATION,
+)
 
 router = APIRouter(prefix="/api")
 
+# 首次扫描/请求才需要的重量级模块，服务就绪后预先导入以免首次扫描卡顿
+HEAVY_MODULES = (
+    "numpy",
+    "backend.core.hashindex",
+    "backend.core.grouper",
+    "scipy.sparse.csgraph",
+    "backend.core.recommender",
+    "backend.core.scanner",
+    "exifread",
+    "backend.core.decoder",
+    "backend.core.thumbnail",
+    "backend.core.hasher",
+    "send2trash",
+    "backend.core.trash",
+    "backend.core.snapshot",
+)
+
 # ─── 全局扫描状态（线程安全通过 GIL 保证简单读写）─────────
 scan_state = {
     "status": "idle",       # idle | scanning | extracting | hashing | grouping | done | error
@@ -33,14 +55,29 @@ scan_state = {
     "message": "",
     "stage": "idle",
     # 扫描结果
-    "photos": [],           # PhotoInfo 列表
-    "photo_hashes": {},     # {path: hash}
+    "table": None,          # PhotoTable（拍摄单元的列式表：路径、大小、哈希、标志位等）
+    "photo_count": 0,       # 照片文件数
+    "graph": None,          # NeighborGraph（边距离 ≤ MAX_REGROUP_THRESHOLD）
+    "incremental": None,    # IncrementalGrouper（首次增量更新时由 graph/groups 接管，之后以它为准）
+    "progressive": None,    # ProgressiveGrouper（扫描进行中的临时分组，分组完成后清空）
+    "watcher": None,        # LibraryWatcher（监视模式开启时）
+    "threshold": DEFAULT_SIMILARITY_THRESHOLD,
     "groups": [],           # PhotoGroup 列表
     "scan_dir": "",
+    "scan_dirs": [],        # 实际遍历的根目录
+    "include_images": False,
+    "time_window": None,    # 扫描时的分组参数，增量更新沿用
+    "include_undated": True,
+    "orientation": "off",   # 方向无关匹配模式（off | exif | any）
+    "root_overlaps": [],    # 因重叠被跳过的根目录
     "lrcat_path": "",
     "edited_photos": set(),
     "flagged_photos": {},
     "recommendations": None,
+    "metrics": None,        # ScanMetrics（当前/最近一次扫描）
+    "report_path": "",      # 最近一次扫描的指标报告
+    "profile_dir": "",      # 最近一次扫描的剖析文件目录（开启剖析时）
+    "snapshot": None,       # 导入的 Snapshot（结果来自快照文件时）
 }
 
 
@@ -48,13 +85,49 @@ scan_state = {
 
 class ScanRequest(BaseModel):
     directory: str
+    directories: Optional[list[str]] = None  # 额外的根目录，与 directory 一并扫描
     lrcat_path: Optional[str] = None
     threshold: int = DEFAULT_SIMILARITY_THRESHOLD
     include_images: bool = False
+    time_window: Optional[float] = None  # 拍摄时间窗口（秒），设置后只比较窗口内的照片
+    include_undated: bool = True         # 时间窗口模式下，无 EXIF 时间的照片是否做全局比较
+    orientation: str = ORIENTATION_MATCHING  # 方向无关匹配：off | exif（显示方向相同的副本）| any（任意旋转/翻转）
+    profile: bool = False                # 为本次扫描生成剖析文件（PHOTODEDUP_PROFILE=1 时总是生成）
+
+
+class RegroupRequest(BaseModel):
+    threshold: int
+
+
+class SnapshotRequest(BaseModel):
+    path: Optional[str] = None  # 导出时可省略，默认写入 EXPORTS_DIR
 
 
 class DeleteRequest(BaseModel):
     paths: list[str]
+    include_sidecars: bool = True  # 一并删除 XMP sidecar（同名主干的照片全部删除时）
+    wait: bool = False             # 等待删除完成后再返回（默认立即返回任务，进度见 /ws/delete/{id}）
+
+
+class LibraryChangeRequest(BaseModel):
+    paths: list[str]  # 文件或目录
+
+
+class PrefetchRequest(BaseModel):
+    groups: list[list[str]]  # 按审核界面的显示顺序排列的分组成员路径，第一组为当前组
+
+
+class LookupRequest(BaseModel):
+    paths: list[str]                             # 要查询的文件或目录（如刚插入的存储卡）
+    threshold: int = DEFAULT_SIMILARITY_THRESHOLD
+    limit: int = 10                              # 每张照片最多返回的匹配数
+    include_images: bool = False                 # 目录中是否包含 JPG 等普通图片（直接给出的文件总是查询）
+
+
+class WatchRequest(BaseModel):
+    debounce: float = WATCH_DEBOUNCE           # 最后一次文件事件后等待的安静时间（秒）
+    poll_interval: float = WATCH_POLL_INTERVAL  # 轮询方式的遍历间隔（秒）
+    polling: Optional[bool] = None              # True 强制轮询（网络盘等收不到 inotify 事件时），None 自动
 
 
 class GroupDecision(BaseModel):
@@ -72,8 +145,9 @@ async def websocket_progress(websocket: WebSocket):
     await websocket.accept()
     ws_clients.append(websocket)
     try:
-        # 持续推送状态给客户端
+        # 持续推送状态给客户端；扫描中的临时分组有变化时推送 {"type": "groups", "provisional": true, ...}
         last_msg = ""
+        version = 0
         while True:
             await asyncio.sleep(0.5)
             current = json.dumps({
@@ -86,6 +160,13 @@ async def websocket_progress(websocket: WebSocket):
                 await websocket.send_text(current)
                 last_msg = current
 
+            progressive = scan_state.get("progressive")
+            if progressive is not None and progressive.version > version:
+                payload = await asyncio.to_thread(_provisional_payload, version)
+                if payload is not None:
+                    await websocket.send_text(json.dumps(payload, ensure_ascii=False))
+                    version = payload["version"]
+
             # 扫描完成或出错时发送最终状态并退出
             if scan_state["status"] in ("done", "error"):
                 summary = None
@@ -94,7 +175,7 @@ async def websocket_progress(websocket: WebSocket):
                 final = json.dumps({
                     "stage": scan_state["status"],
                     "message": scan_state["message"],
-                    "total_photos": len(scan_state.get("photos", [])),
+                    "total_photos": scan_state.get("photo_count", 0),
                     "total_groups": len(scan_state.get("groups", [])),
                     "summary": summary,
                 }, ensure_ascii=False)
@@ -107,16 +188,78 @@ async def websocket_progress(websocket: WebSocket):
             ws_clients.remove(websocket)
 
 
+def _provisional_payload(since: int = 0) -> dict | None:
+    """
+    扫描进行中的临时分组：自版本 since 以来新建、变化、移除的分组（since=0 时为当前全部分组）。
+
+    分组 id 在之后的推送和最终结果中保持不变；扫描结束前每个分组都可能继续增加成员（may_grow）。
+    没有进行中的扫描时返回 None。
+    """
+    progressive = scan_state.get("progressive")
+    if progressive is None:
+        return None
+    with progressive.lock:
+        delta = progressive.delta(since)
+        groups = _group_payload(delta["groups"])
+    for group in groups:
+        group["may_grow"] = True
+    return {
+        "type": "groups",
+        "provisional": True,
+        **delta,
+        "groups": groups,
+        "total_groups": delta["summary"]["total_groups"],
+    }
+
+
+library_clients: list[WebSocket] = []
+_event_loop: asyncio.AbstractEventLoop | None = None  # 后台线程推送消息时使用的事件循环
+
+
+@router.websocket("/ws/library")
+async def websocket_library(websocket: WebSocket):
+    """增量更新（监视模式或 /library 请求）后推送变化的分组：{"type": "groups", created, updated, removed, groups, ...}"""
+    global _event_loop
+    await websocket.accept()
+    _event_loop = asyncio.get_running_loop()
+    library_clients.append(websocket)
+    try:
+        while True:
+            await websocket.receive_text()  # 客户端无需发送内容，只用于察觉断开
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if websocket in library_clients:
+            library_clients.remove(websocket)
+
+
+def _broadcast_changes(payload: dict):
+    """把增量更新结果推送给所有 /ws/library 客户端（可在任意线程调用）"""
+    loop = _event_loop
+    if loop is None or not library_clients:
+        return
+    text = json.dumps({"type": "groups", **payload}, ensure_ascii=False)
+    for websocket in list(library_clients):
+        asyncio.run_coroutine_threadsafe(websocket.send_text(text), loop)
+
+
 # ─── 扫描 API ────────────────────────────────────────────
 
 @router.post("/scan")
 async def start_scan(req: ScanRequest):
     """启动扫描任务"""
-    if not os.path.isdir(req.directory):
-        raise HTTPException(400, f"目录不存在: {req.directory}")
+    directories = [req.directory] + [d for d in (req.directories or []) if d]
+    for d in directories:
+        if not os.path.isdir(d):
+            raise HTTPException(400, f"目录不存在: {d}")
+    if req.orientation not in ORIENTATION_MODES:
+        raise HTTPException(400, f"未知的方向匹配模式: {req.orientation}")
+    roots, overlaps = resolve_scan_roots(directories)
 
     if scan_state["status"] not in ("idle", "done", "error"):
         raise HTTPException(409, "扫描正在进行中")
+    await asyncio.to_thread(_stop_watch)
+    _cancel_prefetch()
 
     # 重置状态
     scan_state.update({
@@ -126,25 +269,47 @@ async def start_scan(req: ScanRequest):
         "total": 0,
         "current_file": "",
         "message": "正在扫描目录...",
-        "photos": [],
-        "photo_hashes": {},
+        "table": None,
+        "photo_count": 0,
+        "graph": None,
+        "incremental": None,
+        "progressive": None,
+        "threshold": req.threshold,
         "groups": [],
         "scan_dir": req.directory,
+        "scan_dirs": roots,
+        "include_images": req.include_images,
+        "time_window": req.time_window,
+        "include_undated": req.include_undated,
+        "orientation": req.orientation,
+        "root_overlaps": overlaps,
         "lrcat_path": req.lrcat_path or "",
         "edited_photos": set(),
         "flagged_photos": {},
         "recommendations": None,
+        "metrics": None,
+        "report_path": "",
+        "profile_dir": "",
+        "snapshot": None,
     })
 
     # 在后台线程执行扫描
     thread = threading.Thread(
         target=_run_scan,
-        args=(req.directory, req.lrcat_path, req.threshold, req.include_images),
+        args=(
+            roots, req.lrcat_path, req.threshold, req.include_images,
+            req.time_window, req.include_undated, req.profile or PROFILE_SCANS, req.orientation,
+        ),
         daemon=True,
     )
     thread.start()
 
-    return {"status": "started", "message": "扫描已启动"}
+    return {
+        "status": "started",
+        "message": "扫描已启动",
+        "roots": roots,
+        "overlaps": overlaps,
+    }
 
 
 def _update_progress(stage: str, message: str, progress: int = 0, total: int = 0, filename: str = ""):
@@ -157,8 +322,50 @@ def _update_progress(stage: str, message: str, progress: int = 0, total: int = 0
     scan_state["current_file"] = filename
 
 
-def _run_scan(directory: str, lrcat_path: str | None, threshold: int, include_images: bool):
+def _run_scan(
+    directories: list[str],
+    lrcat_path: str | None,
+    threshold: int,
+    include_images: bool,
+    time_window: float | None = None,
+    include_undated: bool = True,
+    profile: bool = False,
+    orientation: str = "off",
+):
     """在后台线程执行完整扫描流程"""
+    from backend.core.scanner import scan_directory, pair_captures
+    from backend.core.thumbnail import extract_thumbnails_batch
+    from backend.core.progressive import ProgressiveGrouper
+    from backend.core.recommender import recommend_all
+    from backend.core.autotune import Autotuner
+    from backend.core.cascade import report as cascade_report
+
+    metrics = ScanMetrics()
+    autotuner = Autotuner(directories)
+    profiler = None
+    if profile:
+        profiler = ScanProfiler(REPORTS_DIR / f"{metrics.report_name}-profile")
+        scan_state["profile_dir"] = str(profiler.directory)
+
+    @contextmanager
+    def stage(name: str):
+        """计时（并按需剖析）一个阶段"""
+        with metrics.stage(name) as stage_metrics:
+            if profiler is None:
+                yield stage_metrics
+            else:
+                with profiler.stage(name):
+                    yield stage_metrics
+
+    metrics.info.update({
+        "directories": directories,
+        "threshold": threshold,
+        "include_images": include_images,
+        "time_window": time_window,
+        "orientation": orientation,
+    })
+    scan_state["metrics"] = metrics
+
     try:
         # 步骤 1: 扫描目录
         _update_progress("scanning", "正在扫描目录，收集照片文件...")
@@ -166,53 +373,98 @@ def _run_scan(directory: str, lrcat_path: str | None, threshold: int, include_im
         def scan_progress(current, total, filename):
             _update_progress("scanning", f"扫描中: {filename}", current, total, filename)
 
-        photos = scan_directory(
-            directory,
-            include_raw=True,
-            include_images=include_images,
-            progress_callback=scan_progress,
-        )
-        scan_state["photos"] = photos
+        with stage("scan") as stage_metrics:
+            photos = scan_directory(
+                directories,
+                include_raw=True,
+                include_images=include_images,
+                progress_callback=scan_progress,
+                metrics=stage_metrics,
+                tuner=autotuner.stage("scan"),
+            )
+        scan_state["photo_count"] = len(photos)
+        metrics.info["photos"] = len(photos)
 
         if not photos:
             _update_progress("done", "未找到任何照片文件")
             return
 
-        # 步骤 2: 提取缩略图
+        # RAW+JPEG 同名文件合并为一个拍摄单元，只处理代表文件
+        captures = pair_captures(photos)
+        metrics.info["captures"] = len(captures)
+
+        # 步骤 2: 提取缩略图，每个文件提取完立即计算哈希并逐批分组（临时分组推送给 /ws/progress）
         _update_progress("extracting", "正在提取缩略图...")
 
         def thumb_progress(current, total, filename):
             _update_progress("extracting", f"提取缩略图: {filename}", current, total, filename)
 
-        thumb_results = extract_thumbnails_batch(
-            [p.path for p in photos],
-            progress_callback=thumb_progress,
+        # 邻接图记录到 MAX_REGROUP_THRESHOLD 为止的所有边，之后调整阈值无需重新比较
+        max_threshold = max(threshold, MAX_REGROUP_THRESHOLD)
+        hash_metrics = StageMetrics("hash")
+        progressive = ProgressiveGrouper(
+            captures, threshold, max_threshold, time_window, include_undated, orientation,
+            metrics=hash_metrics, tuner=autotuner.stage("hash"),
         )
-
-        # 步骤 3: 计算哈希
-        _update_progress("hashing", "正在计算图像指纹...")
-
-        thumb_map = {orig: str(thumb) for orig, thumb in thumb_results.items() if thumb}
-
-        def hash_progress(current, total):
-            _update_progress("hashing", f"计算哈希: {current}/{total}", current, total)
-
-        hashes = compute_phash_batch(thumb_map, progress_callback=hash_progress)
-        scan_state["photo_hashes"] = hashes
-
-        # 步骤 4: 聚类分组
+        scan_state["progressive"] = progressive
+        try:
+            with stage("extract") as stage_metrics:
+                extract_thumbnails_batch(
+                    [c.path for c in captures],
+                    progress_callback=thumb_progress,
+                    metrics=stage_metrics,
+                    file_ids=[c.representative.file_id for c in captures],
+                    tuner=autotuner.stage("extract"),
+                    on_result=progressive.add,
+                )
+
+            # 步骤 3: 等待剩余的哈希计算完成（大部分已在提取期间算完）
+            _update_progress("hashing", "正在计算图像指纹...")
+            metrics.stages["hash"] = hash_metrics
+            with stage("hash"):
+                grouper, _hashes = progressive.finish()
+        except BaseException:
+            progressive.close()
+            raise
+
+        # 照片表（列式）在分组过程中已逐批建好，逐文件的对象随即释放
+        table = grouper.table
+        scan_state["table"] = table
+        del photos, captures, _hashes
+
+        # 步骤 4: 分组已随哈希逐批完成，导出紧凑的邻接图（重新分组、阈值预览、增量更新使用），
+        # 释放逐条记录的边；分组 id 与扫描中推送的临时分组一致
         _update_progress("grouping", "正在识别相似照片...")
 
-        photo_sizes = {p.path: p.size for p in photos}
-        groups = group_similar_photos(hashes, photo_sizes, threshold)
-        scan_state["groups"] = groups
+        with stage("group") as stage_metrics:
+            graph = grouper.to_graph()
+            groups = grouper.groups()
+            stage_metrics.items = graph.node_count
+        del grouper
+        metrics.info.update({
+            "edges": graph.edge_count,
+            "groups": len(groups),
+            "progressive": progressive.stats(),
+            "cascade": cascade_report(graph.cascade),
+        })
+        scan_state.update({
+            "graph": graph,
+            "threshold": threshold,
+            "groups": groups,
+            "progressive": None,
+        })
+        _prefetch_review(groups)
 
         # 步骤 5: 检测 Lightroom 编辑状态（通过 XMP sidecar 文件）
         _update_progress("grouping", "正在检测 Lightroom 编辑状态...")
         try:
             from backend.core.lightroom import detect_edited_photos
-            photo_path_list = [p.path for p in photos]
-            edited, flagged = detect_edited_photos(photo_path_list)
+            photo_path_list = table.all_paths()
+            with stage("xmp") as stage_metrics:
+                edited, flagged = detect_edited_photos(photo_path_list)
+                table.apply_lightroom(edited, flagged)
+                stage_metrics.items = len(photo_path_list)
+            del photo_path_list
             scan_state["edited_photos"] = edited
             scan_state["flagged_photos"] = flagged
             if edited:
@@ -222,25 +474,417 @@ def _run_scan(directory: str, lrcat_path: str | None, threshold: int, include_im
 
         # 步骤 6: 生成推荐
         _update_progress("grouping", "正在生成推荐...")
-        recommendations = recommend_all(
-            groups,
-            scan_state.get("edited_photos"),
-            scan_state.get("flagged_photos"),
-        )
+        with stage("recommend") as stage_metrics:
+            recommendations = recommend_all(groups)
+            stage_metrics.items = len(groups)
         scan_state["recommendations"] = recommendations
 
+        # 步骤 7: 写入图库索引（之后可查询新照片是否已在库中）
+        if ARCHIVE_SCANS:
+            try:
+                with stage("archive") as stage_metrics:
+                    stage_metrics.items = _archive_index().add(table, {"roots": directories})
+            except Exception as e:
+                scan_state["message"] = f"写入图库索引失败: {e}"
+
         # 完成
-        _update_progress(
-            "done",
-            f"扫描完成！共 {len(photos)} 张照片，发现 {len(groups)} 组相似照片",
-        )
+        alias_count = sum(len(a) for a in table.aliases.values())
+        paired_count = len(table.siblings)
+        message = f"扫描完成！共 {table.photo_count} 张照片，发现 {len(groups)} 组相似照片"
+        if paired_count:
+            message += f"（{paired_count} 组 RAW+JPEG 已按单次拍摄合并）"
+        if alias_count:
+            message += f"（另有 {alias_count} 个硬链接/重复路径已合并）"
+        _update_progress("done", message)
 
     except Exception as e:
+        metrics.info["error"] = str(e)
         _update_progress("error", f"扫描出错: {str(e)}")
 
+    finally:
+        # 各阶段调整出的线程数按图库保存，下次扫描从这里开始
+        try:
+            metrics.info["autotune"] = autotuner.save()
+        except OSError:
+            pass
+        metrics.finish()
+        try:
+            scan_state["report_path"] = str(metrics.write_report(REPORTS_DIR))
+        except OSError:
+            pass
+
+
+@router.post("/regroup")
+async def regroup(req: RegroupRequest):
+    """用新的阈值即时重新分组（基于扫描时构建的邻接图，不重新扫描）"""
+    if scan_state["status"] != "done":
+        raise HTTPException(400, "扫描尚未完成")
+
+    graph = _graph()
+    if graph is None:
+        raise HTTPException(404, "暂无可重新分组的扫描结果")
+    if not 0 <= req.threshold <= graph.max_threshold:
+        raise HTTPException(400, f"阈值必须在 0 ~ {graph.max_threshold} 之间")
+
+    from backend.core.recommender import recommend_all
+
+    def apply_threshold():
+        # 与增量更新互斥：等正在处理的一批文件变化完成后再基于最新的邻接图分组
+        with _library_lock:
+            current = _graph()
+            groups = current.groups(req.threshold)
+            recommendations = recommend_all(groups)
+            scan_state.update({
+                "threshold": req.threshold,
+                "groups": groups,
+                "recommendations": recommendations,
+                "incremental": None,  # 分组 id 已重新编号，之后的增量更新由新的分组接管
+            })
+            return groups, recommendations
+
+    start = time.perf_counter()
+    groups, recommendations = await asyncio.to_thread(apply_threshold)
+
+    return {
+        "threshold": req.threshold,
+        "max_threshold": graph.max_threshold,
+        "total_groups": len(groups),
+        "summary": recommendations["summary"],
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+@router.get("/threshold-preview")
+async def threshold_preview():
+    """
+    阈值预览 — 最近邻距离分布，以及每个阈值下将得到的分组数量/规模。
+
+    基于扫描时构建的邻接图计算，不做任何额外的两两比较。
+    """
+    if scan_state["status"] != "done":
+        raise HTTPException(400, "扫描尚未完成")
+
+    graph = _graph()
+    if graph is None:
+        raise HTTPException(404, "暂无可预览的扫描结果")
+
+    import numpy as np
+
+    start = time.perf_counter()
+    nearest = graph.nearest_distances()
+    histogram = [0] * (graph.max_threshold + 1)
+    for d, count in zip(*np.unique(nearest[nearest >= 0], return_counts=True)):
+        histogram[int(d)] = int(count)
+
+    return {
+        "threshold": scan_state.get("threshold"),
+        "max_threshold": graph.max_threshold,
+        "nearest_neighbor": {
+            "histogram": histogram,                   # 下标 = 最近邻距离
+            "beyond": int((nearest < 0).sum()),       # 最近邻距离 > max_threshold
+            "total": len(nearest),
+        },
+        "thresholds": graph.threshold_profile(),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+# ─── 增量更新 API（新导入/已删除的文件只更新受影响的分组） ─────────
+
+_library_lock = threading.Lock()
+
+
+def _incremental_grouper():
+    """当前结果的增量分组状态，首次使用时接管扫描得到的邻接图和分组"""
+    grouper = scan_state.get("incremental")
+    if grouper is None:
+        from backend.core.incremental import IncrementalGrouper
+        grouper = IncrementalGrouper.from_graph(
+            scan_state["graph"],
+            scan_state["groups"],
+            scan_state["threshold"],
+            scan_state.get("time_window"),
+            scan_state.get("include_undated", True),
+            scan_state.get("recommendations"),
+            scan_state.get("orientation", "off"),
+        )
+        scan_state["incremental"] = grouper
+    return grouper
+
+
+def _graph():
+    """当前结果的邻接图；增量更新后由增量分组状态重新导出（按需，导出一次后缓存）"""
+    graph = scan_state.get("graph")
+    grouper = scan_state.get("incremental")
+    if graph is None and grouper is not None:
+        graph = scan_state["graph"] = grouper.to_graph()
+    return graph
+
+
+def _process_files(paths: list[str], include_images: bool):
+    """
+    对一批文件执行扫描流程的前几步：EXIF、RAW+JPEG 配对、缩略图、哈希、XMP 检测。
+
+    Returns:
+        (PhotoTable, 已编辑路径, 已标记路径)
+    """
+    from backend.core.scanner import scan_files, pair_captures
+    from backend.core.thumbnail import extract_thumbnails_batch
+    from backend.core.hasher import compute_phash_batch
+    from backend.core.phototable import PhotoTable
+    from backend.core.lightroom import detect_edited_photos
+
+    photos = scan_files(paths, include_raw=True, include_images=include_images)
+    captures = pair_captures(photos)
+    thumb_results = extract_thumbnails_batch(
+        [c.path for c in captures], file_ids=[c.representative.file_id for c in captures],
+    )
+    thumb_map = {orig: str(thumb) for orig, thumb in thumb_results.items() if thumb}
+    qualities = {} if QUALITY_SCORING else None
+    orientations = {}
+    signatures = {} if CASCADE_VERIFICATION else None
+    hashes = compute_phash_batch(thumb_map, qualities=qualities, orientations=orientations, signatures=signatures)
+    table = PhotoTable.from_captures(captures, hashes, qualities, orientations, signatures)
+    edited, flagged = detect_edited_photos(table.all_paths())
+    table.apply_lightroom(edited, flagged)
+    return table, edited, flagged
+
+
+def _apply_library_changes(added: list[str], removed: list[str]) -> dict:
+    """
+    把新增（或修改）和删除的文件并入当前结果，只重新处理受影响的拍摄单元。
+
+    受影响的单元包括：路径被删除/修改的单元、与新增文件同一次拍摄（同名 RAW/JPEG）
+    需要重新配对的单元。它们的其余文件与新增文件一起重新走提取/哈希/XMP 检测，
+    再由 IncrementalGrouper 更新分组和推荐。
+
+    目录按文件大小、修改时间与照片表同步：只处理新出现或变化的文件，以及文件已不存在的
+    单元（监视模式在 inotify 事件丢失后也以这种方式整体同步根目录）。
+
+    Args:
+        added: 新增或修改的文件或目录
+        removed: 已删除（或要移出结果）的文件或目录
+
+    Returns:
+        IncrementalGrouper.apply 的结果 {'created', 'updated', 'removed'}
+    """
+    from backend.core.scanner import scan_directory
+    from backend.core.incremental import related_units
+
+    with _library_lock:
+        grouper = _incremental_grouper()
+        table = grouper.table
+        include_images = scan_state.get("include_images", False)
+
+        files = []
+        touched = set()
+        for path in added:
+            if not os.path.isdir(path):
+                files.append(path)
+                continue
+            for info in scan_directory(path, include_images=include_images, read_exif=False):
+                for p in info.all_paths:
+                    i = table.id_of(p)
+                    if i is None or (
+                        table.path(i) == p and (table.size[i] != info.size or table.mtime[i] != info.mtime)
+                    ):
+                        files.append(p)
+            for i in table.ids_under(path).tolist():
+                if not all(os.path.lexists(p) for p in table.unit_paths(i) + table.aliases.get(i, [])):
+                    touched.add(i)
+
+        touched.update(table.ids_of(files + removed))
+        for path in removed:
+            touched.update(table.ids_under(path).tolist())
+        touched |= related_units(table, files + removed)
+
+        def is_removed(path: str) -> bool:
+            return any(path == r or path.startswith(r.rstrip(os.sep) + os.sep) for r in removed)
+
+        reprocess = set(files)
+        stale = set()
+        for i in touched:
+            unit = table.unit_paths(i) + table.aliases.get(i, [])
+            stale.update(unit)
+            reprocess.update(unit)
+        reprocess = sorted(p for p in reprocess if not is_removed(p))
+
+        new_table, edited, flagged = _process_files(reprocess, include_images)
+        if scan_state.get("incremental") is not grouper:
+            # 处理期间开始了新的扫描/导入（监视线程中可能发生），结果作废
+            return {"created": [], "updated": [], "removed": []}
+        changes = grouper.apply(touched, new_table)
+
+        # 受影响单元的 XMP 状态以这次检测为准
+        stale.update(reprocess)
+        scan_state["edited_photos"] = (scan_state.get("edited_photos") or set()) - stale | edited
+        scan_state["flagged_photos"] = {
+            **{p: v for p, v in (scan_state.get("flagged_photos") or {}).items() if p not in stale},
+            **flagged,
+        }
+        scan_state.update({
+            "graph": None,
+            "groups": grouper.groups(),
+            "recommendations": grouper.recommendations(),
+            "photo_count": table.photo_count,
+        })
+        if ARCHIVE_SCANS and len(new_table):
+            try:
+                _archive_index().add(new_table, {"roots": sorted(set(added))})
+            except Exception as e:
+                scan_state["message"] = f"写入图库索引失败: {e}"
+        return changes
+
+
+async def _library_change(added: list[str], removed: list[str]) -> dict:
+    if scan_state["status"] not in ("idle", "done", "error"):
+        raise HTTPException(409, "扫描正在进行中")
+    if scan_state["status"] != "done" or (scan_state.get("graph") is None and scan_state.get("incremental") is None):
+        raise HTTPException(400, "没有可更新的扫描结果")
+
+    start = time.perf_counter()
+    changes = await asyncio.to_thread(_apply_library_changes, added, removed)
+    payload = _changes_payload(changes)
+    _broadcast_changes(payload)
+    return {**payload, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+def _changes_payload(changes: dict) -> dict:
+    """一次增量更新的结果：变化的分组 id，新建和变化分组的完整数据与推荐，以及新的摘要"""
+    grouper = scan_state["incremental"]
+    changed = grouper.groups(changes["created"] + changes["updated"])
+    return {
+        **changes,
+        "groups": _group_payload(changed),
+        "recommendations": [grouper.recommendation(g.group_id) for g in changed],
+        "total_groups": len(scan_state["groups"]),
+        "total_photos": scan_state["photo_count"],
+        "summary": scan_state["recommendations"]["summary"],
+    }
+
+
+@router.post("/library/add")
+async def library_add(req: LibraryChangeRequest):
+    """
+    把新增（或修改过）的文件/目录并入当前结果，不重新扫描整个图库。
+
+    返回新建、变化、移除的分组 id，以及新建和变化分组的完整数据与推荐。
+    """
+    return await _library_change([os.path.abspath(p) for p in req.paths], [])
+
+
+@router.post("/library/remove")
+async def library_remove(req: LibraryChangeRequest):
+    """从当前结果中移除文件/目录（已删除或不再需要比较），只更新受影响的分组"""
+    return await _library_change([], [os.path.abspath(p) for p in req.paths])
+
+
+# ─── 监视模式 API（导入新照片后自动增量更新并推送给客户端） ─────────
+
+def _on_watch_change(changed: list[str], removed: list[str]):
+    """监视线程的批次回调：增量更新后把变化的分组推送给 /ws/library 的客户端"""
+    if scan_state["status"] != "done":
+        return
+    changes = _apply_library_changes(changed, removed)
+    if any(changes.values()):
+        _broadcast_changes(_changes_payload(changes))
+
+
+def _stop_watch():
+    watcher = scan_state.get("watcher")
+    if watcher is not None:
+        watcher.stop()
+        scan_state["watcher"] = None
+
+
+@router.post("/watch/start")
+async def start_watch(req: WatchRequest):
+    """监视扫描过的根目录，文件（含 XMP sidecar）变化去抖后自动增量更新分组"""
+    from backend.core.watcher import LibraryWatcher
+
+    global _event_loop
+    if scan_state["status"] != "done" or (scan_state.get("graph") is None and scan_state.get("incremental") is None):
+        raise HTTPException(400, "没有可监视的扫描结果")
+    roots = [d for d in scan_state.get("scan_dirs") or [] if os.path.isdir(d)]
+    if not roots:
+        raise HTTPException(400, "扫描的根目录已不存在")
+
+    _event_loop = asyncio.get_running_loop()
+    _stop_watch()
+    watcher = LibraryWatcher(
+        roots,
+        _on_watch_change,
+        include_images=scan_state.get("include_images", False),
+        debounce=req.debounce,
+        poll_interval=req.poll_interval,
+        polling=req.polling,
+    )
+    try:
+        # 建立监视需要遍历根目录（inotify 逐目录添加、轮询记录文件状态），放到线程中执行
+        await asyncio.to_thread(watcher.start)
+    except OSError as e:
+        raise HTTPException(400, f"无法监视目录: {e}")
+    scan_state["watcher"] = watcher
+    return watcher.status()
+
+
+@router.post("/watch/stop")
+async def stop_watch():
+    """停止监视"""
+    await asyncio.to_thread(_stop_watch)
+    return {"running": False}
+
+
+@router.get("/watch/status")
+async def get_watch_status():
+    """监视状态：方式（inotify / polling）、监视的目录/文件数、已处理的批次"""
+    watcher = scan_state.get("watcher")
+    if watcher is None:
+        return {"running": False}
+    return watcher.status()
+
 
 # ─── 查询 API ────────────────────────────────────────────
 
+@router.get("/profile")
+async def list_profile_files():
+    """列出最近一次扫描的剖析文件"""
+    profile_dir = scan_state.get("profile_dir")
+    if not profile_dir or not os.path.isdir(profile_dir):
+        raise HTTPException(404, "最近一次扫描未开启剖析")
+    files = sorted(os.listdir(profile_dir))
+    return {
+        "directory": profile_dir,
+        "files": [
+            {"name": f, "size": os.path.getsize(os.path.join(profile_dir, f)), "url": f"/api/profile/{f}"}
+            for f in files
+        ],
+    }
+
+
+@router.get("/profile/{name}")
+async def download_profile_file(name: str):
+    """下载单个剖析文件（.prof / .txt / .folded）"""
+    profile_dir = scan_state.get("profile_dir")
+    if not profile_dir or not os.path.isdir(profile_dir) or name not in os.listdir(profile_dir):
+        raise HTTPException(404, "剖析文件不存在")
+    return FileResponse(os.path.join(profile_dir, name), filename=name)
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """获取当前/最近一次扫描的分阶段指标（扫描进行中也可查询）"""
+    metrics = scan_state.get("metrics")
+    if metrics is None:
+        raise HTTPException(404, "暂无扫描指标")
+    return {
+        "status": scan_state["status"],
+        "report_path": scan_state.get("report_path") or None,
+        "profile_dir": scan_state.get("profile_dir") or None,
+        **metrics.to_dict(),
+    }
+
+
 @router.get("/scan/status")
 async def get_scan_status():
     """获取扫描状态"""
@@ -259,33 +903,54 @@ async def get_groups():
     if scan_state["status"] != "done":
         raise HTTPException(400, "扫描尚未完成")
 
-    groups = scan_state.get("groups", [])
-    edited = scan_state.get("edited_photos", set())
+    result = _group_payload(scan_state.get("groups", []))
+    graph = _graph()
+    return {
+        "groups": result,
+        "total": len(result),
+        "threshold": scan_state.get("threshold"),
+        "max_threshold": graph.max_threshold if graph else None,
+    }
+
+
+@router.get("/groups/provisional")
+async def get_provisional_groups(since: int = 0):
+    """扫描进行中的临时分组（无法使用 WebSocket 时轮询，since 为上次得到的 version）"""
+    payload = await asyncio.to_thread(_provisional_payload, since)
+    if payload is None:
+        raise HTTPException(404, "没有进行中的扫描")
+    return payload
+
+
+def _group_payload(groups: list) -> list[dict]:
+    """分组的 JSON 结构（含 Lightroom 编辑/标记信息）"""
+    import numpy as np
+    from backend.core.phototable import FLAG_EDITED, FLAG_FLAGGED
+
+    if not groups:
+        return []
     flagged = scan_state.get("flagged_photos", {})
 
+    # 所有分组的成员一次性从照片表生成，再按组切分
+    table = groups[0].table
+    ids = np.concatenate([g.ids for g in groups])
+    photos = table.records(ids)
+    for i, flags, photo in zip(ids.tolist(), table.flags[ids].tolist(), photos):
+        photo["aliases"] = table.aliases.get(i, [])
+        # 拍摄单元内任一文件（RAW 或 JPEG）被编辑/标记即视为整体被编辑/标记（见 apply_lightroom）
+        photo["is_edited"] = bool(flags & FLAG_EDITED)
+        photo["is_flagged"] = bool(flags & FLAG_FLAGGED)
+        flag_info = {}
+        if photo["is_flagged"]:
+            flag_info = next((flagged[p] for p in [photo["path"]] + photo["siblings"] if p in flagged), {})
+        photo["rating"] = flag_info.get("rating", 0)
+        photo["pick"] = flag_info.get("pick", 0)
     result = []
+    start = 0
     for group in groups:
-        group_data = group.to_dict()
-        for photo in group_data["photos"]:
-            path = photo["path"]
-            norm_path = os.path.normpath(path)
-            filename = os.path.basename(path)
-            # 按完整路径、标准化路径、文件名三种方式匹配
-            photo["is_edited"] = (
-                path in edited or norm_path in edited or filename in edited
-            )
-            photo["is_flagged"] = (
-                path in flagged or norm_path in flagged or filename in flagged
-            )
-            flag_info = (
-                flagged.get(path) or flagged.get(norm_path)
-                or flagged.get(filename) or {}
-            )
-            photo["rating"] = flag_info.get("rating", 0)
-            photo["pick"] = flag_info.get("pick", 0)
-        result.append(group_data)
-
-    return {"groups": result, "total": len(result)}
+        result.append(group.to_dict(photos[start:start + group.count]))
+        start += group.count
+    return result
 
 
 @router.get("/recommendations")
@@ -316,61 +981,345 @@ async def get_thumbnail(photo_id: str):
 
 
 @router.get("/thumbnail")
-async def get_thumbnail_by_path(path: str):
-    """通过原始文件路径获取缩略图"""
-    thumb_path = extract_thumbnail(path)
+async def get_thumbnail_by_path(path: str, preview: bool = False):
+    """通过原始文件路径获取缩略图（preview=true 时为灯箱使用的大预览）"""
+    from backend.config import PREVIEW_SIZE, THUMBNAIL_SIZE
+    from backend.core.prefetch import get_prefetcher
+    size = PREVIEW_SIZE if preview else THUMBNAIL_SIZE
+    thumb_path = await asyncio.to_thread(get_prefetcher().fetch, path, size)
     if thumb_path and thumb_path.exists():
         return FileResponse(str(thumb_path), media_type="image/jpeg")
     raise HTTPException(404, "缩略图提取失败")
 
 
-# ─── 操作 API ────────────────────────────────────────────
+# ─── 缩略图预取（按审核顺序预热缓存） ──────────────────────
 
-@router.post("/delete")
-async def delete_photos(req: DeleteRequest):
-    """将照片移入回收站"""
-    deleted = []
-    errors = []
+def _prefetch_review(groups: list):
+    """分组确定后从第一组开始预取（审核界面随后按用户的位置调整顺序）"""
+    from backend.config import PREFETCH_AHEAD
+    from backend.core.prefetch import get_prefetcher, review_order
+    paths = [[photo["path"] for photo in group.photos] for group in groups[:PREFETCH_AHEAD]]
+    get_prefetcher().schedule(review_order(paths))
 
-    for path in req.paths:
+
+def _cancel_prefetch():
+    from backend.core.prefetch import get_prefetcher
+    get_prefetcher().cancel()
+
+
+@router.post("/prefetch")
+async def prefetch_thumbnails(req: PrefetchRequest):
+    """按审核界面的显示顺序预取缩略图，替换之前的预取队列（用户翻页、跳转时调用）"""
+    from backend.core.prefetch import get_prefetcher, review_order
+    queued = get_prefetcher().schedule(review_order(req.groups))
+    return {"queued": queued}
+
+
+@router.get("/prefetch")
+async def get_prefetch_status():
+    """预取队列状态：排队数、进行中、累计预热 / 已缓存 / 失败 / 取消的项数"""
+    from backend.core.prefetch import get_prefetcher
+    return get_prefetcher().status()
+
+
+@router.get("/quarantine")
+async def get_quarantine():
+    """解码时卡死或崩溃、之后被跳过的文件"""
+    from backend.core.decoder import get_decoder
+    decoder = get_decoder()
+    return {**decoder.status(), "files": decoder.quarantine.entries()}
+
+
+@router.delete("/quarantine")
+async def clear_quarantine(path: str | None = None):
+    """移出隔离名单（默认全部），下次扫描重新尝试解码"""
+    from backend.core.decoder import get_decoder
+    removed = get_decoder().quarantine.clear([path] if path else None)
+    return {"removed": removed}
+
+
+# ─── 删除 API（后台任务，记录日志，可还原） ─────────────────
+
+_delete_jobs: dict = {}  # 本进程中启动或加载过的 DeleteJob（按 id）
+
+
+def _delete_job(job_id: str):
+    """按 id 取删除任务（进程重启后从日志加载）"""
+    from backend.config import DELETIONS_DIR
+    from backend.core.trash import DeleteJob, JOURNAL_SUFFIX
+
+    job = _delete_jobs.get(job_id)
+    if job is None:
+        journal = DELETIONS_DIR / f"{job_id}{JOURNAL_SUFFIX}"
+        if os.path.basename(job_id) != job_id or not journal.is_file():
+            raise HTTPException(404, "删除任务不存在")
         try:
-            if os.path.exists(path):
-                send2trash(path)
-                deleted.append(path)
-            else:
-                errors.append({"path": path, "error": "文件不存在"})
-        except Exception as e:
-            errors.append({"path": path, "error": str(e)})
+            job = _delete_jobs[job_id] = DeleteJob.load(journal)
+        except (ValueError, KeyError, OSError) as e:
+            raise HTTPException(400, f"无法读取删除日志: {e}")
+    return job
 
-    return {
-        "deleted_count": len(deleted),
-        "error_count": len(errors),
-        "deleted": deleted,
-        "errors": errors,
-    }
 
+@router.post("/delete")
+async def delete_photos(req: DeleteRequest):
+    """
+    将照片（及 XMP sidecar）移入回收站。
+
+    删除在后台线程中按目录分批并行执行，立即返回任务状态；进度通过 /ws/delete/{id} 推送
+    或查询 /delete/{id}。每个移走的文件记入日志，可用 /delete/{id}/restore 还原。
+    """
+    from backend.core.trash import DeleteJob
+
+    if not req.paths:
+        raise HTTPException(400, "没有要删除的文件")
+    job = DeleteJob(req.paths, include_sidecars=req.include_sidecars)
+    _delete_jobs[job.id] = job
+    if req.wait:
+        return await asyncio.to_thread(job.run)
+    threading.Thread(target=job.run, name="photodedup-delete-job", daemon=True).start()
+    return job.status()
+
+
+@router.get("/delete")
+async def list_delete_jobs():
+    """列出删除日志中的任务（新的在前），含各自可还原的文件数"""
+    from backend.core.trash import list_journals
+
+    jobs = await asyncio.to_thread(list_journals)
+    # 本进程中正在执行的任务以内存中的状态为准
+    return {"jobs": [_delete_jobs[j["id"]].status(errors=False) if j["id"] in _delete_jobs else j for j in jobs]}
+
+
+@router.get("/delete/{job_id}")
+async def get_delete_job(job_id: str):
+    """删除/还原任务的状态：进度、已删除的照片与 sidecar 数、释放的字节数、错误"""
+    return _delete_job(job_id).status()
+
+
+@router.post("/delete/{job_id}/cancel")
+async def cancel_delete_job(job_id: str):
+    """取消正在执行的删除/还原（已开始的批次做完）"""
+    job = _delete_job(job_id)
+    job.cancel()
+    return job.status(errors=False)
+
+
+@router.post("/delete/{job_id}/restore")
+async def restore_delete_job(job_id: str):
+    """按日志把任务移入回收站的文件移回原位置（后台执行，进度同删除）"""
+    job = await asyncio.to_thread(_delete_job, job_id)
+    if job.state in ("pending", "running"):
+        raise HTTPException(409, "任务正在执行中")
+    job.state = "pending"
+    threading.Thread(target=job.restore, name="photodedup-restore-job", daemon=True).start()
+    return job.status(errors=False)
+
+
+@router.websocket("/ws/delete/{job_id}")
+async def websocket_delete(websocket: WebSocket, job_id: str):
+    """推送删除/还原任务的进度，任务结束时发送含错误列表的最终状态后关闭"""
+    await websocket.accept()
+    job = _delete_jobs.get(job_id)
+    if job is None:
+        await websocket.close(code=4404)
+        return
+    try:
+        last = None
+        while True:
+            finished = job.state not in ("pending", "running")
+            current = job.status(errors=finished)
+            if current != last:
+                await websocket.send_text(json.dumps(current, ensure_ascii=False))
+                last = current
+            if finished:
+                break
+            await asyncio.sleep(0.25)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+# ─── 操作 API ────────────────────────────────────────────
 
 @router.post("/reset")
 async def reset_scan():
     """重置扫描状态"""
+    await asyncio.to_thread(_stop_watch)
+    _cancel_prefetch()
     scan_state.update({
         "status": "idle",
         "progress": 0,
         "total": 0,
         "current_file": "",
         "message": "",
-        "photos": [],
-        "photo_hashes": {},
+        "table": None,
+        "photo_count": 0,
+        "graph": None,
+        "incremental": None,
+        "progressive": None,
+        "threshold": DEFAULT_SIMILARITY_THRESHOLD,
         "groups": [],
         "scan_dir": "",
+        "scan_dirs": [],
+        "include_images": False,
+        "time_window": None,
+        "include_undated": True,
+        "orientation": "off",
+        "root_overlaps": [],
         "lrcat_path": "",
         "edited_photos": set(),
         "flagged_photos": {},
         "recommendations": None,
+        "metrics": None,
+        "report_path": "",
+        "profile_dir": "",
+        "snapshot": None,
     })
     return {"status": "reset"}
 
 
+# ─── 快照 API（导出/导入完成的扫描结果） ─────────────────────
+
+@router.post("/export")
+async def export_snapshot(req: SnapshotRequest):
+    """把当前扫描结果写入 .pdscan 快照文件"""
+    from backend.core.snapshot import write_snapshot, SNAPSHOT_SUFFIX
+
+    if scan_state["status"] != "done" or scan_state.get("table") is None:
+        raise HTTPException(400, "没有可导出的扫描结果")
+
+    if req.path:
+        path = Path(req.path).expanduser()
+    else:
+        EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = EXPORTS_DIR / f"scan-{time.strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}"
+    if not path.parent.is_dir():
+        raise HTTPException(400, f"目录不存在: {path.parent}")
+
+    start = time.perf_counter()
+    _graph()  # 增量更新过的结果先导出当前邻接图
+    await asyncio.to_thread(write_snapshot, path, scan_state)
+    return {
+        "path": str(path),
+        "bytes": path.stat().st_size,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+@router.get("/exports")
+async def list_snapshots():
+    """列出默认导出目录中的快照文件（新的在前）"""
+    from backend.core.snapshot import SNAPSHOT_SUFFIX
+
+    if not EXPORTS_DIR.is_dir():
+        return {"snapshots": []}
+    files = sorted(EXPORTS_DIR.glob(f"*{SNAPSHOT_SUFFIX}"), key=lambda f: f.stat().st_mtime, reverse=True)
+    return {
+        "snapshots": [
+            {"path": str(f), "bytes": f.stat().st_size, "modified": f.stat().st_mtime}
+            for f in files
+        ]
+    }
+
+
+@router.post("/import")
+async def import_snapshot(req: SnapshotRequest):
+    """从 .pdscan 快照恢复扫描结果（分组、推荐、邻接图），无需重新扫描"""
+    from backend.core.snapshot import load_snapshot
+
+    if scan_state["status"] not in ("idle", "done", "error"):
+        raise HTTPException(409, "扫描正在进行中")
+    if not req.path or not os.path.isfile(req.path):
+        raise HTTPException(400, f"文件不存在: {req.path}")
+
+    start = time.perf_counter()
+    try:
+        loaded = await asyncio.to_thread(load_snapshot, req.path)
+    except (ValueError, KeyError, OSError) as e:
+        raise HTTPException(400, f"无法读取快照: {e}")
+    await asyncio.to_thread(_stop_watch)
+
+    scan_state.update({
+        "progress": 0,
+        "total": 0,
+        "current_file": "",
+        "metrics": None,
+        "report_path": "",
+        "profile_dir": "",
+        "incremental": None,
+        **loaded,
+    })
+    _update_progress(
+        "done",
+        f"已导入扫描结果：共 {scan_state['photo_count']} 张照片，{len(scan_state['groups'])} 组相似照片",
+    )
+    _prefetch_review(scan_state["groups"])
+
+    return {
+        "path": req.path,
+        "total_photos": scan_state["photo_count"],
+        "total_groups": len(scan_state["groups"]),
+        "threshold": scan_state["threshold"],
+        "summary": scan_state["recommendations"]["summary"],
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+# ─── 图库索引 API（跨扫描查询照片是否已在库中） ───────────────
+
+_archive = None
+
+
+def _archive_index():
+    """进程内共享的图库索引（首次使用时打开）"""
+    global _archive
+    if _archive is None:
+        from backend.core.archive import ArchiveIndex
+        _archive = ArchiveIndex()
+    return _archive
+
+
+@router.get("/archive")
+async def get_archive_info():
+    """图库索引的段、行数、占用空间"""
+    return await asyncio.to_thread(lambda: _archive_index().stats())
+
+
+@router.post("/archive/lookup")
+async def archive_lookup(req: LookupRequest):
+    """
+    查询文件/目录中的照片是否已在图库中（无需与图库一起重新扫描）。
+
+    返回每张照片距离 ≤ threshold 的已索引照片，按距离升序。
+    """
+    from backend.core.archive import lookup_files
+
+    missing = [p for p in req.paths if not os.path.exists(p)]
+    if missing:
+        raise HTTPException(400, f"路径不存在: {missing[0]}")
+    if not 0 <= req.threshold <= 64:
+        raise HTTPException(400, "阈值必须在 0 ~ 64 之间")
+
+    start = time.perf_counter()
+    result = await asyncio.to_thread(
+        lookup_files, _archive_index(), req.paths, req.threshold, req.limit, req.include_images,
+    )
+    queries = len(result["queries"])
+    return {
+        **result,
+        "threshold": req.threshold,
+        "matched": sum(1 for q in result["queries"] if q["matches"]),
+        "ms_per_query": round(result["lookup_ms"] / queries, 3) if queries else 0,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+@router.post("/archive/compact")
+async def compact_archive():
+    """把图库索引的所有段合并为一段（同一路径只保留最新的记录）"""
+    return await asyncio.to_thread(lambda: _archive_index().compact(full=True))
+
+
 # ─── Lightroom API (保留，供未来使用) ─────────────────────────
 
 @router.get("/lightroom/info")
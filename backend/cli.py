@@ -0,0 +1,472 @@
+"""
+命令行批处理模式 — 不启动 Web 服务，直接调用核心模块，适合无界面服务器和 cron。
+
+子命令可以串成流水线，每一步的结果都是 JSON 文件：
+
+    python -m backend.cli scan /Volumes/Photos -o scan.json --include-images
+    python -m backend.cli group scan.json -o groups.json --threshold 10
+    python -m backend.cli recommend groups.json -o plan.json
+    python -m backend.cli export plan.json -o plan.csv
+    python -m backend.cli apply plan.json --yes
+    python -m backend.cli restore 20250101-120000-a1b2c3                    # 按删除日志还原
+
+多台机器分别处理各自的目录时，用 shard 输出分片、merge 合并后再分组：
+
+    python -m backend.cli shard /Volumes/NAS1/2023 -o nas1-2023.pdshard     # 在各节点上
+    python -m backend.cli merge *.pdshard -o scan.json                       # 集中合并
+
+所有扫描过的照片可以写入图库索引，之后无需重新扫描图库即可查询新照片是否已经存在：
+
+    python -m backend.cli index scan.json                                   # 写入索引
+    python -m backend.cli lookup /Volumes/CARD --threshold 6                # 查询
+
+进度输出到 stderr，结果输出到 -o 指定的文件（默认 stdout）。
+每个子命令只在运行时导入它需要的模块，从不导入 FastAPI、uvicorn 或 pywebview，
+因此 `--help` 和轻量子命令启动很快。
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+FORMAT_VERSION = 1
+
+
+# ─── 输入输出 ──────────────────────────────────────────
+
+def _progress(stage: str):
+    """返回写到 stderr 的进度回调（兼容 (current, total[, filename]) 两种签名）"""
+    def callback(current: int, total: int, filename: str = ""):
+        end = "\n" if current >= total else ""
+        print(f"\r[{stage}] {current}/{total} {filename[:60]:<60}", end=end, file=sys.stderr, flush=True)
+    return callback
+
+
+def _log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _read_json(path: str, kind: str) -> dict:
+    if path == "-":
+        data = json.load(sys.stdin)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    if data.get("format") != kind:
+        raise SystemExit(f"{path}: 不是 {kind} 文件（format={data.get('format')!r}）")
+    return data
+
+
+def _write_json(path: str, kind: str, payload: dict):
+    data = {"format": kind, "version": FORMAT_VERSION, **payload}
+    if path == "-":
+        json.dump(data, sys.stdout, ensure_ascii=False, indent=1)
+        sys.stdout.write("\n")
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        _log(f"已写入 {path}")
+
+
+# ─── scan ─────────────────────────────────────────────
+
+def _stage_progress():
+    """build_shard 的进度回调：按阶段复用 _progress"""
+    callbacks = {}
+
+    def callback(stage: str, current: int, total: int, filename: str = ""):
+        if stage not in callbacks:
+            callbacks[stage] = _progress(stage)
+        callbacks[stage](current, total, filename)
+    return callback
+
+
+def _build_shard(args):
+    """按 --jobs 在本进程或多个进程中扫描，返回（合并后的）Shard"""
+    from backend.core.shards import Shard, build_shard, merge_shards, scan_sharded
+
+    if args.jobs <= 1:
+        return build_shard(
+            args.directories, args.include_images, not args.no_exif,
+            progress_callback=_stage_progress(),
+        )
+
+    import tempfile
+    from backend.core.scanner import resolve_scan_roots
+    with tempfile.TemporaryDirectory(prefix="photodedup-shards-") as tmp:
+        paths = scan_sharded(
+            args.directories, tmp, args.jobs, args.include_images, not args.no_exif,
+            progress_callback=_progress("shard"),
+        )
+        merged = merge_shards([Shard.load(p) for p in paths])
+    merged.meta["roots"], merged.meta["overlaps"] = resolve_scan_roots(args.directories)
+    return merged
+
+
+def _write_scan(path: str, shard):
+    """把 Shard 写成 photodedup-scan JSON（group 子命令的输入）"""
+    records = shard.records()
+    failed = sum(1 for r in records if r["hash"] is None)
+    if failed:
+        _log(f"{failed} 个文件无法生成缩略图/哈希")
+    _write_json(path, "photodedup-scan", {
+        "roots": shard.meta.get("roots", []),
+        "overlaps": shard.meta.get("overlaps", []),
+        "photos": records,
+    })
+
+
+def cmd_scan(args) -> int:
+    """遍历目录 → EXIF → 缩略图 → pHash，输出每个拍摄单元的哈希"""
+    from backend.core.scanner import resolve_scan_roots
+
+    _roots, overlaps = resolve_scan_roots(args.directories)
+    for o in overlaps:
+        _log(f"跳过 {o['root']}（已被 {o['covered_by']} 包含）")
+
+    shard = _build_shard(args)
+    _log(f"共 {len(shard)} 个拍摄单元")
+    _write_scan(args.output, shard)
+    return 0
+
+
+# ─── shard / merge ────────────────────────────────────
+
+def cmd_shard(args) -> int:
+    """扫描目录并输出分片文件（在靠近数据的节点上运行）"""
+    if args.output == "-":
+        raise SystemExit("分片是二进制文件，请用 -o 指定输出路径")
+    shard = _build_shard(args)
+    shard.save(args.output)
+    _log(f"{len(shard)} 个拍摄单元 → {args.output}")
+    return 0
+
+
+def cmd_merge(args) -> int:
+    """合并任意数量的分片，输出 photodedup-scan JSON 供 group 使用"""
+    from backend.core.shards import Shard, merge_shards
+
+    remap = []
+    for item in args.remap:
+        old, sep, new = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--remap 格式应为 旧前缀=新前缀：{item}")
+        remap.append((old, new))
+
+    shards = [Shard.load(p) for p in args.shard_files]
+    merged = merge_shards(shards, remap)
+    total = sum(len(s) for s in shards)
+    _log(f"{len(shards)} 个分片，{total} 条 → 去重后 {len(merged)} 个拍摄单元")
+    _write_scan(args.output, merged)
+    return 0
+
+
+# ─── group ────────────────────────────────────────────
+
+def cmd_group(args) -> int:
+    """读取 scan 结果，按阈值（可选时间窗口）分组"""
+    from backend.core.cascade import report
+    from backend.core.grouper import build_neighbor_graph, build_neighbor_graph_windowed
+    from backend.core.phototable import PhotoTable
+
+    scan = _read_json(args.scan_file, "photodedup-scan")
+    table = PhotoTable.from_records(scan["photos"])
+
+    if args.time_window:
+        graph = build_neighbor_graph_windowed(
+            table, args.time_window, args.threshold, not args.skip_undated, args.orientation,
+        )
+    else:
+        graph = build_neighbor_graph(table, args.threshold, args.orientation)
+    groups = graph.groups(args.threshold)
+    cascade = report(graph.cascade)
+    _log(f"{graph.node_count} 张照片 → {len(groups)} 组（阈值 {args.threshold}）")
+    _log(f"两级匹配：比较 {cascade['compared']} 次，候选 {cascade['candidates']} 对，"
+         f"核验排除 {cascade['verify_eliminated']} 对")
+
+    _write_json(args.output, "photodedup-groups", {
+        "threshold": args.threshold,
+        "time_window": args.time_window,
+        "orientation": args.orientation,
+        "cascade": cascade,
+        "groups": [g.to_dict() for g in groups],
+    })
+    return 0
+
+
+# ─── recommend ────────────────────────────────────────
+
+def cmd_recommend(args) -> int:
+    """读取分组结果，检测 XMP 编辑状态并生成保留/删除推荐"""
+    import numpy as np
+    from backend.core.grouper import PhotoGroup
+    from backend.core.lightroom import detect_edited_photos
+    from backend.core.phototable import PhotoTableBuilder, quality_tuple
+    from backend.core.recommender import recommend_all
+
+    data = _read_json(args.groups_file, "photodedup-groups")
+    builder = PhotoTableBuilder()
+    members = [
+        [builder.add(p["path"], p["size"], phash=p.get("hash"), siblings=p.get("siblings") or (),
+                     quality=quality_tuple(p.get("quality")))
+         for p in g["photos"]]
+        for g in data["groups"]
+    ]
+    table = builder.build()
+    groups = [PhotoGroup(g["group_id"], table, np.array(ids, dtype=np.int64))
+              for g, ids in zip(data["groups"], members)]
+
+    edited, flagged = detect_edited_photos(table.all_paths())
+    result = recommend_all(groups, edited, flagged)
+    summary = result["summary"]
+    _log(f"保留 {summary['keep_count']}，删除 {summary['delete_count']}，可释放 {summary['save_gb']} GB")
+
+    _write_json(args.output, "photodedup-recommendations", {
+        "threshold": data.get("threshold"),
+        "groups": data["groups"],
+        "edited": sorted(edited),
+        "flagged": flagged,
+        **result,
+    })
+    return 0
+
+
+# ─── export ───────────────────────────────────────────
+
+def _plan_rows(plan: dict) -> list[dict]:
+    """推荐结果展开为每个文件一行"""
+    edited = set(plan.get("edited", []))
+    sizes = {p["path"]: p["size"] for g in plan["groups"] for p in g["photos"]}
+    siblings = {p["path"]: p.get("siblings", []) for g in plan["groups"] for p in g["photos"]}
+    rows = []
+    for rec in plan["recommendations"]:
+        for action in ("keep", "delete"):
+            for path in rec[action]:
+                rows.append({
+                    "group_id": rec["group_id"],
+                    "action": action,
+                    "path": path,
+                    "siblings": ";".join(siblings.get(path, [])),
+                    "size": sizes.get(path, 0),
+                    "edited": path in edited,
+                })
+    return rows
+
+
+def cmd_export(args) -> int:
+    """把推荐结果导出为 CSV 或扁平 JSON（每个文件一行）"""
+    plan = _read_json(args.plan_file, "photodedup-recommendations")
+    rows = _plan_rows(plan)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        if args.format == "csv":
+            writer = csv.DictWriter(out, fieldnames=["group_id", "action", "path", "siblings", "size", "edited"])
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, out, ensure_ascii=False, indent=1)
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+            _log(f"已导出 {len(rows)} 行 → {args.output}")
+    return 0
+
+
+# ─── apply ────────────────────────────────────────────
+
+def cmd_apply(args) -> int:
+    """执行推荐中的删除（移入回收站），包括 RAW+JPEG 拍摄单元的其他成员"""
+    plan = _read_json(args.plan_file, "photodedup-recommendations")
+    files = [f for rec in plan["recommendations"] for f in rec.get("delete_files", rec["delete"])]
+
+    if args.dry_run:
+        for f in files:
+            print(f)
+        _log(f"（预演）将移入回收站 {len(files)} 个文件")
+        return 0
+
+    if not args.yes:
+        if not sys.stdin.isatty():
+            raise SystemExit("非交互环境下请加 --yes 确认删除")
+        answer = input(f"即将把 {len(files)} 个文件移入回收站，继续？[y/N] ")
+        if answer.strip().lower() not in ("y", "yes"):
+            _log("已取消")
+            return 1
+
+    from backend.core.trash import DeleteJob
+
+    job = DeleteJob(files, include_sidecars=not args.keep_sidecars)
+    job.on_progress = _progress("apply")
+    status = job.run()
+    _log(f"删除日志: {status['journal']}（还原: python -m backend.cli restore {job.id}）")
+
+    _write_json(args.output, "photodedup-apply", {
+        "job": job.id,
+        "journal": status["journal"],
+        "deleted": [e["path"] for e in job.entries if not e["sidecar"]],
+        "sidecars": [e["path"] for e in job.entries if e["sidecar"]],
+        "errors": status["errors"],
+    })
+    return 1 if status["errors"] or status["state"] != "done" else 0
+
+
+def cmd_restore(args) -> int:
+    """按删除日志把移入回收站的文件移回原位置；不带参数时列出删除日志"""
+    from backend.config import DELETIONS_DIR
+    from backend.core.trash import DeleteJob, JOURNAL_SUFFIX, list_journals
+
+    if not args.job:
+        for job in list_journals():
+            _log(f"{job['id']}  {job['state']:<11} 删除 {job['deleted_count']} 张照片、{job['sidecar_count']} 个 sidecar，"
+                 f"可还原 {job['restorable_count']} 个文件")
+        return 0
+
+    journal = args.job if os.path.isfile(args.job) else DELETIONS_DIR / f"{args.job}{JOURNAL_SUFFIX}"
+    try:
+        job = DeleteJob.load(journal)
+    except (OSError, ValueError, KeyError) as e:
+        raise SystemExit(f"无法读取删除日志 {args.job}: {e}")
+    job.on_progress = _progress("restore")
+    status = job.restore()
+    _write_json(args.output, "photodedup-restore", {
+        "job": job.id,
+        "restored": status["restored_count"],
+        "errors": status["errors"],
+    })
+    return 1 if status["errors"] or status["state"] != "done" else 0
+
+
+# ─── index / lookup ───────────────────────────────────
+
+def _archive(args):
+    from backend.core.archive import ArchiveIndex
+    return ArchiveIndex(args.archive) if args.archive else ArchiveIndex()
+
+
+def cmd_index(args) -> int:
+    """把 scan 结果写入图库索引（可选合并段），输出索引概况"""
+    from backend.core.phototable import PhotoTable
+
+    index = _archive(args)
+    for path in args.scan_files:
+        scan = _read_json(path, "photodedup-scan")
+        added = index.add(PhotoTable.from_records(scan["photos"]), {"roots": scan.get("roots", []), "file": path})
+        _log(f"{path}: 写入 {added} 张照片")
+    stats = index.compact() if args.compact else index.stats()
+    _log(f"图库索引: {stats['rows']} 条，{len(stats['segments'])} 段，{stats['bytes'] / 2 ** 20:.1f} MiB")
+    _write_json(args.output, "photodedup-index", stats)
+    return 0
+
+
+def cmd_lookup(args) -> int:
+    """查询文件/目录中的照片是否已在图库索引中"""
+    from backend.core.archive import lookup_files
+
+    for path in args.paths:
+        if not os.path.exists(path):
+            raise SystemExit(f"路径不存在: {path}")
+    index = _archive(args)
+    result = lookup_files(index, args.paths, args.threshold, args.limit, args.include_images)
+    queries = result["queries"]
+    matched = sum(1 for q in queries if q["matches"])
+    per_query = result["lookup_ms"] / len(queries) if queries else 0
+    _log(f"{len(queries)} 张照片，{matched} 张已在图库中（索引 {len(index)} 条，查询 {per_query:.2f} ms/张）")
+    _write_json(args.output, "photodedup-lookup", {"threshold": args.threshold, **result})
+    return 0
+
+
+# ─── 入口 ─────────────────────────────────────────────
+
+def build_parser() -> argparse.ArgumentParser:
+    from backend.config import DEFAULT_SIMILARITY_THRESHOLD, ORIENTATION_MATCHING, ORIENTATION_MODES
+
+    parser = argparse.ArgumentParser(prog="python -m backend.cli", description="PhotoDedup 命令行批处理")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scan", help="扫描目录并计算哈希")
+    p.add_argument("directories", nargs="+", help="一个或多个根目录")
+    p.add_argument("--include-images", action="store_true", help="同时扫描 JPG/PNG 等普通图片")
+    p.add_argument("--no-exif", action="store_true", help="不读取 EXIF（无法使用时间窗口分组）")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="按子目录拆分，用多个进程并行扫描")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("shard", help="扫描目录并输出分片文件（多节点扫描）")
+    p.add_argument("directories", nargs="+", help="本节点负责的目录")
+    p.add_argument("--include-images", action="store_true", help="同时扫描 JPG/PNG 等普通图片")
+    p.add_argument("--no-exif", action="store_true", help="不读取 EXIF（无法使用时间窗口分组）")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="本节点的并行进程数")
+    p.add_argument("-o", "--output", required=True, help="分片文件路径（.pdshard）")
+    p.set_defaults(func=cmd_shard)
+
+    p = sub.add_parser("merge", help="合并分片，输出可供 group 使用的扫描结果")
+    p.add_argument("shard_files", nargs="+")
+    p.add_argument("--remap", action="append", default=[], metavar="OLD=NEW",
+                   help="替换路径前缀（各节点挂载点不同时使用，可重复）")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("group", help="对 scan 结果分组")
+    p.add_argument("scan_file")
+    p.add_argument("--threshold", type=int, default=DEFAULT_SIMILARITY_THRESHOLD)
+    p.add_argument("--time-window", type=float, default=None, help="拍摄时间窗口（秒）")
+    p.add_argument("--skip-undated", action="store_true", help="时间窗口模式下忽略无 EXIF 时间的照片")
+    p.add_argument("--orientation", choices=ORIENTATION_MODES, default=ORIENTATION_MATCHING,
+                   help="方向无关匹配：exif 匹配显示方向相同的副本，any 匹配任意旋转/翻转的副本")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_group)
+
+    p = sub.add_parser("recommend", help="为分组结果生成保留/删除推荐")
+    p.add_argument("groups_file")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_recommend)
+
+    p = sub.add_parser("export", help="把推荐结果导出为 CSV/JSON")
+    p.add_argument("plan_file")
+    p.add_argument("--format", choices=("csv", "json"), default="csv")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("apply", help="执行推荐中的删除（移入回收站）")
+    p.add_argument("plan_file")
+    p.add_argument("--dry-run", action="store_true", help="只列出将删除的文件")
+    p.add_argument("--yes", action="store_true", help="不询问直接执行")
+    p.add_argument("--keep-sidecars", action="store_true", help="不删除照片的 XMP sidecar")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_apply)
+
+    p = sub.add_parser("restore", help="按删除日志还原 apply 移入回收站的文件")
+    p.add_argument("job", nargs="?", help="任务 id 或日志文件（省略时列出删除日志）")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("index", help="把 scan 结果写入图库索引")
+    p.add_argument("scan_files", nargs="*", help="scan 子命令的输出（可省略，只查看/合并索引）")
+    p.add_argument("--compact", action="store_true", help="写入后把所有段合并为一段")
+    p.add_argument("--archive", default=None, help="索引目录（默认 ~/.photodedup/archive）")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser("lookup", help="查询照片是否已在图库索引中")
+    p.add_argument("paths", nargs="+", help="文件或目录（如存储卡）")
+    p.add_argument("--threshold", type=int, default=DEFAULT_SIMILARITY_THRESHOLD)
+    p.add_argument("--limit", type=int, default=10, help="每张照片最多列出的匹配数")
+    p.add_argument("--include-images", action="store_true", help="目录中同时查询 JPG/PNG 等普通图片")
+    p.add_argument("--archive", default=None, help="索引目录（默认 ~/.photodedup/archive）")
+    p.add_argument("-o", "--output", default="-")
+    p.set_defaults(func=cmd_lookup)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
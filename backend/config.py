@@ -19,18 +19,158 @@ RAW_EXTENSIONS = {
 # 支持的普通图片扩展名（可选扫描）
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.heic'}
 
+# RAW+JPEG 同时拍摄时与 RAW 配对的机内预览格式（按优先级，越靠前越适合做哈希代表）
+CAPTURE_SIBLING_EXTENSIONS = ('.jpg', '.jpeg', '.heic')
+
 # 相似度阈值（pHash 汉明距离，越小越严格）
 DEFAULT_SIMILARITY_THRESHOLD = 10
 
+# 扫描时邻接图记录边的最大阈值，之后可在此范围内即时重新分组（与前端滑块上限一致）
+MAX_REGROUP_THRESHOLD = 20
+
+# 监视模式：最后一次文件事件后等待的安静时间、持续有事件时的最长等待、轮询方式的遍历间隔（秒）
+WATCH_DEBOUNCE = 2.0
+WATCH_MAX_DELAY = 30.0
+WATCH_POLL_INTERVAL = 5.0
+
 # 缩略图尺寸
 THUMBNAIL_SIZE = (320, 320)
 
+# 数据目录（缓存、数据库等），可通过环境变量 PHOTODEDUP_HOME 覆盖
+DATA_DIR = Path(os.environ.get("PHOTODEDUP_HOME") or os.path.expanduser("~/.photodedup"))
+
 # 缩略图缓存目录
-CACHE_DIR = Path(os.path.expanduser("~/.photodedup/cache"))
+CACHE_DIR = DATA_DIR / "cache"
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+# 每次扫描的指标报告目录
+REPORTS_DIR = DATA_DIR / "reports"
+
+# 扫描结果快照（.pdscan）的默认导出目录
+EXPORTS_DIR = DATA_DIR / "exports"
+
+# 图库索引（所有扫描过的照片哈希，供「已经有这张照片了吗」查询）
+ARCHIVE_DIR = DATA_DIR / "archive"
+
+# 每次完成的扫描是否写入图库索引（PHOTODEDUP_ARCHIVE=0 关闭）
+ARCHIVE_SCANS = os.environ.get("PHOTODEDUP_ARCHIVE", "1") not in ("", "0")
+
+# 图库索引的段数超过这个值时合并
+ARCHIVE_MAX_SEGMENTS = 8
+
+# 删除记录（每次删除任务一个日志文件：移入回收站的文件及其在回收站中的位置，用于还原）
+DELETIONS_DIR = DATA_DIR / "deletions"
+
+# 删除任务的并行线程数（移入回收站是元数据操作，主要受磁盘限制，少量并行即可）
+DELETE_WORKERS = 4
+
+# 删除任务每批最多处理的文件数（同一目录的文件分批，批次之间并行）
+DELETE_BATCH_SIZE = 256
+
+# 扫描性能剖析：PHOTODEDUP_PROFILE=1 时每次扫描都生成剖析文件（也可在扫描请求中单独开启）
+PROFILE_SCANS = os.environ.get("PHOTODEDUP_PROFILE", "") not in ("", "0")
+
+# 剖析时栈采样的间隔（秒）
+PROFILE_SAMPLE_INTERVAL = 0.005
+
 # 数据库缓存路径
-DB_PATH = Path(os.path.expanduser("~/.photodedup/scan_cache.db"))
+DB_PATH = DATA_DIR / "scan_cache.db"
 
 # 并行线程数
 MAX_WORKERS = os.cpu_count() or 4
+
+# I/O 调度：按存储类型的并发读取数。机械硬盘上并行随机读会来回寻道，网络存储受延迟限制，需要更多请求同时在途
+IO_CONCURRENCY = {"ssd": MAX_WORKERS, "hdd": 2, "network": 16, "unknown": MAX_WORKERS}
+
+# 覆盖上面的并发数，按存储类型或路径所在的设备，如 PHOTODEDUP_IO_CONCURRENCY="hdd=1,network=32,/Volumes/NAS=8"
+IO_CONCURRENCY_OVERRIDES = os.environ.get("PHOTODEDUP_IO_CONCURRENCY", "")
+
+# 读取文件前提示内核预读的字节数（posix_fadvise，RAW 的嵌入预览通常在文件前部）；0 关闭
+IO_READAHEAD_BYTES = 8 << 20
+
+# 每个设备提前提示预读的文件数 = 该设备并发数 × IO_LOOKAHEAD
+IO_LOOKAHEAD = 2
+
+# RAW 预览在隔离的工作进程中提取，单个文件卡死或崩溃只影响该文件（PHOTODEDUP_DECODE_ISOLATION=0 关闭）
+DECODE_ISOLATION = os.environ.get("PHOTODEDUP_DECODE_ISOLATION", "1") not in ("", "0")
+
+# 提取预览的工作进程数上限（按需启动；与 I/O 调度的最大并发一致，等待网络读取的进程不占 CPU）
+DECODE_WORKERS = max(IO_CONCURRENCY.values())
+
+# 单个文件提取预览 / 完整解码的超时（秒），超时的进程被结束并重启，文件进入隔离名单
+DECODE_TIMEOUT = 30.0
+DECODE_FULL_TIMEOUT = 300.0
+
+# 完整解码（没有可用预览时的兜底）单独排队：进程数与优先级（nice 值，越大越低）
+DECODE_FULL_WORKERS = max(1, MAX_WORKERS // 4)
+DECODE_FULL_NICE = 10
+
+# 隔离名单：曾导致解码卡死或崩溃的文件，文件未变化时之后的扫描直接跳过
+QUARANTINE_PATH = DATA_DIR / "quarantine.json"
+
+# 自适应并发：扫描时按阶段测量吞吐量、CPU 利用率和 I/O 等待，在上下限内逐步调整线程数，
+# 每个图库的结果保存下来作为下次扫描的起点（PHOTODEDUP_AUTOTUNE=0 关闭，使用上面的固定配置）
+AUTOTUNE = os.environ.get("PHOTODEDUP_AUTOTUNE", "1") not in ("", "0")
+
+# 各阶段线程数的上下限（scan: 读取 EXIF，extract: 提取预览，hash: 计算指纹）
+AUTOTUNE_BOUNDS = {
+    "scan": (1, 2 * max(IO_CONCURRENCY.values())),
+    "extract": (1, 2 * max(IO_CONCURRENCY.values())),
+    "hash": (1, 2 * MAX_WORKERS),
+}
+
+# 每次调整前的测量时长（秒），以及吞吐量变化小于这个比例时视为持平
+AUTOTUNE_INTERVAL = 1.0
+AUTOTUNE_TOLERANCE = 0.05
+
+# 系统 CPU 利用率达到这个比例时不再增加线程（CPU 已饱和，更多线程只增加争用）
+AUTOTUNE_CPU_SATURATION = 0.9
+
+# 每个图库（按扫描根目录）调整出的线程数
+AUTOTUNE_PATH = DATA_DIR / "autotune.json"
+
+# 扫描进行中每隔多少秒把新算出的哈希并入临时分组，并推送给进度 WebSocket（/api/ws/progress）
+PROGRESSIVE_INTERVAL = 1.0
+
+# 大预览尺寸（灯箱中并排比较细节时使用，按需生成并缓存）
+PREVIEW_SIZE = (1600, 1600)
+
+# 审核时的缩略图预取：后台线程数、待处理队列上限（超出的部分等用户翻到附近时再排队）
+PREFETCH_WORKERS = 2
+PREFETCH_QUEUE = 512
+
+# 分组确定后预取当前位置之后多少组的缩略图，其中前几组同时预取大预览（0 关闭大预览预取）
+PREFETCH_AHEAD = 10
+PREFETCH_PREVIEW_GROUPS = 2
+
+# 画质评分：计算哈希时从同一张缩略图顺带计算清晰度、过曝/欠曝比例和噪声，
+# 组内没有 Lightroom 编辑/标记时推荐保留画质最好的一张（PHOTODEDUP_QUALITY=0 关闭，保留路径排序的第一张）
+QUALITY_SCORING = os.environ.get("PHOTODEDUP_QUALITY", "1") not in ("", "0")
+
+# 亮度不高于 / 不低于这个值（0~255）的像素视为欠曝 / 过曝
+QUALITY_CLIP_LOW = 2
+QUALITY_CLIP_HIGH = 253
+
+# 画质得分 = ln(1 + 清晰度) − 过曝/欠曝比例 × QUALITY_CLIPPING_WEIGHT − ln(1 + 噪声) × QUALITY_NOISE_WEIGHT
+QUALITY_CLIPPING_WEIGHT = 4.0
+QUALITY_NOISE_WEIGHT = 0.5
+
+# 方向无关匹配（见 core/orientation.py）：off 只按原方向比较；exif 另外匹配显示方向相同的副本
+# （机内按 EXIF 旋转的照片与导出时旋转了像素的副本）；any 匹配任意旋转/翻转的副本
+ORIENTATION_MODES = ("off", "exif", "any")
+ORIENTATION_MATCHING = os.environ.get("PHOTODEDUP_ORIENTATION", "off").strip().lower() or "off"
+if ORIENTATION_MATCHING not in ORIENTATION_MODES:
+    raise ValueError(f"PHOTODEDUP_ORIENTATION 只能是 {' / '.join(ORIENTATION_MODES)}，当前为 {ORIENTATION_MATCHING!r}")
+
+# 规范姿态的判定依据与 0 的距离小于这个比例（相对交流系数均方根）时，两种姿态都保留为备选
+ORIENTATION_MARGIN = 0.1
+
+# 两级匹配（见 core/cascade.py）：pHash 找出距离 ≤ MAX_REGROUP_THRESHOLD 的候选对后，
+# 用从同一张缩略图算出的更长签名逐对核验，排除 pHash 偶然相近的不同照片
+CASCADE_VERIFICATION = os.environ.get("PHOTODEDUP_CASCADE", "1") not in ("", "0")
+
+# 核验签名：低频 DCT 系数 CASCADE_SIGNATURE_SIZE × CASCADE_SIGNATURE_SIZE 的符号位（256 bit）
+CASCADE_SIGNATURE_SIZE = 16
+
+# 签名的汉明距离（256 bit 中）超过这个值的候选对判定为不同的照片
+CASCADE_VERIFY_THRESHOLD = 80
@@ -0,0 +1,454 @@
+"""
+图库索引 — 持久化保存所有扫描过的照片哈希，回答「这张照片库里已经有了吗？」。
+
+索引目录（默认 ~/.photodedup/archive）由若干段文件（.pdidx）组成，每次扫描追加一段，
+段数超过 ARCHIVE_MAX_SEGMENTS 时合并。段文件与快照使用相同的分段格式（见 snapshot.py），
+查询时整个文件内存映射，只读取用到的页：
+
+- 每行：打包的 uint64 pHash、大小、修改时间、拍摄时间戳、路径
+- 多索引哈希（multi-index hashing）：把 64 位哈希切成 4 段 16 位子串，每段一张按子串排序的表。
+  汉明距离 ≤ r 的两个哈希至少有一段子串的距离 ≤ r // 4（鸽笼原理），查询时只需在四张表中
+  查找与查询子串相差不超过约 r // 4 位的键，再对候选计算完整距离
+- 路径键（路径的 8 字节 BLAKE2b，排序）：同一路径以最新的段为准，旧段中的记录在查询时忽略
+
+照片较少的段（或批量查询）直接用 hashindex.pairs_between 暴力比较。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend.config import ARCHIVE_DIR, ARCHIVE_MAX_SEGMENTS, DEFAULT_SIMILARITY_THRESHOLD
+from backend.core.hashindex import pack_hashes, pairs_between, popcount64, unpack_hash
+from backend.core.phototable import PhotoTable, encode_strings
+from backend.core.snapshot import SectionFile, write_sections
+
+ARCHIVE_MAGIC = b"PDINDEX\0"
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = ".pdidx"
+
+MIH_CHUNKS = 4      # 64 位哈希切成 4 段 16 位子串
+MIH_BITS = 16
+
+# 查询数 × 段行数不超过这个值时直接暴力比较（不到 1 毫秒）
+BRUTE_FORCE_PAIRS = 1 << 16
+
+# 与 16 位子串相差不超过 s 位的所有掩码（按 s 缓存）
+_FLIP_MASKS: dict[int, np.ndarray] = {}
+
+
+def _flip_masks(radius: int) -> np.ndarray:
+    masks = _FLIP_MASKS.get(radius)
+    if masks is None:
+        values = np.arange(1 << MIH_BITS, dtype=np.uint64)
+        masks = values[popcount64(values) <= radius].astype(np.uint16)
+        _FLIP_MASKS[radius] = masks
+    return masks
+
+
+def path_key(path: str) -> int:
+    """路径的稳定 64 位键（跨进程一致，不能用内置 hash）"""
+    digest = hashlib.blake2b(path.encode('utf-8', 'surrogateescape'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _gather_ranges(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """拼接 values[lo[k]:hi[k]]（向量化，不逐段循环）"""
+    lengths = hi - lo
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=values.dtype)
+    starts = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+    return values[starts + np.arange(total)]
+
+
+# ─── 段文件 ─────────────────────────────────────────────
+
+class ArchiveSegment(SectionFile):
+    """一个内存映射的索引段"""
+
+    MAGIC = ARCHIVE_MAGIC
+    VERSION = ARCHIVE_VERSION
+    OLDER_VERSIONS = ()
+    DESCRIPTION = "PhotoDedup 图库索引"
+
+    def __init__(self, path: str | Path):
+        super().__init__(path)
+        self.hash = self["hash"]
+        self._path_offsets = self["path_offsets"]
+        self._path_blob = memoryview(self["path_blob"])
+        self._path_keys = self["path_key"]
+
+    def __len__(self) -> int:
+        return len(self.hash)
+
+    def path_at(self, i: int) -> str:
+        off = self._path_offsets
+        return str(self._path_blob[int(off[i]):int(off[i + 1]) - 1], 'utf-8', 'surrogateescape')
+
+    def has_path(self, key: int) -> bool:
+        keys = self._path_keys
+        pos = int(np.searchsorted(keys, np.uint64(key)))
+        return pos < len(keys) and int(keys[pos]) == key
+
+    def record(self, i: int) -> dict:
+        ts = float(self["timestamp"][i])
+        return {
+            'path': self.path_at(i),
+            'hash': unpack_hash(self.hash[i]),
+            'size': int(self["size"][i]),
+            'mtime': float(self["mtime"][i]),
+            'timestamp': None if np.isnan(ts) else ts,
+        }
+
+    def candidates(self, query: int, threshold: int) -> np.ndarray | None:
+        """
+        多索引哈希查找候选行（可能重复）；候选数超过 1/8 时返回 None（直接全量比较更快）。
+
+        threshold = s × 4 + a 时，距离 ≤ threshold 的哈希必有前 a+1 段之一的子串距离 ≤ s，
+        或其余段之一的子串距离 ≤ s - 1，各段按对应的半径查找。
+        """
+        s, a = divmod(threshold, MIH_CHUNKS)
+        found = []
+        total = 0
+        for k in range(MIH_CHUNKS):
+            radius = s if k <= a else s - 1
+            if radius < 0:
+                continue
+            keys = self[f"mih{k}_keys"]
+            sub = np.uint16((query >> (MIH_BITS * k)) & 0xFFFF)
+            variants = _flip_masks(radius) ^ sub
+            lo = np.searchsorted(keys, variants, 'left')
+            hi = np.searchsorted(keys, variants, 'right')
+            nonempty = hi > lo
+            lo, hi = lo[nonempty], hi[nonempty]
+            total += int((hi - lo).sum())
+            if total > len(self) // 8:
+                return None
+            found.append(_gather_ranges(self[f"mih{k}_ids"], lo, hi))
+        return np.concatenate(found).astype(np.int64)
+
+    def search(self, queries: np.ndarray, threshold: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        找出与各查询哈希距离 ≤ threshold 的行。
+
+        Returns:
+            (查询下标, 行号, 距离)
+        """
+        if len(queries) * len(self) <= BRUTE_FORCE_PAIRS:
+            return pairs_between(queries, self.hash, threshold)
+        found_q, found_i, found_d = [], [], []
+        for q, query in enumerate(queries.tolist()):
+            rows = self.candidates(query, threshold)
+            packed = self.hash if rows is None else self.hash[rows]
+            dist = popcount64(packed ^ np.uint64(query))
+            hit = np.flatnonzero(dist <= threshold)
+            if rows is not None:
+                # 同一行可能经由多段子串成为候选，只对命中的行去重
+                hit = hit[np.unique(rows[hit], return_index=True)[1]]
+            found_q.append(np.full(len(hit), q, dtype=np.int64))
+            found_i.append(hit if rows is None else rows[hit])
+            found_d.append(dist[hit])
+        if not found_q:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.uint8)
+        return np.concatenate(found_q), np.concatenate(found_i), np.concatenate(found_d)
+
+
+def _write_segment(
+    path: Path,
+    hashes: np.ndarray,
+    sizes: np.ndarray,
+    mtimes: np.ndarray,
+    timestamps: np.ndarray,
+    path_blob: np.ndarray,
+    path_offsets: np.ndarray,
+    keys: np.ndarray,
+    header: dict,
+) -> Path:
+    sections = {
+        "hash": hashes.astype(np.uint64, copy=False),
+        "size": sizes.astype(np.int64, copy=False),
+        "mtime": mtimes.astype(np.float64, copy=False),
+        "timestamp": timestamps.astype(np.float64, copy=False),
+        "path_blob": path_blob,
+        "path_offsets": path_offsets,
+        "row_key": keys,              # 按行号，合并段时使用
+        "path_key": np.sort(keys),    # 排序后，判断路径是否在段中
+    }
+    for k in range(MIH_CHUNKS):
+        sub = ((hashes >> np.uint64(MIH_BITS * k)) & np.uint64(0xFFFF)).astype(np.uint16)
+        order = np.argsort(sub, kind='stable')
+        sections[f"mih{k}_keys"] = sub[order]
+        sections[f"mih{k}_ids"] = order.astype(np.uint32)
+    return write_sections(path, ARCHIVE_MAGIC, ARCHIVE_VERSION, {**header, "rows": len(hashes)}, sections)
+
+
+# ─── 索引 ──────────────────────────────────────────────
+
+class ArchiveIndex:
+    """
+    索引目录：追加段、合并段、查询。
+
+    多个进程（服务与命令行）可以同时使用同一目录：段文件名包含进程号，写完后再出现在目录中，
+    查询前重新列出目录即可看到其他进程追加的段。
+    """
+
+    def __init__(self, directory: str | Path = ARCHIVE_DIR):
+        self.directory = Path(directory)
+        self.segments: list[ArchiveSegment] = []
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """重新列出段文件（打开新出现的段，丢弃已被合并替换的段）"""
+        if not self.directory.is_dir():
+            self.segments = []
+            return
+        opened = {s.path.name: s for s in self.segments}
+        segments = []
+        for path in sorted(self.directory.glob(f"seg-*{ARCHIVE_SUFFIX}")):
+            segment = opened.get(path.name)
+            if segment is None:
+                try:
+                    segment = ArchiveSegment(path)
+                except (ValueError, OSError):
+                    continue  # 正在写入或已损坏
+            segments.append(segment)
+        replaced = {name for s in segments for name in s.header.get("replaces", [])}
+        for s in segments:
+            if s.path.name in replaced:
+                try:
+                    os.remove(s.path)  # 合并后未能删除的旧段（如 Windows 上仍被映射）
+                except OSError:
+                    pass
+        self.segments = [s for s in segments if s.path.name not in replaced]
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.segments)
+
+    def _next_path(self) -> Path:
+        numbers = [int(s.path.name.split("-")[1]) for s in self.segments]
+        for path in self.directory.glob(f"seg-*{ARCHIVE_SUFFIX}"):
+            numbers.append(int(path.name.split("-")[1]))
+        return self.directory / f"seg-{max(numbers, default=0) + 1:06d}-{os.getpid()}{ARCHIVE_SUFFIX}"
+
+    # ─── 追加 ───────────────────────────────────────────
+
+    def add(self, table: PhotoTable, source: dict | None = None) -> int:
+        """
+        把照片表中有哈希的单元写入新段（同一路径以后写入的为准），必要时合并段。
+
+        Args:
+            table: 扫描结果
+            source: 记录在段头部的来源信息（根目录等）
+
+        Returns:
+            写入的行数
+        """
+        ids = table.hashed_ids()
+        if not len(ids):
+            return 0
+        paths = table.paths(ids)
+        blob, offsets = encode_strings(paths)
+        keys = np.fromiter((path_key(p) for p in paths), dtype=np.uint64, count=len(paths))
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.refresh()
+            path = _write_segment(
+                self._next_path(),
+                table.packed[ids], table.size[ids], table.mtime[ids], table.timestamp[ids],
+                blob, offsets, keys,
+                {"created_at": time.time(), "source": source or {}},
+            )
+            self.segments.append(ArchiveSegment(path))
+            if len(self.segments) > ARCHIVE_MAX_SEGMENTS:
+                self._compact(full=False)
+        return len(ids)
+
+    # ─── 合并 ───────────────────────────────────────────
+
+    def compact(self, full: bool = True) -> dict:
+        """合并段（full=False 时保留最大的基础段，只合并之后追加的小段）"""
+        with self._lock:
+            self.refresh()
+            self._compact(full)
+        return self.stats()
+
+    def _compact(self, full: bool):
+        segments = self.segments
+        if not full and len(segments) > 1 and len(segments[0]) >= sum(len(s) for s in segments[1:]):
+            segments = segments[1:]  # 基础段远大于新段：只合并新段，避免每次重写整个索引
+        if len(segments) < 2 and not (segments and full):
+            return
+
+        # 同一路径只保留最新的一行：从新到旧拼接后取每个键第一次出现的位置
+        newest_first = segments[::-1]
+        keys = np.concatenate([s["row_key"] for s in newest_first])
+        _, first = np.unique(keys, return_index=True)
+        keep = np.zeros(len(keys), dtype=bool)
+        keep[first] = True
+        bounds = np.cumsum([0] + [len(s) for s in newest_first])
+
+        # 按从旧到新的顺序写出
+        columns = {name: [] for name in ("hash", "size", "mtime", "timestamp", "row_key")}
+        blobs, lengths = [], []
+        for pos in range(len(newest_first) - 1, -1, -1):
+            segment = newest_first[pos]
+            rows = np.flatnonzero(keep[bounds[pos]:bounds[pos + 1]])
+            for name in columns:
+                columns[name].append(segment[name][rows])
+            offsets = segment["path_offsets"].astype(np.int64)
+            lo, hi = offsets[rows], offsets[rows + 1]
+            blobs.append(_gather_ranges(segment["path_blob"], lo, hi))
+            lengths.append(hi - lo)
+        lengths = np.concatenate(lengths)
+        path_offsets = np.zeros(len(lengths) + 1, dtype=np.uint64)
+        np.cumsum(lengths, out=path_offsets[1:])
+
+        path = _write_segment(
+            self._next_path(),
+            *(np.concatenate(columns[name]) for name in ("hash", "size", "mtime", "timestamp")),
+            np.concatenate(blobs), path_offsets, np.concatenate(columns["row_key"]),
+            {
+                "created_at": time.time(),
+                "source": {"compacted": len(segments)},
+                "replaces": [s.path.name for s in segments],
+            },
+        )
+        merged = ArchiveSegment(path)
+        for s in segments:
+            try:
+                os.remove(s.path)
+            except OSError:
+                pass  # 下次 refresh 时按 replaces 清理
+        self.segments = [s for s in self.segments if s not in segments] + [merged]
+
+    # ─── 查询 ───────────────────────────────────────────
+
+    def lookup(
+        self,
+        queries: np.ndarray,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        limit: int = 10,
+    ) -> list[list[dict]]:
+        """
+        查找每个查询哈希在索引中距离 ≤ threshold 的照片。
+
+        Args:
+            queries: 打包的 uint64 哈希
+            threshold: 最大汉明距离（含）
+            limit: 每个查询最多返回的结果数（按距离升序）
+
+        Returns:
+            与 queries 等长的列表，每项为 [{path, distance, hash, size, mtime, timestamp}, ...]
+        """
+        self.refresh()
+        queries = np.asarray(queries, dtype=np.uint64)
+        hits: list[list[tuple[int, int, int]]] = [[] for _ in range(len(queries))]
+        for pos, segment in enumerate(self.segments):
+            qi, rows, dist = segment.search(queries, threshold)
+            for q, row, d in zip(qi.tolist(), rows.tolist(), dist.tolist()):
+                hits[q].append((d, pos, row))
+
+        results = []
+        for found in hits:
+            found.sort(key=lambda hit: (hit[0], -hit[1], hit[2]))
+            matches = []
+            for d, pos, row in found:
+                segment = self.segments[pos]
+                record = segment.record(row)
+                key = path_key(record['path'])
+                if any(newer.has_path(key) for newer in self.segments[pos + 1:]):
+                    continue  # 该路径在之后的扫描中已更新
+                matches.append({'distance': d, **record})
+                if len(matches) >= limit:
+                    break
+            results.append(matches)
+        return results
+
+    def stats(self) -> dict:
+        self.refresh()
+        return {
+            'directory': str(self.directory),
+            'rows': len(self),
+            'segments': [
+                {
+                    'name': s.path.name,
+                    'rows': len(s),
+                    'bytes': s.path.stat().st_size,
+                    'created_at': s.header.get('created_at'),
+                    'source': s.header.get('source', {}),
+                }
+                for s in self.segments
+            ],
+            'bytes': sum(s.path.stat().st_size for s in self.segments),
+        }
+
+
+# ─── 按文件查询 ─────────────────────────────────────────
+
+def hash_files(paths: list[str], include_images: bool = False) -> list[tuple[str, str | None]]:
+    """
+    对文件/目录执行扫描流程的前几步（遍历 → RAW+JPEG 配对 → 缩略图 → pHash）。
+
+    直接给出的文件总是处理（不按扩展名过滤），目录按 include_images 过滤。
+
+    Returns:
+        [(代表文件路径, 十六进制哈希或 None)]
+    """
+    from backend.core.scanner import scan_directory, scan_files, pair_captures
+    from backend.core.thumbnail import extract_thumbnails_batch
+    from backend.core.hasher import compute_phash_batch
+
+    directories = [p for p in paths if os.path.isdir(p)]
+    files = [p for p in paths if not os.path.isdir(p)]
+    photos = scan_files(files, include_raw=True, include_images=True, read_exif=False)
+    if directories:
+        photos += scan_directory(directories, include_images=include_images, read_exif=False)
+    captures = pair_captures(photos)
+    thumbs = extract_thumbnails_batch(
+        [c.path for c in captures], file_ids=[c.representative.file_id for c in captures],
+    )
+    thumb_map = {orig: str(t) for orig, t in thumbs.items() if t}
+    hashes = compute_phash_batch(thumb_map)
+    return [(c.path, hashes.get(c.path)) for c in captures]
+
+
+def lookup_files(
+    index: ArchiveIndex,
+    paths: list[str],
+    threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+    limit: int = 10,
+    include_images: bool = False,
+) -> dict:
+    """
+    对文件/目录（例如刚插入的存储卡）计算哈希，在索引中查找相似照片。
+
+    查询文件本身已在索引中时（查询的就是图库里的文件），结果不包含它自己。
+
+    Returns:
+        {'queries': [{path, hash, matches}], 'hash_ms', 'lookup_ms'}
+    """
+    start = time.perf_counter()
+    hashed = hash_files(paths, include_images)
+    hash_ms = (time.perf_counter() - start) * 1000
+
+    valid = [(p, h) for p, h in hashed if h]
+    start = time.perf_counter()
+    found = index.lookup(pack_hashes([h for _, h in valid]), threshold, limit + 1) if valid else []
+    lookup_ms = (time.perf_counter() - start) * 1000
+
+    matches = dict(zip((p for p, _ in valid), found))
+    queries = []
+    for path, h in hashed:
+        own = [m for m in matches.get(path, []) if m['path'] != path][:limit]
+        queries.append({'path': path, 'hash': h, 'matches': own})
+    return {
+        'queries': queries,
+        'hash_ms': round(hash_ms, 1),
+        'lookup_ms': round(lookup_ms, 1),
+    }
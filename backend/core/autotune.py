@@ -0,0 +1,299 @@
+"""
+自适应并发 — 扫描时按阶段调整工作线程数。
+
+固定的线程数不适合所有情况：同样是「提取预览」，缓存命中时受 CPU 限制，读网络盘时受延迟限制，
+机械硬盘上线程多了反而变慢。每个阶段（scan / extract / hash）由一个 StageTuner 控制：
+
+- 工作线程按上限启动，同时在处理文件的线程数由一个可调的 ConcurrencyLimit 限制；按设备调度的阶段
+  （scan / extract，见 IOScheduler.map）则按比例缩放每个设备自己的并发数，不超过该设备的上限；
+- 后台线程每 AUTOTUNE_INTERVAL 秒测量一次该阶段的吞吐量（文件/秒）、系统 CPU 利用率和 I/O 等待
+  （Linux 的 /proc/stat；其他平台只有本进程的 CPU 时间）；
+- 爬山法调整：吞吐量上升则沿同一方向继续并加大步长，下降则掉头并减小步长，持平时减少线程
+  （同样的吞吐量，争用更少）；CPU 已饱和时不再增加线程；
+- 阶段结束时取吞吐量最高的线程数，Autotuner.save() 按图库（扫描根目录）写入 AUTOTUNE_PATH，
+  下次扫描同一图库时从这个值开始。
+
+调整过程（每次测量的线程数、吞吐量、CPU、I/O 等待）写入扫描指标的 info["autotune"]。
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from backend.config import (
+    AUTOTUNE, AUTOTUNE_BOUNDS, AUTOTUNE_INTERVAL, AUTOTUNE_TOLERANCE, AUTOTUNE_CPU_SATURATION,
+    AUTOTUNE_PATH,
+)
+
+# 每个阶段保留的测量记录数
+HISTORY_LIMIT = 120
+
+# 一次测量中完成的文件数少于当前线程数时继续测量（最多这么多个间隔），避免按噪声调整
+MAX_WINDOW_INTERVALS = 5
+
+
+def _cpu_times() -> tuple[float, float, float]:
+    """(忙碌时间, I/O 等待时间, 总时间)；Linux 为整机（含解码子进程），其他平台为本进程，I/O 等待为 0"""
+    try:
+        with open('/proc/stat', encoding='ascii') as f:
+            # cpu  user nice system idle iowait irq softirq steal ...
+            values = [float(v) for v in f.readline().split()[1:9]]
+        idle, iowait = values[3], values[4]
+        total = sum(values)
+        return total - idle - iowait, iowait, total
+    except (OSError, ValueError, IndexError):
+        now = time.perf_counter()
+        return time.process_time(), 0.0, now * (os.cpu_count() or 1)
+
+
+# ─── 可调的并发限制 ─────────────────────────────────────
+
+class ConcurrencyLimit:
+    """同时持有的槽位数上限可以在运行中修改的信号量"""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._active = 0
+        self._cond = threading.Condition()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def set(self, value: int):
+        if value == self._value:
+            return
+        with self._cond:
+            self._value = value
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self._active >= self._value:
+                self._cond.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify()
+
+
+# ─── 单个阶段 ───────────────────────────────────────────
+
+class StageTuner:
+    """一个阶段的线程数控制器"""
+
+    def __init__(
+        self,
+        name: str,
+        low: int,
+        high: int,
+        initial: int | None = None,
+        interval: float = AUTOTUNE_INTERVAL,
+    ):
+        """
+        Args:
+            name: 阶段名
+            low, high: 线程数上下限
+            initial: 起始线程数（上次为该图库调整出的值），None 时由 start() 的默认值决定
+            interval: 测量间隔（秒）
+        """
+        self.name = name
+        self.low = max(1, low)
+        self.high = max(self.low, high)
+        self.initial = initial
+        self.interval = interval
+        self.limit = ConcurrencyLimit(self.high)
+        self.history: list[dict] = []
+        self.best: tuple[int, float] | None = None  # (线程数, 吞吐量)
+        self._completed = 0
+        self._count_lock = threading.Lock()
+        self._direction = 1
+        self._step = 1
+        self._previous: float | None = None  # 上一个线程数下的吞吐量
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _clamp(self, value: int) -> int:
+        return min(self.high, max(self.low, value))
+
+    @property
+    def workers(self) -> int:
+        return self.limit.value
+
+    def start(self, default: int, ceiling: int | None = None):
+        """
+        开始阶段：设置起始线程数并启动测量线程（调用方按 high 启动工作线程）。
+
+        Args:
+            default: 没有上次的结果时的起始线程数
+            ceiling: 本阶段可用的线程数上限（按设备调度时为各设备并发数之和），收紧 high
+        """
+        if ceiling is not None:
+            self.high = max(self.low, min(self.high, ceiling))
+        start = self._clamp(self.initial if self.initial is not None else default)
+        self.initial = start
+        self.limit.set(start)
+        self._step = max(1, start // 4)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'photodedup-autotune-{self.name}', daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def slot(self):
+        """处理一个文件：等待空闲槽位，结束后计入吞吐量"""
+        with self.limit.slot():
+            yield
+        self.count()
+
+    def count(self):
+        """计入一个处理完的文件（不经过 slot() 的调用方，如按设备限制并发的 IOScheduler）"""
+        with self._count_lock:
+            self._completed += 1
+
+    def scale(self, limit: int, total: int) -> int:
+        """
+        按当前线程数占起始总数 total 的比例缩放一个设备的并发数 limit。
+
+        结果在 [1, limit] 内：设备自己的上限（如机械硬盘的 2）不会被突破。
+        """
+        return min(limit, max(1, round(limit * self.workers / max(1, total))))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def chosen(self) -> int:
+        """吞吐量最高的线程数（没有完整的测量时为起始值）"""
+        return self.best[0] if self.best else (self.initial or self.workers)
+
+    def _run(self):
+        busy0, wait0, total0 = _cpu_times()
+        wall0 = time.perf_counter()
+        done0 = self._completed
+        intervals = 0
+        while not self._stop.wait(self.interval):
+            intervals += 1
+            done = self._completed - done0
+            if done < self.workers and intervals < MAX_WINDOW_INTERVALS:
+                continue
+            busy, wait, total = _cpu_times()
+            wall = time.perf_counter()
+            span = (total - total0) or 1.0
+            self._adjust({
+                'workers': self.workers,
+                'items_per_second': round(done / (wall - wall0), 1),
+                'cpu': round((busy - busy0) / span, 3),
+                'iowait': round((wait - wait0) / span, 3),
+            })
+            busy0, wait0, total0, wall0, done0 = busy, wait, total, wall, self._completed
+            intervals = 0
+
+    def _adjust(self, sample: dict):
+        """根据一次测量决定下一个线程数（爬山法）"""
+        if len(self.history) >= HISTORY_LIMIT:
+            del self.history[0]
+        self.history.append(sample)
+        workers, throughput = sample['workers'], sample['items_per_second']
+        if self.best is None or throughput > self.best[1] * (1 + AUTOTUNE_TOLERANCE):
+            self.best = (workers, throughput)
+        elif throughput >= self.best[1] * (1 - AUTOTUNE_TOLERANCE) and workers < self.best[0]:
+            self.best = (workers, max(throughput, self.best[1]))  # 持平时取更少的线程
+
+        if self._previous is not None:
+            if throughput > self._previous * (1 + AUTOTUNE_TOLERANCE):
+                self._step = min(self._step * 2, max(1, (self.high - self.low) // 4))  # 变快：加大步长
+            elif throughput < self._previous * (1 - AUTOTUNE_TOLERANCE):
+                self._direction = -self._direction       # 变慢：掉头，缩小步长
+                self._step = max(1, self._step // 2)
+            elif throughput <= self._previous * (1 + AUTOTUNE_TOLERANCE):
+                self._direction = -1                     # 持平：同样的吞吐量用更少的线程
+        if self._direction > 0 and sample['cpu'] >= AUTOTUNE_CPU_SATURATION:
+            self._direction = -1                         # CPU 已饱和，增加线程没有意义
+        self._previous = throughput
+
+        target = self._clamp(workers + self._direction * self._step)
+        if target == workers:                            # 到达边界：掉头
+            self._direction = -self._direction
+            target = self._clamp(workers + self._direction * self._step)
+        self.limit.set(target)
+
+    def to_dict(self) -> dict:
+        return {
+            'stage': self.name,
+            'bounds': [self.low, self.high],
+            'initial': self.initial,
+            'chosen': self.chosen,
+            'best_items_per_second': self.best[1] if self.best else None,
+            'history': list(self.history),
+        }
+
+
+# ─── 按图库保存 ─────────────────────────────────────────
+
+def library_key(roots: list[str]) -> str:
+    """图库标识：排序后的扫描根目录"""
+    return os.pathsep.join(sorted(roots))
+
+
+class Autotuner:
+    """一次扫描的全部阶段控制器，起始值取自该图库上次的结果"""
+
+    def __init__(self, roots: list[str], path: str | Path = AUTOTUNE_PATH, enabled: bool = AUTOTUNE):
+        self.key = library_key(roots)
+        self.path = Path(path)
+        self.enabled = enabled
+        self.tuners: dict[str, StageTuner] = {}
+        self.saved = self._load().get(self.key, {}) if enabled else {}
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f).get('libraries', {})
+        except (OSError, ValueError):
+            return {}
+
+    def stage(self, name: str) -> StageTuner | None:
+        """阶段的控制器；关闭或该阶段不可调时返回 None（批处理函数使用固定线程数）"""
+        if not self.enabled or name not in AUTOTUNE_BOUNDS:
+            return None
+        low, high = AUTOTUNE_BOUNDS[name]
+        tuner = StageTuner(name, low, high, self.saved.get(name, {}).get('workers'))
+        self.tuners[name] = tuner
+        return tuner
+
+    def save(self) -> dict:
+        """
+        保存有完整测量的阶段调整出的线程数。
+
+        Returns:
+            各阶段的调整过程（写入扫描指标）
+        """
+        tuned = {name: t for name, t in self.tuners.items() if t.best is not None}
+        if tuned:
+            libraries = self._load()
+            entry = libraries.setdefault(self.key, {})
+            for name, tuner in tuned.items():
+                entry[name] = {
+                    'workers': tuner.chosen,
+                    'items_per_second': tuner.best[1],
+                    'at': time.time(),
+                }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'libraries': libraries}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        return {
+            'library': self.key,
+            'stages': [t.to_dict() for t in self.tuners.values()],
+        }
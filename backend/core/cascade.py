@@ -0,0 +1,134 @@
+"""
+两级匹配 — pHash 索引找出候选对，更长的签名只核验这些候选对。
+
+单个 64-bit pHash 只有 64 个低频符号，低频结构相似（大片天空、纯色背景）的不同照片也可能落在
+阈值内被并成一组。
+
+- 第一级：pHash 的距离 ≤ max_threshold（扫描时为较宽的 MAX_REGROUP_THRESHOLD）的照片对作为候选，
+  沿用原有的分块比较 / 时间窗口；
+- 第二级：签名为同一张缩略图 16×16 低频 DCT 系数的符号位（256 bit），只对候选对计算距离。
+  距离超过 CASCADE_VERIFY_THRESHOLD 的候选对被排除；通过核验的对保留原来的 pHash 距离，
+  阈值滑块、距离直方图和阈值预览的含义不变。
+
+签名用符号位而不是与中位数比较：旋转、翻转只改变 DCT 系数的符号和转置（见 orientation.py），
+符号位随之精确变换，方向无关匹配找到的对也能按两者的相对姿态核验。照片表中的签名按存储方向
+（缩略图）保存，与 pHash 一致；相对姿态由 EXIF Orientation（PhotoTable.exif_pose）和规范姿态推出。
+
+没有签名的照片（早期快照、关闭两级匹配）的候选对不经核验，按 pHash 距离保留。
+"""
+
+import numpy as np
+
+from backend.config import CASCADE_SIGNATURE_SIZE, CASCADE_VERIFY_THRESHOLD
+from backend.core.hashindex import popcount64
+from backend.core.orientation import COMPOSE, INVERSE
+
+SIGNATURE_WORDS = CASCADE_SIGNATURE_SIZE * CASCADE_SIGNATURE_SIZE // 64  # 每个签名的 uint64 个数
+
+# 一次核验的候选对数（每对按两个签名取数，约 64 MB 临时内存）
+VERIFY_CHUNK = 1 << 20
+
+
+def signature_hex(block: np.ndarray) -> str:
+    """
+    DCT 系数矩阵 → 签名（符号位按行优先、高位在前，十六进制）。
+
+    直流系数恒为正，签名的最高位总是 1，因此全零的签名表示未计算。
+    """
+    return np.packbits((block > 0).ravel()).tobytes().hex()
+
+
+def signature_words(signature: str) -> list[int]:
+    """十六进制签名 → SIGNATURE_WORDS 个 uint64（大端，与 signature_hex 的位序一致）"""
+    return np.frombuffer(bytes.fromhex(signature), dtype='>u8').tolist()
+
+
+def _unpack(words: np.ndarray) -> np.ndarray:
+    """(n, SIGNATURE_WORDS) uint64 → (n, S, S) 位矩阵"""
+    as_bytes = np.ascontiguousarray(words, dtype='>u8').view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1).reshape(-1, CASCADE_SIGNATURE_SIZE, CASCADE_SIGNATURE_SIZE)
+
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """(n, S, S) 位矩阵 → (n, SIGNATURE_WORDS) uint64"""
+    packed = np.packbits(bits.reshape(len(bits), -1), axis=1)
+    return packed.view('>u8').astype(np.uint64)
+
+
+def transform_signatures(words: np.ndarray, poses: np.ndarray) -> np.ndarray:
+    """
+    图像做姿态变换后的签名（不重新计算 DCT）。
+
+    Args:
+        words: (n, SIGNATURE_WORDS) uint64 签名
+        poses: 每个签名的姿态（orientation.py 的编号）
+
+    Returns:
+        变换后的签名，形状同 words
+    """
+    out = np.array(words, dtype=np.uint64, copy=True)
+    odd = np.arange(CASCADE_SIGNATURE_SIZE) % 2 == 1
+    for k in np.unique(poses).tolist():
+        if k == 0:
+            continue
+        rows = np.flatnonzero(poses == k)
+        # 与 orientation.transform_block 相同的变换，系数变号即符号位取反
+        bits = _unpack(out[rows])
+        if k & 4:
+            bits = bits.transpose(0, 2, 1).copy()
+        if k & 1:
+            bits[:, :, odd] ^= 1
+        if k & 2:
+            bits[:, odd, :] ^= 1
+        out[rows] = _pack(bits)
+    return out
+
+
+def verify_edges(
+    table,
+    u: np.ndarray,
+    v: np.ndarray,
+    pose_u: np.ndarray | None = None,
+    pose_v: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    第二级：用签名核验候选对。
+
+    Args:
+        table: PhotoTable
+        u / v: 候选对两端的单元 id
+        pose_u / pose_v: 方向无关匹配的候选对两端条目的姿态（显示方向 → 规范姿态），
+            给出时 v 的签名先变换到与 u 的存储方向一致再比较
+
+    Returns:
+        每个候选对是否通过核验（任一端没有签名时视为通过）
+    """
+    keep = np.ones(len(u), dtype=bool)
+    for start in range(0, len(u), VERIFY_CHUNK):
+        part = slice(start, start + VERIFY_CHUNK)
+        a, b = table.signature[u[part]], table.signature[v[part]]
+        if pose_u is not None:
+            # 存储方向 → 规范姿态：先按 EXIF 转到显示方向，再做条目的姿态
+            to_u = COMPOSE[table.exif_pose[u[part]], pose_u[part]]
+            to_v = COMPOSE[table.exif_pose[v[part]], pose_v[part]]
+            b = transform_signatures(b, COMPOSE[to_v, INVERSE[to_u]])
+        known = (a[:, 0] != 0) & (b[:, 0] != 0)
+        fine = popcount64(a ^ b).sum(axis=1, dtype=np.uint16)
+        keep[part] = ~known | (fine <= CASCADE_VERIFY_THRESHOLD)
+    return keep
+
+
+def new_stats() -> dict:
+    """两级匹配的计数：第一级比较的次数、候选对数、通过核验的对数"""
+    return {'compared': 0, 'candidates': 0, 'verified': 0}
+
+
+def report(stats: dict | None) -> dict | None:
+    """计数 → 每一级排除的对数（扫描指标、CLI 输出）"""
+    if stats is None:
+        return None
+    return {
+        **stats,
+        'coarse_eliminated': stats['compared'] - stats['candidates'],
+        'verify_eliminated': stats['candidates'] - stats['verified'],
+    }
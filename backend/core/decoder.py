@@ -0,0 +1,269 @@
+"""
+隔离的 RAW 解码 — 在受监管的工作进程中提取 RAW 预览，单个文件卡死或崩溃不影响扫描和服务。
+
+损坏或少见格式的 RAW 可能让 LibRaw 卡住或段错误。这里把 RAW 的解码放进工作进程：
+
+- 每次请求等待结果最多 DECODE_TIMEOUT 秒，超时的进程被结束；进程崩溃（管道断开）同样视为失败，
+  下一次请求时自动启动新的进程；
+- 卡死或崩溃的文件记入隔离名单（QUARANTINE_PATH），文件大小和修改时间不变时之后的扫描直接跳过；
+- 没有可用嵌入预览、需要完整解码（每张数秒）的文件交给单独的进程池：进程数少、以较低优先级运行、
+  超时更长，不占用提取预览的进程。
+
+普通图片（JPG 等）仍在调用线程中用 PIL 解码。进程以 spawn 方式启动（LibRaw 启用了 OpenMP，
+fork 出的子进程可能死锁），启动后常驻，多次扫描共用。
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from backend.config import (
+    THUMBNAIL_SIZE, DECODE_WORKERS, DECODE_TIMEOUT, DECODE_FULL_WORKERS, DECODE_FULL_TIMEOUT,
+    DECODE_FULL_NICE, QUARANTINE_PATH,
+)
+
+OK = 'ok'
+FAILED = 'failed'            # 解码器正常返回但没有结果（预览失败时改做完整解码）
+TIMEOUT = 'timeout'
+CRASHED = 'crashed'
+QUARANTINED = 'quarantined'  # 在隔离名单中，未尝试
+
+
+def _worker_main(conn, nice: int):
+    """工作进程：循环接收 (路径, 尺寸, 是否完整解码)，返回缩略图路径（失败为 None）"""
+    if nice and hasattr(os, 'nice'):
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+    from backend.core.thumbnail import extract_raw_thumbnail
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        if request is None:
+            return
+        path, size, full = request
+        thumb = extract_raw_thumbnail(path, size, full)
+        conn.send(str(thumb) if thumb is not None else None)
+
+
+# ─── 隔离名单 ───────────────────────────────────────────
+
+class Quarantine:
+    """曾导致解码卡死或崩溃的文件（按大小和修改时间识别，文件被替换后重新尝试）"""
+
+    def __init__(self, path: str | Path = QUARANTINE_PATH):
+        self.path = Path(path)
+        self._entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._entries = json.load(f).get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: str) -> bool:
+        entry = self._entries.get(path)
+        if entry is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return entry['size'] == st.st_size and entry['mtime'] == st.st_mtime
+
+    def add(self, path: str, reason: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self._entries[path] = {'size': st.st_size, 'mtime': st.st_mtime, 'reason': reason, 'at': time.time()}
+            self._save()
+
+    def clear(self, paths: list[str] | None = None) -> int:
+        """移出名单（默认全部），返回移出的数量"""
+        with self._lock:
+            if paths is None:
+                removed = len(self._entries)
+                self._entries = {}
+            else:
+                removed = sum(self._entries.pop(p, None) is not None for p in paths)
+            self._save()
+        return removed
+
+    def entries(self) -> list[dict]:
+        return [{'path': path, **entry} for path, entry in sorted(self._entries.items())]
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'files': self._entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+# ─── 工作进程池 ──────────────────────────────────────────
+
+class _Worker:
+    def __init__(self, context, nice: int, name: str):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, nice), name=name, daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class WorkerPool:
+    """固定上限、按需启动的解码进程池；每个请求独占一个进程，超时或崩溃的进程被替换"""
+
+    def __init__(self, workers: int, timeout: float, nice: int = 0, name: str = 'decode'):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.nice = nice
+        self.name = name
+        self.restarts = 0
+        self._context = multiprocessing.get_context('spawn')
+        self._idle: queue.SimpleQueue[_Worker] = queue.SimpleQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Worker:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._started < self.workers:
+                    self._started += 1
+                    try:
+                        return _Worker(self._context, self.nice, f'photodedup-{self.name}-{self._started}')
+                    except BaseException:
+                        self._started -= 1
+                        raise
+            # 全部忙碌：等待归还；被结束的进程不会归还，定期重新检查是否可以新启动
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _discard(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            self._started -= 1
+            self.restarts += 1
+
+    def run(self, path: str, size: tuple[int, int], full: bool) -> tuple[str, Path | None]:
+        """
+        在工作进程中解码一个文件。
+
+        Returns:
+            (状态, 缩略图路径)，状态为 OK / FAILED / TIMEOUT / CRASHED
+        """
+        worker = self._acquire()
+        try:
+            worker.conn.send((path, size, full))
+            if not worker.conn.poll(self.timeout):
+                self._discard(worker)
+                return TIMEOUT, None
+            result = worker.conn.recv()
+        except (EOFError, OSError):
+            self._discard(worker)
+            return CRASHED, None
+        self._idle.put(worker)
+        return (OK, Path(result)) if result is not None else (FAILED, None)
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+                worker.process.join(timeout=1)
+                if worker.process.is_alive():
+                    worker.process.kill()
+                self._started -= 1
+
+
+class Decoder:
+    """预览进程池 + 低优先级的完整解码进程池 + 隔离名单"""
+
+    def __init__(
+        self,
+        workers: int = DECODE_WORKERS,
+        full_workers: int = DECODE_FULL_WORKERS,
+        timeout: float = DECODE_TIMEOUT,
+        full_timeout: float = DECODE_FULL_TIMEOUT,
+        quarantine: Quarantine | None = None,
+    ):
+        self.previews = WorkerPool(workers, timeout, name='preview')
+        self.full_decodes = WorkerPool(full_workers, full_timeout, nice=DECODE_FULL_NICE, name='fulldecode')
+        self.quarantine = quarantine if quarantine is not None else Quarantine()
+
+    def _run(self, pool: WorkerPool, path: str, size: tuple[int, int], full: bool) -> tuple[str, Path | None]:
+        if path in self.quarantine:
+            return QUARANTINED, None
+        status, thumb = pool.run(path, size, full)
+        if status in (TIMEOUT, CRASHED):
+            self.quarantine.add(path, f"{'完整解码' if full else '提取预览'}{'超时' if status == TIMEOUT else '时进程崩溃'}")
+        return status, thumb
+
+    def preview(self, path: str, size: tuple[int, int] = THUMBNAIL_SIZE) -> tuple[str, Path | None]:
+        """提取嵌入式预览；FAILED 表示需要完整解码（交给 full）"""
+        return self._run(self.previews, path, size, False)
+
+    def full(self, path: str, size: tuple[int, int] = THUMBNAIL_SIZE) -> tuple[str, Path | None]:
+        """完整解码（低优先级进程池）"""
+        return self._run(self.full_decodes, path, size, True)
+
+    def thumbnail(self, path: str, size: tuple[int, int] = THUMBNAIL_SIZE) -> Path | None:
+        """单个 RAW 的缩略图：先提取预览，失败再完整解码"""
+        status, thumb = self.preview(path, size)
+        if status == FAILED:
+            status, thumb = self.full(path, size)
+        return thumb
+
+    def status(self) -> dict:
+        return {
+            'preview_workers': self.previews.workers,
+            'full_workers': self.full_decodes.workers,
+            'restarts': self.previews.restarts + self.full_decodes.restarts,
+            'quarantined': len(self.quarantine),
+        }
+
+    def close(self):
+        self.previews.close()
+        self.full_decodes.close()
+
+
+_decoder: Decoder | None = None
+_decoder_lock = threading.Lock()
+
+
+def get_decoder() -> Decoder:
+    """进程内共享的解码器（工作进程首次使用时启动，之后常驻）"""
+    global _decoder
+    with _decoder_lock:
+        if _decoder is None:
+            _decoder = Decoder()
+        return _decoder
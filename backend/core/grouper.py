@@ -1,9 +1,20 @@
 """
-相似照片聚类器 — 使用 Union-Find 将相似照片归入同一组。
+相似照片聚类器 — 将相似照片归入同一组。
+
+先构建邻接图（NeighborGraph）：记录距离不超过最大阈值的所有照片对及其距离；
+分组时按阈值过滤边再求连通分量。因此同一批哈希可以用任意不超过最大阈值的
+阈值即时重新分组，而无需重新扫描或重新比较。
+
+图的节点和分组成员都是照片表（PhotoTable）中的单元 id，路径只在输出时解码。
 """
 
-from backend.config import DEFAULT_SIMILARITY_THRESHOLD
-from backend.core.hasher import hamming_distance
+import numpy as np
+
+from backend.config import CASCADE_VERIFICATION, DEFAULT_SIMILARITY_THRESHOLD
+from backend.core.cascade import new_stats, verify_edges
+from backend.core.hashindex import pairs_within, popcount64, distances_to
+from backend.core.orientation import compatible, orientation_entries
+from backend.core.phototable import PhotoTable
 
 
 class UnionFind:
@@ -37,40 +48,413 @@ class UnionFind:
 
 
 class PhotoGroup:
-    """一组相似照片"""
+    """
+    一组相似照片 — 照片表中的一组单元 id。
 
-    def __init__(self, group_id: int, photos: list[dict]):
-        self.group_id = group_id
-        self.photos = photos  # [{'path': ..., 'hash': ..., 'size': ...}, ...]
+    photos 按需从照片表生成字典列表，不常驻内存。
+    """
 
-    @property
-    def count(self) -> int:
-        return len(self.photos)
+    def __init__(self, group_id: int, table: PhotoTable, ids: np.ndarray):
+        self.group_id = group_id
+        self.table = table
+        self.ids = ids  # 单元 id，按路径排序
 
     @property
-    def total_size(self) -> int:
-        return sum(p.get('size', 0) for p in self.photos)
+    def photos(self) -> list[dict]:
+        """[{'path': ..., 'hash': ..., 'size': ..., 'siblings': [...]}, ...]"""
+        return self.table.records(self.ids)
 
-    def to_dict(self) -> dict:
+    def to_dict(self, photos: list[dict] | None = None) -> dict:
+        """photos 可由调用方批量生成后传入（见 routes.get_groups）"""
         return {
             'group_id': self.group_id,
             'count': self.count,
             'total_size': self.total_size,
-            'photos': self.photos,
+            'photos': self.photos if photos is None else photos,
         }
 
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def total_size(self) -> int:
+        return int(self.table.size[self.ids].sum())
+
+
+
+class NeighborGraph:
+    """
+    相似度邻接图 — 节点为照片，边为距离 ≤ max_threshold 的照片对。
+
+    边按距离升序存储，任意阈值 t ≤ max_threshold 对应的边集就是一个前缀。
+    """
+
+    def __init__(
+        self,
+        table: PhotoTable,
+        nodes: np.ndarray,
+        edges_i: np.ndarray,
+        edges_j: np.ndarray,
+        edges_d: np.ndarray,
+        max_threshold: int,
+        cascade: dict | None = None,
+    ):
+        order = np.argsort(edges_d, kind='stable')
+        self.table = table
+        self.nodes = nodes            # 节点 → 照片表中的单元 id
+        self.edges_i = edges_i[order]
+        self.edges_j = edges_j[order]
+        self.edges_d = edges_d[order]
+        self.max_threshold = max_threshold
+        self.cascade = cascade        # 两级匹配的计数（见 cascade.new_stats），快照中早期的邻接图为 None
+
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def packed(self) -> np.ndarray:
+        """节点的 pHash（uint64，与 nodes 一一对应）"""
+        return self.table.packed[self.nodes]
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edges_d)
+
+    def edge_count_within(self, threshold: int) -> int:
+        """距离 ≤ threshold 的边数"""
+        return int(np.searchsorted(self.edges_d, threshold, side='right'))
+
+    def components(self, threshold: int) -> list[list[int]]:
+        """
+        按阈值求连通分量（只返回 2 个及以上节点的分量）。
+
+        Returns:
+            节点下标列表的列表，按分量大小降序，同样大小按首个节点下标升序
+        """
+        if threshold > self.max_threshold:
+            raise ValueError(
+                f"阈值 {threshold} 超过邻接图的最大阈值 {self.max_threshold}"
+            )
+        n = len(self.nodes)
+        k = self.edge_count_within(threshold)
+        if n == 0 or k == 0:
+            return []
+
+        from scipy.sparse import coo_matrix  # 延迟导入：只读取分组结果时不需要 SciPy
+        from scipy.sparse.csgraph import connected_components
+
+        adjacency = coo_matrix(
+            (np.ones(k, dtype=np.int8), (self.edges_i[:k], self.edges_j[:k])),
+            shape=(n, n),
+        )
+        _, labels = connected_components(adjacency, directed=False)
+
+        members: dict[int, list[int]] = {}
+        for node, label in enumerate(labels.tolist()):
+            members.setdefault(label, []).append(node)
+        comps = [m for m in members.values() if len(m) >= 2]
+        comps.sort(key=lambda m: (-len(m), m[0]))
+        return comps
+
+    def nearest_distances(self) -> np.ndarray:
+        """
+        每个节点到最近邻的汉明距离。
+
+        只统计图中的边，最近邻距离超过 max_threshold（或时间窗口模式下
+        窗口内没有邻居）的节点记为 -1。
+        """
+        nearest = np.full(len(self.nodes), 255, dtype=np.int16)
+        np.minimum.at(nearest, self.edges_i, self.edges_d.astype(np.int16))
+        np.minimum.at(nearest, self.edges_j, self.edges_d.astype(np.int16))
+        nearest[nearest == 255] = -1
+        return nearest
+
+    def threshold_profile(self) -> list[dict]:
+        """
+        各阈值（0..max_threshold）下的分组规模预览。
+
+        边已按距离排序，逐级处理：每一级只把该距离的边加到上一级的
+        连通分量（收缩为单个节点）之上，总代价约为 O(E + N·T)。
+
+        Returns:
+            [{'threshold', 'groups', 'grouped_photos', 'largest_group', 'deletable'}, ...]
+            deletable 为每组只保留一张时可删除的照片数
+        """
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        labels = np.arange(len(self.nodes), dtype=np.int32)  # 节点 → 当前连通分量
+        n_components = len(self.nodes)
+        profile = []
+        stats = {'groups': 0, 'grouped_photos': 0, 'largest_group': 0, 'deletable': 0}
+        lo = 0
+
+        for t in range(self.max_threshold + 1):
+            hi = self.edge_count_within(t)
+            if hi > lo:
+                adjacency = coo_matrix(
+                    (
+                        np.ones(hi - lo, dtype=np.int8),
+                        (labels[self.edges_i[lo:hi]], labels[self.edges_j[lo:hi]]),
+                    ),
+                    shape=(n_components, n_components),
+                )
+                n_components, merged = connected_components(adjacency, directed=False)
+                labels = merged[labels].astype(np.int32, copy=False)
+                sizes = np.bincount(labels)
+                sizes = sizes[sizes >= 2]
+                stats = {
+                    'groups': int(len(sizes)),
+                    'grouped_photos': int(sizes.sum()),
+                    'largest_group': int(sizes.max()) if len(sizes) else 0,
+                    'deletable': int(sizes.sum() - len(sizes)),
+                }
+                lo = hi
+            profile.append({'threshold': t, **stats})
+
+        return profile
+
+    def groups(self, threshold: int) -> list[PhotoGroup]:
+        """按阈值生成 PhotoGroup 列表，按照片数量从大到小排序"""
+        groups = []
+        for gid, comp in enumerate(self.components(threshold)):
+            ids = self.nodes[comp]
+            # 按路径排序，通常也是时间顺序
+            paths = self.table.paths(ids)
+            order = sorted(range(len(ids)), key=paths.__getitem__)
+            groups.append(PhotoGroup(group_id=gid, table=self.table, ids=ids[order]))
+        return groups
+
+
+def merge_edges(*parts: tuple[np.ndarray, np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    合并几组边 (i, j, d)：端点规范化为 i < j，同一对节点只保留最小距离。
+
+    方向无关匹配时同一对照片可能既按原方向、又按规范哈希（或多个备选规范哈希）相近。
+    """
+    i = np.concatenate([p[0] for p in parts]).astype(np.int64, copy=False)
+    j = np.concatenate([p[1] for p in parts]).astype(np.int64, copy=False)
+    d = np.concatenate([p[2] for p in parts]).astype(np.uint8, copy=False)
+    lo, hi = np.minimum(i, j), np.maximum(i, j)
+    order = np.lexsort((d, hi, lo))
+    lo, hi, d = lo[order], hi[order], d[order]
+    first = np.ones(len(lo), dtype=bool)
+    first[1:] = (lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1])
+    return lo[first], hi[first], d[first]
+
+
+def _orientation_edges(
+    owner: np.ndarray,
+    poses: np.ndarray,
+    found: tuple[np.ndarray, np.ndarray, np.ndarray],
+    mode: str,
+) -> tuple[np.ndarray, ...]:
+    """
+    规范哈希条目之间的对 → 节点之间的边（去掉同一节点的条目对，exif 模式只保留显示方向相同的）。
+
+    Returns:
+        (i, j, d, 条目 i 的姿态, 条目 j 的姿态)
+    """
+    ei, ej, d = found
+    keep = (owner[ei] != owner[ej]) & compatible(poses[ei], poses[ej], mode)
+    ei, ej = ei[keep], ej[keep]
+    return owner[ei], owner[ej], d[keep], poses[ei], poses[ej]
+
+
+def _verify(
+    table: PhotoTable,
+    nodes: np.ndarray,
+    edges: tuple[np.ndarray, np.ndarray, np.ndarray],
+    oriented: tuple[np.ndarray, ...] | None,
+    stats: dict,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    第二级：用签名核验第一级找出的候选边（见 cascade.py），候选对数、通过的对数记入 stats。
+    关闭两级匹配（CASCADE_VERIFICATION）时候选边原样保留，已有的签名也不使用。
+
+    Args:
+        edges: 按原方向哈希找出的候选边 (i, j, d)，i < j 为 nodes 的下标
+        oriented: 方向无关匹配找出的候选边（_orientation_edges 的结果），未开启时为 None
+    """
+    if not CASCADE_VERIFICATION:
+        if oriented is not None:
+            mi, mj, md = merge_edges(edges, oriented[:3])
+            edges = mi.astype(np.int32), mj.astype(np.int32), md
+        stats['candidates'] += len(edges[2])
+        stats['verified'] += len(edges[2])
+        return edges
+
+    i, j, d = edges
+    keep = verify_edges(table, nodes[i], nodes[j])
+    verified = i[keep], j[keep], d[keep]
+    if oriented is None:
+        stats['candidates'] += len(keep)
+        stats['verified'] += int(keep.sum())
+        return verified
+
+    oi, oj, od, pi, pj = oriented
+    keep = verify_edges(table, nodes[oi], nodes[oj], pi, pj)
+    stats['candidates'] += len(merge_edges(edges, oriented[:3])[0])
+    mi, mj, md = merge_edges(verified, (oi[keep], oj[keep], od[keep]))
+    stats['verified'] += len(md)
+    return mi.astype(np.int32), mj.astype(np.int32), md
+
+
+def build_neighbor_graph(
+    table: PhotoTable,
+    max_threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+    orientation: str = 'off',
+) -> NeighborGraph:
+    """
+    全局比较构建邻接图 — 所有照片两两比较（NumPy 分块向量化）。
+
+    距离 ≤ max_threshold 的照片对是候选，再由签名核验（两级匹配，见 cascade.py）。
+
+    Args:
+        table: 照片表，没有哈希或已移除的单元会被忽略
+        max_threshold: 记录边的最大汉明距离
+        orientation: 方向无关匹配模式（见 orientation.ORIENTATION_MODES）。开启时规范哈希条目
+            再两两比较一遍，边的距离取两者中较小的
+
+    Returns:
+        NeighborGraph
+    """
+    nodes = table.hashed_ids()
+    stats = new_stats()
+    stats['compared'] = len(nodes) * (len(nodes) - 1) // 2
+    edges = pairs_within(table.packed[nodes], max_threshold)
+    oriented = None
+    if orientation != 'off':
+        owner, hashes, poses = orientation_entries(table, nodes)
+        stats['compared'] += len(hashes) * (len(hashes) - 1) // 2
+        oriented = _orientation_edges(owner, poses, pairs_within(hashes, max_threshold), orientation)
+    edges = _verify(table, nodes, edges, oriented, stats)
+    return NeighborGraph(table, nodes, *edges, max_threshold, stats)
+
+
+def _window_pairs(
+    packed: np.ndarray,
+    camera: np.ndarray,
+    times: np.ndarray,
+    window_seconds: float,
+    max_threshold: int,
+    include_undated: bool,
+) -> tuple[tuple[np.ndarray, np.ndarray, np.ndarray], int]:
+    """
+    滑动窗口比较：packed 的前 len(camera) 项有拍摄时间（已按相机、时间排序），其余没有。
+
+    Returns:
+        ((i, j, d), 比较的次数)，i < j 为 packed 的下标
+    """
+    n_dated = len(camera)
+    found_i, found_j, found_d = [], [], []
+    compared = 0
+
+    # 第 k 轮比较每张照片与其后第 k 张；已排序，一旦超出窗口或换了相机，
+    # 更大的 k 也必然超出，因此活跃集合逐轮缩小，直到为空
+    active = np.arange(n_dated - 1)
+    k = 1
+    while len(active):
+        active = active[active + k < n_dated]
+        other = active + k
+        within = (camera[other] == camera[active]) & (times[other] - times[active] <= window_seconds)
+        active, other = active[within], other[within]
+        compared += len(active)
+        dist = popcount64(packed[active] ^ packed[other])
+        near = dist <= max_threshold
+        found_i.append(active[near])
+        found_j.append(other[near])
+        found_d.append(dist[near])
+        k += 1
+
+    # 全局补充：无 EXIF 时间的照片与所有照片比较（包括彼此，i < j）
+    if include_undated:
+        for iu in range(n_dated, len(packed)):
+            compared += iu
+            dist = distances_to(packed[:iu], packed[iu])
+            near = np.flatnonzero(dist <= max_threshold)
+            found_i.append(near)
+            found_j.append(np.full(len(near), iu))
+            found_d.append(dist[near])
+
+    def concat(parts, dtype):
+        return np.concatenate(parts).astype(dtype, copy=False) if parts else np.zeros(0, dtype=dtype)
+
+    return (concat(found_i, np.int32), concat(found_j, np.int32), concat(found_d, np.uint8)), compared
+
+
+def build_neighbor_graph_windowed(
+    table: PhotoTable,
+    window_seconds: float,
+    max_threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+    include_undated: bool = True,
+    orientation: str = 'off',
+) -> NeighborGraph:
+    """
+    按拍摄时间窗口构建邻接图 — 只比较同一相机、拍摄时间相差不超过窗口的照片。
+
+    连拍/包围曝光的重复照片几乎都在几秒之内，按 (相机型号, 拍摄时间)
+    排序后用滑动窗口比较，复杂度为 O(N·w)，w 为窗口内的平均照片数。
+
+    Args:
+        table: 照片表（camera_id、timestamp 列，时间为 NaN 视为无 EXIF）
+        window_seconds: 时间窗口（秒）
+        max_threshold: 记录边的最大汉明距离
+        include_undated: 是否对没有拍摄时间的照片额外做一次全局比较
+            （与所有照片比较），否则这些照片不参与分组
+        orientation: 方向无关匹配模式，开启时规范哈希条目按同样的窗口再比较一遍
+
+    窗口内的候选对同样由签名核验（见 build_neighbor_graph）。
+
+    Returns:
+        NeighborGraph
+    """
+    valid = table.hashed_ids()
+    ts = table.timestamp[valid]
+    has_time = ~np.isnan(ts)
+    dated, undated = valid[has_time], valid[~has_time]
+
+    # 按相机型号分区、按时间排序
+    order = np.lexsort((ts[has_time], table.camera_id[dated]))
+    dated = dated[order]
+    nodes = np.concatenate([dated, undated]) if include_undated else dated
+    camera = table.camera_id[dated]
+    times = table.timestamp[dated]
+
+    stats = new_stats()
+    edges, stats['compared'] = _window_pairs(
+        table.packed[nodes], camera, times, window_seconds, max_threshold, include_undated,
+    )
+    oriented = None
+    if orientation != 'off':
+        # 条目按所属节点排列，有拍摄时间的节点的条目仍在前面、按相机和时间有序
+        owner, hashes, poses = orientation_entries(table, nodes)
+        dated_entries = owner < len(dated)
+        found, compared = _window_pairs(
+            hashes, camera[owner[dated_entries]], times[owner[dated_entries]],
+            window_seconds, max_threshold, include_undated,
+        )
+        stats['compared'] += compared
+        oriented = _orientation_edges(owner, poses, found, orientation)
+    edges = _verify(table, nodes, edges, oriented, stats)
+
+    return NeighborGraph(table, nodes, *edges, max_threshold, stats)
+
 
 def group_similar_photos(
     photo_hashes: dict[str, str | None],
     photo_sizes: dict[str, int] | None = None,
     threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+    photo_siblings: dict[str, list[str]] | None = None,
 ) -> list[PhotoGroup]:
     """
     将相似照片聚类为群组。
 
     算法：
-    1. 对所有照片对计算汉明距离
-    2. 距离 < 阈值 → Union-Find 合并
+    1. 对所有照片对计算汉明距离（NumPy 分块向量化）
+    2. 距离 ≤ 阈值 → 邻接图中的一条边
     3. 提取连通分量作为群组
     4. 只返回包含 2 张及以上照片的群组
 
@@ -78,50 +462,34 @@ def group_similar_photos(
         photo_hashes: {文件路径: pHash} 字典
         photo_sizes: {文件路径: 文件大小} 字典（可选）
         threshold: 相似度阈值（汉明距离）
+        photo_siblings: {代表文件路径: 同一拍摄单元的其他文件路径}（可选，
+            RAW+JPEG 配对时使用，photo_sizes 中应为整个单元的大小）
 
     Returns:
         PhotoGroup 列表，按照片数量从大到小排序
     """
-    # 过滤掉没有哈希值的照片
-    valid = {p: h for p, h in photo_hashes.items() if h is not None}
-    paths = list(valid.keys())
-    n = len(paths)
-
-    if n == 0:
-        return []
-
-    uf = UnionFind()
-
-    # O(N²) 两两比较 — 对于几千张照片是可接受的
-    # 优化思路：如果 N > 10000，可用 VP-Tree 或 LSH 加速
-    for i in range(n):
-        for j in range(i + 1, n):
-            dist = hamming_distance(valid[paths[i]], valid[paths[j]])
-            if dist <= threshold:
-                uf.union(paths[i], paths[j])
-
-    # 提取群组
-    groups_dict: dict[str, list[str]] = {}
-    for path in paths:
-        root = uf.find(path)
-        groups_dict.setdefault(root, []).append(path)
-
-    # 构建 PhotoGroup，过滤独立照片
-    photo_sizes = photo_sizes or {}
-    groups = []
-    for gid, (_, members) in enumerate(
-        sorted(groups_dict.items(), key=lambda x: -len(x[1]))
-    ):
-        if len(members) < 2:
-            continue
-        photos = [
-            {
-                'path': p,
-                'hash': valid[p],
-                'size': photo_sizes.get(p, 0),
-            }
-            for p in sorted(members)  # 按路径排序，通常也是时间顺序
-        ]
-        groups.append(PhotoGroup(group_id=gid, photos=photos))
-
-    return groups
+    table = PhotoTable.from_dicts(photo_hashes, photo_sizes, photo_siblings)
+    return build_neighbor_graph(table, threshold).groups(threshold)
+
+
+def group_similar_photos_windowed(
+    photo_hashes: dict[str, str | None],
+    capture_info: dict[str, tuple[str | None, float | None]],
+    window_seconds: float,
+    photo_sizes: dict[str, int] | None = None,
+    threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+    photo_siblings: dict[str, list[str]] | None = None,
+    include_undated: bool = True,
+) -> list[PhotoGroup]:
+    """
+    按拍摄时间窗口聚类，参数含义见 build_neighbor_graph_windowed。
+
+    Args:
+        capture_info: {文件路径: (相机型号, 拍摄时间戳)}，缺失或时间为 None 视为无 EXIF
+
+    Returns:
+        PhotoGroup 列表，按照片数量从大到小排序
+    """
+    table = PhotoTable.from_dicts(photo_hashes, photo_sizes, photo_siblings, capture_info)
+    graph = build_neighbor_graph_windowed(table, window_seconds, threshold, include_undated)
+    return graph.groups(threshold)
@@ -1,16 +1,34 @@
 """
 感知哈希计算器 — 使用 pHash 为每张照片生成 64-bit 指纹。
 支持多线程并行计算。
+
+计算哈希时可以顺带从同一张已解码的缩略图算出画质指标（清晰度、过曝/欠曝比例、噪声），
+供推荐器在连拍中保留最好的一张，不额外读取或解码文件。
+
+pHash 的 DCT 系数同时用于推出方向无关的规范哈希（见 orientation.py），旋转、翻转过的副本
+不必重新解码或重新计算 DCT；同一张灰度图还用于计算两级匹配的核验签名（见 cascade.py）。
 """
 
 import os
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
 
 import imagehash
+import numpy as np
 from PIL import Image
 
-from backend.config import MAX_WORKERS
+from backend.config import CASCADE_SIGNATURE_SIZE, MAX_WORKERS, QUALITY_CLIP_LOW, QUALITY_CLIP_HIGH
+from backend.core.cascade import signature_hex
+from backend.core.hashindex import hash_to_int
+from backend.core.metrics import StageMetrics
+from backend.core.orientation import Variant, block_bits, canonical_variants, dct_block
+
+if TYPE_CHECKING:
+    from backend.core.autotune import StageTuner
+
+
+Quality = tuple[float, float, float]  # (清晰度, 过曝/欠曝比例, 噪声)
 
 
 def compute_phash(image_path: str, hash_size: int = 8) -> str | None:
@@ -24,12 +42,120 @@ def compute_phash(image_path: str, hash_size: int = 8) -> str | None:
     Returns:
         十六进制哈希字符串，失败返回 None
     """
+    return analyze_image(image_path, hash_size)[0]
+
+
+def analyze_image(
+    image_path: str,
+    hash_size: int = 8,
+    quality: bool = False,
+    orientation: bool = False,
+    signature: bool = False,
+) -> tuple[str | None, Quality | None, list[Variant] | None, str | None]:
+    """
+    解码一次缩略图，计算 pHash，并可选地从同一张灰度图计算画质指标、核验签名，从同一块 DCT 系数推出规范哈希。
+
+    Args:
+        image_path: 图片路径（缩略图 JPEG）
+        hash_size: 哈希矩阵尺寸
+        quality: 是否计算画质指标（见 image_quality）
+        orientation: 是否计算方向无关的规范哈希（见 orientation.canonical_variants）
+        signature: 是否计算两级匹配的核验签名（见 cascade.signature_hex，存储方向）
+
+    Returns:
+        (十六进制哈希, 画质指标, 规范哈希, 签名)，失败时哈希为 None；未要求或失败时后三项为 None
+    """
     try:
-        img = Image.open(image_path)
-        h = imagehash.phash(img, hash_size=hash_size)
-        return str(h)
+        gray = Image.open(image_path).convert('L')
+        block = dct_block(gray, hash_size)  # 与 imagehash.phash 相同的系数，结果逐位一致
+        h = str(imagehash.ImageHash(block_bits(block)))
     except Exception:
-        return None
+        return None, None, None, None
+    variants = None
+    if orientation:
+        try:
+            variants = canonical_variants(block)
+        except Exception:
+            pass
+    fine = None
+    if signature:
+        try:
+            fine = signature_hex(dct_block(gray, CASCADE_SIGNATURE_SIZE))
+        except Exception:
+            pass
+    if not quality:
+        return h, None, variants, fine
+    try:
+        return h, image_quality(np.asarray(gray)), variants, fine
+    except Exception:
+        return h, None, variants, fine
+
+
+def image_quality(gray: np.ndarray) -> Quality:
+    """
+    灰度图（uint8）的画质指标，全部由水平、垂直二阶差分得到（int16 运算，每张缩略图约半毫秒）。
+
+    - 噪声：Immerkær 快速噪声估计（两个方向二阶差分的乘积核，对图像结构不敏感）；
+    - 清晰度：拉普拉斯响应（两个方向二阶差分之和）的方差，扣除噪声贡献的部分
+      （独立噪声 σ 对 4 邻域拉普拉斯贡献 20σ²），以免噪点多的一张被当作更清晰；
+    - 过曝/欠曝：亮度不高于 QUALITY_CLIP_LOW 或不低于 QUALITY_CLIP_HIGH 的像素比例。
+
+    Returns:
+        (清晰度, 过曝/欠曝比例, 噪声 σ)
+    """
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return 0.0, 0.0, 0.0
+    g = gray.astype(np.int16)
+    rows = g[:, :-2] + g[:, 2:]
+    rows -= 2 * g[:, 1:-1]                   # 水平二阶差分
+    lap = g[:-2, 1:-1] + g[2:, 1:-1]
+    lap -= 2 * g[1:-1, 1:-1]                 # 垂直二阶差分
+    residual = rows[:-2] + rows[2:]
+    residual -= 2 * rows[1:-1]               # 再做垂直二阶差分 = Immerkær 核
+    noise = float(np.sqrt(np.pi / 2) * np.abs(residual, out=residual).sum(dtype=np.int64) / (6 * residual.size))
+    lap += rows[1:-1]
+    flat = lap.ravel().astype(np.float32)
+    mean = float(flat.sum()) / flat.size
+    variance = float(np.dot(flat, flat)) / flat.size - mean * mean
+    sharpness = max(variance - 20 * noise * noise, 0.0)
+    clipped = (np.count_nonzero(gray <= QUALITY_CLIP_LOW) + np.count_nonzero(gray >= QUALITY_CLIP_HIGH)) / gray.size
+    return round(sharpness, 2), round(clipped, 4), round(noise, 3)
+
+
+def hash_thumbnail(
+    original_path: str,
+    thumb_path: str,
+    hash_size: int = 8,
+    metrics: StageMetrics | None = None,
+    qualities: dict[str, Quality | None] | None = None,
+    orientations: dict[str, list[Variant] | None] | None = None,
+    signatures: dict[str, str | None] | None = None,
+) -> str | None:
+    """
+    计算一张缩略图的 pHash，给出 metrics 时按原始文件记录耗时和读取字节数，
+    给出 qualities / orientations / signatures 时把画质指标 / 规范哈希 / 签名写入其中（键为原始文件路径）。
+    """
+    start = time.perf_counter()
+    hash_val, quality, variants, signature = analyze_image(
+        thumb_path, hash_size, qualities is not None, orientations is not None, signatures is not None,
+    )
+    if qualities is not None:
+        qualities[original_path] = quality
+    if orientations is not None:
+        orientations[original_path] = variants
+    if signatures is not None:
+        signatures[original_path] = signature
+    if metrics is None:
+        return hash_val
+    try:
+        size = os.path.getsize(thumb_path)
+    except OSError:
+        size = 0
+    metrics.record_file(
+        original_path, time.perf_counter() - start,
+        bytes_read=size, ok=hash_val is not None,
+    )
+    return hash_val
 
 
 def compute_phash_batch(
@@ -37,6 +163,11 @@ def compute_phash_batch(
     hash_size: int = 8,
     max_workers: int = MAX_WORKERS,
     progress_callback: Callable[[int, int], None] | None = None,
+    metrics: StageMetrics | None = None,
+    tuner: 'StageTuner | None' = None,
+    qualities: dict[str, Quality | None] | None = None,
+    orientations: dict[str, list[Variant] | None] | None = None,
+    signatures: dict[str, str | None] | None = None,
 ) -> dict[str, str | None]:
     """
     多线程批量计算 pHash。
@@ -46,6 +177,12 @@ def compute_phash_batch(
         hash_size: 哈希矩阵尺寸
         max_workers: 最大线程数
         progress_callback: 进度回调 (已完成数, 总数)
+        metrics: 阶段指标（可选），记录逐文件耗时（在工作线程内测量）
+        tuner: 自适应并发控制器（可选）。给出时按其上限启动线程，同时计算的线程数由控制器调整，
+            起始值为 max_workers
+        qualities: 给出时同时计算画质指标，写入 {原始文件路径: (清晰度, 过曝/欠曝比例, 噪声)}
+        orientations: 给出时同时计算规范哈希，写入 {原始文件路径: [(规范哈希, 姿态), ...]}（存储方向的姿态）
+        signatures: 给出时同时计算核验签名，写入 {原始文件路径: 十六进制签名}（存储方向）
 
     Returns:
         {原始文件路径: 哈希值} 字典
@@ -55,21 +192,36 @@ def compute_phash_batch(
     completed = 0
 
     def _compute(original_path: str, thumb_path: str):
-        return original_path, compute_phash(thumb_path, hash_size)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(_compute, orig, thumb): orig
-            for orig, thumb in image_paths.items()
-            if thumb is not None
-        }
-
-        for future in as_completed(futures):
-            orig_path, hash_val = future.result()
-            results[orig_path] = hash_val
-            completed += 1
-            if progress_callback and (completed % 50 == 0 or completed == total):
-                progress_callback(completed, total)
+        return original_path, hash_thumbnail(
+            original_path, thumb_path, hash_size, metrics, qualities, orientations, signatures,
+        )
+
+    def _tuned(original_path: str, thumb_path: str):
+        with tuner.slot():
+            return _compute(original_path, thumb_path)
+
+    task = _compute
+    if tuner is not None:
+        tuner.start(max_workers)
+        max_workers, task = tuner.high, _tuned
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(task, orig, thumb): orig
+                for orig, thumb in image_paths.items()
+                if thumb is not None
+            }
+
+            for future in as_completed(futures):
+                orig_path, hash_val = future.result()
+                results[orig_path] = hash_val
+                completed += 1
+                if progress_callback and (completed % 50 == 0 or completed == total):
+                    progress_callback(completed, total)
+    finally:
+        if tuner is not None:
+            tuner.stop()
 
     # 标记没有缩略图的文件
     for orig, thumb in image_paths.items():
@@ -90,6 +242,4 @@ def hamming_distance(hash1: str, hash2: str) -> int:
     Returns:
         汉明距离（0 = 完全相同，64 = 完全不同）
     """
-    h1 = imagehash.hex_to_hash(hash1)
-    h2 = imagehash.hex_to_hash(hash2)
-    return h1 - h2
+    return (hash_to_int(hash1) ^ hash_to_int(hash2)).bit_count()
@@ -0,0 +1,137 @@
+"""
+哈希索引 — 将 64-bit pHash 打包为 uint64 数组，用 NumPy 批量计算汉明距离。
+
+逐对调用 hamming_distance 在 Python 层循环，几万张照片就需要数分钟；
+这里把异或 + popcount 向量化，并按块（tile）分批计算，内存占用与总数无关。
+"""
+
+import numpy as np
+
+# 每个分块的边长：块内 TILE × TILE 个距离一次算完（约 8 MB 临时内存）
+TILE = 1024
+
+# 0..255 的 popcount 查找表（NumPy < 2.0 没有 bitwise_count 时使用）
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def hash_to_int(hash_hex: str) -> int:
+    """将十六进制哈希字符串转为整数，便于批量比较时用异或 + popcount 计算距离"""
+    return int(hash_hex, 16)
+
+
+def pack_hashes(hashes: list[str]) -> np.ndarray:
+    """
+    将十六进制 pHash 列表打包为 uint64 数组。
+
+    Args:
+        hashes: 16 位十六进制字符串列表（hash_size=8 的 64-bit pHash）
+
+    Returns:
+        形状为 (N,) 的 uint64 数组
+    """
+    return np.fromiter((int(h, 16) for h in hashes), dtype=np.uint64, count=len(hashes))
+
+
+def unpack_hash(value: int) -> str:
+    """uint64 → 16 位十六进制字符串（与 imagehash 的 str() 格式一致）"""
+    return f'{int(value):016x}'
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """逐元素计算 uint64 数组中 1 的个数，返回 uint8 数组"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.uint8, copy=False)
+    as_bytes = values.reshape(-1, 1).view(np.uint8)
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=1, dtype=np.uint8).reshape(values.shape)
+
+
+def distances_to(packed: np.ndarray, query: int) -> np.ndarray:
+    """计算单个哈希到数组中所有哈希的汉明距离"""
+    return popcount64(packed ^ np.uint64(query))
+
+
+def pairs_within(
+    packed: np.ndarray,
+    max_distance: int,
+    tile: int = TILE,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    找出所有汉明距离 ≤ max_distance 的哈希对（i < j）。
+
+    按 tile × tile 分块计算上三角部分，复杂度仍为 O(N²)，
+    但全部在 NumPy 中完成，比 Python 逐对比较快两个数量级以上。
+
+    Args:
+        packed: pack_hashes 的结果
+        max_distance: 最大汉明距离（含）
+
+    Returns:
+        (i, j, dist) 三个等长数组：i/j 为 int32 下标，dist 为 uint8 距离
+    """
+    n = len(packed)
+    found_i, found_j, found_d = [], [], []
+
+    for a in range(0, n, tile):
+        block_a = packed[a:a + tile]
+        for b in range(a, n, tile):
+            block_b = packed[b:b + tile]
+            dist = popcount64(block_a[:, None] ^ block_b[None, :])
+            ii, jj = np.nonzero(dist <= max_distance)
+            if a == b:
+                upper = jj > ii
+                ii, jj = ii[upper], jj[upper]
+            if len(ii):
+                found_i.append(ii + a)
+                found_j.append(jj + b)
+                found_d.append(dist[ii, jj])
+
+    if not found_i:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty.copy(), np.empty(0, dtype=np.uint8)
+
+    return (
+        np.concatenate(found_i).astype(np.int32),
+        np.concatenate(found_j).astype(np.int32),
+        np.concatenate(found_d).astype(np.uint8),
+    )
+
+
+def pairs_between(
+    queries: np.ndarray,
+    packed: np.ndarray,
+    max_distance: int,
+    tile: int = TILE,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    找出 queries 与 packed 之间所有汉明距离 ≤ max_distance 的哈希对。
+
+    用于增量插入：新照片只与已有照片（以及彼此）比较，复杂度 O(Q·N)。
+
+    Args:
+        queries: 新照片的打包哈希
+        packed: 被比较的打包哈希
+
+    Returns:
+        (qi, j, dist)：qi 为 queries 的下标，j 为 packed 的下标（int32），dist 为 uint8 距离
+    """
+    found_i, found_j, found_d = [], [], []
+
+    for a in range(0, len(queries), tile):
+        block_a = queries[a:a + tile]
+        for b in range(0, len(packed), tile):
+            dist = popcount64(block_a[:, None] ^ packed[None, b:b + tile])
+            ii, jj = np.nonzero(dist <= max_distance)
+            if len(ii):
+                found_i.append(ii + a)
+                found_j.append(jj + b)
+                found_d.append(dist[ii, jj])
+
+    if not found_i:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty.copy(), np.empty(0, dtype=np.uint8)
+
+    return (
+        np.concatenate(found_i).astype(np.int32),
+        np.concatenate(found_j).astype(np.int32),
+        np.concatenate(found_d).astype(np.uint8),
+    )
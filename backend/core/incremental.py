@@ -0,0 +1,484 @@
+"""
+增量分组 — 照片陆续加入/移除时只更新受影响的分组和推荐。
+
+邻接表记录距离 ≤ max_threshold 的所有边（与 NeighborGraph 相同），分组为
+阈值 threshold 下的连通分量：
+
+- 插入：新照片与照片表中的已有照片批量比较（hashindex.pairs_between；开启方向无关匹配时
+  规范哈希条目再比较一遍），候选对经签名核验（见 cascade.py）后成为新边，新边两端的分组合并，
+  合并后沿用其中最早的分组 id；
+- 移除：删去照片及其边，只对它原来所在的分组重新求连通分量，拆分出的最大分量
+  沿用原 id，其余分量获得新 id，不足两张的分组被移除。
+
+每次操作返回 {'created', 'updated', 'removed'} 三组分组 id，推荐结果只为
+新建和变化的分组重新生成。
+"""
+
+import os
+from typing import Iterable
+
+import numpy as np
+
+from backend.config import (
+    CASCADE_VERIFICATION, DEFAULT_SIMILARITY_THRESHOLD, RAW_EXTENSIONS, CAPTURE_SIBLING_EXTENSIONS,
+)
+from backend.core.cascade import new_stats, verify_edges
+from backend.core.grouper import (
+    NeighborGraph, PhotoGroup, build_neighbor_graph, build_neighbor_graph_windowed, merge_edges,
+)
+from backend.core.hashindex import pairs_between
+from backend.core.orientation import compatible, orientation_entries
+from backend.core.phototable import PhotoTable
+
+
+class IncrementalGrouper:
+    """
+    可增量更新的分组状态（照片表 + 邻接表 + 分组成员 + 各组推荐）。
+
+    分组 id 在整个生命周期内稳定：只有新建的分组获得新 id，合并/拆分时
+    原有分组尽量保留自己的 id，客户端可以按 id 局部刷新。
+    """
+
+    def __init__(
+        self,
+        table: PhotoTable,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        max_threshold: int | None = None,
+        time_window: float | None = None,
+        include_undated: bool = True,
+        orientation: str = 'off',
+    ):
+        self.table = table
+        self.threshold = threshold
+        self.max_threshold = max(threshold, max_threshold or threshold)
+        self.time_window = time_window
+        self.include_undated = include_undated
+        self.orientation = orientation
+        self.cascade = new_stats()                       # 两级匹配的累计计数（见 cascade.py）
+        self._edges: dict[int, dict[int, int]] = {}     # 单元 id → {相邻单元 id: 距离}
+        self._group_of: dict[int, int] = {}             # 单元 id → 分组 id（只含分组成员）
+        self._members: dict[int, set[int]] = {}         # 分组 id → 成员单元 id
+        self._groups: dict[int, PhotoGroup] = {}        # 分组 id → PhotoGroup（成员按路径排序）
+        self._recommendations: dict[int, dict] = {}     # 分组 id → Recommendation.to_dict()
+        self._next_id = 0
+
+    # ─── 构建 ───────────────────────────────────────────
+
+    @classmethod
+    def from_graph(
+        cls,
+        graph: NeighborGraph,
+        groups: list[PhotoGroup],
+        threshold: int,
+        time_window: float | None = None,
+        include_undated: bool = True,
+        recommendations: dict | None = None,
+        orientation: str = 'off',
+    ) -> 'IncrementalGrouper':
+        """
+        接管一次完整扫描的结果（邻接图、分组、推荐），沿用已有的分组 id。
+
+        Args:
+            graph: 扫描时构建的邻接图
+            groups: graph.groups(threshold) 的结果
+            threshold: 当前分组阈值
+            time_window / include_undated / orientation: 与构建邻接图时相同，新照片按同样的规则比较
+            recommendations: recommend_all 的结果（可选，缺省时重新生成）
+        """
+        grouper = cls(graph.table, threshold, graph.max_threshold, time_window, include_undated, orientation)
+        if graph.cascade is not None:
+            grouper.cascade = dict(graph.cascade)
+        nodes = graph.nodes.tolist()
+        for i, j, d in zip(graph.edges_i.tolist(), graph.edges_j.tolist(), graph.edges_d.tolist()):
+            grouper._link(nodes[i], nodes[j], d)
+        for group in groups:
+            members = group.ids.tolist()
+            grouper._members[group.group_id] = set(members)
+            grouper._group_of.update(dict.fromkeys(members, group.group_id))
+            grouper._groups[group.group_id] = group
+        grouper._next_id = max(grouper._members, default=-1) + 1
+        if recommendations is not None:
+            grouper._recommendations = {r['group_id']: r for r in recommendations['recommendations']}
+        else:
+            grouper._refresh({'created': sorted(grouper._members), 'updated': [], 'removed': []})
+        return grouper
+
+    @classmethod
+    def from_table(
+        cls,
+        table: PhotoTable,
+        threshold: int = DEFAULT_SIMILARITY_THRESHOLD,
+        max_threshold: int | None = None,
+        time_window: float | None = None,
+        include_undated: bool = True,
+        orientation: str = 'off',
+    ) -> 'IncrementalGrouper':
+        """对照片表做一次完整分组，作为之后增量更新的起点"""
+        max_threshold = max(threshold, max_threshold or threshold)
+        if time_window:
+            graph = build_neighbor_graph_windowed(table, time_window, max_threshold, include_undated, orientation)
+        else:
+            graph = build_neighbor_graph(table, max_threshold, orientation)
+        return cls.from_graph(
+            graph, graph.groups(threshold), threshold, time_window, include_undated, orientation=orientation,
+        )
+
+    # ─── 增量操作 ───────────────────────────────────────
+
+    def insert(self, new_table: PhotoTable) -> dict:
+        """
+        追加一批拍摄单元并更新分组。
+
+        与已有单元路径相同的单元视为修改：先移除旧单元再插入。
+
+        Returns:
+            {'created': [...], 'updated': [...], 'removed': [...]}
+        """
+        return self.apply(remove_ids=(), new_table=new_table)
+
+    def remove(self, ids: Iterable[int]) -> dict:
+        """
+        移除一批拍摄单元（照片表中标记为已移除）并更新分组。
+
+        Returns:
+            {'created': [...], 'updated': [...], 'removed': [...]}
+        """
+        return self.apply(remove_ids=ids)
+
+    def apply(self, remove_ids: Iterable[int] = (), new_table: PhotoTable | None = None) -> dict:
+        """
+        先移除再插入（一轮文件变化通常两者都有），合并报告变化的分组。
+
+        Returns:
+            {'created': [...], 'updated': [...], 'removed': [...]}，分组 id 升序
+        """
+        created: set[int] = set()
+        updated: set[int] = set()
+        removed: set[int] = set()
+
+        remove_ids = set(remove_ids)
+        if new_table is not None:
+            # 同路径的旧单元（文件被修改、RAW+JPEG 重新配对）先移除
+            aliases = [p for extra in new_table.aliases.values() for p in extra]
+            for path in new_table.all_paths() + aliases:
+                i = self.table.id_of(path)
+                if i is not None:
+                    remove_ids.add(i)
+        if remove_ids:
+            self._remove(remove_ids, created, updated, removed)
+        if new_table is not None and len(new_table):
+            self._insert(self.table.append(new_table), created, updated, removed)
+
+        # 新建后又被合并掉的分组不必报告；新建的分组不再重复报告为变化
+        gone = created & removed
+        changes = {
+            'created': sorted(created - gone),
+            'updated': sorted(updated - created - removed),
+            'removed': sorted(removed - gone),
+        }
+        self._refresh(changes)
+        return changes
+
+    def _insert(self, ids: np.ndarray, created: set, updated: set, removed: set):
+        table = self.table
+        candidates = self._candidates()
+        new = np.intersect1d(ids, candidates, assume_unique=True)
+        if not len(new):
+            return
+        qi, j, dist = self._pairs(new, table.packed[new], candidates, table.packed[candidates])
+        u, v = new[qi], candidates[j]
+        keep = u != v
+        found = u[keep], v[keep], dist[keep]
+        oriented = None
+        if self.orientation != 'off':
+            new_owner, new_hash, new_pose = orientation_entries(table, new)
+            cand_owner, cand_hash, cand_pose = orientation_entries(table, candidates)
+            qi, j, d = self._pairs(new[new_owner], new_hash, candidates[cand_owner], cand_hash)
+            u, v = new[new_owner[qi]], candidates[cand_owner[j]]
+            keep = (u != v) & compatible(new_pose[qi], cand_pose[j], self.orientation)
+            oriented = u[keep], v[keep], d[keep], new_pose[qi[keep]], cand_pose[j[keep]]
+        u, v, dist = self._verify(found, oriented)
+        u, v, dist = u.tolist(), v.tolist(), dist.tolist()
+
+        for a, b, d in zip(u, v, dist):
+            self._link(a, b, d)
+        for a, b, d in zip(u, v, dist):
+            if d <= self.threshold:
+                self._union(a, b, created, updated, removed)
+
+    def _verify(
+        self,
+        found: tuple[np.ndarray, np.ndarray, np.ndarray],
+        oriented: tuple[np.ndarray, ...] | None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        第二级：用签名核验候选对（与 grouper._verify 相同，端点为单元 id）。
+
+        新照片彼此之间的对会按两个方向各找到一次，合并后只计一次。关闭两级匹配时候选对原样保留。
+
+        Returns:
+            通过核验的 (u, v, dist)，u < v
+        """
+        if not CASCADE_VERIFICATION:
+            u, v, dist = merge_edges(found) if oriented is None else merge_edges(found, oriented[:3])
+            self.cascade['candidates'] += len(dist)
+            self.cascade['verified'] += len(dist)
+            return u, v, dist
+
+        keep = verify_edges(self.table, found[0], found[1])
+        parts = [(found[0][keep], found[1][keep], found[2][keep])]
+        candidates = [found]
+        if oriented is not None:
+            u, v, d, pose_u, pose_v = oriented
+            keep = verify_edges(self.table, u, v, pose_u, pose_v)
+            parts.append((u[keep], v[keep], d[keep]))
+            candidates.append((u, v, d))
+        self.cascade['candidates'] += len(merge_edges(*candidates)[0])
+        u, v, dist = merge_edges(*parts)
+        self.cascade['verified'] += len(dist)
+        return u, v, dist
+
+    def _pairs(
+        self, new: np.ndarray, new_hash: np.ndarray, candidates: np.ndarray, cand_hash: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        新照片的哈希与候选照片的哈希之间距离 ≤ max_threshold 的对（第一级，比较次数记入 cascade）。
+
+        new / candidates 为每个哈希所属的单元 id（规范哈希条目时同一单元可能出现多次）。
+
+        Returns:
+            (qi, j, dist)：qi 为 new 的下标，j 为 candidates 的下标
+        """
+        if self.time_window:
+            qi, j, dist, compared = self._window_pairs(new, new_hash, candidates, cand_hash)
+        else:
+            qi, j, dist = pairs_between(new_hash, cand_hash, self.max_threshold)
+            compared = len(new_hash) * len(cand_hash)
+        # 新照片的条目也都在候选中：新条目之间的对比较了两次、与自身比较了一次，
+        # 只计不同的对，与 build_neighbor_graph 的计数一致：Q·(N−Q) + Q·(Q−1)/2
+        q = len(new_hash)
+        self.cascade['compared'] += compared - q - q * (q - 1) // 2
+        return qi, j, dist
+
+    def _window_pairs(
+        self, new: np.ndarray, new_hash: np.ndarray, candidates: np.ndarray, cand_hash: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        时间窗口模式下新照片的边：有拍摄时间的只与时间窗口内的照片及无时间的照片比较，
+        无拍摄时间的与所有照片比较（与 build_neighbor_graph_windowed 的规则一致）。
+
+        Returns:
+            (qi, j, dist, 比较的次数)：次数包括新条目之间重复的对和与自身的比较，由 _pairs 扣除
+        """
+        table = self.table
+        ts = table.timestamp[candidates]
+        dated = ~np.isnan(ts)
+        dated_pos = np.flatnonzero(dated)[np.argsort(ts[dated], kind='stable')]
+        dated_ts = ts[dated_pos]
+        undated_pos = np.flatnonzero(~dated)
+
+        new_ts = table.timestamp[new]
+        new_dated, new_undated = np.flatnonzero(~np.isnan(new_ts)), np.flatnonzero(np.isnan(new_ts))
+        found = []
+        compared = 0
+        if len(new_undated):
+            compared += len(new_undated) * len(cand_hash)
+            qi, j, d = pairs_between(new_hash[new_undated], cand_hash, self.max_threshold)
+            found.append((new_undated[qi], j, d))
+        if len(new_dated):
+            t = new_ts[new_dated]
+            lo = np.searchsorted(dated_ts, t - self.time_window, side='left')
+            hi = np.searchsorted(dated_ts, t + self.time_window, side='right')
+            nearby = np.unique(np.concatenate(
+                [dated_pos[a:b] for a, b in zip(lo.tolist(), hi.tolist())] + [undated_pos]
+            ))
+            compared += len(new_dated) * len(nearby)
+            qi, j, d = pairs_between(new_hash[new_dated], cand_hash[nearby], self.max_threshold)
+            qi, j = new_dated[qi], nearby[j]
+            u, v = new[qi], candidates[j]
+            ts_u, ts_v = table.timestamp[u], table.timestamp[v]
+            in_window = (table.camera_id[u] == table.camera_id[v]) & (np.abs(ts_u - ts_v) <= self.time_window)
+            keep = in_window | np.isnan(ts_v)
+            found.append((qi[keep], j[keep], d[keep]))
+        if not found:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.uint8), compared
+        return (*(np.concatenate(parts) for parts in zip(*found)), compared)
+
+    def _remove(self, ids: set[int], created: set, updated: set, removed: set):
+        self.table.remove(ids)
+        affected = set()
+        for u in ids:
+            for v in self._edges.pop(u, {}):
+                self._edges[v].pop(u, None)
+            g = self._group_of.pop(u, None)
+            if g is not None:
+                self._members[g].discard(u)
+                affected.add(g)
+        for g in affected:
+            self._split(g, created, updated, removed)
+
+    def _link(self, u: int, v: int, d: int):
+        self._edges.setdefault(u, {})[v] = d
+        self._edges.setdefault(v, {})[u] = d
+
+    def _new_group(self, members: set[int]) -> int:
+        gid = self._next_id
+        self._next_id += 1
+        self._members[gid] = members
+        self._group_of.update(dict.fromkeys(members, gid))
+        return gid
+
+    def _union(self, u: int, v: int, created: set, updated: set, removed: set):
+        """阈值内的一条新边：合并两端所在的分组（保留较早的分组 id）"""
+        gu, gv = self._group_of.get(u), self._group_of.get(v)
+        if gu is None and gv is None:
+            created.add(self._new_group({u, v}))
+        elif gu is None or gv is None:
+            g, other = (gv, u) if gu is None else (gu, v)
+            self._members[g].add(other)
+            self._group_of[other] = g
+            updated.add(g)
+        elif gu != gv:
+            keep, drop = min(gu, gv), max(gu, gv)
+            moved = self._members.pop(drop)
+            self._members[keep] |= moved
+            self._group_of.update(dict.fromkeys(moved, keep))
+            updated.add(keep)
+            removed.add(drop)
+
+    def _split(self, g: int, created: set, updated: set, removed: set):
+        """成员被移除后重新求分组 g 的连通分量"""
+        members = self._members.pop(g)
+        comps = []
+        unvisited = set(members)
+        while unvisited:
+            start = unvisited.pop()
+            comp, stack = [start], [start]
+            while stack:
+                for w, d in self._edges.get(stack.pop(), {}).items():
+                    if d <= self.threshold and w in unvisited:
+                        unvisited.discard(w)
+                        comp.append(w)
+                        stack.append(w)
+            comps.append(comp)
+
+        for comp in comps:
+            if len(comp) < 2:
+                self._group_of.pop(comp[0], None)
+        comps = sorted((c for c in comps if len(c) >= 2), key=lambda c: (-len(c), min(c)))
+        if not comps:
+            removed.add(g)
+            return
+        # 最大的分量沿用原 id，其余为新分组
+        self._members[g] = set(comps[0])
+        self._group_of.update(dict.fromkeys(comps[0], g))
+        updated.add(g)
+        for comp in comps[1:]:
+            created.add(self._new_group(set(comp)))
+
+    def _candidates(self) -> np.ndarray:
+        """参与分组的单元 id：有哈希、未移除（时间窗口模式下可能不含无 EXIF 时间的照片）"""
+        ids = self.table.hashed_ids()
+        if self.time_window and not self.include_undated:
+            ids = ids[~np.isnan(self.table.timestamp[ids])]
+        return ids
+
+    def _refresh(self, changes: dict):
+        """重新生成变化分组的 PhotoGroup 和推荐"""
+        from backend.core.recommender import recommend_all
+
+        for g in changes['removed']:
+            self._groups.pop(g, None)
+            self._recommendations.pop(g, None)
+        changed = changes['created'] + changes['updated']
+        if not changed:
+            return
+        table = self.table
+        groups = []
+        for g in changed:
+            ids = np.fromiter(self._members[g], dtype=np.int64, count=len(self._members[g]))
+            paths = table.paths(ids)
+            order = sorted(range(len(ids)), key=paths.__getitem__)  # 与批量分组一样按路径排序
+            groups.append(PhotoGroup(group_id=g, table=table, ids=ids[order]))
+        self._groups.update((group.group_id, group) for group in groups)
+        for rec in recommend_all(groups)['recommendations']:
+            self._recommendations[rec['group_id']] = rec
+
+    # ─── 结果 ───────────────────────────────────────────
+
+    def groups(self, ids: Iterable[int] | None = None) -> list[PhotoGroup]:
+        """分组列表（按照片数量从大到小，同样大小按分组 id），ids 给出时只返回这些分组"""
+        if ids is not None:
+            return [self._groups[g] for g in ids if g in self._groups]
+        return sorted(self._groups.values(), key=lambda group: (-group.count, group.group_id))
+
+    def recommendations(self) -> dict:
+        """与 recommend_all 相同结构的推荐结果（按 groups() 的顺序）"""
+        recs = [self._recommendations[group.group_id] for group in self.groups()]
+        keep = sum(r['keep_count'] for r in recs)
+        delete = sum(r['delete_count'] for r in recs)
+        save = sum(r['save_bytes'] for r in recs)
+        return {
+            'recommendations': recs,
+            'summary': {
+                'total_groups': len(recs),
+                'total_photos': keep + delete,
+                'keep_count': keep,
+                'delete_count': delete,
+                'save_bytes': save,
+                'save_gb': round(save / (1024 ** 3), 2),
+            },
+        }
+
+    def recommendation(self, group_id: int) -> dict | None:
+        return self._recommendations.get(group_id)
+
+    def to_graph(self) -> NeighborGraph:
+        """当前状态的邻接图（阈值预览、重新分组、导出快照使用）"""
+        nodes = self._candidates()
+        edges_i, edges_j, edges_d = [], [], []
+        for u, neighbors in self._edges.items():
+            for v, d in neighbors.items():
+                if u < v:
+                    edges_i.append(u)
+                    edges_j.append(v)
+                    edges_d.append(d)
+        return NeighborGraph(
+            self.table,
+            nodes,
+            np.searchsorted(nodes, np.array(edges_i, dtype=np.int64)).astype(np.int32),
+            np.searchsorted(nodes, np.array(edges_j, dtype=np.int64)).astype(np.int32),
+            np.array(edges_d, dtype=np.uint8),
+            self.max_threshold,
+            dict(self.cascade),
+        )
+
+
+def related_units(table: PhotoTable, paths: Iterable[str]) -> set[int]:
+    """
+    与这些文件属于同一次拍摄（同目录、同文件名主干的 RAW/JPEG）的已有单元 id。
+
+    新增 DSC_1234.JPG 时，已有的 DSC_1234.NEF 单元需要与它重新配对。
+    """
+    pairable = RAW_EXTENSIONS | set(CAPTURE_SIBLING_EXTENSIONS)
+    listing: dict[str, list[str]] = {}
+    ids = set()
+    for path in paths:
+        stem, ext = os.path.splitext(path)
+        if ext.lower() not in pairable:
+            continue
+        directory = os.path.dirname(path)
+        if directory not in listing:
+            try:
+                listing[directory] = os.listdir(directory)
+            except OSError:
+                listing[directory] = []
+        base = os.path.basename(stem).lower()
+        for fname in listing[directory]:
+            name_stem, name_ext = os.path.splitext(fname)
+            if name_stem.lower() == base and name_ext.lower() in pairable:
+                i = table.id_of(os.path.join(directory, fname))
+                if i is not None:
+                    ids.add(i)
+    return ids
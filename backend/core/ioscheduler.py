@@ -0,0 +1,316 @@
+"""
+I/O 调度器 — 按文件所在的存储设备安排读取的并发数、顺序和预读。
+
+同一个固定的线程数并不适合所有存储：机械硬盘上并行的随机读会让磁头来回寻道，
+网络存储（SMB/NFS）受往返延迟限制，需要更多请求同时在途。调度器：
+
+- 按 st_dev 把文件分到各自的设备队列，每个设备有独立的一组工作线程，并发数按设备类型
+  （ssd / hdd / network / unknown，见 IO_CONCURRENCY）或 PHOTODEDUP_IO_CONCURRENCY 覆盖；
+- 设备类型在 Linux 上由 /proc/self/mountinfo（网络文件系统）和 /sys/dev/block/*/queue/rotational
+  判断，macOS 上由 mount 的输出判断网络卷，无法判断时为 unknown；
+- 队列按 (目录, inode) 排序，相邻读取落在磁盘上相近的位置；
+- 处理第 i 个文件时用 posix_fadvise(WILLNEED) 提示内核预读之后第 i + lookahead 个文件的开头部分，
+  解码当前文件时下一个文件已经在页缓存中（没有 posix_fadvise 的平台跳过）。
+"""
+
+import os
+import queue
+import subprocess
+import sys
+import threading
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+
+from backend.config import IO_CONCURRENCY, IO_CONCURRENCY_OVERRIDES, IO_READAHEAD_BYTES, IO_LOOKAHEAD
+from backend.core.autotune import ConcurrencyLimit
+
+if TYPE_CHECKING:
+    from backend.core.autotune import StageTuner
+
+SSD = 'ssd'
+HDD = 'hdd'
+NETWORK = 'network'
+UNKNOWN = 'unknown'
+
+NETWORK_FILESYSTEMS = {
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afpfs', 'webdav', 'davfs', '9p',
+    'sshfs', 'fuse.sshfs', 'fuse.rclone', 'ceph', 'glusterfs', 'fuse.glusterfs', 'lustre',
+}
+
+
+# ─── 设备识别 ───────────────────────────────────────────
+
+def _mount_table() -> dict[int, tuple[str, str]]:
+    """st_dev → (文件系统类型, 挂载点)"""
+    mounts = {}
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/mountinfo', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    # 36 35 98:0 /mnt1 /mnt/parent rw - ext3 /dev/root rw
+                    fields, _, rest = line.partition(' - ')
+                    fields = fields.split()
+                    major, minor = fields[2].split(':')
+                    fstype = rest.split()[0] if rest else ''
+                    mounts[os.makedev(int(major), int(minor))] = (fstype, fields[4].replace('\\040', ' '))
+        except (OSError, ValueError, IndexError):
+            pass
+    elif sys.platform == 'darwin':
+        # //user@nas/share on /Volumes/share (smbfs, nodev, nosuid, mounted by user)
+        try:
+            output = subprocess.run(['mount'], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            output = ''
+        for line in output.splitlines():
+            _, sep, rest = line.partition(' on ')
+            mountpoint, _, options = rest.rpartition(' (')
+            if not sep or not mountpoint:
+                continue
+            try:
+                mounts[os.stat(mountpoint).st_dev] = (options.split(',')[0].strip(' )'), mountpoint)
+            except OSError:
+                continue
+    return mounts
+
+
+def _rotational(dev: int) -> bool | None:
+    """块设备是否为机械硬盘（Linux sysfs；分区看所在磁盘），无法判断返回 None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    base = os.path.realpath(f'/sys/dev/block/{os.major(dev)}:{os.minor(dev)}')
+    for candidate in (os.path.join(base, 'queue', 'rotational'), os.path.join(base, '..', 'queue', 'rotational')):
+        try:
+            with open(candidate) as f:
+                return f.read().strip() == '1'
+        except OSError:
+            continue
+    return None
+
+
+def device_kind(dev: int, mounts: dict[int, tuple[str, str]]) -> str:
+    """设备类型：network / hdd / ssd / unknown"""
+    fstype = mounts.get(dev, ('', ''))[0]
+    if fstype in NETWORK_FILESYSTEMS:
+        return NETWORK
+    rotational = _rotational(dev)
+    if rotational is None:
+        return UNKNOWN
+    return HDD if rotational else SSD
+
+
+def parse_overrides(text: str) -> tuple[dict[str, int], dict[str, int]]:
+    """
+    解析并发数覆盖 "hdd=1,network=32,/Volumes/NAS=8"。
+
+    Returns:
+        (按设备类型, 按路径)
+    """
+    kinds, paths = {}, {}
+    for item in text.split(','):
+        key, sep, value = item.strip().rpartition('=')
+        if not sep or not key:
+            continue
+        try:
+            limit = max(1, int(value))
+        except ValueError:
+            continue
+        (paths if os.sep in key or key.startswith('~') else kinds)[os.path.expanduser(key)] = limit
+    return kinds, paths
+
+
+# ─── 设备队列 ───────────────────────────────────────────
+
+class DeviceQueue:
+    """一个设备上待读取的文件（已排序）及其并发数"""
+
+    def __init__(self, dev: int, kind: str, limit: int, mountpoint: str, paths: list[str]):
+        self.dev = dev
+        self.kind = kind
+        self.limit = limit
+        self.mountpoint = mountpoint
+        self.paths = paths
+        self.slots = ConcurrencyLimit(limit)  # 自适应并发时按比例缩小，不超过 limit
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> int | None:
+        """下一个待处理文件的下标，处理完时返回 None"""
+        with self._lock:
+            if self._next >= len(self.paths):
+                return None
+            self._next += 1
+            return self._next - 1
+
+    def to_dict(self) -> dict:
+        return {
+            'dev': self.dev,
+            'kind': self.kind,
+            'mountpoint': self.mountpoint,
+            'concurrency': self.limit,
+            'tuned_concurrency': self.slots.value,
+            'files': len(self.paths),
+        }
+
+
+class IOScheduler:
+    """
+    按设备调度文件读取。map() 把函数应用到每个文件，按完成顺序返回结果；
+    最近一次的设备划分保存在 plan 中（写入扫描指标）。
+    """
+
+    def __init__(
+        self,
+        concurrency: dict[str, int] | None = None,
+        overrides: str = IO_CONCURRENCY_OVERRIDES,
+        readahead: int = IO_READAHEAD_BYTES,
+        lookahead: int = IO_LOOKAHEAD,
+    ):
+        """
+        Args:
+            concurrency: 按设备类型的并发数（缺省项取 IO_CONCURRENCY）
+            overrides: 覆盖字符串（见 parse_overrides），默认取环境变量 PHOTODEDUP_IO_CONCURRENCY
+            readahead: 每个文件提示预读的字节数，0 不提示
+            lookahead: 提前提示的文件数 = 并发数 × lookahead
+        """
+        kinds, paths = parse_overrides(overrides)
+        self.concurrency = {**IO_CONCURRENCY, **(concurrency or {}), **kinds}
+        self.readahead = readahead if hasattr(os, 'posix_fadvise') else 0
+        self.lookahead = max(1, lookahead)
+        self.plan: list[DeviceQueue] = []
+        self._mounts: dict[int, tuple[str, str]] | None = None
+        self._path_limits: dict[int, int] = {}
+        for path, limit in paths.items():
+            try:
+                self._path_limits[os.stat(path).st_dev] = limit
+            except OSError:
+                continue
+
+    def queues(self, paths: Iterable[str], file_ids: Iterable[tuple[int, int]] | None = None) -> list[DeviceQueue]:
+        """
+        按设备分组并排序。
+
+        Args:
+            paths: 文件路径
+            file_ids: 与 paths 对应的 (st_dev, st_ino)（扫描时已得到，省去逐个 stat）
+        """
+        paths = list(paths)
+        if file_ids is None:
+            file_ids = []
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                    file_ids.append((st.st_dev, st.st_ino))
+                except OSError:
+                    file_ids.append((0, 0))  # 读取时由处理函数报告错误
+        if self._mounts is None:
+            self._mounts = _mount_table()
+
+        by_dev: dict[int, list[tuple[str, int, str]]] = {}
+        for path, (dev, ino) in zip(paths, file_ids):
+            by_dev.setdefault(dev, []).append((os.path.dirname(path), ino, path))
+
+        result = []
+        for dev, items in by_dev.items():
+            items.sort()
+            kind = device_kind(dev, self._mounts)
+            limit = self._path_limits.get(dev) or self.concurrency.get(kind) or self.concurrency[UNKNOWN]
+            mountpoint = self._mounts.get(dev, ('', ''))[1]
+            result.append(DeviceQueue(dev, kind, max(1, limit), mountpoint, [p for _, _, p in items]))
+        return result
+
+    def _prefetch(self, path: str, length: int):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def map(
+        self,
+        func: Callable[[str], object],
+        paths: Iterable[str],
+        file_ids: Iterable[tuple[int, int]] | None = None,
+        readahead: int | None = None,
+        prefetch_if: Callable[[str], bool] | None = None,
+        tuner: 'StageTuner | None' = None,
+    ) -> Iterator[tuple[str, object]]:
+        """
+        对每个文件调用 func，按完成顺序产出 (路径, 结果)。
+
+        每个设备启动 min(并发数, 文件数) 个线程按队列顺序取文件；func 抛出的异常在产出处重新抛出，
+        此时（或调用方提前结束迭代时）其余线程不再取新文件。
+
+        Args:
+            func: 处理单个文件的函数（在工作线程中执行）
+            paths: 文件路径
+            file_ids: 与 paths 对应的 (st_dev, st_ino)，可省略
+            readahead: 本次提示预读的字节数（默认取构造参数，只读文件头时可传 0）
+            prefetch_if: 只对返回 True 的文件提示预读（如缩略图已缓存、不会读取原文件的跳过）
+            tuner: 自适应并发控制器（可选）。给出时控制器的线程数以各设备并发数之和为起点和上限，
+                每个设备同时处理的文件数按控制器当前线程数的比例缩放（见 StageTuner.scale），
+                不超过该设备自己的并发数：慢的网络盘不会占用其他设备的份额
+        """
+        readahead = self.readahead if readahead is None else min(readahead, self.readahead)
+        self.plan = self.queues(paths, file_ids)
+        total = sum(len(q.paths) for q in self.plan)
+        results: queue.Queue = queue.Queue()
+        stop = threading.Event()
+
+        def prefetch(q: DeviceQueue, i: int):
+            if readahead and i < len(q.paths) and (prefetch_if is None or prefetch_if(q.paths[i])):
+                self._prefetch(q.paths[i], readahead)
+
+        def worker(q: DeviceQueue, lookahead: int):
+            while not stop.is_set():
+                i = q.take()
+                if i is None:
+                    return
+                if i == 0:
+                    for j in range(1, lookahead):
+                        prefetch(q, j)
+                prefetch(q, i + lookahead)
+                path = q.paths[i]
+                try:
+                    if tuner is None:
+                        results.put((path, func(path), None))
+                    else:
+                        q.slots.set(tuner.scale(q.limit, base))
+                        with q.slots.slot():
+                            value = func(path)
+                        tuner.count()
+                        results.put((path, value, None))
+                except BaseException as e:
+                    results.put((path, None, e))
+
+        base = sum(min(q.limit, len(q.paths)) for q in self.plan)
+        if tuner is not None:
+            tuner.start(base, ceiling=base)
+        threads = []
+        for q in self.plan:
+            for n in range(min(q.limit, len(q.paths))):
+                thread = threading.Thread(
+                    target=worker, args=(q, q.limit * self.lookahead),
+                    name=f'photodedup-io-{q.kind}-{n}', daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+        try:
+            for _ in range(total):
+                path, value, error = results.get()
+                if error is not None:
+                    raise error
+                yield path, value
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if tuner is not None:
+                tuner.stop()
+
+    def plan_summary(self) -> list[dict]:
+        """最近一次 map 的设备划分"""
+        return [q.to_dict() for q in self.plan]
@@ -0,0 +1,193 @@
+"""
+扫描指标 — 记录每个阶段的耗时、CPU 时间、吞吐量、读取字节数、缓存命中率
+以及单文件延迟分布（p50/p95/p99、最慢文件）。
+
+各批处理函数接受可选的 StageMetrics 参数，由调用方（routes._run_scan）
+通过 ScanMetrics.stage() 创建并计时；不传时没有任何额外开销。
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+
+# 延迟直方图的桶上界（毫秒），最后一个桶为 +inf
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# 每个阶段保留的最慢文件数
+SLOWEST_FILES = 10
+
+
+def _io_read_bytes() -> int | None:
+    """进程累计读取字节数（Linux /proc/self/io 的 rchar），其他平台返回 None"""
+    try:
+        with open('/proc/self/io', 'rb') as f:
+            for line in f:
+                if line.startswith(b'rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class StageMetrics:
+    """单个阶段的指标"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.items = 0
+        self.bytes_read = 0          # 交给解码器/哈希的文件字节数（调用方累计）
+        self.io_read_bytes = None    # 操作系统统计的实际读取字节数（仅 Linux）
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.failures = 0
+        self.devices: list[dict] | None = None  # I/O 调度器的设备划分（读取源文件的阶段）
+        self.running = False
+        self._running_since = 0.0
+        self._latencies = array('d')
+        self._slowest: list[tuple[float, str]] = []  # 最小堆，保留最慢的 SLOWEST_FILES 个
+        self._lock = threading.Lock()
+
+    def record_file(
+        self,
+        path: str,
+        seconds: float,
+        bytes_read: int = 0,
+        cache_hit: bool | None = None,
+        ok: bool = True,
+    ):
+        """记录单个文件的处理结果（线程安全）"""
+        with self._lock:
+            self.items += 1
+            self.bytes_read += bytes_read
+            if cache_hit is True:
+                self.cache_hits += 1
+            elif cache_hit is False:
+                self.cache_misses += 1
+            if not ok:
+                self.failures += 1
+            self._latencies.append(seconds)
+            if len(self._slowest) < SLOWEST_FILES:
+                heapq.heappush(self._slowest, (seconds, path))
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, (seconds, path))
+
+    def latency_summary(self) -> dict | None:
+        """单文件延迟统计，没有逐文件记录时返回 None"""
+        with self._lock:
+            values = sorted(self._latencies)
+            slowest = sorted(self._slowest, reverse=True)
+        if not values:
+            return None
+
+        def pct(p: float) -> float:
+            return values[min(len(values) - 1, int(p * len(values)))] * 1000
+
+        histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        bucket = 0
+        for v in values:
+            ms = v * 1000
+            while bucket < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[bucket]:
+                bucket += 1
+            histogram[bucket] += 1
+
+        return {
+            'p50_ms': round(pct(0.50), 3),
+            'p95_ms': round(pct(0.95), 3),
+            'p99_ms': round(pct(0.99), 3),
+            'max_ms': round(values[-1] * 1000, 3),
+            'mean_ms': round(sum(values) / len(values) * 1000, 3),
+            'histogram': {
+                'bounds_ms': list(LATENCY_BUCKETS_MS),
+                'counts': histogram,
+            },
+            'slowest': [{'path': p, 'ms': round(s * 1000, 3)} for s, p in slowest],
+        }
+
+    def to_dict(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        wall = self.wall_seconds
+        if self.running:
+            wall += time.perf_counter() - self._running_since  # 进行中的阶段显示已用时间
+        return {
+            'name': self.name,
+            'running': self.running,
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            'items': self.items,
+            'items_per_second': round(self.items / wall, 1) if wall else None,
+            'bytes_read': self.bytes_read,
+            'io_read_bytes': self.io_read_bytes,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_hit_rate': round(self.cache_hits / lookups, 4) if lookups else None,
+            'failures': self.failures,
+            'devices': self.devices,
+            'latency': self.latency_summary(),
+        }
+
+
+class ScanMetrics:
+    """一次扫描的全部阶段指标"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self.stages: dict[str, StageMetrics] = {}
+        self.info: dict = {}  # 附加信息（目录、阈值、照片数等）
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        计时一个阶段，yield 该阶段的 StageMetrics 供批处理函数记录逐文件数据。
+
+        CPU 时间为整个进程的 process_time，包含工作线程。
+        """
+        metrics = self.stages.get(name) or StageMetrics(name)
+        self.stages[name] = metrics
+        wall0, cpu0, io0 = time.perf_counter(), time.process_time(), _io_read_bytes()
+        metrics.running = True
+        metrics._running_since = wall0
+        try:
+            yield metrics
+        finally:
+            metrics.wall_seconds += time.perf_counter() - wall0
+            metrics.cpu_seconds += time.process_time() - cpu0
+            io1 = _io_read_bytes()
+            if io0 is not None and io1 is not None:
+                metrics.io_read_bytes = (metrics.io_read_bytes or 0) + io1 - io0
+            metrics.running = False
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'total_seconds': round(end - self.started_at, 4),
+            'info': self.info,
+            'stages': [s.to_dict() for s in self.stages.values()],
+        }
+
+    @property
+    def report_name(self) -> str:
+        """报告文件名（不含扩展名），同一扫描的其他产物（如剖析文件）也以此命名"""
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        millis = int(self.started_at * 1000) % 1000
+        return f"scan-{stamp}-{millis:03d}-{os.getpid()}"
+
+    def write_report(self, directory: Path) -> Path:
+        """写入 JSON 报告，返回报告路径"""
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.report_name}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
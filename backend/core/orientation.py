@@ -0,0 +1,188 @@
+"""
+方向无关匹配 — 找出旋转、翻转过的同一张照片，不重新解码图片。
+
+机内按 EXIF Orientation 标记旋转的照片与导出时旋转了像素的副本、镜像翻转的副本，
+pHash 完全不同，按原方向比较永远分不到一组。把每张照片按 8 种方向各算一次哈希代价是 8 倍。
+
+pHash 取 32×32 灰度图 DCT-II 的 8×8 低频系数，而 DCT-II 对正方形图像的 8 种二面体变换
+（旋转 0/90/180/270°，以及各自的镜像）有简单的对应关系：
+
+- 水平翻转：系数 (u, v) 乘以 (-1)^v；垂直翻转：乘以 (-1)^u；
+- 转置（沿主对角线翻转）：系数矩阵转置。
+
+因此所有方向的哈希都可以由计算 pHash 时的同一块系数直接得到。进一步，选出一个与方向无关的
+规范姿态：转置使 |C[0,1]| ≥ |C[1,0]|，再翻转使 C[0,1]、C[1,0] 都不为负。同一张照片无论怎样
+旋转、翻转，规范姿态的系数都相同，因此每张照片只需再存一个规范哈希，分组时多比较一遍即可，
+代价是常数倍而不是 8 倍。
+
+判定所依据的系数接近 0（或两者幅度接近）时，轻微的压缩、缩放差异就可能让两份副本选出不同的
+姿态；这样的判定两种结果都保留（备选规范哈希，通常不到一成的照片有）。
+
+姿态编号 k = 4·t + 2·fv + fh：依次做转置（t）、水平翻转（fh）、垂直翻转（fv）。
+照片表中记录的姿态是从显示方向（已按 EXIF Orientation 旋转）到规范姿态的变换：
+两张照片的规范哈希相近且姿态相同，说明它们显示出来是同一方向；姿态不同则是旋转/翻转过的副本。
+"""
+
+import numpy as np
+
+from backend.config import ORIENTATION_MARGIN
+
+# 匹配模式（config.ORIENTATION_MODES，在 config 中校验环境变量）：off 只按原方向比较；
+# exif 另外匹配显示方向相同（按 EXIF Orientation 旋转后）的副本；any 匹配任意旋转/翻转的副本
+
+POSE_UNKNOWN = 255  # 照片表中未计算规范哈希（早期快照、没有哈希）的姿态
+
+Variant = tuple[int, int]  # (规范哈希, 姿态)
+
+
+def _apply(pixels: np.ndarray, k: int) -> np.ndarray:
+    """对像素数组做姿态 k 的变换"""
+    if k & 4:
+        pixels = pixels.T
+    if k & 1:
+        pixels = pixels[:, ::-1]
+    if k & 2:
+        pixels = pixels[::-1, :]
+    return pixels
+
+
+def _compose_table() -> tuple[np.ndarray, np.ndarray]:
+    """COMPOSE[a, b] = 先做 a 再做 b 的姿态；INVERSE[a] = a 的逆（在 2×2 非对称阵列上枚举）"""
+    probe = np.arange(4).reshape(2, 2)
+    index = {_apply(probe, k).tobytes(): k for k in range(8)}
+    compose = np.array([[index[_apply(_apply(probe, a), b).tobytes()] for b in range(8)] for a in range(8)])
+    inverse = np.array([int(np.flatnonzero(compose[a] == 0)[0]) for a in range(8)])
+    return compose, inverse
+
+
+COMPOSE, INVERSE = _compose_table()
+
+# EXIF Orientation（1..8）→ 从存储的像素到显示方向的姿态
+EXIF_POSES = {1: 0, 2: 1, 3: 3, 4: 2, 5: 4, 6: 5, 7: 7, 8: 6}
+
+
+def dct_block(gray, hash_size: int = 8) -> np.ndarray:
+    """
+    pHash 使用的低频 DCT 系数（与 imagehash.phash 完全相同的缩放和变换）。
+
+    Args:
+        gray: 灰度 PIL 图像
+
+    Returns:
+        hash_size × hash_size 的 float64 系数矩阵，行为垂直频率 u，列为水平频率 v
+    """
+    import scipy.fftpack  # 延迟导入：与 imagehash.phash 相同
+    from PIL import Image
+
+    img_size = hash_size * 4
+    pixels = np.asarray(gray.resize((img_size, img_size), Image.Resampling.LANCZOS))
+    dct = scipy.fftpack.dct(scipy.fftpack.dct(pixels, axis=0), axis=1)
+    return dct[:hash_size, :hash_size]
+
+
+def block_bits(block: np.ndarray) -> np.ndarray:
+    """系数矩阵 → pHash 位矩阵（高于中位数为 1）"""
+    return block > np.median(block)
+
+
+def bits_to_int(bits: np.ndarray) -> int:
+    """位矩阵按行优先、高位在前打包为整数（与 imagehash 的十六进制字符串一致）"""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def transform_block(block: np.ndarray, k: int) -> np.ndarray:
+    """图像做姿态 k 的变换后的 DCT 系数（不重新计算 DCT）"""
+    odd = np.arange(block.shape[0]) % 2 == 1
+    if k & 4:
+        block = block.T
+    block = block.copy()
+    if k & 1:
+        block[:, odd] *= -1   # 水平翻转：奇数水平频率变号
+    if k & 2:
+        block[odd, :] *= -1   # 垂直翻转：奇数垂直频率变号
+    return block
+
+
+def canonical_variants(block: np.ndarray, margin: float = ORIENTATION_MARGIN) -> list[Variant]:
+    """
+    规范姿态的哈希。
+
+    依次判定是否转置、是否水平翻转、是否垂直翻转；判定依据与 0（或两个幅度之差）的距离
+    小于 margin × 交流系数均方根时视为不确定，两种结果都保留。
+
+    Args:
+        block: dct_block 的结果（存储方向）
+
+    Returns:
+        [(规范哈希, 从存储方向到规范姿态的姿态)]，第一项为按系数直接判定的结果，之后为备选
+    """
+    ac = block.ravel()[1:]
+    scale = margin * float(np.sqrt(np.mean(ac * ac)))
+    a, b = abs(float(block[0, 1])), abs(float(block[1, 0]))
+    transposes = [4 if b > a else 0]
+    if abs(a - b) < scale:
+        transposes.append(transposes[0] ^ 4)
+
+    variants = []
+    for t in transposes:
+        c01, c10 = (block[1, 0], block[0, 1]) if t else (block[0, 1], block[1, 0])  # 转置后两者对调
+        fh, fv = int(c01 < 0), 2 * int(c10 < 0)
+        flips_h = [fh, fh ^ 1] if abs(c01) < scale else [fh]
+        flips_v = [fv, fv ^ 2] if abs(c10) < scale else [fv]
+        for fh in flips_h:
+            for fv in flips_v:
+                k = t | fh | fv
+                variants.append((bits_to_int(block_bits(transform_block(block, k))), k))
+    return variants
+
+
+def display_variants(variants: list[Variant] | None, exif_orientation: int | None) -> list[Variant] | None:
+    """
+    把姿态从存储方向换算到显示方向（按 EXIF Orientation 旋转后）。
+
+    规范哈希与方向无关，不受影响；姿态 h（存储 → 规范）变为 先做显示 → 存储，再做 h。
+    """
+    if not variants:
+        return variants
+    exif = EXIF_POSES.get(exif_orientation or 1, 0)
+    if exif == 0:
+        return variants
+    undo = INVERSE[exif]
+    return [(h, int(COMPOSE[undo, k])) for h, k in variants]
+
+
+def compatible(pose_a: np.ndarray, pose_b: np.ndarray, mode: str) -> np.ndarray:
+    """规范哈希相近的条目对中，按模式可以匹配的（exif 模式要求显示方向相同）"""
+    if mode == 'exif':
+        return pose_a == pose_b
+    return np.ones(len(pose_a), dtype=bool)
+
+
+def orientation_entries(table, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    一组单元的全部规范哈希条目（主规范哈希 + 备选），按所属单元的顺序排列。
+
+    Args:
+        table: PhotoTable
+        ids: 单元 id
+
+    Returns:
+        (所属单元在 ids 中的下标, uint64 规范哈希, uint8 姿态)；没有规范哈希的单元不产生条目
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    known = np.flatnonzero(table.pose[ids] != POSE_UNKNOWN)
+    owner = [known]
+    hashes = [table.orient[ids[known]]]
+    poses = [table.pose[ids[known]]]
+    if table.orient_alts:
+        position = np.full(len(table), -1, dtype=np.int64)
+        position[ids] = np.arange(len(ids))
+        alt_ids = [i for i, alts in table.orient_alts.items() for _ in alts]
+        alt_pos = position[np.array(alt_ids, dtype=np.int64)]
+        mine = alt_pos >= 0
+        owner.append(alt_pos[mine])
+        hashes.append(np.array([h for alts in table.orient_alts.values() for h, _ in alts], dtype=np.uint64)[mine])
+        poses.append(np.array([k for alts in table.orient_alts.values() for _, k in alts], dtype=np.uint8)[mine])
+    owner = np.concatenate(owner)
+    order = np.argsort(owner, kind='stable')
+    return owner[order], np.concatenate(hashes)[order], np.concatenate(poses)[order]
@@ -0,0 +1,524 @@
+"""
+列式照片表 — 扫描结果的内存表示（struct of arrays）。
+
+每个拍摄单元对应一个整数 id（0..N-1），属性存放在等长的 NumPy 列中：
+所在目录（指向去重的目录表）、文件名（UTF-8 拼接字节 + 偏移）、大小、修改时间、
+拍摄时间戳、打包的 uint64 pHash、标志位、相机型号（指向去重的型号表）、
+画质指标（清晰度、过曝/欠曝比例、噪声，未计算时为 NaN）、方向无关的规范哈希及姿态（见 orientation.py）、
+EXIF Orientation 对应的姿态、两级匹配的核验签名（见 cascade.py）。
+RAW+JPEG 配对文件、别名路径和备选规范哈希很稀疏，按 id 存在字典里。
+
+分组、推荐和 API 都只传递 id 数组，路径字符串在输出时才解码，
+避免同一路径被 PhotoInfo、哈希字典、大小字典、分组字典等多处各持有一份。
+"""
+
+import os
+from array import array
+from typing import Iterable
+
+import numpy as np
+
+from backend.core.cascade import SIGNATURE_WORDS, signature_words
+from backend.core.hashindex import hash_to_int, unpack_hash
+from backend.core.orientation import EXIF_POSES, POSE_UNKNOWN, Variant, display_variants
+
+# 标志位
+FLAG_HAS_HASH = 1    # 缩略图/哈希成功
+FLAG_EDITED = 2      # Lightroom 已编辑（拍摄单元内任一文件有 XMP）
+FLAG_FLAGGED = 4     # 有星标/旗帜/色标
+FLAG_REJECTED = 8    # 标记为排除（pick == -1）
+FLAG_DELETED = 16    # 已从照片库移除（增量更新时保留 id，不再参与分组）
+LIGHTROOM_FLAGS = FLAG_EDITED | FLAG_FLAGGED | FLAG_REJECTED
+
+
+def encode_strings(values: Iterable[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    字符串列表 → (UTF-8 字节, uint64 起始偏移数组，长度 len+1)。
+
+    每个字符串以 NUL 结尾（路径中不会出现 NUL），整列读取时一次 decode + split 即可，
+    偏移数组用于随机访问单个字符串。
+    """
+    blob = bytearray()
+    offsets = array('Q', [0])
+    for v in values:
+        blob += v.encode('utf-8')
+        blob.append(0)
+        offsets.append(len(blob))
+    return np.frombuffer(bytes(blob), dtype=np.uint8), np.frombuffer(offsets, dtype=np.uint64)
+
+
+def decode_strings(blob: np.ndarray, offsets: np.ndarray) -> list[str]:
+    """encode_strings 的逆操作"""
+    if len(offsets) <= 1:
+        return []
+    return blob.tobytes()[:-1].decode('utf-8').split('\0')
+
+
+def quality_tuple(quality: dict | None) -> tuple[float, float, float] | None:
+    """记录字典中的画质指标 {'sharpness', 'clipping', 'noise'} → PhotoTableBuilder.add 使用的元组"""
+    return (quality['sharpness'], quality['clipping'], quality['noise']) if quality else None
+
+
+def orientation_variants(values: list | None) -> list[Variant] | None:
+    """记录字典中的规范哈希 [[十六进制哈希, 姿态], ...] → PhotoTableBuilder.add 使用的列表"""
+    return [(hash_to_int(h), int(k)) for h, k in values] if values else None
+
+
+class PhotoTable:
+    """
+    拍摄单元的列式表。
+
+    由 PhotoTableBuilder 逐条构建，或由快照文件的内存映射列直接构建（见 snapshot.py）。
+    """
+
+    def __init__(
+        self,
+        dirs: list[str],
+        cameras: list[str],
+        dir_id: np.ndarray,
+        name_blob: np.ndarray,
+        name_offsets: np.ndarray,
+        size: np.ndarray,
+        mtime: np.ndarray,
+        timestamp: np.ndarray,
+        packed: np.ndarray,
+        flags: np.ndarray,
+        camera_id: np.ndarray,
+        siblings: dict[int, list[str]] | None = None,
+        aliases: dict[int, list[str]] | None = None,
+        photo_count: int | None = None,
+        sharpness: np.ndarray | None = None,
+        clipping: np.ndarray | None = None,
+        noise: np.ndarray | None = None,
+        orient: np.ndarray | None = None,
+        pose: np.ndarray | None = None,
+        orient_alts: dict[int, list[Variant]] | None = None,
+        exif_pose: np.ndarray | None = None,
+        signature: np.ndarray | None = None,
+    ):
+        self.dirs = dirs                  # 去重的目录表
+        self.cameras = cameras            # 去重的相机型号表
+        self.dir_id = dir_id              # uint32，指向 dirs
+        self.name_blob = name_blob        # 文件名（encode_strings 格式）
+        self.name_offsets = name_offsets
+        self.size = size                  # int64，整个拍摄单元的大小
+        self.mtime = mtime                # float64，代表文件的修改时间
+        self.timestamp = timestamp        # float64，拍摄时间，NaN 为无 EXIF 时间
+        self.packed = packed              # uint64 pHash（无哈希时为 0，见 FLAG_HAS_HASH）
+        self.flags = flags                # uint8 标志位
+        self.camera_id = camera_id        # int32，指向 cameras，-1 为未知
+        # float32 画质指标（见 hasher.image_quality），未计算（早期快照、关闭画质评分）时为 NaN
+        unknown = np.full(len(size), np.nan, dtype=np.float32)
+        self.sharpness = sharpness if sharpness is not None else unknown
+        self.clipping = clipping if clipping is not None else unknown
+        self.noise = noise if noise is not None else unknown
+        # 方向无关的规范哈希与显示方向 → 规范姿态的变换，未计算时姿态为 POSE_UNKNOWN
+        self.orient = orient if orient is not None else np.zeros(len(size), dtype=np.uint64)
+        self.pose = pose if pose is not None else np.full(len(size), POSE_UNKNOWN, dtype=np.uint8)
+        self.orient_alts = orient_alts or {}  # {id: [(备选规范哈希, 姿态), ...]}
+        # uint8 从存储的像素到显示方向的姿态（EXIF Orientation，见 orientation.EXIF_POSES），未知时为 0
+        self.exif_pose = exif_pose if exif_pose is not None else np.zeros(len(size), dtype=np.uint8)
+        # (N, SIGNATURE_WORDS) uint64 核验签名（存储方向），未计算时全为 0
+        self.signature = (
+            signature if signature is not None else np.zeros((len(size), SIGNATURE_WORDS), dtype=np.uint64)
+        )
+        self.siblings = siblings or {}    # {id: 同一拍摄单元的其他文件}
+        self.aliases = aliases or {}      # {id: 指向同一物理文件的其他路径}
+        self.photo_count = photo_count if photo_count is not None else (
+            len(size) + sum(len(v) for v in self.siblings.values())
+        )
+        self._names = memoryview(name_blob)
+        self._index: tuple[np.ndarray, np.ndarray] | None = None
+        self._extra_owner: dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    # ─── 路径 ───────────────────────────────────────────
+
+    def name(self, i: int) -> str:
+        off = self.name_offsets
+        return str(self._names[int(off[i]):int(off[i + 1]) - 1], 'utf-8')
+
+    def path(self, i: int) -> str:
+        return os.path.join(self.dirs[self.dir_id[i]], self.name(i))
+
+    def paths(self, ids: Iterable[int] | np.ndarray | None = None) -> list[str]:
+        """多个 id 的路径；ids 为 None 时返回全部（一次解码整列）"""
+        # 目录前缀与 os.path.join 一致：目录为空（相对路径）或已以分隔符结尾（'/'、'E:\\'）时不再加分隔符
+        if ids is None:
+            prefixes = [os.path.join(d, '') for d in self.dirs]
+            return [prefixes[d] + n for d, n in zip(self.dir_id.tolist(), decode_strings(self.name_blob, self.name_offsets))]
+        ids = np.asarray(ids, dtype=np.int64)
+        dir_ids = self.dir_id[ids].tolist()
+        prefixes = {d: os.path.join(self.dirs[d], '') for d in set(dir_ids)}
+        starts = self.name_offsets[ids].tolist()
+        ends = self.name_offsets[ids + 1].tolist()
+        names = self._names
+        return [
+            prefixes[d] + str(names[a:b - 1], 'utf-8')
+            for d, a, b in zip(dir_ids, starts, ends)
+        ]
+
+    def unit_paths(self, i: int) -> list[str]:
+        """拍摄单元的全部文件：代表文件 + 配对文件"""
+        return [self.path(i)] + self.siblings.get(i, [])
+
+    def all_paths(self) -> list[str]:
+        """所有拍摄单元的全部文件（用于 XMP 检测等需要逐文件处理的场景）"""
+        paths = self.paths()
+        for i, extra in self.siblings.items():
+            paths.extend(extra)
+        return paths
+
+    def records(self, ids: np.ndarray) -> list[dict]:
+        """多个单元的字典形式（API / JSON 输出）：[{'path', 'hash', 'size', 'siblings', 'quality'}, ...]"""
+        ids = np.asarray(ids, dtype=np.int64)
+        siblings = self.siblings
+        return [
+            {
+                'path': path,
+                'hash': f'{h:016x}',
+                'size': size,
+                'siblings': siblings.get(i, []),
+                'quality': quality,
+            }
+            for i, path, h, size, quality in zip(
+                ids.tolist(), self.paths(ids), self.packed[ids].tolist(), self.size[ids].tolist(),
+                self.qualities(ids),
+            )
+        ]
+
+    def qualities(self, ids: np.ndarray) -> list[dict | None]:
+        """画质指标 {'sharpness', 'clipping', 'noise'}，未计算的单元为 None"""
+        return [
+            None if s != s else {'sharpness': s, 'clipping': c, 'noise': n}  # NaN != NaN
+            for s, c, n in zip(
+                self.sharpness[ids].astype(np.float64).round(2).tolist(),
+                self.clipping[ids].astype(np.float64).round(4).tolist(),
+                self.noise[ids].astype(np.float64).round(3).tolist(),
+            )
+        ]
+
+    def hashed_ids(self) -> np.ndarray:
+        """有哈希且未移除的单元 id（分组的候选节点），升序"""
+        return np.flatnonzero((self.flags & (FLAG_HAS_HASH | FLAG_DELETED)) == FLAG_HAS_HASH)
+
+    def hash_hex(self, i: int) -> str | None:
+        return unpack_hash(self.packed[i]) if self.flags[i] & FLAG_HAS_HASH else None
+
+    def camera(self, i: int) -> str | None:
+        c = int(self.camera_id[i])
+        return self.cameras[c] if c >= 0 else None
+
+    # ─── 路径 → id ─────────────────────────────────────
+
+    def id_of(self, path: str) -> int | None:
+        """
+        代表文件、配对文件或别名路径对应的单元 id，不存在（或已移除）返回 None。
+
+        首次调用时建立索引：按路径字符串哈希排序的 int64 数组（每条 16 字节），
+        不为每条路径常驻一个 Python 字符串。
+        """
+        if self._index is None:
+            self._index = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+            self._extra_owner = {}
+            self._index_rows(np.arange(len(self)))
+        keys, order = self._index
+        h = hash(path)
+        pos = int(np.searchsorted(keys, h))
+        while pos < len(keys) and keys[pos] == h:
+            i = int(order[pos])
+            if not self.flags[i] & FLAG_DELETED and self.path(i) == path:
+                return i
+            pos += 1
+        i = self._extra_owner.get(path)
+        return None if i is None or self.flags[i] & FLAG_DELETED else i
+
+    def _index_rows(self, ids: np.ndarray):
+        """把 ids 加入路径索引（追加单元后只为新增部分计算哈希，再与原索引合并）"""
+        keys = np.fromiter((hash(p) for p in self.paths(ids)), dtype=np.int64, count=len(ids))
+        old_keys, old_order = self._index
+        keys = np.concatenate([old_keys, keys])
+        order = np.concatenate([old_order, ids])
+        sort = np.argsort(keys, kind='stable')
+        self._index = (keys[sort], order[sort])
+        for table in (self.siblings, self.aliases):
+            for i in ids.tolist():
+                for p in table.get(i, ()):
+                    self._extra_owner[p] = i
+
+    def ids_of(self, paths: Iterable[str]) -> list[int]:
+        """多条路径对应的单元 id（忽略不存在的路径，保持顺序）"""
+        ids = (self.id_of(p) for p in paths)
+        return [i for i in ids if i is not None]
+
+    def ids_under(self, directory: str) -> np.ndarray:
+        """代表文件位于该目录（含子目录）下的单元 id（不含已移除的单元）"""
+        directory = directory.rstrip(os.sep) or os.sep
+        prefix = directory if directory.endswith(os.sep) else directory + os.sep
+        dirs = [i for i, d in enumerate(self.dirs) if d == directory or d.startswith(prefix)]
+        if not dirs:
+            return np.zeros(0, dtype=np.int64)
+        mask = np.isin(self.dir_id, dirs) & ((self.flags & FLAG_DELETED) == 0)
+        return np.flatnonzero(mask)
+
+    # ─── Lightroom 标志 ────────────────────────────────
+
+    def apply_lightroom(
+        self,
+        edited: set[str] | None,
+        flagged: dict[str, dict] | None,
+        ids: np.ndarray | None = None,
+    ):
+        """
+        根据 XMP 检测结果设置编辑/标记/排除标志。
+
+        拍摄单元内任一文件（RAW 或 JPEG）被编辑/标记即视为整个单元被编辑/标记。
+
+        Args:
+            edited: 已编辑的文件路径
+            flagged: 已标记的文件 {path: {rating, pick, label}}
+            ids: 只更新这些单元（增量检测时），默认为全部单元
+        """
+        clear = np.uint8(~LIGHTROOM_FLAGS & 0xFF)
+        if ids is None:
+            self.flags &= clear
+        else:
+            self.flags[ids] &= clear
+        for path in edited or ():
+            i = self.id_of(path)
+            if i is not None:
+                self.flags[i] |= FLAG_EDITED
+        for path, info in (flagged or {}).items():
+            i = self.id_of(path)
+            if i is not None:
+                self.flags[i] |= FLAG_FLAGGED
+                if info.get('pick', 0) == -1:
+                    self.flags[i] |= FLAG_REJECTED
+
+    # ─── 增量更新 ───────────────────────────────────────
+
+    def append(self, other: 'PhotoTable') -> np.ndarray:
+        """
+        追加另一张表的全部单元（目录、相机型号按名称合并），返回新单元的 id。
+
+        列整体重新拼接，适合按批（一个文件夹、一轮文件变化）追加；已有单元的 id 不变。
+        """
+        start = len(self)
+        dir_index = {d: i for i, d in enumerate(self.dirs)}
+        dir_map = np.array([dir_index.setdefault(d, len(dir_index)) for d in other.dirs], dtype=np.uint32)
+        self.dirs = list(dir_index)
+        camera_index = {c: i for i, c in enumerate(self.cameras)}
+        camera_map = np.array(
+            [camera_index.setdefault(c, len(camera_index)) for c in other.cameras] + [-1], dtype=np.int32,
+        )  # 末尾的 -1 让未知型号（camera_id == -1）映射回 -1
+        self.cameras = list(camera_index)
+
+        self.dir_id = np.concatenate([self.dir_id, dir_map[other.dir_id]])
+        self.camera_id = np.concatenate([self.camera_id, camera_map[other.camera_id]])
+        self.name_blob = np.concatenate([self.name_blob, other.name_blob])
+        self.name_offsets = np.concatenate([self.name_offsets, other.name_offsets[1:] + self.name_offsets[-1]])
+        self._names = memoryview(self.name_blob)
+        for column in (
+            'size', 'mtime', 'timestamp', 'packed', 'flags', 'sharpness', 'clipping', 'noise', 'orient', 'pose',
+            'exif_pose', 'signature',
+        ):
+            setattr(self, column, np.concatenate([getattr(self, column), getattr(other, column)]))
+        self.siblings.update({start + i: v for i, v in other.siblings.items()})
+        self.aliases.update({start + i: v for i, v in other.aliases.items()})
+        self.orient_alts.update({start + i: v for i, v in other.orient_alts.items()})
+        self.photo_count += other.photo_count
+
+        ids = np.arange(start, len(self))
+        if self._index is not None:
+            self._index_rows(ids)
+        return ids
+
+    def remove(self, ids: Iterable[int]):
+        """标记单元为已移除（id 保持不变，不再参与分组、路径查找）"""
+        for i in ids:
+            if not self.flags[i] & FLAG_DELETED:
+                self.flags[i] |= FLAG_DELETED
+                self.photo_count -= 1 + len(self.siblings.get(i, ()))
+
+    # ─── 构建 ───────────────────────────────────────────
+
+    @classmethod
+    def from_captures(
+        cls,
+        captures: list,
+        hashes: dict[str, str | None],
+        qualities: dict[str, tuple | None] | None = None,
+        orientations: dict[str, list[Variant] | None] | None = None,
+        signatures: dict[str, str | None] | None = None,
+    ) -> 'PhotoTable':
+        """
+        由扫描得到的 CaptureUnit 列表、哈希结果和（可选的）画质指标、规范哈希、核验签名构建。
+
+        规范哈希的姿态在哈希阶段按缩略图（存储方向）计算，这里按 EXIF Orientation 换算到显示方向。
+        """
+        builder = PhotoTableBuilder()
+        qualities = qualities or {}
+        orientations = orientations or {}
+        signatures = signatures or {}
+        photo_count = 0
+        for c in captures:
+            builder.add(
+                c.path, c.size, c.representative.mtime, c.timestamp, hashes.get(c.path),
+                c.camera_model, c.siblings, c.representative.aliases, qualities.get(c.path),
+                display_variants(orientations.get(c.path), c.orientation),
+                signatures.get(c.path), c.orientation,
+            )
+            photo_count += len(c.members)
+        return builder.build(photo_count)
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> 'PhotoTable':
+        """
+        由 CLI/分片输出的记录字典构建（path、size、hash，可选 siblings、aliases、timestamp、quality、
+        orientation、signature、exif_orientation 等）
+        """
+        builder = PhotoTableBuilder()
+        for r in records:
+            builder.add(
+                r['path'], r.get('size', 0), r.get('mtime', 0.0), r.get('timestamp'), r.get('hash'),
+                r.get('camera_model'), r.get('siblings') or (), r.get('aliases') or (),
+                quality_tuple(r.get('quality')), orientation_variants(r.get('orientation')),
+                r.get('signature'), r.get('exif_orientation'),
+            )
+        return builder.build()
+
+    @classmethod
+    def from_dicts(
+        cls,
+        photo_hashes: dict[str, str | None],
+        photo_sizes: dict[str, int] | None = None,
+        photo_siblings: dict[str, list[str]] | None = None,
+        capture_info: dict[str, tuple[str | None, float | None]] | None = None,
+    ) -> 'PhotoTable':
+        """由 {path: hash} 等字典构建（兼容按字典调用的分组接口）"""
+        photo_sizes = photo_sizes or {}
+        photo_siblings = photo_siblings or {}
+        capture_info = capture_info or {}
+        builder = PhotoTableBuilder()
+        for path, phash in photo_hashes.items():
+            camera, ts = capture_info.get(path, (None, None))
+            builder.add(path, photo_sizes.get(path, 0), 0.0, ts, phash, camera,
+                        photo_siblings.get(path, ()))
+        return builder.build()
+
+    def nbytes(self) -> int:
+        """列占用的字节数（不含目录表、型号表和稀疏字典）"""
+        return sum(a.nbytes for a in (
+            self.dir_id, self.name_blob, self.name_offsets, self.size, self.mtime,
+            self.timestamp, self.packed, self.flags, self.camera_id,
+            self.sharpness, self.clipping, self.noise, self.orient, self.pose, self.exif_pose, self.signature,
+        ))
+
+
+class PhotoTableBuilder:
+    """逐条追加拍摄单元，最后一次性生成 PhotoTable（追加期间用 array 暂存，不创建逐条对象）"""
+
+    def __init__(self):
+        self._dir_index: dict[str, int] = {}
+        self._camera_index: dict[str, int] = {}
+        self._dir_id = array('I')
+        self._names = bytearray()
+        self._name_offsets = array('Q', [0])
+        self._size = array('q')
+        self._mtime = array('d')
+        self._timestamp = array('d')
+        self._packed = array('Q')
+        self._flags = array('B')
+        self._camera_id = array('i')
+        self._sharpness = array('f')
+        self._clipping = array('f')
+        self._noise = array('f')
+        self._orient = array('Q')
+        self._pose = array('B')
+        self._exif_pose = array('B')
+        self._signature = array('Q')
+        self._siblings: dict[int, list[str]] = {}
+        self._aliases: dict[int, list[str]] = {}
+        self._orient_alts: dict[int, list[Variant]] = {}
+
+    def add(
+        self,
+        path: str,
+        size: int,
+        mtime: float = 0.0,
+        timestamp: float | None = None,
+        phash: str | None = None,
+        camera: str | None = None,
+        siblings: Iterable[str] = (),
+        aliases: Iterable[str] = (),
+        quality: tuple[float, float, float] | None = None,
+        orientation: list[Variant] | None = None,
+        signature: str | None = None,
+        exif_orientation: int | None = None,
+    ) -> int:
+        """
+        追加一个拍摄单元，返回它的 id。
+
+        quality 为 (清晰度, 过曝/欠曝比例, 噪声)；orientation 为 [(规范哈希, 显示方向的姿态), ...]，
+        第一项为主规范哈希，其余为备选；signature 为存储方向的十六进制核验签名；
+        exif_orientation 为 EXIF Orientation 标记（1..8）。
+        """
+        i = len(self._size)
+        directory, name = os.path.split(path)
+        self._dir_id.append(self._dir_index.setdefault(directory, len(self._dir_index)))
+        self._names += name.encode('utf-8')
+        self._names.append(0)
+        self._name_offsets.append(len(self._names))
+        self._size.append(size)
+        self._mtime.append(mtime)
+        self._timestamp.append(np.nan if timestamp is None else timestamp)
+        self._packed.append(hash_to_int(phash) if phash else 0)
+        self._flags.append(FLAG_HAS_HASH if phash else 0)
+        self._camera_id.append(self._camera_index.setdefault(camera, len(self._camera_index)) if camera else -1)
+        sharpness, clipping, noise = quality or (np.nan, np.nan, np.nan)
+        self._sharpness.append(sharpness)
+        self._clipping.append(clipping)
+        self._noise.append(noise)
+        if phash and orientation:
+            self._orient.append(orientation[0][0])
+            self._pose.append(orientation[0][1])
+            if len(orientation) > 1:
+                self._orient_alts[i] = list(orientation[1:])
+        else:
+            self._orient.append(0)
+            self._pose.append(POSE_UNKNOWN)
+        self._exif_pose.append(EXIF_POSES.get(exif_orientation or 1, 0))
+        self._signature.extend(signature_words(signature) if phash and signature else [0] * SIGNATURE_WORDS)
+        if siblings:
+            self._siblings[i] = list(siblings)
+        if aliases:
+            self._aliases[i] = list(aliases)
+        return i
+
+    def build(self, photo_count: int | None = None) -> PhotoTable:
+        return PhotoTable(
+            dirs=list(self._dir_index),
+            cameras=list(self._camera_index),
+            dir_id=np.frombuffer(self._dir_id, dtype=np.uint32),
+            name_blob=np.frombuffer(bytes(self._names), dtype=np.uint8),
+            name_offsets=np.frombuffer(self._name_offsets, dtype=np.uint64),
+            size=np.frombuffer(self._size, dtype=np.int64),
+            mtime=np.frombuffer(self._mtime, dtype=np.float64),
+            timestamp=np.frombuffer(self._timestamp, dtype=np.float64),
+            packed=np.frombuffer(self._packed, dtype=np.uint64),
+            flags=np.frombuffer(self._flags, dtype=np.uint8).copy(),  # 标志位可写
+            camera_id=np.frombuffer(self._camera_id, dtype=np.int32),
+            siblings=self._siblings,
+            aliases=self._aliases,
+            photo_count=photo_count,
+            sharpness=np.frombuffer(self._sharpness, dtype=np.float32),
+            clipping=np.frombuffer(self._clipping, dtype=np.float32),
+            noise=np.frombuffer(self._noise, dtype=np.float32),
+            orient=np.frombuffer(self._orient, dtype=np.uint64),
+            pose=np.frombuffer(self._pose, dtype=np.uint8),
+            orient_alts=self._orient_alts,
+            exif_pose=np.frombuffer(self._exif_pose, dtype=np.uint8),
+            signature=np.frombuffer(self._signature, dtype=np.uint64).reshape(-1, SIGNATURE_WORDS),
+        )
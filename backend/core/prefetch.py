@@ -0,0 +1,192 @@
+"""
+缩略图预取 — 分组确定后，按审核界面的显示顺序在后台预热缩略图和大预览。
+
+审核时每翻一组都要显示该组全部照片；缓存里没有的缩略图（导入的快照、增量加入的照片、
+灯箱中的大预览）由 /api/thumbnail 当场提取，用户只能等待。ThumbnailPrefetcher：
+
+- 队列按优先级排列：当前组 → 之后的 PREFETCH_AHEAD 组 → 前一组，最前面 PREFETCH_PREVIEW_GROUPS 组
+  同时排入大预览（review_order）；
+- 用户翻页或跳转时前端提交新的顺序（/api/prefetch），schedule() 整体替换待处理队列，
+  尚未开始的旧任务随即取消；正在提取的文件不中断（结果照样写入缓存）；
+- 队列最多 PREFETCH_QUEUE 项，多出的部分等用户翻到附近时再排入；
+- /api/thumbnail 请求的文件正在预取时等待同一次提取，还在队列中时移出队列直接提取，不重复解码。
+"""
+
+import threading
+from collections import deque
+from pathlib import Path
+
+from backend.config import (
+    THUMBNAIL_SIZE, PREVIEW_SIZE, PREFETCH_WORKERS, PREFETCH_QUEUE, PREFETCH_PREVIEW_GROUPS,
+)
+from backend.core.thumbnail import cached_thumbnail, get_thumbnail
+
+Item = tuple[str, tuple[int, int]]  # (原始文件路径, 尺寸)
+
+
+def review_order(
+    groups: list[list[str]],
+    preview_groups: int = PREFETCH_PREVIEW_GROUPS,
+    preview_size: tuple[int, int] = PREVIEW_SIZE,
+) -> list[Item]:
+    """
+    按审核顺序排列的预取项。
+
+    Args:
+        groups: 按显示顺序排列的分组成员路径，第一组为当前组
+        preview_groups: 最前面几组同时预取大预览（0 不预取）
+        preview_size: 大预览尺寸
+
+    Returns:
+        [(路径, 尺寸)]，优先级从高到低
+    """
+    items = []
+    for i, paths in enumerate(groups):
+        items.extend((p, THUMBNAIL_SIZE) for p in paths)
+        if i < preview_groups:
+            items.extend((p, preview_size) for p in paths)
+    return items
+
+
+class ThumbnailPrefetcher:
+    """按优先级预热缩略图缓存的后台线程池（队列有上限，可整体替换）"""
+
+    def __init__(self, workers: int = PREFETCH_WORKERS, limit: int = PREFETCH_QUEUE):
+        """
+        Args:
+            workers: 预取线程数（RAW 在隔离的解码进程中提取，与按需请求共用进程池，线程数宜少）
+            limit: 待处理队列上限
+        """
+        self.workers = workers
+        self.limit = limit
+        self._queue: deque[Item] = deque()
+        self._queued: set[Item] = set()
+        self._inflight: dict[Item, threading.Event] = {}  # 正在提取的项 → 完成事件
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._closed = False
+        self.stats = {'scheduled': 0, 'warmed': 0, 'cached': 0, 'failed': 0, 'cancelled': 0}
+
+    def schedule(self, items: list[Item]) -> int:
+        """
+        用新的顺序替换待处理队列，之前尚未开始的任务取消。
+
+        Args:
+            items: [(路径, 尺寸)]，优先级从高到低；超过上限的部分丢弃
+
+        Returns:
+            入队的项数
+        """
+        with self._cond:
+            self.stats['cancelled'] += len(self._queue)
+            self._queue.clear()
+            self._queued.clear()
+            for path, size in items:
+                if len(self._queue) >= self.limit:
+                    break
+                item = (path, tuple(size))
+                if item in self._queued or item in self._inflight:
+                    continue
+                self._queue.append(item)
+                self._queued.add(item)
+            self.stats['scheduled'] += len(self._queue)
+            if self._queue:
+                self._start()
+            self._cond.notify_all()
+            return len(self._queue)
+
+    def cancel(self) -> int:
+        """取消所有尚未开始的任务，返回取消的项数"""
+        with self._cond:
+            cancelled = len(self._queue)
+        self.schedule([])
+        return cancelled
+
+    def fetch(self, path: str, size: tuple[int, int] = THUMBNAIL_SIZE) -> Path | None:
+        """
+        立即需要的缩略图（/api/thumbnail）：正在预取时等待同一次提取，否则移出队列直接提取。
+
+        Returns:
+            缩略图路径，失败返回 None
+        """
+        item = (path, tuple(size))
+        with self._cond:
+            event = self._inflight.get(item)
+            owner = event is None
+            if owner:
+                if item in self._queued:
+                    self._queued.discard(item)
+                    self._queue.remove(item)
+                event = self._inflight[item] = threading.Event()
+        if not owner:
+            event.wait()
+            return cached_thumbnail(path, size)
+        try:
+            return get_thumbnail(path, size)
+        finally:
+            with self._cond:
+                self._inflight.pop(item, None)
+            event.set()
+
+    def status(self) -> dict:
+        with self._cond:
+            return {'queued': len(self._queue), 'in_progress': len(self._inflight), **self.stats}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._queued.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    # ─── 工作线程 ───────────────────────────────────────
+
+    def _start(self):
+        """首次有任务时启动工作线程（调用方持有锁）"""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._work, name=f'photodedup-prefetch-{len(self._threads)}', daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                item = self._queue.popleft()
+                self._queued.discard(item)
+                event = self._inflight[item] = threading.Event()
+            path, size = item
+            outcome = 'failed'
+            try:
+                if cached_thumbnail(path, size) is not None:
+                    outcome = 'cached'
+                elif get_thumbnail(path, size) is not None:
+                    outcome = 'warmed'
+            except Exception:
+                pass  # 文件已删除或不可读：按需请求时再报告
+            finally:
+                with self._cond:
+                    self._inflight.pop(item, None)
+                    self.stats[outcome] += 1
+                event.set()
+
+
+_prefetcher: ThumbnailPrefetcher | None = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> ThumbnailPrefetcher:
+    """进程内共享的预取器（工作线程在首次排入任务时启动）"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = ThumbnailPrefetcher()
+        return _prefetcher
@@ -0,0 +1,111 @@
+"""
+扫描性能剖析（可选） — 为每个阶段生成剖析文件，便于排查用户报告的慢扫描。
+
+每个阶段同时使用两种方式：
+- cProfile：阶段所在线程的确定性剖析，输出 .prof（pstats 格式）和 .txt 摘要
+- 栈采样：后台线程定期采样所有线程（包括哈希线程池的工作线程）的调用栈，
+  输出 .folded（每行 "帧;帧;帧 次数"，可直接用 flamegraph.pl / speedscope 打开）
+
+通过环境变量 PHOTODEDUP_PROFILE=1 或扫描请求中的 profile 字段开启。
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from backend.config import PROFILE_SAMPLE_INTERVAL
+
+
+class StackSampler:
+    """定期采样所有线程的调用栈，按折叠栈计数"""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="photodedup-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_folded(self, path: Path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ScanProfiler:
+    """一次扫描的剖析器，每个阶段输出到 directory 下的独立文件"""
+
+    def __init__(self, directory: Path, sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self.files: list[Path] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """剖析一个阶段，结束后写出 {name}.prof / {name}.txt / {name}.folded"""
+        profile = cProfile.Profile()
+        sampler = StackSampler(self.sample_interval)
+        sampler.start()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            sampler.stop()
+            self._dump(name, profile, sampler)
+
+    def _dump(self, name: str, profile: cProfile.Profile, sampler: StackSampler):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        prof_path = self.directory / f"{name}.prof"
+        profile.dump_stats(str(prof_path))
+
+        text = io.StringIO()
+        stats = pstats.Stats(profile, stream=text)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(40)
+        txt_path = self.directory / f"{name}.txt"
+        txt_path.write_text(
+            f"# 阶段 {name}：栈采样 {sampler.samples} 次，间隔 {sampler.interval * 1000:.1f} ms\n"
+            + text.getvalue(),
+            encoding='utf-8',
+        )
+
+        folded_path = self.directory / f"{name}.folded"
+        sampler.write_folded(folded_path)
+
+        self.files += [prof_path, txt_path, folded_path]
@@ -0,0 +1,211 @@
+"""
+扫描中的临时分组 — 缩略图一提取出来就计算哈希并入分组，扫描未结束时即可开始审核。
+
+完整扫描按阶段依次进行：所有文件提取完缩略图才开始计算哈希，全部哈希算完才分组。
+一个需要一小时的图库，最前面几个文件夹里的连拍其实几秒钟后就能确定。ProgressiveGrouper：
+
+- 提取阶段每完成一个文件（extract_thumbnails_batch 的 on_result 回调）就交给哈希线程池计算 pHash
+  （以及画质指标、规范哈希、核验签名），与其余文件的提取同时进行；
+- 后台线程每 PROGRESSIVE_INTERVAL 秒把新算出的哈希作为一批拍摄单元并入 IncrementalGrouper，
+  分组 id 从第一次出现起保持不变（合并时沿用最早的 id），每次有变化时版本号加一；
+- 客户端按版本号取增量（delta）：自某个版本以来新建、变化、移除的分组。扫描结束前每个分组都可能
+  继续增加成员（may_grow）；
+- 全部文件处理完后 finish() 返回的分组状态就是最终结果，不再重新比较一遍，分组 id 与临时结果一致。
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from backend.config import CASCADE_VERIFICATION, MAX_WORKERS, PROGRESSIVE_INTERVAL, QUALITY_SCORING
+from backend.core.hasher import hash_thumbnail
+from backend.core.incremental import IncrementalGrouper
+from backend.core.metrics import StageMetrics
+from backend.core.phototable import PhotoTable
+
+if TYPE_CHECKING:
+    from backend.core.autotune import StageTuner
+    from backend.core.grouper import PhotoGroup
+
+
+class ProgressiveGrouper:
+    """边提取边分组，按版本号提供临时结果"""
+
+    def __init__(
+        self,
+        captures: list,
+        threshold: int,
+        max_threshold: int,
+        time_window: float | None = None,
+        include_undated: bool = True,
+        orientation: str = 'off',
+        metrics: StageMetrics | None = None,
+        tuner: 'StageTuner | None' = None,
+        interval: float = PROGRESSIVE_INTERVAL,
+    ):
+        """
+        Args:
+            captures: 本次扫描的全部拍摄单元（pair_captures 的结果）
+            threshold / max_threshold / time_window / include_undated / orientation: 与完整分组相同
+            metrics: 哈希阶段的指标（可选），逐文件记录
+            tuner: 哈希线程数的自适应控制器（可选）
+            interval: 并入分组的间隔（秒）
+        """
+        self.total = len(captures)
+        self.interval = interval
+        self.metrics = metrics
+        self.tuner = tuner
+        self.grouper = IncrementalGrouper(
+            PhotoTable.from_captures([], {}), threshold, max_threshold, time_window, include_undated, orientation,
+        )
+        self.lock = threading.Lock()     # 并入分组与读取临时结果互斥
+        self.version = 0
+        self.hashed = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self.first_group_seconds: float | None = None
+        self._captures = {c.path: c for c in captures}
+        self._hashes: dict[str, str | None] = {}
+        self._qualities: dict[str, tuple | None] | None = {} if QUALITY_SCORING else None
+        self._orientations: dict[str, list | None] = {}
+        self._signatures: dict[str, str | None] | None = {} if CASCADE_VERIFICATION else None
+        self._ready: queue.SimpleQueue[str] = queue.SimpleQueue()
+        self._created_at: dict[int, int] = {}   # 分组 id → 首次出现的版本
+        self._changed_at: dict[int, int] = {}   # 分组 id → 最近一次变化的版本
+        self._removed_at: dict[int, int] = {}   # 分组 id → 被移除（合并）的版本
+        self._done = threading.Event()
+        self._error: BaseException | None = None
+
+        workers = MAX_WORKERS
+        if tuner is not None:
+            tuner.start(MAX_WORKERS)
+            workers = tuner.high
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='photodedup-hash')
+        self._thread = threading.Thread(target=self._run, name='photodedup-progressive', daemon=True)
+        self._thread.start()
+
+    # ─── 输入 ───────────────────────────────────────────
+
+    def add(self, path: str, thumb: Path | None):
+        """一个拍摄单元的缩略图已就绪（extract_thumbnails_batch 的 on_result 回调）"""
+        if thumb is None:
+            self._hashes[path] = None
+            self._ready.put(path)
+        else:
+            self._executor.submit(self._hash, path, str(thumb))
+
+    def _hash(self, path: str, thumb: str):
+        try:
+            if self.tuner is None:
+                self._hashes[path] = hash_thumbnail(
+                    path, thumb, metrics=self.metrics, qualities=self._qualities, orientations=self._orientations,
+                    signatures=self._signatures,
+                )
+            else:
+                with self.tuner.slot():
+                    self._hashes[path] = hash_thumbnail(
+                        path, thumb, metrics=self.metrics, qualities=self._qualities,
+                        orientations=self._orientations, signatures=self._signatures,
+                    )
+        finally:
+            self._ready.put(path)  # 出错的文件没有哈希，仍然计入照片表
+
+    def finish(self) -> tuple[IncrementalGrouper, dict[str, str | None]]:
+        """
+        等待所有哈希计算完成并并入分组。
+
+        Returns:
+            (包含全部拍摄单元的分组状态, {代表文件路径: 哈希})
+        """
+        self._executor.shutdown(wait=True)
+        if self.tuner is not None:
+            self.tuner.stop()
+        self._done.set()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.grouper, self._hashes
+
+    def close(self):
+        """扫描出错或被中止时停止（丢弃尚未计算的哈希）"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self.tuner is not None:
+            self.tuner.stop()
+        self._done.set()
+        self._thread.join()
+
+    # ─── 并入分组 ───────────────────────────────────────
+
+    def _run(self):
+        try:
+            while True:
+                done = self._done.wait(self.interval)
+                self._flush()
+                if done:
+                    return
+        except BaseException as e:
+            self._error = e  # finish() 中重新抛出
+
+    def _flush(self):
+        paths = []
+        while True:
+            try:
+                paths.append(self._ready.get_nowait())
+            except queue.Empty:
+                break
+        if not paths:
+            return
+        batch = PhotoTable.from_captures(
+            [self._captures[p] for p in paths], self._hashes, self._qualities, self._orientations, self._signatures,
+        )
+        with self.lock:
+            changes = self.grouper.insert(batch)
+            self.hashed += len(paths)
+            self.batches += 1
+            if not (changes['created'] or changes['updated'] or changes['removed']):
+                return
+            self.version += 1
+            for g in changes['created']:
+                self._created_at[g] = self.version
+            for g in changes['created'] + changes['updated']:
+                self._changed_at[g] = self.version
+            for g in changes['removed']:
+                self._created_at.pop(g, None)
+                self._changed_at.pop(g, None)
+                self._removed_at[g] = self.version
+            if self.first_group_seconds is None and self._changed_at:
+                self.first_group_seconds = round(time.perf_counter() - self.started, 3)
+
+    # ─── 临时结果 ───────────────────────────────────────
+
+    def delta(self, since: int = 0) -> dict:
+        """
+        自版本 since 以来的变化（调用方持有 lock 时分组数据保持一致）。
+
+        Returns:
+            {'version', 'created': [id], 'updated': [id], 'removed': [id], 'groups': [PhotoGroup],
+             'recommendations': [dict], 'summary', 'hashed', 'total'}
+        """
+        changed = sorted(g for g, v in self._changed_at.items() if v > since)
+        groups: list['PhotoGroup'] = self.grouper.groups(changed)
+        return {
+            'version': self.version,
+            'created': [g for g in changed if self._created_at[g] > since],
+            'updated': [g for g in changed if self._created_at[g] <= since],
+            'removed': sorted(g for g, v in self._removed_at.items() if v > since) if since else [],
+            'groups': groups,
+            'recommendations': [self.grouper.recommendation(g.group_id) for g in groups],
+            'summary': self.grouper.recommendations()['summary'],
+            'hashed': self.hashed,
+            'total': self.total,
+        }
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'versions': self.version,
+            'first_group_seconds': self.first_group_seconds,
+        }
@@ -1,36 +1,116 @@
 """
-智能推荐器 — 结合 Lightroom 编辑状态和相似度分析，推荐保留和删除项。
+智能推荐器 — 结合 Lightroom 编辑状态、相似度分析和画质评分，推荐保留和删除项。
 """
 
-import os
+import numpy as np
+
+from backend.config import QUALITY_CLIPPING_WEIGHT, QUALITY_NOISE_WEIGHT
 from backend.core.grouper import PhotoGroup
+from backend.core.phototable import FLAG_EDITED, FLAG_FLAGGED, FLAG_REJECTED, LIGHTROOM_FLAGS, PhotoTable
+
+
+def _recommendation_dict(group_id: int, total: int, keep: list[str], delete: list[str],
+                         delete_files: list[str], save_bytes: int) -> dict:
+    return {
+        'group_id': group_id,
+        'total_in_group': total,
+        'keep': keep,
+        'delete': delete,
+        'delete_files': delete_files,
+        'keep_count': len(keep),
+        'delete_count': len(delete),
+        'save_bytes': save_bytes,
+    }
+
+
+def _unit_flags(
+    table: PhotoTable,
+    ids: np.ndarray,
+    edited: set[str] | None,
+    flagged: dict[str, dict] | None,
+) -> np.ndarray:
+    """
+    一组单元的标志位（副本，不修改照片表）。
+
+    给出 edited / flagged 时，这些单元的编辑/标记位以它们为准（与 PhotoTable.apply_lightroom 的规则相同），
+    否则沿用照片表中已有的标志位。
+    """
+    flags = table.flags[ids]
+    if not (edited or flagged):
+        return flags
+    flags &= np.uint8(~LIGHTROOM_FLAGS & 0xFF)
+    position = np.full(len(table), -1, dtype=np.int64)
+    position[ids] = np.arange(len(ids))
+
+    def mark(path: str, bits: int):
+        i = table.id_of(path)
+        if i is not None and position[i] >= 0:
+            flags[position[i]] |= bits
+
+    for path in edited or ():
+        mark(path, FLAG_EDITED)
+    for path, info in (flagged or {}).items():
+        mark(path, FLAG_FLAGGED | (FLAG_REJECTED if info.get('pick', 0) == -1 else 0))
+    return flags
+
+
+def _keep_mask(flags: np.ndarray) -> np.ndarray:
+    """按标志位判断保留：已编辑或有标记，且未被标记为排除"""
+    return ((flags & (FLAG_EDITED | FLAG_FLAGGED)) != 0) & ((flags & FLAG_REJECTED) == 0)
+
+
+def quality_score(table: PhotoTable, ids: np.ndarray) -> np.ndarray:
+    """
+    画质得分（越高越好）：ln(1 + 清晰度) − 过曝/欠曝比例 × QUALITY_CLIPPING_WEIGHT − ln(1 + 噪声) × QUALITY_NOISE_WEIGHT。
+
+    只在同一组（同一场景）内比较，不需要跨场景可比。没有画质指标的单元为 -inf。
+    """
+    score = (
+        np.log1p(table.sharpness[ids].astype(np.float64))
+        - QUALITY_CLIPPING_WEIGHT * table.clipping[ids]
+        - QUALITY_NOISE_WEIGHT * np.log1p(table.noise[ids].astype(np.float64))
+    )
+    return np.where(np.isnan(score), -np.inf, score)
 
 
 class Recommendation:
     """单组照片的推荐结果"""
 
-    def __init__(self, group: PhotoGroup, keep: list[str], delete: list[str]):
+    def __init__(self, group: PhotoGroup, keep_ids: np.ndarray, delete_ids: np.ndarray):
         self.group = group
-        self.keep = keep      # 建议保留的文件路径
-        self.delete = delete  # 建议删除的文件路径
+        self.keep_ids = keep_ids      # 建议保留的单元 id
+        self.delete_ids = delete_ids  # 建议删除的单元 id
+
+    @property
+    def keep(self) -> list[str]:
+        """建议保留的文件路径"""
+        return self.group.table.paths(self.keep_ids)
+
+    @property
+    def delete(self) -> list[str]:
+        """建议删除的文件路径"""
+        return self.group.table.paths(self.delete_ids)
 
     @property
     def save_bytes(self) -> int:
         """可释放的空间（字节）"""
-        return sum(
-            p['size'] for p in self.group.photos if p['path'] in self.delete
-        )
+        return int(self.group.table.size[self.delete_ids].sum())
+
+    @property
+    def delete_files(self) -> list[str]:
+        """实际要删除的全部文件（包含 RAW+JPEG 拍摄单元中的其他成员）"""
+        siblings = self.group.table.siblings
+        files = []
+        for i, path in zip(self.delete_ids.tolist(), self.delete):
+            files.append(path)
+            files.extend(siblings.get(i, []))
+        return files
 
     def to_dict(self) -> dict:
-        return {
-            'group_id': self.group.group_id,
-            'total_in_group': self.group.count,
-            'keep': self.keep,
-            'delete': self.delete,
-            'keep_count': len(self.keep),
-            'delete_count': len(self.delete),
-            'save_bytes': self.save_bytes,
-        }
+        return _recommendation_dict(
+            self.group.group_id, self.group.count, self.keep, self.delete,
+            self.delete_files, self.save_bytes,
+        )
 
 
 def recommend_for_group(
@@ -41,44 +121,29 @@ def recommend_for_group(
     """
     为一组相似照片生成保留/删除推荐。
 
-    策略：
+    策略（RAW+JPEG 拍摄单元中任一文件满足条件即视为整个单元满足）：
     1. LR 中已编辑的 → 保留
     2. LR 中有星标/旗帜的 → 保留
-    3. 若组内没有任何 LR 标记的照片 → 保留第一张（通常是时间最早的）
+    3. 若组内没有任何 LR 标记的照片 → 保留画质得分最高的一张（见 quality_score；
+       没有画质指标或得分相同时保留排在前面的一张）
     4. 其余 → 建议删除
 
+    编辑/标记状态取自照片表的标志位（见 PhotoTable.apply_lightroom）；给出 edited_photos / flagged_photos 时
+    改为按它们判断，只作用于本次推荐，不修改照片表。
+
     Args:
         group: 相似照片群组
-        edited_photos: LR 已编辑照片路径集合
-        flagged_photos: LR 已标记照片 {path: {rating, pick, label}}
+        edited_photos: LR 已编辑照片路径集合（可选）
+        flagged_photos: LR 已标记照片 {path: {rating, pick, label}}（可选）
 
     Returns:
         Recommendation 对象
     """
-    edited_photos = edited_photos or set()
-    flagged_photos = flagged_photos or {}
-
-    keep = []
-    delete = []
-
-    for photo in group.photos:
-        path = photo['path']
-        is_edited = path in edited_photos
-        is_flagged = path in flagged_photos
-        is_rejected = flagged_photos.get(path, {}).get('pick', 0) == -1
-
-        if is_rejected:
-            delete.append(path)
-        elif is_edited or is_flagged:
-            keep.append(path)
-        else:
-            delete.append(path)
-
-    # 安全检查：如果整组都被标记为删除，保留第一张
-    if not keep and delete:
-        keep.append(delete.pop(0))
-
-    return Recommendation(group=group, keep=keep, delete=delete)
+    keep = _keep_mask(_unit_flags(group.table, group.ids, edited_photos, flagged_photos))
+    # 整组都没有保留项时，保留画质最好的一张
+    if not keep.any():
+        keep[int(np.argmax(quality_score(group.table, group.ids)))] = True
+    return Recommendation(group=group, keep_ids=group.ids[keep], delete_ids=group.ids[~keep])
 
 
 def recommend_all(
@@ -89,6 +154,10 @@ def recommend_all(
     """
     为所有群组生成推荐，并汇总统计。
 
+    所有群组的成员拼接为一个 id 数组，保留/删除判断和可释放空间一次向量化算出，
+    路径也只解码一次。群组应来自同一张照片表（同一个邻接图）。
+    edited_photos / flagged_photos 与 recommend_for_group 相同，只作用于本次推荐，不修改照片表。
+
     Returns:
         {
             'recommendations': [Recommendation.to_dict(), ...],
@@ -104,18 +173,48 @@ def recommend_all(
     """
     recommendations = []
     total_keep = 0
-    total_delete = 0
     total_save = 0
 
-    for group in groups:
-        rec = recommend_for_group(group, edited_photos, flagged_photos)
-        recommendations.append(rec)
-        total_keep += len(rec.keep)
-        total_delete += len(rec.delete)
-        total_save += rec.save_bytes
+    if groups:
+        table = groups[0].table
+        counts = np.array([g.count for g in groups], dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        ids = np.concatenate([g.ids for g in groups])
+
+        keep = _keep_mask(_unit_flags(table, ids, edited_photos, flagged_photos))
+        group_index = np.repeat(np.arange(len(groups)), counts)
+        # 整组都没有保留项的，保留画质最好的一张：按 (组, 得分从高到低) 稳定排序后取每组的第一个
+        has_keep = np.bincount(group_index, weights=keep, minlength=len(groups)) > 0
+        if not has_keep.all():
+            order = np.lexsort((-quality_score(table, ids), group_index))
+            keep[order[starts[~has_keep]]] = True
+        save = np.add.reduceat(np.where(keep, 0, table.size[ids]), starts).tolist()
+
+        paths = table.paths(ids)
+        id_list = ids.tolist()
+        keep_list = keep.tolist()
+        siblings = table.siblings
+        total_keep = int(keep.sum())
+        total_save = int(sum(save))
+
+        for g, (a, n) in enumerate(zip(starts.tolist(), counts.tolist())):
+            keep_paths, delete_paths, delete_files = [], [], []
+            for i in range(a, a + n):
+                if keep_list[i]:
+                    keep_paths.append(paths[i])
+                else:
+                    delete_paths.append(paths[i])
+                    delete_files.append(paths[i])
+                    delete_files.extend(siblings.get(id_list[i], ()))
+            recommendations.append(_recommendation_dict(
+                groups[g].group_id, n, keep_paths, delete_paths, delete_files, save[g],
+            ))
+        total_delete = len(ids) - total_keep
+    else:
+        total_delete = 0
 
     return {
-        'recommendations': [r.to_dict() for r in recommendations],
+        'recommendations': recommendations,
         'summary': {
             'total_groups': len(groups),
             'total_photos': total_keep + total_delete,
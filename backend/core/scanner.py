@@ -1,71 +1,469 @@
 """
 目录扫描器 — 递归扫描指定目录，收集所有 RAW 图像文件及其元数据。
+
+文件以 (st_dev, st_ino) 作为物理身份：硬链接、符号链接目录以及相互嵌套的
+扫描根目录只会产生一条 PhotoInfo，其余路径记录在 aliases 中。
 """
 
 import os
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
 
-import exifread
+from backend.config import RAW_EXTENSIONS, IMAGE_EXTENSIONS, CAPTURE_SIBLING_EXTENSIONS
+from backend.core.metrics import StageMetrics
 
-from backend.config import RAW_EXTENSIONS, IMAGE_EXTENSIONS
+if TYPE_CHECKING:
+    from backend.core.autotune import StageTuner
 
 
 class PhotoInfo:
-    """单张照片的信息"""
+    """单张照片的信息（对应一个物理文件）"""
 
-    __slots__ = ['path', 'filename', 'size', 'date_taken', 'camera_model']
+    __slots__ = [
+        'path', 'filename', 'size', 'mtime', 'dev', 'ino', 'aliases',
+        'date_taken', 'camera_model', 'orientation',
+    ]
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, st: os.stat_result | None = None):
+        if st is None:
+            st = os.stat(path)
         self.path = path
         self.filename = os.path.basename(path)
-        self.size = os.path.getsize(path)
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.dev = st.st_dev
+        self.ino = st.st_ino
+        self.aliases: list[str] = []  # 指向同一物理文件的其他路径
         self.date_taken: str | None = None
         self.camera_model: str | None = None
+        self.orientation: int | None = None   # EXIF Orientation（1..8），未读取或没有时为 None
+
+    @property
+    def file_id(self) -> tuple[int, int]:
+        """物理文件身份 (st_dev, st_ino)"""
+        return (self.dev, self.ino)
+
+    @property
+    def all_paths(self) -> list[str]:
+        """主路径 + 所有别名路径"""
+        return [self.path] + self.aliases
+
+    @property
+    def timestamp(self) -> float | None:
+        """拍摄时间戳（秒），无 EXIF 时间返回 None"""
+        return parse_exif_datetime(self.date_taken)
 
     def to_dict(self) -> dict:
         return {
             'path': self.path,
             'filename': self.filename,
             'size': self.size,
+            'mtime': self.mtime,
+            'aliases': list(self.aliases),
+            'date_taken': self.date_taken,
+            'camera_model': self.camera_model,
+        }
+
+
+class CaptureUnit:
+    """
+    一次拍摄 — 同目录同名的 RAW 与机内 JPEG 组成一个单元。
+
+    只对代表文件（优先 JPEG，解码更快）提取缩略图和计算哈希，
+    分组、推荐和删除时整个单元作为一个整体，大小为所有成员之和。
+    """
+
+    __slots__ = ['members', 'representative']
+
+    def __init__(self, members: list[PhotoInfo]):
+        self.members = members
+        self.representative = min(members, key=_representative_rank)
+
+    @property
+    def path(self) -> str:
+        """单元的标识路径（即代表文件路径）"""
+        return self.representative.path
+
+    @property
+    def filename(self) -> str:
+        return self.representative.filename
+
+    @property
+    def size(self) -> int:
+        return sum(m.size for m in self.members)
+
+    @property
+    def siblings(self) -> list[str]:
+        """除代表文件外的其他成员路径"""
+        return [m.path for m in self.members if m is not self.representative]
+
+    @property
+    def all_paths(self) -> list[str]:
+        return [m.path for m in self.members]
+
+    @property
+    def date_taken(self) -> str | None:
+        return next((m.date_taken for m in self.members if m.date_taken), None)
+
+    @property
+    def camera_model(self) -> str | None:
+        return next((m.camera_model for m in self.members if m.camera_model), None)
+
+    @property
+    def orientation(self) -> int | None:
+        """代表文件（缩略图和哈希的来源）的 EXIF Orientation"""
+        return self.representative.orientation
+
+    @property
+    def timestamp(self) -> float | None:
+        """拍摄时间戳（秒），无 EXIF 时间返回 None"""
+        return parse_exif_datetime(self.date_taken)
+
+    def to_dict(self) -> dict:
+        return {
+            'path': self.path,
+            'siblings': self.siblings,
+            'size': self.size,
             'date_taken': self.date_taken,
             'camera_model': self.camera_model,
         }
 
 
+def _representative_rank(photo: PhotoInfo) -> tuple[int, str]:
+    """代表文件优先级：机内 JPEG 在前，RAW 在后"""
+    ext = os.path.splitext(photo.path)[1].lower()
+    if ext in CAPTURE_SIBLING_EXTENSIONS:
+        return (CAPTURE_SIBLING_EXTENSIONS.index(ext), photo.path)
+    return (len(CAPTURE_SIBLING_EXTENSIONS), photo.path)
+
+
+def pair_captures(photos: list[PhotoInfo]) -> list[CaptureUnit]:
+    """
+    将同一次拍摄的 RAW 与 JPEG 合并为 CaptureUnit。
+
+    按 (目录, 不区分大小写的文件名主干) 分组，只有同时包含 RAW 文件时
+    才会配对（DSC_1234.NEF + DSC_1234.JPG）；其余照片各自成为单成员单元。
+
+    Args:
+        photos: scan_directory 的结果
+
+    Returns:
+        CaptureUnit 列表，顺序与输入中各单元首个成员出现的顺序一致
+    """
+    pairable = RAW_EXTENSIONS | set(CAPTURE_SIBLING_EXTENSIONS)
+    buckets: dict[tuple[str, str], list[PhotoInfo]] = {}
+    units: list[CaptureUnit | tuple[str, str]] = []
+
+    for photo in photos:
+        stem, ext = os.path.splitext(photo.path)
+        if ext.lower() not in pairable:
+            units.append(CaptureUnit([photo]))
+            continue
+        key = (os.path.dirname(stem), os.path.basename(stem).lower())
+        if key not in buckets:
+            buckets[key] = []
+            units.append(key)
+        buckets[key].append(photo)
+
+    result = []
+    for item in units:
+        if isinstance(item, CaptureUnit):
+            result.append(item)
+            continue
+        members = buckets[item]
+        has_raw = any(os.path.splitext(m.path)[1].lower() in RAW_EXTENSIONS for m in members)
+        if has_raw and len(members) > 1:
+            result.append(CaptureUnit(members))
+        else:
+            result.extend(CaptureUnit([m]) for m in members)
+
+    return result
+
+
+def scan_files(
+    paths: list[str],
+    include_raw: bool = True,
+    include_images: bool = False,
+    read_exif: bool = True,
+) -> list[PhotoInfo]:
+    """
+    为指定的文件生成 PhotoInfo（增量更新时使用，不遍历目录）。
+
+    与 scan_directory 使用相同的扩展名过滤，并按物理身份去重；
+    不存在或无法访问的文件会被跳过。
+
+    Args:
+        paths: 文件路径列表
+        include_raw: 是否包含 RAW 文件
+        include_images: 是否包含普通图片（JPG 等）
+        read_exif: 是否读取 EXIF 信息
+
+    Returns:
+        PhotoInfo 列表
+    """
+    extensions = set()
+    if include_raw:
+        extensions |= RAW_EXTENSIONS
+    if include_images:
+        extensions |= IMAGE_EXTENSIONS
+
+    by_id: dict[tuple[int, int], PhotoInfo] = {}
+    for filepath in paths:
+        fname = os.path.basename(filepath)
+        if fname.startswith('.') or os.path.splitext(fname)[1].lower() not in extensions:
+            continue
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            continue
+        file_id = (st.st_dev, st.st_ino)
+        existing = by_id.get(file_id)
+        if existing is None:
+            by_id[file_id] = PhotoInfo(filepath, st)
+        elif filepath != existing.path and filepath not in existing.aliases:
+            existing.aliases.append(filepath)
+
+    photos = list(by_id.values())
+    if read_exif:
+        read_exif_batch(photos)
+    return photos
+
+
+def parse_exif_datetime(value: str | None) -> float | None:
+    """
+    将 EXIF 时间（'YYYY:MM:DD HH:MM:SS'）转换为时间戳（秒）。
+
+    EXIF 时间不带时区，这里按同一本地时区解释，只用于照片之间的相对比较。
+
+    Returns:
+        时间戳，无法解析返回 None
+    """
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip()[:19], '%Y:%m:%d %H:%M:%S').timestamp()
+    except (ValueError, OverflowError):
+        return None
+
+
 def read_exif_quick(filepath: str) -> dict:
     """快速读取关键 EXIF 信息（只读前 64KB 获取基本信息）"""
+    import exifread  # 延迟导入：只遍历目录（read_exif=False）时不需要
     try:
         with open(filepath, 'rb') as f:
             tags = exifread.process_file(f, stop_tag='DateTimeOriginal', details=False)
+        orientation = tags.get('Image Orientation')  # IFD0，在 DateTimeOriginal 之前读到
         return {
             'date_taken': str(tags.get('EXIF DateTimeOriginal', '')),
             'camera_model': str(tags.get('Image Model', '')),
+            'orientation': orientation.values[0] if orientation and orientation.values else None,
         }
     except Exception:
         return {}
 
 
+def read_exif_batch(
+    photos: list[PhotoInfo],
+    progress_callback: Callable[[int, int, str], None] | None = None,
+    metrics: StageMetrics | None = None,
+    tuner: 'StageTuner | None' = None,
+):
+    """
+    为一批照片读取 EXIF（拍摄时间、机型），结果写回 PhotoInfo。
+
+    只读取文件头，由 IOScheduler 按设备的并发数和目录/inode 顺序安排（不提示预读），
+    网络存储上多个请求同时在途，机械硬盘上按顺序读取。
+
+    Args:
+        photos: PhotoInfo 列表
+        progress_callback: 进度回调 (当前数量, 总数量, 当前文件名)
+        metrics: 阶段指标（可选），记录每个文件的 EXIF 读取耗时和设备划分
+        tuner: 自适应并发控制器（可选，见 IOScheduler.map）
+    """
+    from backend.core.ioscheduler import IOScheduler
+
+    by_path = {info.path: info for info in photos}
+    total = len(photos)
+
+    def read(path: str) -> dict:
+        start = time.perf_counter()
+        exif = read_exif_quick(path)
+        if metrics is not None:
+            metrics.record_file(path, time.perf_counter() - start, ok=bool(exif))
+        return exif
+
+    scheduler = IOScheduler()
+    results = scheduler.map(read, list(by_path), [info.file_id for info in photos], readahead=0, tuner=tuner)
+    for i, (path, exif) in enumerate(results):
+        info = by_path[path]
+        info.date_taken = exif.get('date_taken') or None
+        info.camera_model = exif.get('camera_model') or None
+        info.orientation = exif.get('orientation')
+        if progress_callback and (i % 50 == 0 or i == total - 1):
+            progress_callback(i + 1, total, info.filename)
+    if metrics is not None:
+        metrics.devices = scheduler.plan_summary()
+
+
+def resolve_scan_roots(directories: list[str]) -> tuple[list[str], list[dict]]:
+    """
+    规范化扫描根目录并检测重叠。
+
+    每个根目录先解析为真实路径（消除符号链接和 ..），重复的根目录和
+    被其他根目录包含的子目录会被剔除，避免同一目录树被扫描两次。
+
+    Args:
+        directories: 用户指定的根目录列表
+
+    Returns:
+        (roots, overlaps)
+        - roots: 实际需要遍历的根目录（真实路径，保持输入顺序）
+        - overlaps: [{'root': 被剔除的目录, 'covered_by': 覆盖它的根目录}, ...]
+    """
+    real_of: dict[str, int] = {}  # 真实路径 → 第一个给出它的输入序号
+    for i, d in enumerate(directories):
+        real_of.setdefault(os.path.realpath(d), i)
+
+    def _covering(real: str) -> str | None:
+        """返回包含 real 的另一个根目录（真实路径），没有则返回 None"""
+        for other in real_of:
+            if other != real and real.startswith(other.rstrip(os.sep) + os.sep):
+                return other
+        return None
+
+    roots: list[str] = []
+    overlaps: list[dict] = []
+    for i, d in enumerate(directories):
+        real = os.path.realpath(d)
+        if real_of[real] != i:
+            overlaps.append({'root': d, 'covered_by': directories[real_of[real]]})
+            continue
+        parent = _covering(real)
+        if parent is not None:
+            overlaps.append({'root': d, 'covered_by': directories[real_of[parent]]})
+        else:
+            roots.append(real)
+
+    return roots, overlaps
+
+
+def walk_unique_dirs(
+    roots: list[str],
+    visited: set[tuple[int, int]] | None = None,
+    aliases: bool = False,
+):
+    """
+    遍历根目录下的所有目录，按物理身份去重。
+
+    跟随符号链接目录，但以 (st_dev, st_ino) 记录已访问的目录，
+    因此符号链接环和指向已扫描目录的链接都只会遍历一次。
+    与 os.walk 相同，调用方可以修改产出的 dirs 来跳过子目录。
+
+    aliases=True 时，经由符号链接再次到达的目录也会产出（第四项以外与首次相同），
+    调用方据此把其中的文件记为别名；别名目录的子目录继续遍历，
+    直到遇到路径上的祖先目录（符号链接环）为止。
+
+    Args:
+        roots: 根目录
+        visited: 已访问目录的 (st_dev, st_ino)，原地更新（监视模式跨多次遍历共用）
+        aliases: 是否产出再次到达的目录
+
+    Yields:
+        (目录路径, (st_dev, st_ino), 子目录名列表, 文件名列表)
+    """
+    visited = set() if visited is None else visited
+
+    for root in roots:
+        ids: dict[str, tuple[int, int]] = {}  # 本根目录下已产出的目录路径 → 物理身份（查找祖先）
+        for dirpath, dirs, files in os.walk(root, followlinks=True):
+            try:
+                st = os.stat(dirpath)
+            except OSError:
+                dirs.clear()
+                continue
+            dir_id = (st.st_dev, st.st_ino)
+            if dir_id in visited:
+                if not aliases:
+                    dirs.clear()
+                    continue
+                if dir_id in _ancestor_ids(dirpath, ids):
+                    dirs.clear()  # 符号链接环：记下这一层的别名，不再深入
+            visited.add(dir_id)
+            ids[dirpath] = dir_id
+            dirs.sort()
+            yield dirpath, dir_id, dirs, files
+
+
+def _ancestor_ids(dirpath: str, ids: dict[str, tuple[int, int]]):
+    """dirpath 在本次遍历中各级父目录的物理身份"""
+    parent = os.path.dirname(dirpath)
+    while parent in ids:
+        yield ids[parent]
+        parent, prev = os.path.dirname(parent), parent
+        if parent == prev:
+            break
+
+
+def _walk_unique(roots: list[str], extensions: set[str], recursive: bool = True):
+    """
+    遍历根目录（见 walk_unique_dirs），列出扩展名匹配的文件。
+
+    recursive=False 时只列出根目录本身的文件。经由符号链接再次到达的目录中的文件也会列出
+    （物理身份与首次到达的路径相同，由调用方记为别名）。
+
+    Yields:
+        (文件路径, os.stat_result)
+    """
+    for dirpath, _, dirs, files in walk_unique_dirs(roots, aliases=True):
+        if not recursive:
+            dirs.clear()
+        for fname in sorted(files):
+            if fname.startswith('.'):
+                continue
+            ext = os.path.splitext(fname)[1].lower()
+            if ext not in extensions:
+                continue
+            filepath = os.path.join(dirpath, fname)
+            try:
+                yield filepath, os.stat(filepath)
+            except OSError:
+                continue  # 失效的符号链接等
+
+
 def scan_directory(
-    directory: str,
+    directory: str | list[str],
     include_raw: bool = True,
     include_images: bool = False,
     read_exif: bool = True,
     progress_callback: Callable[[int, int, str], None] | None = None,
+    metrics: StageMetrics | None = None,
+    recursive: bool = True,
+    tuner: 'StageTuner | None' = None,
 ) -> list[PhotoInfo]:
     """
     递归扫描目录，收集所有照片文件。
 
+    同一物理文件（硬链接、经由符号链接或重叠根目录到达的路径）只生成
+    一条 PhotoInfo，并只读取一次 EXIF；其余路径记录在 PhotoInfo.aliases 中。
+
     Args:
-        directory: 要扫描的目录路径
+        directory: 要扫描的目录路径，或多个根目录组成的列表
         include_raw: 是否包含 RAW 文件
         include_images: 是否包含普通图片（JPG 等）
         read_exif: 是否读取 EXIF 信息
         progress_callback: 进度回调 (当前数量, 总数量, 当前文件名)
+        metrics: 阶段指标（可选），记录每个文件的 EXIF 读取耗时
+        recursive: 是否递归扫描子目录（分片扫描时根目录自身的文件单独成片）
+        tuner: 读取 EXIF 的自适应并发控制器（可选）
 
     Returns:
         PhotoInfo 列表
     """
+    directories = [directory] if isinstance(directory, str) else list(directory)
+    roots, _overlaps = resolve_scan_roots(directories)
+
     # 先收集所有符合条件的文件路径
     extensions = set()
     if include_raw:
@@ -73,29 +471,19 @@ def scan_directory(
     if include_images:
         extensions |= IMAGE_EXTENSIONS
 
-    all_files = []
-    for root, _dirs, files in os.walk(directory):
-        for fname in files:
-            if fname.startswith('.'):
-                continue
-            ext = os.path.splitext(fname)[1].lower()
-            if ext in extensions:
-                all_files.append(os.path.join(root, fname))
-
-    total = len(all_files)
-    photos = []
-
-    for i, filepath in enumerate(all_files):
-        info = PhotoInfo(filepath)
+    by_id: dict[tuple[int, int], PhotoInfo] = {}
+    for filepath, st in _walk_unique(roots, extensions, recursive):
+        file_id = (st.st_dev, st.st_ino)
+        existing = by_id.get(file_id)
+        if existing is None:
+            by_id[file_id] = PhotoInfo(filepath, st)
+        elif filepath != existing.path and filepath not in existing.aliases:
+            existing.aliases.append(filepath)
 
-        if read_exif:
-            exif = read_exif_quick(filepath)
-            info.date_taken = exif.get('date_taken') or None
-            info.camera_model = exif.get('camera_model') or None
-
-        photos.append(info)
-
-        if progress_callback and (i % 50 == 0 or i == total - 1):
-            progress_callback(i + 1, total, info.filename)
+    photos = list(by_id.values())
+    if read_exif:
+        read_exif_batch(photos, progress_callback, metrics, tuner)
+    elif progress_callback and photos:
+        progress_callback(len(photos), len(photos), photos[-1].filename)
 
     return photos
@@ -0,0 +1,417 @@
+"""
+分片扫描 — 把提取/哈希阶段拆到多台机器（或同一台机器的多个进程）上执行，集中分组。
+
+每个工作节点扫描一个或多个子目录，输出自包含的分片文件（.pdshard，NumPy npz 格式）：
+路径、大小、修改时间、EXIF、设备号/inode 以及打包为 uint64 的 pHash。
+合并步骤把任意数量的分片拼成一个结果，交给分组阶段（CLI 的 group 子命令）。
+
+分片之间可能因为硬链接、符号链接或重叠的子目录包含同一物理文件：
+同一主机上按 (st_dev, st_ino) 去重，不同主机之间按路径去重。
+"""
+
+import json
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from backend.config import CASCADE_VERIFICATION, MAX_WORKERS, QUALITY_SCORING
+from backend.core.hashindex import pack_hashes, unpack_hash
+from backend.core.orientation import display_variants
+
+SHARD_FORMAT = "photodedup-shard"
+# 2: 增加画质指标、规范哈希与核验签名；1 版的分片仍可读取，缺少的字段按未计算处理
+SHARD_VERSION = 2
+SHARD_OLDER_VERSIONS = (1,)
+SHARD_SUFFIX = ".pdshard"
+
+
+class Shard:
+    """
+    一个分片：若干拍摄单元的元数据与哈希，按列存储。
+
+    text 中每列是等长的 Python 列表（路径、配对文件、别名、相机型号、拍摄时间、
+    规范哈希 [[十六进制哈希, 显示方向的姿态], ...]，未计算时为 None），
+    arrays 中每列是等长的 NumPy 数组；timestamp 以 NaN 表示无拍摄时间，
+    has_hash 为 False 的行表示缩略图/哈希失败，画质指标（sharpness、clipping、noise）以 NaN 表示未计算。
+    """
+
+    TEXT_FIELDS = (
+        "path", "siblings", "aliases", "camera_model", "date_taken", "orientation", "signature", "exif_orientation",
+    )
+    ARRAY_FIELDS = {
+        "size": np.int64,
+        "mtime": np.float64,
+        "timestamp": np.float64,
+        "dev": np.uint64,
+        "ino": np.uint64,
+        "hash": np.uint64,
+        "has_hash": np.bool_,
+        "sharpness": np.float32,
+        "clipping": np.float32,
+        "noise": np.float32,
+    }
+    QUALITY_FIELDS = ("sharpness", "clipping", "noise")  # 早期的分片文件没有这几列
+
+    def __init__(self, meta: dict, text: dict[str, list], arrays: dict[str, np.ndarray]):
+        self.meta = meta
+        self.text = text
+        self.arrays = arrays
+
+    def __len__(self) -> int:
+        return len(self.text["path"])
+
+    @classmethod
+    def from_captures(
+        cls,
+        captures: list,
+        hashes: dict[str, str],
+        meta: dict,
+        qualities: dict[str, tuple | None] | None = None,
+        orientations: dict[str, list | None] | None = None,
+        signatures: dict[str, str | None] | None = None,
+    ) -> "Shard":
+        """
+        由拍摄单元和哈希结果构建分片。
+
+        Args:
+            captures: CaptureUnit 列表
+            hashes: {代表文件 path: pHash 十六进制}
+            meta: 附加元数据（根目录、主机名等）
+            qualities: {代表文件 path: (清晰度, 过曝/欠曝比例, 噪声)}（可选）
+            orientations: {代表文件 path: [(规范哈希, 存储方向的姿态), ...]}（可选，按 EXIF Orientation 换算）
+            signatures: {代表文件 path: 存储方向的核验签名}（可选）
+        """
+        orientations = orientations or {}
+        signatures = signatures or {}
+        text = {
+            "path": [c.path for c in captures],
+            "siblings": [c.siblings for c in captures],
+            "aliases": [c.representative.aliases for c in captures],
+            "camera_model": [c.camera_model for c in captures],
+            "date_taken": [c.date_taken for c in captures],
+            "orientation": [
+                [[unpack_hash(h), k] for h, k in variants] if variants else None
+                for variants in (display_variants(orientations.get(c.path), c.orientation) for c in captures)
+            ],
+            "signature": [signatures.get(c.path) for c in captures],
+            "exif_orientation": [c.orientation for c in captures],
+        }
+        hash_list = [hashes.get(c.path) for c in captures]
+        qualities = qualities or {}
+        quality = np.array(
+            [qualities.get(c.path) or (np.nan, np.nan, np.nan) for c in captures], dtype=np.float32,
+        ).reshape(len(captures), 3)
+        arrays = {
+            "size": np.array([c.size for c in captures], dtype=np.int64),
+            "mtime": np.array([c.representative.mtime for c in captures], dtype=np.float64),
+            "timestamp": np.array(
+                [np.nan if c.timestamp is None else c.timestamp for c in captures], dtype=np.float64,
+            ),
+            "dev": np.array([c.representative.dev for c in captures], dtype=np.uint64),
+            "ino": np.array([c.representative.ino for c in captures], dtype=np.uint64),
+            "hash": pack_hashes([h or "0" for h in hash_list]),
+            "has_hash": np.array([h is not None for h in hash_list], dtype=np.bool_),
+            **{name: np.ascontiguousarray(quality[:, k]) for k, name in enumerate(cls.QUALITY_FIELDS)},
+        }
+        return cls(meta, text, arrays)
+
+    def save(self, path: str | Path) -> Path:
+        """写入分片文件（npz，不压缩：哈希几乎无法压缩，路径列以 JSON 存放）"""
+        path = Path(path)
+        header = {"format": SHARD_FORMAT, "version": SHARD_VERSION, "count": len(self), **self.meta}
+        blobs = {
+            "header": json.dumps(header, ensure_ascii=False),
+            "text": json.dumps(self.text, ensure_ascii=False),
+        }
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                **{k: np.frombuffer(v.encode("utf-8"), dtype=np.uint8) for k, v in blobs.items()},
+                **self.arrays,
+            )
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Shard":
+        """读取分片文件，格式或版本不符时抛出 ValueError"""
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(data["header"].tobytes().decode("utf-8"))
+            if header.get("format") != SHARD_FORMAT:
+                raise ValueError(f"{path}: 不是分片文件")
+            if header.get("version") not in (SHARD_VERSION, *SHARD_OLDER_VERSIONS):
+                raise ValueError(f"{path}: 不支持的分片版本 {header.get('version')}")
+            text = json.loads(data["text"].tobytes().decode("utf-8"))
+            count = len(text["path"])
+            text.setdefault("orientation", [None] * count)  # 早期的分片文件没有规范哈希、核验签名
+            text.setdefault("signature", [None] * count)
+            text.setdefault("exif_orientation", [None] * count)
+            arrays = {
+                k: data[k].astype(dtype, copy=False) if k in data.files else np.full(count, np.nan, dtype=dtype)
+                for k, dtype in cls.ARRAY_FIELDS.items()
+            }
+        meta = {k: v for k, v in header.items() if k not in ("format", "version", "count")}
+        return cls(meta, text, arrays)
+
+    def records(self) -> list[dict]:
+        """逐行展开为字典（与 CLI scan 输出的 photos 条目格式一致）"""
+        a = self.arrays
+        records = []
+        sharpness, clipping, noise = (a[k].astype(np.float64) for k in self.QUALITY_FIELDS)
+        for i, path in enumerate(self.text["path"]):
+            ts = float(a["timestamp"][i])
+            records.append({
+                "path": path,
+                "siblings": self.text["siblings"][i],
+                "aliases": self.text["aliases"][i],
+                "size": int(a["size"][i]),
+                "mtime": float(a["mtime"][i]),
+                "date_taken": self.text["date_taken"][i],
+                "timestamp": None if np.isnan(ts) else ts,
+                "camera_model": self.text["camera_model"][i],
+                "hash": unpack_hash(a["hash"][i]) if a["has_hash"][i] else None,
+                "orientation": self.text["orientation"][i],
+                "signature": self.text["signature"][i],
+                "exif_orientation": self.text["exif_orientation"][i],
+                "quality": None if np.isnan(sharpness[i]) else {
+                    "sharpness": round(float(sharpness[i]), 2),
+                    "clipping": round(float(clipping[i]), 4),
+                    "noise": round(float(noise[i]), 3),
+                },
+            })
+        return records
+
+
+# ─── 构建 ─────────────────────────────────────────────
+
+def build_shard(
+    roots: list[str],
+    include_images: bool = False,
+    read_exif: bool = True,
+    recursive: bool = True,
+    hash_workers: int = MAX_WORKERS,
+    progress_callback: Callable[[str, int, int, str], None] | None = None,
+) -> Shard:
+    """
+    扫描根目录并计算哈希，生成分片（遍历 → RAW+JPEG 配对 → 提取缩略图 → pHash）。
+
+    Args:
+        roots: 要扫描的根目录
+        include_images: 是否包含普通图片
+        read_exif: 是否读取 EXIF（时间窗口分组需要）
+        recursive: 是否递归子目录
+        hash_workers: 哈希线程数（多进程运行时按进程数均分）
+        progress_callback: 进度回调 (阶段名, 当前数量, 总数量, 当前文件名)
+
+    Returns:
+        Shard
+    """
+    from backend.core.scanner import scan_directory, resolve_scan_roots, pair_captures
+    from backend.core.thumbnail import extract_thumbnails_batch
+    from backend.core.hasher import compute_phash_batch
+
+    def reporter(stage: str):
+        if progress_callback is None:
+            return None
+        return lambda current, total, filename="": progress_callback(stage, current, total, filename)
+
+    real_roots, overlaps = resolve_scan_roots(roots)
+    photos = scan_directory(
+        real_roots,
+        include_raw=True,
+        include_images=include_images,
+        read_exif=read_exif,
+        progress_callback=reporter("scan"),
+        recursive=recursive,
+    )
+    captures = pair_captures(photos)
+    thumbs = extract_thumbnails_batch(
+        [c.path for c in captures],
+        progress_callback=reporter("extract"),
+        file_ids=[c.representative.file_id for c in captures],
+    )
+    thumb_map = {orig: str(t) for orig, t in thumbs.items() if t}
+    qualities = {} if QUALITY_SCORING else None
+    orientations = {}
+    signatures = {} if CASCADE_VERIFICATION else None
+    hashes = compute_phash_batch(
+        thumb_map, progress_callback=reporter("hash"), max_workers=hash_workers,
+        qualities=qualities, orientations=orientations, signatures=signatures,
+    )
+
+    meta = {
+        "host": socket.gethostname(),
+        "roots": real_roots,
+        "overlaps": overlaps,
+        "recursive": recursive,
+        "include_images": include_images,
+        "created_at": time.time(),
+    }
+    return Shard.from_captures(
+        captures, hashes, meta, qualities=qualities, orientations=orientations, signatures=signatures,
+    )
+
+
+def plan_local_shards(roots: list[str], jobs: int) -> list[tuple[list[str], bool]]:
+    """
+    把根目录拆成若干子树任务，供本机多进程执行。
+
+    每个根目录自身的文件为一个非递归任务；其下的子目录轮流分配到
+    jobs × 4 个递归任务中（多于进程数，以便先完成的进程继续领取任务）。
+
+    Returns:
+        [(子树根目录列表, 是否递归), ...]
+    """
+    tasks: list[tuple[list[str], bool]] = []
+    subdirs: list[str] = []
+    for root in roots:
+        tasks.append(([root], False))
+        try:
+            with os.scandir(root) as it:
+                entries = sorted(e.path for e in it if not e.name.startswith(".") and e.is_dir())
+        except OSError:
+            continue
+        subdirs.extend(entries)
+
+    buckets = max(1, min(len(subdirs), jobs * 4))
+    for b in range(buckets):
+        chunk = subdirs[b::buckets]
+        if chunk:
+            tasks.append((chunk, True))
+    return tasks
+
+
+def _shard_task(roots: list[str], recursive: bool, out_path: str, include_images: bool,
+                read_exif: bool, hash_workers: int) -> tuple[str, int]:
+    """工作进程入口：构建分片并写入文件，返回 (路径, 条目数)"""
+    shard = build_shard(roots, include_images, read_exif, recursive, hash_workers)
+    shard.save(out_path)
+    return out_path, len(shard)
+
+
+def scan_sharded(
+    directories: list[str],
+    output_dir: str | Path,
+    jobs: int = MAX_WORKERS,
+    include_images: bool = False,
+    read_exif: bool = True,
+    progress_callback: Callable[[int, int, str], None] | None = None,
+) -> list[Path]:
+    """
+    本机多进程分片扫描（多节点部署的单机替代）：每个任务由独立进程写出一个分片。
+
+    Args:
+        directories: 根目录列表
+        output_dir: 分片文件输出目录
+        jobs: 进程数
+        progress_callback: 进度回调 (已完成任务数, 任务总数, 分片路径)
+
+    Returns:
+        分片文件路径列表（按任务顺序）
+    """
+    from backend.core.scanner import resolve_scan_roots
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    roots, _overlaps = resolve_scan_roots(directories)
+    tasks = plan_local_shards(roots, jobs)
+    hash_workers = max(1, MAX_WORKERS // jobs)
+
+    paths = [str(output_dir / f"shard-{i:04d}{SHARD_SUFFIX}") for i in range(len(tasks))]
+    # LibRaw 启用了 OpenMP，fork 出的子进程可能死锁，因此用 spawn 启动工作进程
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as executor:
+        futures = [
+            executor.submit(_shard_task, task_roots, recursive, path, include_images, read_exif, hash_workers)
+            for (task_roots, recursive), path in zip(tasks, paths)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            path, _count = future.result()
+            if progress_callback:
+                progress_callback(done, len(futures), path)
+    return [Path(p) for p in paths]
+
+
+# ─── 合并 ─────────────────────────────────────────────
+
+def _remap_path(path: str, remap: list[tuple[str, str]]) -> str:
+    for old, new in remap:
+        if path == old or path.startswith(old.rstrip(os.sep) + os.sep):
+            return new.rstrip(os.sep) + path[len(old.rstrip(os.sep)):]
+    return path
+
+
+def merge_shards(shards: list[Shard], remap: list[tuple[str, str]] | None = None) -> Shard:
+    """
+    合并任意数量的分片。
+
+    同一主机上 (st_dev, st_ino) 相同、或路径相同的条目只保留第一个，
+    其余路径并入 aliases；没有哈希的条目被保留以便报告失败数。
+
+    Args:
+        shards: 分片列表
+        remap: 路径前缀替换 [(旧前缀, 新前缀), ...]，用于各节点挂载点不同的情况
+
+    Returns:
+        合并后的 Shard
+    """
+    remap = remap or []
+    text = {k: [] for k in Shard.TEXT_FIELDS}
+    rows: dict[str, list[np.ndarray]] = {k: [] for k in Shard.ARRAY_FIELDS}
+    seen: dict[tuple, int] = {}
+    roots, hosts = [], []
+
+    for shard in shards:
+        host = shard.meta.get("host", "")
+        hosts.append(host)
+        for r in shard.meta.get("roots", []):
+            r = _remap_path(r, remap)
+            if r not in roots:
+                roots.append(r)
+        a = shard.arrays
+        keep = np.zeros(len(shard), dtype=bool)
+        for i, path in enumerate(shard.text["path"]):
+            path = _remap_path(path, remap)
+            aliases = [_remap_path(p, remap) for p in shard.text["aliases"][i]]
+            keys = [("path", path)]
+            if a["ino"][i]:
+                keys.append(("inode", host, int(a["dev"][i]), int(a["ino"][i])))
+            existing = next((seen[k] for k in keys if k in seen), None)
+            if existing is not None:
+                known = text["aliases"][existing]
+                for p in [path, *aliases]:
+                    if p != text["path"][existing] and p not in known:
+                        known.append(p)
+                continue
+            index = len(text["path"])
+            for k in keys + [("path", p) for p in aliases]:
+                seen[k] = index
+            keep[i] = True
+            text["path"].append(path)
+            text["aliases"].append(aliases)
+            text["siblings"].append([_remap_path(p, remap) for p in shard.text["siblings"][i]])
+            text["camera_model"].append(shard.text["camera_model"][i])
+            text["date_taken"].append(shard.text["date_taken"][i])
+            text["orientation"].append(shard.text["orientation"][i])
+            text["signature"].append(shard.text["signature"][i])
+            text["exif_orientation"].append(shard.text["exif_orientation"][i])
+        for k in Shard.ARRAY_FIELDS:
+            rows[k].append(a[k][keep])
+
+    arrays = {
+        k: np.concatenate(rows[k]).astype(dtype, copy=False) if rows[k] else np.empty(0, dtype=dtype)
+        for k, dtype in Shard.ARRAY_FIELDS.items()
+    }
+    meta = {
+        "host": ",".join(sorted(set(hosts))),
+        "roots": roots,
+        "overlaps": [],
+        "merged_from": len(shards),
+        "created_at": time.time(),
+    }
+    return Shard(meta, text, arrays)
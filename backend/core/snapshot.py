@@ -0,0 +1,357 @@
+"""
+扫描结果快照 — 紧凑的版本化二进制格式，用于导出/导入一次完成的扫描。
+
+文件布局（小端）：
+
+    8 字节魔数 b"PDSCAN\\0\\0" | uint32 版本 | uint32 头部长度 | 头部 JSON | 各数据段
+
+头部 JSON 记录扫描参数、Lightroom 编辑/标记信息以及每个数据段的
+{offset, dtype, count}；数据段按 8 字节对齐，读取时整个文件 np.memmap，
+照片表（PhotoTable）的各列直接是映射上的视图，不做拷贝。
+
+数据段：
+- 字符串表（*_blob + *_offsets）：目录（去重）、文件名、相机型号、配对/别名路径
+- 按拍摄单元的列（与 PhotoTable 一一对应）：所在目录、大小、修改时间、
+  拍摄时间戳（NaN 为无）、打包的 uint64 pHash、标志位（哈希 / Lightroom 编辑、
+  标记、排除）、相机型号下标（-1 为无）、画质指标、规范哈希与姿态（见 orientation.py）、EXIF Orientation 的姿态、
+  核验签名（每单元 SIGNATURE_WORDS 个 uint64，见 cascade.py）
+- 配对文件 / 别名：每单元的偏移数组 + 路径表下标
+- 备选规范哈希：每单元的偏移数组 + 哈希 + 姿态
+- 分组：偏移数组 + 成员下标
+- 邻接图：节点对应的单元下标、按距离排序的边 (i, j, d)，导入后可继续调整阈值
+"""
+
+import gc
+import json
+import os
+import struct
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend.core.cascade import SIGNATURE_WORDS
+from backend.core.grouper import NeighborGraph, PhotoGroup
+from backend.core.phototable import PhotoTable, decode_strings, encode_strings
+
+SNAPSHOT_MAGIC = b"PDSCAN\0\0"
+# 2: 增加画质指标、规范哈希/姿态与核验签名各段；1 版的文件仍可读取，缺少的段按未计算处理
+SNAPSHOT_VERSION = 2
+SNAPSHOT_SUFFIX = ".pdscan"
+
+_ALIGN = 8
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _ragged(mapping: dict[int, list[str]], units: int, extra_index: dict[str, int]) -> tuple[np.ndarray, np.ndarray]:
+    """稀疏的 {单元 id: [路径, ...]} → (uint32 偏移数组 units+1, uint32 路径表下标)"""
+    counts = np.zeros(units, dtype=np.uint32)
+    for i, values in mapping.items():
+        counts[i] = len(values)
+    offsets = np.zeros(units + 1, dtype=np.uint32)
+    np.cumsum(counts, out=offsets[1:])
+    flat = np.fromiter(
+        (extra_index.setdefault(v, len(extra_index)) for i in sorted(mapping) for v in mapping[i]),
+        dtype=np.uint32, count=int(offsets[-1]),
+    )
+    return offsets, flat
+
+
+def _ragged_variants(mapping: dict[int, list], units: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """稀疏的 {单元 id: [(规范哈希, 姿态), ...]} → (uint32 偏移数组 units+1, uint64 哈希, uint8 姿态)"""
+    counts = np.zeros(units, dtype=np.uint32)
+    for i, values in mapping.items():
+        counts[i] = len(values)
+    offsets = np.zeros(units + 1, dtype=np.uint32)
+    np.cumsum(counts, out=offsets[1:])
+    flat = [v for i in sorted(mapping) for v in mapping[i]]
+    return (
+        offsets,
+        np.array([h for h, _ in flat], dtype=np.uint64),
+        np.array([k for _, k in flat], dtype=np.uint8),
+    )
+
+
+# ─── 分段文件（快照与图库索引共用） ─────────────────────────
+
+def write_sections(path: str | Path, magic: bytes, version: int, header: dict, sections: dict[str, np.ndarray]) -> Path:
+    """
+    写入「魔数 | 版本 | 头部 JSON | 数据段」格式的文件，头部中记录各段的 {offset, dtype, count}。
+
+    先写临时文件再替换，中途失败不会留下损坏的文件。
+    """
+    path = Path(path)
+    header = {**header, "sections": {}}
+    # 先确定各段偏移：头部长度取决于偏移数字，迭代到稳定为止
+    offset_base = 0
+    while True:
+        offset = offset_base
+        for name, arr in sections.items():
+            offset = -(-offset // _ALIGN) * _ALIGN
+            header["sections"][name] = {"offset": offset, "dtype": arr.dtype.str, "count": int(arr.size)}
+            offset += arr.nbytes
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        data_start = -(-(_PREAMBLE.size + len(header_bytes)) // _ALIGN) * _ALIGN
+        if data_start == offset_base:
+            break
+        offset_base = data_start
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(magic, version, len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in sections.items():
+            f.seek(header["sections"][name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+class SectionFile:
+    """内存映射的分段文件，各段为只读 NumPy 视图"""
+
+    MAGIC = SNAPSHOT_MAGIC
+    VERSION = SNAPSHOT_VERSION
+    # 仍可读取的旧版本（只是少了一些段）
+    OLDER_VERSIONS: tuple[int, ...] = (1,)
+    DESCRIPTION = "PhotoDedup 快照"
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        if self.path.stat().st_size < _PREAMBLE.size:
+            raise ValueError(f"{path}: 文件不完整，不是有效的{self.DESCRIPTION}文件")
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode="r")
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mm[:_PREAMBLE.size].tobytes())
+        if magic != self.MAGIC:
+            raise ValueError(f"{path}: 不是 {self.DESCRIPTION}文件")
+        if version != self.VERSION and version not in self.OLDER_VERSIONS:
+            raise ValueError(f"{path}: 不支持的 {self.DESCRIPTION}版本 {version}")
+        start = _PREAMBLE.size
+        if start + header_len > len(self._mm):
+            raise ValueError(f"{path}: 文件不完整（头部被截断）")
+        self.header = json.loads(self._mm[start:start + header_len].tobytes().decode("utf-8"))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        info = self.header["sections"][name]
+        dtype = np.dtype(info["dtype"])
+        return np.frombuffer(self._mm, dtype=dtype, count=info["count"], offset=info["offset"])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.header["sections"]
+
+    def strings(self, name: str) -> list[str]:
+        return decode_strings(self[f"{name}_blob"], self[f"{name}_offsets"])
+
+
+# ─── 导出 ─────────────────────────────────────────────
+
+def write_snapshot(path: str | Path, state: dict) -> Path:
+    """
+    把一次完成的扫描写入快照文件。
+
+    Args:
+        path: 输出路径
+        state: routes.scan_state（table、graph、groups 等字段）
+
+    Returns:
+        写入的文件路径
+    """
+    path = Path(path)
+    table: PhotoTable = state["table"]
+    graph: NeighborGraph | None = state.get("graph")
+    groups: list[PhotoGroup] = state.get("groups") or []
+    units = len(table)
+
+    extra_index: dict[str, int] = {}
+    sib_offsets, sib_values = _ragged(table.siblings, units, extra_index)
+    alias_offsets, alias_values = _ragged(table.aliases, units, extra_index)
+    alt_offsets, alt_hash, alt_pose = _ragged_variants(table.orient_alts, units)
+    group_offsets = np.zeros(len(groups) + 1, dtype=np.uint32)
+    np.cumsum([g.count for g in groups], out=group_offsets[1:])
+
+    sections = {
+        "unit_dir": table.dir_id.astype(np.uint32, copy=False),
+        "unit_cam": table.camera_id.astype(np.int32, copy=False),
+        "size": table.size,
+        "mtime": table.mtime,
+        "timestamp": table.timestamp,
+        "hash": table.packed,
+        "flags": table.flags,
+        "sharpness": table.sharpness,
+        "clipping": table.clipping,
+        "noise": table.noise,
+        "orient": table.orient,
+        "pose": table.pose,
+        "orient_alt_offsets": alt_offsets,
+        "orient_alt_hash": alt_hash,
+        "orient_alt_pose": alt_pose,
+        "exif_pose": table.exif_pose,
+        "signature": table.signature.reshape(-1),
+        "sib_offsets": sib_offsets,
+        "sib_values": sib_values,
+        "alias_offsets": alias_offsets,
+        "alias_values": alias_values,
+        "group_offsets": group_offsets,
+        "group_members": np.concatenate([g.ids for g in groups]).astype(np.uint32) if groups
+        else np.zeros(0, dtype=np.uint32),
+        "name_blob": table.name_blob,
+        "name_offsets": table.name_offsets,
+    }
+    for name, values in (
+        ("dir", table.dirs),
+        ("cam", table.cameras),
+        ("extra", list(extra_index)),
+    ):
+        sections[f"{name}_blob"], sections[f"{name}_offsets"] = encode_strings(values)
+
+    if graph is not None:
+        sections["graph_nodes"] = graph.nodes.astype(np.uint32)
+        sections["edges_i"] = graph.edges_i.astype(np.int32, copy=False)
+        sections["edges_j"] = graph.edges_j.astype(np.int32, copy=False)
+        sections["edges_d"] = graph.edges_d.astype(np.uint8, copy=False)
+
+    header = {
+        "created_at": time.time(),
+        "units": units,
+        "photo_count": state.get("photo_count") or table.photo_count,
+        "threshold": state.get("threshold"),
+        "max_threshold": graph.max_threshold if graph is not None else None,
+        "cascade": graph.cascade if graph is not None else None,
+        "scan_dir": state.get("scan_dir", ""),
+        "scan_dirs": state.get("scan_dirs", []),
+        "include_images": state.get("include_images", False),
+        "time_window": state.get("time_window"),
+        "include_undated": state.get("include_undated", True),
+        "orientation": state.get("orientation", "off"),
+        "root_overlaps": state.get("root_overlaps", []),
+        "lrcat_path": state.get("lrcat_path", ""),
+        "edited": sorted(state.get("edited_photos") or []),
+        "flagged": state.get("flagged_photos") or {},
+        "lightroom_flags": True,  # flags 列已包含编辑/标记位，导入时无需按路径重新匹配
+    }
+    return write_sections(path, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, header, sections)
+
+
+# ─── 导入 ─────────────────────────────────────────────
+
+class Snapshot(SectionFile):
+    """内存映射的快照文件，各列为只读 NumPy 视图"""
+
+    def ragged_paths(self, name: str) -> dict[int, list[str]]:
+        """配对文件 / 别名：{单元 id: [路径, ...]}，只包含非空的条目"""
+        offsets = self[f"{name}_offsets"]
+        counts = np.diff(offsets)
+        if not counts.any():
+            return {}
+        extra = self.strings("extra")
+        values = self[f"{name}_values"]
+        result = {}
+        for u in np.nonzero(counts)[0].tolist():
+            result[u] = [extra[v] for v in values[offsets[u]:offsets[u + 1]].tolist()]
+        return result
+
+    def ragged_variants(self) -> dict[int, list[tuple[int, int]]]:
+        """备选规范哈希：{单元 id: [(规范哈希, 姿态), ...]}，早期写入的快照没有（返回空）"""
+        if "orient_alt_offsets" not in self:
+            return {}
+        offsets = self["orient_alt_offsets"]
+        counts = np.diff(offsets)
+        hashes, poses = self["orient_alt_hash"].tolist(), self["orient_alt_pose"].tolist()
+        return {
+            u: list(zip(hashes[offsets[u]:offsets[u + 1]], poses[offsets[u]:offsets[u + 1]]))
+            for u in np.nonzero(counts)[0].tolist()
+        }
+
+    def table(self) -> PhotoTable:
+        """
+        由快照各列构建照片表。
+
+        数值列和文件名直接使用内存映射视图（不拷贝），只有标志位复制一份（可写）。
+        """
+        h = self.header
+        return PhotoTable(
+            dirs=self.strings("dir"),
+            cameras=self.strings("cam"),
+            dir_id=self["unit_dir"],
+            name_blob=self["name_blob"],
+            name_offsets=self["name_offsets"],
+            size=self["size"],
+            mtime=self["mtime"],
+            timestamp=self["timestamp"],
+            packed=self["hash"],
+            flags=self["flags"].copy(),
+            camera_id=self["unit_cam"],
+            siblings=self.ragged_paths("sib"),
+            aliases=self.ragged_paths("alias"),
+            photo_count=h.get("photo_count"),
+            orient_alts=self.ragged_variants(),
+            signature=self["signature"].reshape(-1, SIGNATURE_WORDS) if "signature" in self else None,
+            # 早期写入的快照没有画质指标、规范哈希、核验签名（按未计算处理）
+            **{
+                name: self[name]
+                for name in ("sharpness", "clipping", "noise", "orient", "pose", "exif_pose") if name in self
+            },
+        )
+
+
+def load_snapshot(path: str | Path) -> dict:
+    """
+    读取快照，返回可直接 update 到 scan_state 的字段。
+
+    照片表的列、邻接图的边、分组成员都是内存映射上的视图，
+    需要解码为 Python 对象的只有目录表、相机型号表和稀疏的配对/别名路径。
+    """
+    # 解码阶段一次性创建大量小对象，暂停分代 GC 以免反复全量扫描
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _load_snapshot(path)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _load_snapshot(path: str | Path) -> dict:
+    from backend.core.recommender import recommend_all
+
+    snap = Snapshot(path)
+    h = snap.header
+    table = snap.table()
+
+    edited = set(h.get("edited", []))
+    flagged = h.get("flagged", {})
+    if not h.get("lightroom_flags") and (edited or flagged):
+        # 早期写入的快照 flags 列只有哈希位，按路径补上编辑/标记位
+        table.apply_lightroom(edited, flagged)
+
+    graph = None
+    if "graph_nodes" in snap:
+        graph = NeighborGraph(
+            table, snap["graph_nodes"],
+            snap["edges_i"], snap["edges_j"], snap["edges_d"],
+            h["max_threshold"], h.get("cascade"),
+        )
+
+    members = snap["group_members"]
+    offsets = snap["group_offsets"].tolist()
+    groups = [PhotoGroup(gid, table, members[a:b]) for gid, (a, b) in enumerate(zip(offsets, offsets[1:]))]
+
+    return {
+        "table": table,
+        "photo_count": table.photo_count,
+        "graph": graph,
+        "threshold": h.get("threshold"),
+        "groups": groups,
+        "scan_dir": h.get("scan_dir", ""),
+        "scan_dirs": h.get("scan_dirs", []),
+        "include_images": h.get("include_images", False),
+        "time_window": h.get("time_window"),
+        "include_undated": h.get("include_undated", True),
+        "orientation": h.get("orientation", "off"),
+        "root_overlaps": h.get("root_overlaps", []),
+        "lrcat_path": h.get("lrcat_path", ""),
+        "edited_photos": edited,
+        "flagged_photos": flagged,
+        "recommendations": recommend_all(groups),
+        "snapshot": snap,
+    }
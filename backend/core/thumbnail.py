@@ -5,14 +5,22 @@ NEF 文件内嵌有 JPEG 预览，直接提取比完整解码 RAW 快 100 倍以
 
 import hashlib
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
 
 import rawpy
 from PIL import Image
 from io import BytesIO
 
-from backend.config import THUMBNAIL_SIZE, CACHE_DIR
+from backend.config import THUMBNAIL_SIZE, CACHE_DIR, RAW_EXTENSIONS, DECODE_ISOLATION, DECODE_FULL_WORKERS
+from backend.core.decoder import FAILED, get_decoder
+from backend.core.ioscheduler import IOScheduler
+from backend.core.metrics import StageMetrics
+
+if TYPE_CHECKING:
+    from backend.core.autotune import StageTuner
 
 
 def _cache_key(filepath: str) -> str:
@@ -22,9 +30,20 @@ def _cache_key(filepath: str) -> str:
     return hashlib.md5(key_str.encode()).hexdigest()
 
 
-def _cache_path(filepath: str) -> Path:
-    """获取缓存文件路径"""
-    return CACHE_DIR / f"{_cache_key(filepath)}.jpg"
+def _cache_path(filepath: str, size: tuple[int, int] = THUMBNAIL_SIZE) -> Path:
+    """获取缓存文件路径（默认尺寸之外的尺寸以长边区分，如大预览 <键>_1600.jpg）"""
+    if tuple(size) == THUMBNAIL_SIZE:
+        return CACHE_DIR / f"{_cache_key(filepath)}.jpg"
+    return CACHE_DIR / f"{_cache_key(filepath)}_{max(size)}.jpg"
+
+
+def cached_thumbnail(filepath: str, size: tuple[int, int] = THUMBNAIL_SIZE) -> Path | None:
+    """已缓存的缩略图，没有（或原文件不可读）时返回 None，不做提取"""
+    try:
+        cached = _cache_path(filepath, size)
+    except OSError:
+        return None
+    return cached if cached.exists() else None
 
 
 def extract_thumbnail(
@@ -36,47 +55,122 @@ def extract_thumbnail(
     从 RAW 文件提取缩略图。
 
     优先提取嵌入式 JPEG 预览（极快），失败则回退到完整解码（慢）。
+    普通图片（JPG 等）直接用 PIL 解码，JPEG 借助 draft 模式按比例缩小解码。
     结果缓存到磁盘，重复调用不会重复提取。
 
     Args:
-        filepath: RAW 文件路径
+        filepath: RAW 或普通图片文件路径
         size: 缩略图尺寸
         use_cache: 是否使用缓存
 
     Returns:
         缩略图文件路径，失败返回 None
     """
-    cached = _cache_path(filepath)
+    cached = _cache_path(filepath, size)
 
     if use_cache and cached.exists():
         return cached
 
+    if not is_raw(filepath):
+        img = _open_image(filepath, size)
+        if img is None:
+            return None
+        return _save_thumbnail(img, size, cached)
+
+    # 方法 1: 提取嵌入式 JPEG 预览（极快）；方法 2: 完整解码 RAW（较慢，作为兜底）
+    img = _embedded_preview(filepath)
+    if img is None:
+        img = _decode_raw(filepath)
+        if img is None:
+            return None
+
+    return _save_thumbnail(img, size, cached)
+
+
+def get_thumbnail(filepath: str, size: tuple[int, int] = THUMBNAIL_SIZE) -> Path | None:
+    """
+    单个文件的缩略图（按需提取）。DECODE_ISOLATION 开启时 RAW 在隔离的解码进程中提取，
+    卡死或崩溃不影响服务进程。
+    """
+    if not DECODE_ISOLATION or not is_raw(filepath):
+        return extract_thumbnail(filepath, size)
+    try:
+        cached = _cache_path(filepath, size)
+    except OSError:
+        return None
+    if cached.exists():
+        return cached
+    return get_decoder().thumbnail(filepath, size)
+
+
+def extract_raw_thumbnail(filepath: str, size: tuple[int, int] = THUMBNAIL_SIZE, full: bool = False) -> Path | None:
+    """
+    只用一种方法从 RAW 生成缩略图并写入缓存（由隔离的解码进程调用，见 decoder.py）。
+
+    Args:
+        filepath: RAW 文件路径
+        size: 缩略图尺寸
+        full: False 提取嵌入式预览，True 完整解码
+
+    Returns:
+        缩略图文件路径，失败返回 None
+    """
+    img = _decode_raw(filepath) if full else _embedded_preview(filepath)
+    if img is None:
+        return None
+    try:
+        return _save_thumbnail(img, size, _cache_path(filepath, size))
+    except Exception:
+        return None
+
+
+def is_raw(filepath: str) -> bool:
+    return os.path.splitext(filepath)[1].lower() in RAW_EXTENSIONS
+
+
+def _embedded_preview(filepath: str) -> Image.Image | None:
+    """RAW 内嵌的 JPEG / 位图预览"""
     try:
-        # 方法 1: 提取嵌入式 JPEG 预览（极快）
         with rawpy.imread(filepath) as raw:
             thumb = raw.extract_thumb()
 
         if thumb.format == rawpy.ThumbFormat.JPEG:
-            img = Image.open(BytesIO(thumb.data))
+            return Image.open(BytesIO(thumb.data))
         elif thumb.format == rawpy.ThumbFormat.BITMAP:
-            img = Image.fromarray(thumb.data)
+            return Image.fromarray(thumb.data)
         else:
             raise ValueError(f"Unknown thumb format: {thumb.format}")
+    except Exception:
+        return None
+
+
+def _decode_raw(filepath: str) -> Image.Image | None:
+    """完整解码 RAW（半尺寸），每张需要数秒"""
+    try:
+        with rawpy.imread(filepath) as raw:
+            rgb = raw.postprocess(
+                use_camera_wb=True,
+                half_size=True,  # 半尺寸加速
+                no_auto_bright=True,
+            )
+        return Image.fromarray(rgb)
+    except Exception:
+        return None
+
 
+def _open_image(filepath: str, size: tuple[int, int]) -> Image.Image | None:
+    """用 PIL 打开普通图片；JPEG 使用 draft 模式直接以缩小的尺寸解码"""
+    try:
+        img = Image.open(filepath)
+        img.draft('RGB', size)
+        img.load()
+        return img
     except Exception:
-        try:
-            # 方法 2: 完整解码 RAW（较慢，作为兜底）
-            with rawpy.imread(filepath) as raw:
-                rgb = raw.postprocess(
-                    use_camera_wb=True,
-                    half_size=True,  # 半尺寸加速
-                    no_auto_bright=True,
-                )
-            img = Image.fromarray(rgb)
-        except Exception:
-            return None
+        return None
 
-    # 缩放并保存
+
+def _save_thumbnail(img: Image.Image, size: tuple[int, int], cached: Path) -> Path:
+    """缩放并保存缩略图到缓存"""
     img.thumbnail(size, Image.LANCZOS)
 
     if img.mode != 'RGB':
@@ -86,28 +180,114 @@ def extract_thumbnail(
     return cached
 
 
+_NEEDS_FULL_DECODE = object()  # 预览提取失败，交给完整解码的进程池
+
+
+def _file_size(filepath: str) -> int:
+    try:
+        return os.path.getsize(filepath)
+    except OSError:
+        return 0
+
+
 def extract_thumbnails_batch(
     filepaths: list[str],
     size: tuple[int, int] = THUMBNAIL_SIZE,
     progress_callback: Callable[[int, int, str], None] | None = None,
+    metrics: StageMetrics | None = None,
+    file_ids: list[tuple[int, int]] | None = None,
+    scheduler: IOScheduler | None = None,
+    tuner: 'StageTuner | None' = None,
+    on_result: Callable[[str, Path | None], None] | None = None,
 ) -> dict[str, Path | None]:
     """
     批量提取缩略图。
 
+    读取由 IOScheduler 按设备安排：每个设备按其类型的并发数并行，按目录/inode 顺序读取，
+    并提前提示内核预读后面的文件（缩略图已缓存、不需要读取原文件的除外）。
+
+    DECODE_ISOLATION 开启时 RAW 在隔离的解码进程中提取预览（见 decoder.py）：卡死或崩溃的文件
+    超时后记入隔离名单，之后跳过；没有嵌入预览、需要完整解码的文件交给低优先级的进程池，
+    与其余文件的预览提取同时进行。
+
     Args:
         filepaths: 文件路径列表
         size: 缩略图尺寸
         progress_callback: 进度回调
+        metrics: 阶段指标（可选），记录逐文件耗时、缓存命中、读取字节数和设备划分
+        file_ids: 与 filepaths 对应的 (st_dev, st_ino)（扫描时已得到，可省略）
+        scheduler: I/O 调度器，默认按配置新建
+        tuner: 自适应并发控制器（可选，见 IOScheduler.map）
+        on_result: 每个文件完成时在调用线程中回调 (文件路径, 缩略图路径)，按完成顺序（扫描中的临时分组）
 
     Returns:
         {文件路径: 缩略图路径} 字典
     """
     total = len(filepaths)
     results = {}
+    scheduler = scheduler or IOScheduler()
+    decoder = None
+    if DECODE_ISOLATION:
+        decoder = get_decoder()
+    full_decodes: dict[str, Future] = {}
+    full_pool = None
+    completed = 0
+
+    def cache_hit(fp: str) -> bool:
+        try:
+            return _cache_path(fp, size).exists()
+        except OSError:
+            return False
 
-    for i, fp in enumerate(filepaths):
-        results[fp] = extract_thumbnail(fp, size)
-        if progress_callback and (i % 20 == 0 or i == total - 1):
-            progress_callback(i + 1, total, os.path.basename(fp))
+    def extract(fp: str, full: bool = False):
+        start = time.perf_counter()
+        hit = False if full else cache_hit(fp)
+        if hit:
+            thumb = _cache_path(fp, size)
+        elif decoder is None or not is_raw(fp):
+            thumb = extract_thumbnail(fp, size)
+        elif full:
+            thumb = decoder.full(fp, size)[1]
+        else:
+            status, thumb = decoder.preview(fp, size)
+            if status == FAILED:
+                return _NEEDS_FULL_DECODE
+        if metrics is not None:
+            metrics.record_file(
+                fp,
+                time.perf_counter() - start,
+                bytes_read=0 if hit else _file_size(fp),
+                cache_hit=hit,
+                ok=thumb is not None,
+            )
+        return thumb
+
+    def report(fp: str):
+        nonlocal completed
+        completed += 1
+        if on_result is not None:
+            on_result(fp, results[fp])
+        if progress_callback and (completed % 20 == 1 or completed == total):
+            progress_callback(completed, total, os.path.basename(fp))
+
+    try:
+        for fp, thumb in scheduler.map(
+            extract, filepaths, file_ids, prefetch_if=lambda fp: not cache_hit(fp), tuner=tuner,
+        ):
+            if thumb is _NEEDS_FULL_DECODE:
+                if full_pool is None:
+                    full_pool = ThreadPoolExecutor(DECODE_FULL_WORKERS, thread_name_prefix='photodedup-fulldecode')
+                full_decodes[fp] = full_pool.submit(extract, fp, True)
+                continue
+            results[fp] = thumb
+            report(fp)
+        for fp, future in full_decodes.items():
+            results[fp] = future.result()
+            report(fp)
+    finally:
+        if full_pool is not None:
+            full_pool.shutdown(cancel_futures=True)
 
+    if metrics is not None:
+        metrics.devices = scheduler.plan_summary()
     return results
@@ -0,0 +1,602 @@
+"""
+批量删除 — 把照片（连同 XMP sidecar）移入回收站，记录日志，可按日志还原。
+
+删除以任务（DeleteJob）的形式在后台线程执行：
+
+- 按目录规划：每个目录只列一次，确认文件存在、取大小，并找出随照片一起删除的 XMP sidecar
+  （DSC_1234.xmp 在同名主干的照片全部删除时才删除；DSC_1234.NEF.xmp 随 DSC_1234.NEF 删除）；
+- 同一目录的文件按 DELETE_BATCH_SIZE 分批，批次之间用 DELETE_WORKERS 个线程并行；
+- 每移走一个文件就在日志（DELETIONS_DIR/<任务 id>.jsonl）中追加一行：原路径、回收站中的位置、大小，
+  中途出错或进程退出时也能知道哪些文件已经移走、移到了哪里；
+- 还原时按日志把文件移回原位置（原位置已有文件时跳过）。
+
+回收站的位置：
+- Linux 等 freedesktop 平台：按 Trash 规范自行移动（与 send2trash 相同的回收站目录，info 文件用
+  O_EXCL 创建，并行删除同名文件时不会互相覆盖），位置总是已知；
+- macOS：有 PyObjC 时通过 NSFileManager 移动，返回回收站中的位置；
+- 其他情况（Windows、没有 PyObjC 的 macOS，或 send2trash 的内部函数与固定的版本不符）：
+  整批交给 send2trash，回收站不返回位置，日志只记录原路径，需要在系统回收站中手动还原。
+"""
+
+import errno
+import json
+import os
+import secrets
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from urllib.parse import quote
+
+from backend.config import (
+    RAW_EXTENSIONS, IMAGE_EXTENSIONS, DELETIONS_DIR, DELETE_WORKERS, DELETE_BATCH_SIZE,
+)
+
+JOURNAL_FORMAT = "photodedup-delete-journal"
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = ".jsonl"
+JOURNAL_SYNC_INTERVAL = 1.0  # 日志 fsync 的最短间隔（秒）；每行写入后都会刷出到系统缓存
+
+SIDECAR_EXTENSION = '.xmp'
+PHOTO_EXTENSIONS = RAW_EXTENSIONS | IMAGE_EXTENSIONS
+
+# (原路径, 回收站中的位置或 None, 错误信息或 None)
+MoveResult = tuple[str, str | None, str | None]
+
+# FreedesktopTrash 用到的 send2trash.plat_other 内部名称（按 requirements.txt 固定的 1.8.3 编写）；
+# 不是公开接口，缺少任何一个时 open_trash 改用只依赖公开 send2trash() 的 SystemTrash
+_PLAT_OTHER_NAMES = (
+    "get_dev", "find_mount_point", "find_ext_volume_trash", "format_date", "HOMETRASH_B", "XDG_DATA_HOME",
+)
+
+
+# ─── 回收站 ─────────────────────────────────────────────
+
+class FreedesktopTrash:
+    """
+    freedesktop.org Trash 规范的回收站（Linux 等），与 send2trash 选择相同的回收站目录。
+
+    每个设备的回收站目录只查找一次；info 文件以 O_EXCL 创建，文件名冲突时改用「名称 N.扩展名」，
+    多个线程同时删除同名文件也不会覆盖彼此。多个删除线程共用一个实例，共享的缓存都在 _lock 下读写。
+
+    查找回收站目录借用 send2trash.plat_other 的内部函数；与固定版本不符时构造抛出 ImportError。
+    """
+
+    def __init__(self):
+        from send2trash import plat_other
+        missing = [name for name in _PLAT_OTHER_NAMES if not hasattr(plat_other, name)]
+        if missing:
+            raise ImportError(f"send2trash.plat_other 缺少 {', '.join(missing)}（与固定的版本不符）")
+        self._spec = plat_other
+        self._home_dev = plat_other.get_dev(os.path.expanduser(b"~"))
+        self._trash_dirs: dict[int, tuple[bytes, bytes]] = {}
+        self._counters: dict[bytes, int] = {}  # 回收站中同名文件已用到的编号，避免每次从头试探
+        self._created: set[bytes] = set()
+        self._realpaths: dict[bytes, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _trash_dir(self, path_b: bytes, dev: int) -> tuple[bytes, bytes]:
+        """文件所在设备的 (回收站目录, 记录相对路径的顶层目录)"""
+        with self._lock:
+            if dev not in self._trash_dirs:
+                spec = self._spec
+                if dev == self._home_dev:
+                    self._trash_dirs[dev] = (spec.HOMETRASH_B, spec.XDG_DATA_HOME)
+                else:
+                    topdir = spec.find_mount_point(path_b)
+                    if spec.get_dev(topdir) != dev:
+                        raise OSError(f"找不到 {os.fsdecode(path_b)} 所在的挂载点")
+                    self._trash_dirs[dev] = (spec.find_ext_volume_trash(topdir), topdir)
+            return self._trash_dirs[dev]
+
+    def _move_one(self, path: str) -> str:
+        path_b = os.fsencode(path)
+        # 与 send2trash 一致：先确认有权限再移动
+        if not os.access(path_b, os.W_OK):
+            raise PermissionError(errno.EACCES, "Permission denied", path)
+        trash, topdir = self._trash_dir(path_b, os.lstat(path_b).st_dev)
+        try:
+            return self._rename(path_b, trash, topdir)
+        except OSError as e:
+            # 卷上的回收站在另一设备时（如绑定挂载），退回用户主目录的回收站（需要复制）
+            if e.errno != errno.EXDEV:
+                raise
+            return self._rename(path_b, self._spec.HOMETRASH_B, self._spec.XDG_DATA_HOME, cross_dev=True)
+
+    def _rename(self, path_b: bytes, trash: bytes, topdir: bytes, cross_dev: bool = False) -> str:
+        files_dir = os.path.join(trash, b"files")
+        info_dir = os.path.join(trash, b"info")
+        with self._lock:
+            if trash not in self._created:
+                # 规范要求 0700
+                os.makedirs(files_dir, 0o700, exist_ok=True)
+                os.makedirs(info_dir, 0o700, exist_ok=True)
+                self._created.add(trash)
+
+        name = os.path.basename(path_b)
+        stem, ext = os.path.splitext(name)
+        key = os.path.join(files_dir, name)
+        with self._lock:
+            counter = self._counters.get(key, 0)
+        dest_name = name if counter == 0 else stem + b" %d" % counter + ext
+        while True:
+            info_path = os.path.join(info_dir, dest_name + b".trashinfo")
+            try:
+                fd = os.open(info_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                pass
+            else:
+                if not os.path.lexists(os.path.join(files_dir, dest_name)):
+                    break
+                os.close(fd)
+                os.unlink(info_path)
+            counter += 1
+            dest_name = stem + b" %d" % counter + ext
+        with self._lock:
+            # 其他线程可能已用到更大的编号（两个线程试探同一编号时 O_EXCL 只让一个成功）
+            self._counters[key] = max(self._counters.get(key, 0), counter + 1)
+
+        dest = os.path.join(files_dir, dest_name)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self._info(path_b, topdir))
+            if cross_dev:
+                shutil.move(os.fsdecode(path_b), os.fsdecode(dest))
+            else:
+                os.rename(path_b, dest)
+        except BaseException:
+            try:
+                os.unlink(info_path)
+            except OSError:
+                pass
+            raise
+        return os.fsdecode(dest)
+
+    def _realpath(self, path_b: bytes) -> bytes:
+        with self._lock:
+            real = self._realpaths.get(path_b)
+        if real is None:
+            real = os.path.realpath(path_b)
+            with self._lock:
+                self._realpaths[path_b] = real
+        return real
+
+    def _info(self, path_b: bytes, topdir: bytes) -> str:
+        """.trashinfo 内容（同 send2trash 的 info_for，目录的 realpath 按目录缓存）"""
+        if self._realpath(os.path.dirname(path_b)).startswith(self._realpath(topdir)):
+            src = os.path.relpath(path_b, topdir)
+        else:
+            src = os.path.abspath(path_b)
+        return f"[Trash Info]\nPath={quote(src)}\nDeletionDate={self._spec.format_date(datetime.now())}\n"
+
+    def move(self, paths: list[str]) -> Iterator[MoveResult]:
+        for path in paths:
+            try:
+                yield path, self._move_one(path), None
+            except OSError as e:
+                yield path, None, str(e)
+
+
+class MacTrash:
+    """macOS 回收站（NSFileManager，返回文件在回收站中的位置；需要 PyObjC）"""
+
+    def __init__(self):
+        from Foundation import NSFileManager, NSURL
+        self._manager = NSFileManager.defaultManager()
+        self._url = NSURL.fileURLWithPath_
+
+    def move(self, paths: list[str]) -> Iterator[MoveResult]:
+        for path in paths:
+            ok, url, error = self._manager.trashItemAtURL_resultingItemURL_error_(self._url(path), None, None)
+            if ok:
+                yield path, str(url.path()) if url is not None else None, None
+            else:
+                yield path, None, str(error.localizedFailureReason()) if error is not None else "移入回收站失败"
+
+
+class SystemTrash:
+    """整批交给 send2trash（Windows 上一次文件操作处理一批）；回收站不返回位置，只能手动还原"""
+
+    def move(self, paths: list[str]) -> Iterator[MoveResult]:
+        from send2trash import send2trash
+        try:
+            send2trash(paths)
+        except Exception:
+            # 批量调用失败时逐个重试，找出出错的文件（批量调用中已移走的视为成功）
+            for path in paths:
+                if not os.path.lexists(path):
+                    yield path, None, None
+                    continue
+                try:
+                    send2trash(path)
+                    yield path, None, None
+                except Exception as e:
+                    yield path, None, str(e)
+        else:
+            for path in paths:
+                yield path, None, None
+
+
+def open_trash():
+    """当前平台的回收站（能记录位置的优先）"""
+    if sys.platform == "darwin":
+        try:
+            return MacTrash()
+        except ImportError:
+            return SystemTrash()
+    if sys.platform == "win32":
+        return SystemTrash()
+    try:
+        return FreedesktopTrash()
+    except ImportError:
+        return SystemTrash()
+
+
+def _forget_trash_info(dest: str):
+    """还原后删除 freedesktop 回收站中对应的 .trashinfo（其他回收站没有 info 目录，什么也不做）"""
+    files_dir, name = os.path.split(dest)
+    if os.path.basename(files_dir) != "files":
+        return
+    try:
+        os.unlink(os.path.join(os.path.dirname(files_dir), "info", name + ".trashinfo"))
+    except OSError:
+        pass
+
+
+# ─── 规划 ───────────────────────────────────────────────
+
+def plan_directory(directory: str, paths: list[str], include_sidecars: bool = True) -> tuple[list[dict], list[dict]]:
+    """
+    规划一个目录中的删除：确认文件存在、取大小，并加入随照片一起删除的 XMP sidecar。
+
+    Args:
+        directory: 目录
+        paths: 该目录下要删除的文件
+        include_sidecars: 是否删除 XMP sidecar
+
+    Returns:
+        (items, errors)
+        - items: [{path, size, sidecar}]，sidecar 排在照片之后
+        - errors: [{path, error}]（文件不存在等）
+    """
+    try:
+        entries = {entry.name: entry for entry in os.scandir(directory)}
+    except OSError as e:
+        error = "文件不存在" if isinstance(e, FileNotFoundError) else e.strerror or str(e)
+        return [], [{"path": p, "error": error} for p in paths]
+
+    items, errors = [], []
+    names = set()
+    for path in paths:
+        name = os.path.basename(path)
+        entry = entries.get(name)
+        try:
+            if entry is None or entry.is_dir():
+                raise FileNotFoundError("文件不存在")
+            items.append({"path": path, "size": entry.stat(follow_symlinks=False).st_size, "sidecar": False})
+            names.add(name)
+        except OSError as e:
+            errors.append({"path": path, "error": e.strerror or str(e)})
+
+    if include_sidecars and names:
+        # 同名主干（忽略大小写）的照片：DSC_1234.xmp 只有在 DSC_1234.NEF / DSC_1234.JPG 都删除时才删除
+        photos_by_stem: dict[str, list[str]] = {}
+        for name in entries:
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in PHOTO_EXTENSIONS:
+                photos_by_stem.setdefault(stem.lower(), []).append(name)
+        lower_names = {name.lower() for name in names}
+        for name, entry in entries.items():
+            stem, ext = os.path.splitext(name)
+            if ext.lower() != SIDECAR_EXTENSION or name in names:
+                continue
+            if os.path.splitext(stem)[1].lower() in PHOTO_EXTENSIONS:
+                owned = stem.lower() in lower_names
+            else:
+                owners = photos_by_stem.get(stem.lower())
+                owned = bool(owners) and all(owner in names for owner in owners)
+            if owned:
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                items.append({"path": os.path.join(directory, name), "size": size, "sidecar": True})
+    return items, errors
+
+
+def _by_directory(items: Iterable, path: Callable = lambda item: item) -> dict[str, list]:
+    """按所在目录分组（保持原有顺序）"""
+    groups: dict[str, list] = {}
+    for item in items:
+        groups.setdefault(os.path.dirname(path(item)), []).append(item)
+    return groups
+
+
+def _chunks(groups: dict[str, list], size: int) -> list[list]:
+    """每个目录的条目按 size 切成批次"""
+    return [items[i:i + size] for items in groups.values() for i in range(0, len(items), size)]
+
+
+# ─── 删除任务 ────────────────────────────────────────────
+
+class DeleteJob:
+    """
+    一次批量删除（及其还原）。run() / restore() 在调用线程中执行（路由放到后台线程），
+    status() 可在任意线程随时读取进度。
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str],
+        include_sidecars: bool = True,
+        journal_dir: str | Path = DELETIONS_DIR,
+        workers: int = DELETE_WORKERS,
+        batch_size: int = DELETE_BATCH_SIZE,
+        job_id: str | None = None,
+    ):
+        """
+        Args:
+            paths: 要删除的文件（重复的路径只处理一次）
+            include_sidecars: 是否一并删除 XMP sidecar
+            journal_dir: 日志目录
+            workers: 并行线程数
+            batch_size: 每批最多处理的文件数
+            job_id: 任务 id（从日志加载时沿用，新任务自动生成）
+        """
+        self.id = job_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        self.paths = list(dict.fromkeys(os.path.abspath(p) for p in paths))
+        self.include_sidecars = include_sidecars
+        self.journal = Path(journal_dir) / f"{self.id}{JOURNAL_SUFFIX}"
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+
+        self.operation = "delete"   # delete | restore
+        self.state = "pending"      # pending | running | done | cancelled | error | interrupted
+        self.message = ""
+        self.created = time.time()
+        self.total = len(self.paths)
+        self.done = 0
+        self.entries: list[dict] = []   # 已移入回收站：{path, trash, size, sidecar}
+        self.restored: set[str] = set()
+        self.errors: list[dict] = []    # 当前操作的错误：{path, error}
+        self.elapsed = 0.0
+        self.on_progress: Callable[[int, int, str], None] | None = None
+
+        self._trash = None
+        self._file = None
+        self._synced = 0.0
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    # ─── 日志 ───────────────────────────────────────────
+
+    def _open_journal(self):
+        self.journal.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.journal.exists()
+        self._file = open(self.journal, "a", encoding="utf-8")
+        if new:
+            self._append({
+                "format": JOURNAL_FORMAT,
+                "version": JOURNAL_VERSION,
+                "id": self.id,
+                "created": self.created,
+                "requested": len(self.paths),
+                "include_sidecars": self.include_sidecars,
+            })
+
+    def _append(self, record: dict):
+        """追加一行并刷出（调用方持有 _lock 或尚未并行）"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _sync(self, force: bool = False):
+        """把日志落盘（批次结束时调用，间隔不足 JOURNAL_SYNC_INTERVAL 时跳过，慢盘上 fsync 很贵）"""
+        now = time.monotonic()
+        if force or now - self._synced >= JOURNAL_SYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._synced = now
+
+    def _close_journal(self):
+        with self._lock:
+            self._append({"op": "end", "operation": self.operation, "state": self.state})
+            self._sync(force=True)
+            self._file.close()
+            self._file = None
+
+    @classmethod
+    def load(cls, journal: str | Path) -> "DeleteJob":
+        """从日志恢复任务（进程重启后查看或还原）"""
+        journal = Path(journal)
+        with open(journal, encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("format") != JOURNAL_FORMAT:
+                raise ValueError(f"{journal}: 不是删除日志文件")
+            job = cls([], header.get("include_sidecars", True), journal.parent, job_id=header["id"])
+            job.created = header.get("created", journal.stat().st_mtime)
+            job.state = "interrupted"  # 没有 end 记录说明任务执行中进程退出
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 进程退出时写了一半的行
+                op = record.get("op")
+                if op == "trash":
+                    job.entries.append(record)
+                elif op == "error":
+                    job.errors.append(record)
+                elif op == "restore":
+                    job.restored.add(record["path"])
+                elif op == "end":
+                    job.operation, job.state = record["operation"], record["state"]
+        job.total = job.done = len(job.entries) + len(job.errors)
+        job.paths = [e["path"] for e in job.entries if not e.get("sidecar")]
+        return job
+
+    # ─── 执行 ───────────────────────────────────────────
+
+    def cancel(self):
+        """取消：已开始的批次做完，其余批次跳过"""
+        self._cancel.set()
+
+    def _progress(self, count: int, filename: str):
+        self.done += count
+        if self.on_progress is not None:
+            self.on_progress(self.done, self.total, filename)
+
+    def _run(self, operation: str, prepare: Callable[[ThreadPoolExecutor], list[list]], work: Callable[[list], None]):
+        self.operation = operation
+        self.state = "running"
+        self.message = ""
+        self.errors = []
+        self.done = 0
+        self._cancel.clear()
+        start = time.perf_counter()
+        self._open_journal()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"photodedup-{operation}") as pool:
+                batches = prepare(pool)
+                for _ in pool.map(work, batches):
+                    pass
+            self.state = "cancelled" if self._cancel.is_set() else "done"
+        except Exception as e:
+            self.state = "error"
+            self.message = str(e)
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self._close_journal()
+        return self.status()
+
+    def run(self) -> dict:
+        """执行删除，返回最终状态（见 status）"""
+        def prepare(pool: ThreadPoolExecutor) -> list[list]:
+            self._trash = open_trash()
+            groups = _by_directory(self.paths)
+            planned: dict[str, list[dict]] = {}
+            for directory, (items, errors) in zip(
+                groups, pool.map(lambda d: plan_directory(d, groups[d], self.include_sidecars), groups)
+            ):
+                planned[directory] = items
+                with self._lock:
+                    for error in errors:
+                        self._append({"op": "error", **error})
+                    self.errors.extend(errors)
+            # 总数包含 sidecar；找不到的文件已计入完成
+            self.total = sum(len(items) for items in planned.values()) + len(self.errors)
+            self._progress(len(self.errors), "")
+            return _chunks(planned, self.batch_size)
+
+        return self._run("delete", prepare, self._delete_batch)
+
+    def _delete_batch(self, items: list[dict]):
+        if self._cancel.is_set():
+            return
+        sizes = {item["path"]: item for item in items}
+        for path, dest, error in self._trash.move(list(sizes)):
+            with self._lock:
+                if error is None:
+                    entry = {"op": "trash", "path": path, "trash": dest,
+                             "size": sizes[path]["size"], "sidecar": sizes[path]["sidecar"]}
+                    self._append(entry)
+                    self.entries.append(entry)
+                else:
+                    self._append({"op": "error", "path": path, "error": error})
+                    self.errors.append({"path": path, "error": error})
+                self._progress(1, os.path.basename(path))
+        with self._lock:
+            self._sync()
+
+    def restore(self) -> dict:
+        """按日志把尚未还原的文件移回原位置，返回最终状态"""
+        def prepare(pool: ThreadPoolExecutor) -> list[list]:
+            pending = [e for e in self.entries if e["path"] not in self.restored]
+            self.total = len(pending)
+            return _chunks(_by_directory(pending, lambda e: e["path"]), self.batch_size)
+
+        return self._run("restore", prepare, self._restore_batch)
+
+    def _restore_batch(self, entries: list[dict]):
+        if self._cancel.is_set():
+            return
+        for entry in entries:
+            path = entry["path"]
+            try:
+                _restore_one(path, entry.get("trash"))
+                record = {"op": "restore", "path": path}
+            except OSError as e:
+                record = {"op": "restore_error", "path": path, "error": e.strerror or str(e)}
+            with self._lock:
+                self._append(record)
+                if record["op"] == "restore":
+                    self.restored.add(path)
+                else:
+                    self.errors.append({"path": path, "error": record["error"]})
+                self._progress(1, os.path.basename(path))
+        with self._lock:
+            self._sync()
+
+    # ─── 状态 ───────────────────────────────────────────
+
+    def status(self, errors: bool = True) -> dict:
+        """
+        任务状态（可在执行中读取）。
+
+        Args:
+            errors: 是否包含错误列表（推送进度时省略，只给数量）
+        """
+        entries = list(self.entries)
+        photos = [e for e in entries if not e.get("sidecar")]
+        result = {
+            "id": self.id,
+            "operation": self.operation,
+            "state": self.state,
+            "message": self.message,
+            "created": self.created,
+            "progress": self.done,
+            "total": self.total,
+            "deleted_count": len(photos),
+            "sidecar_count": len(entries) - len(photos),
+            "bytes": sum(e["size"] for e in entries),
+            "restored_count": len(self.restored),
+            "restorable_count": sum(1 for e in entries if e.get("trash") and e["path"] not in self.restored),
+            "error_count": len(self.errors),
+            "elapsed_ms": round(self.elapsed * 1000, 1),
+            "journal": str(self.journal),
+        }
+        if errors:
+            result["errors"] = list(self.errors)
+        return result
+
+
+def _restore_one(path: str, dest: str | None):
+    if not dest:
+        raise OSError("回收站未提供文件位置，请在系统回收站中手动还原")
+    if os.path.lexists(path):
+        raise FileExistsError(errno.EEXIST, "原位置已有同名文件")
+    if not os.path.lexists(dest):
+        raise FileNotFoundError(errno.ENOENT, "回收站中已找不到该文件（回收站可能已清空）")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.rename(dest, path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(dest, path)
+    _forget_trash_info(dest)
+
+
+def list_journals(journal_dir: str | Path = DELETIONS_DIR) -> list[dict]:
+    """日志目录中的删除任务（新的在前）"""
+    journal_dir = Path(journal_dir)
+    if not journal_dir.is_dir():
+        return []
+    jobs = []
+    for path in sorted(journal_dir.glob(f"*{JOURNAL_SUFFIX}"), reverse=True):
+        try:
+            jobs.append(DeleteJob.load(path).status(errors=False))
+        except (OSError, ValueError, KeyError):
+            continue
+    return jobs
@@ -0,0 +1,432 @@
+"""
+图库监视 — 监视已扫描的根目录，把文件变化合并成批次交给增量更新。
+
+- Linux 上使用 inotify（通过 ctypes 直接调用 libc，无额外依赖），递归为每个子目录
+  添加监视，新建/移入的目录自动加入；
+- 其他平台、inotify 不可用或监视数量超出系统上限时，退回定期遍历并比较
+  (mtime, size) 的轮询方式。
+
+事件按路径去抖：最后一次事件后安静 debounce 秒（或首个事件后最多 max_delay 秒）
+才作为一批提交，拷贝大文件、编辑器先写临时文件再改名等情况只产生一批变化。
+XMP sidecar 的变化换算为同名照片的变化，由增量更新重新检测编辑/标记状态。
+"""
+
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable
+
+from backend.config import RAW_EXTENSIONS, IMAGE_EXTENSIONS, WATCH_DEBOUNCE, WATCH_MAX_DELAY, WATCH_POLL_INTERVAL
+from backend.core.scanner import walk_unique_dirs
+
+SIDECAR_EXTENSION = '.xmp'
+
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+
+def _relevant(name: str, extensions: set[str]) -> bool:
+    if name.startswith('.'):
+        return False
+    ext = os.path.splitext(name)[1].lower()
+    return ext in extensions or ext == SIDECAR_EXTENSION
+
+
+def sidecar_targets(xmp_path: str, extensions: set[str]) -> list[str]:
+    """XMP sidecar 对应的照片文件（同目录、同文件名主干，忽略大小写）"""
+    directory, fname = os.path.split(xmp_path)
+    stem = os.path.splitext(fname)[0].lower()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return [
+        os.path.join(directory, name) for name in sorted(names)
+        if os.path.splitext(name)[0].lower() == stem and os.path.splitext(name)[1].lower() in extensions
+    ]
+
+
+# ─── inotify ────────────────────────────────────────────
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def _libc():
+    import ctypes
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+def inotify_available() -> bool:
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        return hasattr(_libc(), 'inotify_init1')
+    except OSError:
+        return False
+
+
+class InotifySource:
+    """
+    基于 inotify 的事件源。
+
+    read() 返回 [(路径, CHANGED | REMOVED)]；目录被创建/移入时返回目录本身和
+    其中已有的文件（监视建立前写入的文件不会再有事件）。
+    """
+
+    backend = 'inotify'
+
+    def __init__(self, roots: list[str], extensions: set[str]):
+        import ctypes
+
+        self._ctypes = ctypes
+        self.extensions = extensions
+        self._libc = _libc()
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self._dirs: dict[int, str] = {}   # wd → 目录路径
+        self._wds: dict[str, int] = {}    # 目录路径 → wd
+        self._dir_ids: dict[str, tuple[int, int]] = {}  # 目录路径 → (st_dev, st_ino)，与扫描相同按物理身份去重
+        try:
+            for root in roots:
+                self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    @property
+    def watched(self) -> int:
+        return len(self._dirs)
+
+    def _watch(self, directory: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            code = self._ctypes.get_errno()
+            if code in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return  # 目录已不存在或无权限，跳过
+            raise OSError(code, f'inotify_add_watch 失败（{os.strerror(code)}）: {directory}')
+        old = self._dirs.get(wd)
+        if old is not None and old != directory:
+            self._wds.pop(old, None)
+        self._dirs[wd] = directory
+        self._wds[directory] = wd
+
+    def _watch_tree(self, root: str) -> list[str]:
+        """
+        监视 root 及其所有子目录，返回其中已有的相关文件。
+
+        已监视的目录（符号链接环、指向已监视目录的链接）不再重复进入，与扫描得到的文件一致。
+        """
+        files = []
+        visited = set(self._dir_ids.values())
+        for dirpath, dir_id, dirs, names in walk_unique_dirs([root], visited):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            self._watch(dirpath)
+            self._dir_ids[dirpath] = dir_id
+            files.extend(os.path.join(dirpath, n) for n in names if _relevant(n, self.extensions))
+        return files
+
+    def _forget_tree(self, directory: str):
+        prefix = directory + os.sep
+        for path in [p for p in self._wds if p == directory or p.startswith(prefix)]:
+            wd = self._wds.pop(path)
+            self._dirs.pop(wd, None)
+            self._dir_ids.pop(path, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read(self, timeout: float) -> list[tuple[str, str]] | None:
+        """
+        等待并读取一批事件。
+
+        Returns:
+            [(路径, 事件类型)]；队列溢出（事件丢失）时返回 None，调用方需要整体同步
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        overflow = False
+        pos = 0
+        while pos + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, pos)
+            name = data[pos + _EVENT.size:pos + _EVENT.size + length].split(b'\0', 1)[0]
+            pos += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                if self._wds.get(directory) == wd:
+                    del self._wds[directory]
+                    self._dir_ids.pop(directory, None)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue  # 由父目录的 IN_DELETE / IN_MOVED_FROM 报告
+            name = os.fsdecode(name)
+            path = os.path.join(directory, name)
+
+            if mask & IN_ISDIR:
+                if name.startswith('.'):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        events.extend((p, CHANGED) for p in self._watch_tree(path))
+                    except OSError:
+                        overflow = True  # 超出监视上限，交给调用方整体同步
+                    events.append((path, CHANGED))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._forget_tree(path)
+                    events.append((path, REMOVED))
+            elif _relevant(name, self.extensions):
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    events.append((path, REMOVED))
+                else:
+                    events.append((path, CHANGED))
+        return None if overflow else events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+# ─── 轮询 ──────────────────────────────────────────────
+
+class PollingSource:
+    """
+    轮询事件源：每隔 interval 秒遍历根目录，与上一次的 (mtime_ns, size) 比较。
+
+    网络盘、部分容器挂载等收不到 inotify 事件的文件系统也能工作。
+    """
+
+    backend = 'polling'
+
+    def __init__(self, roots: list[str], extensions: set[str], interval: float = WATCH_POLL_INTERVAL):
+        self.roots = list(roots)
+        self.extensions = extensions
+        self.interval = interval
+        self._state = self._snapshot()
+        self._next = time.monotonic() + interval
+
+    @property
+    def watched(self) -> int:
+        return len(self._state)
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        state = {}
+        for dirpath, _, dirs, names in walk_unique_dirs(self.roots):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in names:
+                if not _relevant(name, self.extensions):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def read(self, timeout: float) -> list[tuple[str, str]]:
+        wait = self._next - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.monotonic() < self._next:
+                return []
+        self._next = time.monotonic() + self.interval
+
+        old, new = self._state, self._snapshot()
+        self._state = new
+        events = [(p, REMOVED) for p in old.keys() - new.keys()]
+        events.extend((p, CHANGED) for p, sig in new.items() if old.get(p) != sig)
+        return events
+
+    def close(self):
+        pass
+
+
+# ─── 监视器 ────────────────────────────────────────────
+
+class LibraryWatcher:
+    """
+    后台线程监视图库根目录，去抖后以批次回调 on_change(changed, removed)。
+
+    changed / removed 中可能出现目录（整个目录被移入/删除）；XMP 变化已换算为
+    对应的照片文件。回调在监视线程中执行，执行期间到达的事件进入下一批。
+    """
+
+    def __init__(
+        self,
+        roots: list[str],
+        on_change: Callable[[list[str], list[str]], None],
+        include_images: bool = False,
+        debounce: float = WATCH_DEBOUNCE,
+        max_delay: float = WATCH_MAX_DELAY,
+        poll_interval: float = WATCH_POLL_INTERVAL,
+        polling: bool | None = None,
+    ):
+        """
+        Args:
+            roots: 要监视的根目录（通常是扫描时的 scan_dirs）
+            on_change: 批次回调 (新增或修改的路径, 删除的路径)
+            include_images: 是否关注普通图片（与扫描参数一致）
+            debounce: 最后一次事件后等待的安静时间（秒）
+            max_delay: 持续有事件时，首个事件后最多等待的时间（秒）
+            poll_interval: 轮询方式的遍历间隔（秒）
+            polling: True 强制轮询，False 强制 inotify，None 自动选择
+        """
+        self.roots = list(roots)
+        self.on_change = on_change
+        self.extensions = set(RAW_EXTENSIONS)
+        if include_images:
+            self.extensions |= IMAGE_EXTENSIONS
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.polling = polling
+
+        self.source = None
+        self.batches = 0
+        self.last_batch: dict | None = None
+        self.last_error = ''
+        self._pending: dict[str, str] = {}
+        self._first_event = 0.0
+        self._last_event = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # ─── 生命周期 ───────────────────────────────────────
+
+    def start(self):
+        """建立监视（inotify 失败时退回轮询）并启动后台线程"""
+        self.source = self._open_source()
+        self._thread = threading.Thread(target=self._run, name='photodedup-watch', daemon=True)
+        self._thread.start()
+
+    def _open_source(self):
+        if self.polling is not True and inotify_available():
+            try:
+                return InotifySource(self.roots, self.extensions)
+            except OSError as e:
+                if self.polling is False:
+                    raise
+                self.last_error = f'inotify 不可用，改用轮询: {e}'
+        elif self.polling is False:
+            raise OSError('当前平台不支持 inotify')
+        return PollingSource(self.roots, self.extensions, self.poll_interval)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        if self.source is not None:
+            self.source.close()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> dict:
+        return {
+            'running': self.running,
+            'backend': self.source.backend if self.source else None,
+            'roots': self.roots,
+            'watched': self.source.watched if self.source else 0,
+            'pending': len(self._pending),
+            'batches': self.batches,
+            'last_batch': self.last_batch,
+            'last_error': self.last_error,
+        }
+
+    # ─── 事件循环 ───────────────────────────────────────
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                events = self.source.read(min(self.debounce, 0.5))
+            except OSError as e:
+                self.last_error = str(e)
+                self._stop.wait(1.0)
+                continue
+            now = time.monotonic()
+            if events is None:
+                # inotify 队列溢出：事件已丢失，把根目录整体交给增量更新同步
+                events = [(root, CHANGED) for root in self.roots]
+            if events:
+                if not self._pending:
+                    self._first_event = now
+                self._last_event = now
+                self._pending.update(events)  # 同一路径只保留最后一次事件
+
+            if self._pending and (
+                now - self._last_event >= self.debounce or now - self._first_event >= self.max_delay
+            ):
+                self._flush()
+
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        changed: set[str] = set()
+        removed: set[str] = set()
+        for path in pending:
+            if os.path.splitext(path)[1].lower() == SIDECAR_EXTENSION:
+                # sidecar 新增/修改/删除都意味着照片的编辑状态需要重新检测
+                changed.update(sidecar_targets(path, self.extensions))
+                continue
+            # 以文件的当前状态为准（先删除后重新写入、写入后又被删除）
+            if os.path.lexists(path):
+                changed.add(path)
+            else:
+                removed.add(path)
+
+        if not changed and not removed:
+            return
+        start = time.perf_counter()
+        try:
+            self.on_change(sorted(changed), sorted(removed))
+            self.last_error = ''
+        except Exception as e:
+            self.last_error = f'增量更新失败: {e}'
+        self.batches += 1
+        self.last_batch = {
+            'changed': len(changed),
+            'removed': len(removed),
+            'at': time.time(),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+        }
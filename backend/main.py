@@ -2,14 +2,17 @@
 应用入口 — FastAPI 应用 + 静态文件服务。
 """
 
+import importlib
 import os
 import sys
-import uvicorn
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
-from backend.api.routes import router
+from backend.api.routes import router, HEAVY_MODULES
 
 
 def _get_base_dir():
@@ -26,10 +29,27 @@ def _get_base_dir():
 BASE_DIR = _get_base_dir()
 FRONTEND_DIR = os.path.join(BASE_DIR, "frontend")
 
+def _warm_up():
+    """后台预先导入解码/哈希等重量级模块，失败时留到首次使用再报错"""
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 服务开始监听后才预热，不拖慢启动（app.py 的 wait_for_server 只需等到这里）
+    threading.Thread(target=_warm_up, name="photodedup-warmup", daemon=True).start()
+    yield
+
+
 app = FastAPI(
     title="PhotoDedup — 重复照片识别",
     description="智能识别相似照片，释放硬盘空间",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # 挂载 API 路由
@@ -53,6 +73,7 @@ async def serve_index():
 
 def start_server(host: str = "127.0.0.1", port: int = 8686):
     """启动服务器"""
+    import uvicorn
     uvicorn.run(app, host=host, port=port, log_level="info")
 
 
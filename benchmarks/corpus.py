@@ -0,0 +1,318 @@
+"""
+合成照片语料生成器 — 为基准测试生成可复现的照片目录。
+
+每个“场景”生成一张随机图形组成的基准图，再派生若干近似重复的变体
+（亮度微调、轻微平移裁剪、噪点、不同 JPEG 质量），模拟连拍。
+文件带有 EXIF 拍摄时间和相机型号，格式包括 JPEG、TIFF，以及带嵌入式
+JPEG 预览的最小 DNG（LibRaw 可以直接 extract_thumb）。
+
+同样的参数和种子总是生成字节级相同的文件，manifest.json 记录每个文件
+所属的场景，可作为分组结果的标准答案。
+
+用法:
+    python -m benchmarks.corpus OUT_DIR --scenes 200 --variants 4
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import struct
+from datetime import datetime, timedelta
+
+from PIL import Image, ImageDraw, ImageEnhance
+
+CAMERA_MODELS = ['BenchCam A1', 'BenchCam B2', 'BenchCam C3']
+BASE_TIME = datetime(2024, 1, 1, 8, 0, 0)
+FORMATS = ('jpg', 'tif', 'dng')
+
+# TIFF 字段类型 → (struct 格式, 单个值的字节数)
+_TIFF_TYPES = {
+    1: ('B', 1),    # BYTE
+    2: ('s', 1),    # ASCII
+    3: ('H', 2),    # SHORT
+    4: ('I', 4),    # LONG
+    5: ('II', 8),   # RATIONAL
+    10: ('ii', 8),  # SRATIONAL
+}
+
+
+# ─── 图像内容 ──────────────────────────────────────────
+
+def _scene_image(rng: random.Random, size: tuple[int, int]) -> Image.Image:
+    """随机色块 + 圆形组成的基准图（足够让 pHash 区分不同场景）"""
+    w, h = size
+    img = Image.new('RGB', size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(8, 16)):
+        x, y = rng.randrange(w), rng.randrange(h)
+        dx, dy = rng.randint(w // 10, w // 2), rng.randint(h // 10, h // 2)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle([x, y, x + dx, y + dy], fill=color)
+        else:
+            draw.ellipse([x, y, x + dx, y + dy], fill=color)
+    return img
+
+
+def _variant(base: Image.Image, rng: random.Random, index: int) -> Image.Image:
+    """派生近似重复的变体；index 0 为原图"""
+    if index == 0:
+        return base.copy()
+    w, h = base.size
+    img = ImageEnhance.Brightness(base).enhance(rng.uniform(0.9, 1.1))
+    # 轻微平移裁剪后缩放回原尺寸（模拟连拍时的微小抖动）
+    sx, sy = rng.randint(0, w // 40), rng.randint(0, h // 40)
+    img = img.crop((sx, sy, w - (w // 40 - sx), h - (h // 40 - sy))).resize((w, h))
+    # 稀疏噪点
+    pixels = img.load()
+    for _ in range(w * h // 200):
+        x, y = rng.randrange(w), rng.randrange(h)
+        pixels[x, y] = tuple(rng.randrange(256) for _ in range(3))
+    return img
+
+
+def _jpeg_bytes(img: Image.Image, quality: int, exif: bytes | None = None) -> bytes:
+    buf = io.BytesIO()
+    kwargs = {'exif': exif} if exif else {}
+    img.save(buf, 'JPEG', quality=quality, **kwargs)
+    return buf.getvalue()
+
+
+def _exif_bytes(model: str, taken: datetime) -> bytes:
+    exif = Image.Exif()
+    exif[0x010F] = 'Bench'                                   # Make
+    exif[0x0110] = model                                     # Model
+    exif[0x8769] = {0x9003: taken.strftime('%Y:%m:%d %H:%M:%S')}  # DateTimeOriginal
+    return exif.tobytes()
+
+
+# ─── 最小 DNG ──────────────────────────────────────────
+
+def _encode_ifds(ifds: list[list[tuple]], blobs: dict[str, bytes]) -> bytes:
+    """
+    将若干 IFD 编码为小端 TIFF。
+
+    每个条目为 (tag, type, values)；values 可以是数值列表、bytes（ASCII），
+    或字符串占位符：'@ifd:N' 指向第 N 个 IFD，'@blob:NAME' 指向 blobs[NAME]。
+    第 0 个 IFD 为主 IFD，其余 IFD 只能通过占位符引用。
+    """
+    header = 8
+    ifd_offsets, pos = [], header
+    for entries in ifds:
+        ifd_offsets.append(pos)
+        pos += 2 + 12 * len(entries) + 4
+
+    out = bytearray(b'II*\x00' + struct.pack('<I', header))
+    out += bytes(pos - header)
+    blob_offsets: dict[str, int] = {}
+
+    def append(data: bytes) -> int:
+        if len(out) % 2:
+            out.append(0)
+        offset = len(out)
+        out.extend(data)
+        return offset
+
+    for entries, ifd_offset in zip(ifds, ifd_offsets):
+        table = bytearray(struct.pack('<H', len(entries)))
+        for tag, typ, values in sorted(entries, key=lambda e: e[0]):
+            if isinstance(values, str):
+                kind, _, name = values[1:].partition(':')
+                if kind == 'ifd':
+                    target = ifd_offsets[int(name)]
+                else:
+                    if name not in blob_offsets:
+                        blob_offsets[name] = append(blobs[name])
+                    target = blob_offsets[name]
+                table += struct.pack('<HHII', tag, typ, 1, target)
+                continue
+
+            fmt, width = _TIFF_TYPES[typ]
+            if typ == 2:
+                data, count = values, len(values)
+            elif typ in (5, 10):
+                data = b''.join(struct.pack('<' + fmt, *v) for v in values)
+                count = len(values)
+            else:
+                data = struct.pack('<' + fmt * len(values), *values)
+                count = len(values)
+
+            if len(data) <= 4:
+                table += struct.pack('<HHI', tag, typ, count) + data.ljust(4, b'\x00')
+            else:
+                table += struct.pack('<HHII', tag, typ, count, append(data))
+        table += struct.pack('<I', 0)
+        out[ifd_offset:ifd_offset + len(table)] = table
+
+    return bytes(out)
+
+
+def make_dng(preview: Image.Image, model: str, taken: datetime, raw_size: int = 64) -> bytes:
+    """
+    生成最小 DNG：主 IFD 为 JPEG 预览，SubIFD 为全零的 16-bit CFA 数据。
+
+    只包含 LibRaw 识别 DNG 所需的最少标签，解码 RAW 没有意义，
+    但 extract_thumb() 能正常取出嵌入式预览，用于测量预览提取路径。
+    """
+    jpeg = _jpeg_bytes(preview, quality=85)
+    raw = bytes(raw_size * raw_size * 2)
+    stamp = taken.strftime('%Y:%m:%d %H:%M:%S').encode() + b'\x00'
+    one = [(1, 1)] * 3
+    identity = [(1, 1), (0, 1), (0, 1), (0, 1), (1, 1), (0, 1), (0, 1), (0, 1), (1, 1)]
+
+    main = [
+        (254, 4, [1]),                                   # NewSubFileType: 预览
+        (256, 4, [preview.width]), (257, 4, [preview.height]),
+        (258, 3, [8, 8, 8]), (259, 3, [7]), (262, 3, [6]),
+        (271, 2, b'Bench\x00'), (272, 2, model.encode() + b'\x00'),
+        (273, 4, '@blob:jpeg'), (277, 3, [3]),
+        (278, 4, [preview.height]), (279, 4, [len(jpeg)]),
+        (306, 2, stamp),
+        (330, 4, '@ifd:1'),                              # SubIFDs
+        (34665, 4, '@ifd:2'),                            # ExifIFD
+        (50706, 1, [1, 4, 0, 0]),                        # DNGVersion
+        (50708, 2, model.encode() + b'\x00'),            # UniqueCameraModel
+        (50721, 10, identity),                           # ColorMatrix1
+        (50727, 5, one), (50728, 5, one),                # AnalogBalance, AsShotNeutral
+    ]
+    raw_ifd = [
+        (254, 4, [0]), (256, 4, [raw_size]), (257, 4, [raw_size]),
+        (258, 3, [16]), (259, 3, [1]), (262, 3, [32803]),
+        (273, 4, '@blob:raw'), (277, 3, [1]),
+        (278, 4, [raw_size]), (279, 4, [len(raw)]), (284, 3, [1]),
+        (33421, 3, [2, 2]), (33422, 1, [0, 1, 1, 2]),    # CFARepeatPatternDim, CFAPattern
+        (50717, 4, [65535]),                             # WhiteLevel
+    ]
+    exif_ifd = [(36867, 2, stamp)]                       # DateTimeOriginal
+
+    return _encode_ifds([main, raw_ifd, exif_ifd], {'jpeg': jpeg, 'raw': raw})
+
+
+# ─── 语料目录 ──────────────────────────────────────────
+
+def generate_corpus(
+    out_dir: str,
+    scenes: int = 100,
+    variants: int = 4,
+    formats: tuple[str, ...] = FORMATS,
+    image_size: tuple[int, int] = (640, 480),
+    files_per_dir: int = 200,
+    seed: int = 0,
+) -> dict:
+    """
+    生成合成照片语料。
+
+    Args:
+        out_dir: 输出目录
+        scenes: 场景数
+        variants: 每个场景的变体数（含原图）
+        formats: 文件格式轮换使用，取值 'jpg' / 'tif' / 'dng'
+        image_size: 图像尺寸
+        files_per_dir: 每个子目录的文件数
+        seed: 随机种子
+
+    Returns:
+        manifest: {'params': {...}, 'files': [{'path', 'scene', 'variant', 'format'}, ...]}
+    """
+    rng = random.Random(seed)
+    files = []
+    taken = BASE_TIME
+    count = 0
+
+    for scene in range(scenes):
+        base = _scene_image(rng, image_size)
+        model = CAMERA_MODELS[scene % len(CAMERA_MODELS)]
+        taken += timedelta(seconds=rng.randint(60, 600))  # 场景之间相隔数分钟
+
+        for v in range(variants):
+            img = _variant(base, rng, v)
+            fmt = formats[(scene + v) % len(formats)]
+            shot_time = taken + timedelta(seconds=v)      # 连拍：每张相隔 1 秒
+
+            subdir = os.path.join(out_dir, f'roll_{count // files_per_dir:04d}')
+            os.makedirs(subdir, exist_ok=True)
+            path = os.path.join(subdir, f'IMG_{count:06d}.{fmt}')
+
+            if fmt == 'jpg':
+                data = _jpeg_bytes(img, rng.choice((80, 90, 95)), _exif_bytes(model, shot_time))
+                with open(path, 'wb') as f:
+                    f.write(data)
+            elif fmt == 'tif':
+                img.save(path, 'TIFF', exif=_exif_bytes(model, shot_time))
+            elif fmt == 'dng':
+                with open(path, 'wb') as f:
+                    f.write(make_dng(img, model, shot_time))
+            else:
+                raise ValueError(f"不支持的格式: {fmt}")
+
+            files.append({
+                'path': os.path.relpath(path, out_dir),
+                'scene': scene,
+                'variant': v,
+                'format': fmt,
+            })
+            count += 1
+
+    manifest = {
+        'params': {
+            'scenes': scenes,
+            'variants': variants,
+            'formats': list(formats),
+            'image_size': list(image_size),
+            'seed': seed,
+        },
+        'files': files,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def synthetic_hashes(
+    n: int,
+    cluster_size: int = 4,
+    max_flips: int = 6,
+    seed: int = 0,
+) -> tuple[list[str], list[float]]:
+    """
+    生成 n 个合成 64-bit 哈希（十六进制）及对应的拍摄时间戳，不需要任何图像。
+
+    每 cluster_size 个哈希为一簇：由同一个随机基准哈希翻转 0..max_flips 位得到，
+    拍摄时间相隔 1 秒；簇与簇之间相隔 60 秒以上。用于大规模分组基准。
+    """
+    rng = random.Random(seed)
+    hashes, times = [], []
+    t = BASE_TIME.timestamp()
+    base = 0
+    for i in range(n):
+        if i % cluster_size == 0:
+            base = rng.getrandbits(64)
+            t += rng.randint(60, 600)
+        h = base
+        for _ in range(rng.randint(0, max_flips)):
+            h ^= 1 << rng.randrange(64)
+        hashes.append(f'{h:016x}')
+        times.append(t + i % cluster_size)
+    return hashes, times
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="生成合成照片语料")
+    parser.add_argument('out_dir')
+    parser.add_argument('--scenes', type=int, default=100)
+    parser.add_argument('--variants', type=int, default=4)
+    parser.add_argument('--formats', default=','.join(FORMATS))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    manifest = generate_corpus(
+        args.out_dir, args.scenes, args.variants,
+        tuple(args.formats.split(',')), seed=args.seed,
+    )
+    print(f"已生成 {len(manifest['files'])} 个文件 → {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
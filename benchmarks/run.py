@@ -0,0 +1,453 @@
+"""
+性能基准 — 分阶段测量扫描流水线，输出机器可读的 JSON 结果。
+
+阶段：目录遍历、EXIF 读取、预览提取、pHash 计算、分组（全局 / 时间窗口，
+1k ~ 1M 个哈希）、推荐生成、API 序列化、扫描结果常驻内存。前四个阶段在合成语料上运行，
+其余阶段使用合成哈希，不依赖图像文件。
+
+用法:
+    python -m benchmarks.run                          # 运行并输出 bench_results.json
+    python -m benchmarks.run --baseline base.json     # 与基线对比，回归超过容差时退出码为 1
+    python -m benchmarks.run --stages group --sizes 1000,10000
+
+所有数据（语料、缩略图缓存）写入临时目录，不会触碰 ~/.photodedup。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+STAGES = ('walk', 'exif', 'extract', 'hash', 'group', 'recommend', 'serialize', 'memory', 'lookup')
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# 全局分组为 O(N²)，超过这个规模只跑时间窗口模式
+DEFAULT_MAX_GLOBAL = 100_000
+
+
+def _measure(name: str, fn, n: int, repeat: int, **extra) -> dict:
+    """重复运行 fn，取中位数"""
+    return _summarize(name, n, [_timed(fn) for _ in range(repeat)], **extra)
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _summarize(name: str, n: int, runs: list[float], **extra) -> dict:
+    seconds = statistics.median(runs)
+    result = {
+        'name': name,
+        'n': n,
+        'seconds': round(seconds, 6),
+        'min_seconds': round(min(runs), 6),
+        'runs': [round(r, 6) for r in runs],
+        'per_second': round(n / seconds, 1) if seconds > 0 else None,
+    }
+    result.update(extra)
+    print(f"  {name:<28} n={n:<9} {seconds * 1000:10.1f} ms", file=sys.stderr)
+    return result
+
+
+# ─── 文件阶段（合成语料） ──────────────────────────────
+
+def bench_files(corpus_dir: str, stages: set[str], repeat: int) -> list[dict]:
+    from backend.core.scanner import scan_directory, read_exif_quick
+    from backend.core.thumbnail import extract_thumbnail
+    from backend.core.hasher import compute_phash_batch
+
+    results = []
+    photos = scan_directory(corpus_dir, include_images=True, read_exif=False)
+    paths = [p.path for p in photos]
+    n = len(paths)
+
+    if 'walk' in stages:
+        results.append(_measure(
+            'walk', lambda: scan_directory(corpus_dir, include_images=True, read_exif=False),
+            n, repeat,
+        ))
+    if 'exif' in stages:
+        results.append(_measure('exif', lambda: [read_exif_quick(p) for p in paths], n, repeat))
+
+    thumbs = {}
+    if 'extract' in stages or 'hash' in stages:
+        def extract():
+            for p in paths:
+                thumbs[p] = extract_thumbnail(p, use_cache=False)
+        extract_result = _measure('extract', extract, n, repeat if 'extract' in stages else 1)
+        if 'extract' in stages:
+            by_format = {}
+            for p in paths:
+                ext = os.path.splitext(p)[1].lower()
+                by_format.setdefault(ext, [0, 0])
+                by_format[ext][0] += 1
+                by_format[ext][1] += thumbs[p] is not None
+            extract_result['ok_by_format'] = {k: f"{ok}/{total}" for k, (total, ok) in by_format.items()}
+            results.append(extract_result)
+
+    if 'hash' in stages:
+        thumb_map = {p: str(t) for p, t in thumbs.items() if t}
+        def plain():
+            compute_phash_batch(thumb_map)
+
+        def with_quality():
+            compute_phash_batch(thumb_map, qualities={})
+
+        # 先不计时地跑一遍预热页缓存，再交替运行两种模式，
+        # 避免先跑的一方替后跑的一方读盘，使附加开销偏小甚至为负
+        plain()
+        hash_runs, quality_runs = [], []
+        for _ in range(repeat):
+            hash_runs.append(_timed(plain))
+            quality_runs.append(_timed(with_quality))
+        hash_result = _summarize('hash', len(thumb_map), hash_runs)
+        results.append(hash_result)
+        # 同一遍顺带计算画质指标（扫描的实际做法），overhead 为相对只算哈希多出的比例（各轮比值的中位数）
+        quality_result = _summarize('hash_quality', len(thumb_map), quality_runs)
+        if min(hash_runs) > 0:
+            quality_result['overhead'] = round(
+                statistics.median(q / h for q, h in zip(quality_runs, hash_runs)) - 1, 3,
+            )
+        results.append(quality_result)
+
+    return results
+
+
+# ─── 分组 / 推荐 / 序列化（合成哈希） ────────────────────
+
+def bench_hash_stages(
+    stages: set[str],
+    sizes: list[int],
+    max_global: int,
+    repeat: int,
+) -> list[dict]:
+    from benchmarks.corpus import synthetic_hashes
+    from backend.config import DEFAULT_SIMILARITY_THRESHOLD
+    from backend.core.grouper import group_similar_photos, group_similar_photos_windowed
+    from backend.core.recommender import recommend_all
+
+    results = []
+    threshold = DEFAULT_SIMILARITY_THRESHOLD
+    if 'serialize' in stages:
+        from backend.api import routes  # noqa: F401 — 预先导入，不把导入耗时算进序列化
+
+    for n in sizes:
+        hashes, times = synthetic_hashes(n)
+        photo_hashes = {f'/bench/{i:07d}.NEF': h for i, h in enumerate(hashes)}
+        photo_sizes = {p: 25_000_000 for p in photo_hashes}
+        capture_info = {p: ('BenchCam', t) for p, t in zip(photo_hashes, times)}
+        # 大规模时减少重复次数，避免基准本身耗时过长
+        reps = repeat if n <= 10_000 else 1
+
+        groups = None
+        if 'group' in stages or 'recommend' in stages or 'serialize' in stages:
+            def windowed():
+                nonlocal groups
+                groups = group_similar_photos_windowed(
+                    photo_hashes, capture_info, 5, photo_sizes, threshold,
+                )
+            windowed_result = _measure(f'group_windowed_{n}', windowed, n, reps if 'group' in stages else 1,
+                                       threshold=threshold, window_seconds=5)
+            if 'group' in stages:
+                windowed_result['groups'] = len(groups)
+                results.append(windowed_result)
+
+        if 'group' in stages and n <= max_global:
+            results.append(_measure(
+                f'group_global_{n}',
+                lambda: group_similar_photos(photo_hashes, photo_sizes, threshold),
+                n, reps, threshold=threshold,
+            ))
+
+        if 'group' in stages:
+            results.extend(_bench_orientation(hashes, times, threshold, n, reps, n <= max_global))
+
+        if 'recommend' in stages:
+            results.append(_measure(f'recommend_{n}', lambda: recommend_all(groups), n, reps,
+                                    groups=len(groups)))
+
+        if 'serialize' in stages:
+            results.append(_measure(f'serialize_{n}', lambda: _serialize(groups), n, reps,
+                                    groups=len(groups)))
+
+    return results
+
+
+def _bench_orientation(hashes: list[str], times: list[float], threshold: int, n: int, reps: int,
+                       run_global: bool) -> list[dict]:
+    """
+    方向无关匹配的分组代价：同一张照片表分别按 off / any 构建邻接图，overhead 为多出的比例。
+
+    规范哈希由合成哈希按位反转得到（与原哈希无关联，和真实照片一样需要单独比较），
+    约 8% 的照片带一个备选规范哈希。
+    """
+    import random
+    from backend.core.grouper import build_neighbor_graph, build_neighbor_graph_windowed
+    from backend.core.phototable import PhotoTableBuilder
+
+    rng = random.Random(1)
+    builder = PhotoTableBuilder()
+    for i, (h, t) in enumerate(zip(hashes, times)):
+        canonical = int(f'{int(h, 16):064b}'[::-1], 2)
+        variants = [(canonical, rng.randrange(8))]
+        if rng.random() < 0.08:
+            variants.append((canonical ^ (1 << rng.randrange(64)), rng.randrange(8)))
+        builder.add(f'/bench/{i:07d}.NEF', 25_000_000, t, t, h, 'BenchCam', orientation=variants)
+    table = builder.build()
+
+    builds = [('windowed', lambda mode: build_neighbor_graph_windowed(table, 5, threshold, True, mode))]
+    if run_global:
+        builds.append(('global', lambda mode: build_neighbor_graph(table, threshold, mode)))
+    results = []
+    for name, build in builds:
+        base = _measure(f'group_{name}_table_{n}', lambda: build('off'), n, reps, threshold=threshold)
+        oriented = _measure(f'group_{name}_orientation_{n}', lambda: build('any'), n, reps, threshold=threshold)
+        if base['seconds'] > 0:
+            oriented['overhead'] = round(oriented['seconds'] / base['seconds'] - 1, 3)
+        results.extend([base, oriented])
+    return results
+
+
+def _serialize(groups) -> int:
+    """走一遍 /api/groups 与 /api/recommendations 的处理和 JSON 编码"""
+    from fastapi.encoders import jsonable_encoder
+    from backend.api import routes
+    from backend.core.recommender import recommend_all
+
+    routes.scan_state.update({
+        'status': 'done',
+        'groups': groups,
+        'recommendations': recommend_all(groups),
+    })
+    size = 0
+    for handler in (routes.get_groups, routes.get_recommendations):
+        payload = asyncio.run(handler())
+        size += len(json.dumps(jsonable_encoder(payload), ensure_ascii=False))
+    return size
+
+
+def bench_memory(sizes: list[int]) -> list[dict]:
+    """
+    扫描结果常驻内存：照片表 + 邻接图 + 分组（tracemalloc 统计，不含 NumPy 之外的解释器开销）。
+
+    路径按真实照片库的形态生成（约 300 张一个目录），时间窗口分组，阈值为默认值。
+    """
+    import gc
+    import tracemalloc
+    from benchmarks.corpus import synthetic_hashes
+    from backend.config import DEFAULT_SIMILARITY_THRESHOLD
+    from backend.core.grouper import build_neighbor_graph_windowed
+    from backend.core.phototable import PhotoTableBuilder
+    import scipy.sparse.csgraph  # noqa: F401 — 预先导入，模块本身不计入结果
+
+    results = []
+    for n in sizes:
+        hashes, times = synthetic_hashes(n)
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        builder = PhotoTableBuilder()
+        for i, (h, t) in enumerate(zip(hashes, times)):
+            builder.add(f'/photos/{2015 + i // 200_000}/{i // 300:05d}-event/DSC_{i:07d}.NEF',
+                        25_000_000, t, t, h, 'BenchCam')
+        table = builder.build()
+        graph = build_neighbor_graph_windowed(table, 5, DEFAULT_SIMILARITY_THRESHOLD)
+        groups = graph.groups(DEFAULT_SIMILARITY_THRESHOLD)
+        seconds = time.perf_counter() - start
+        del builder
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append({
+            'name': f'memory_{n}',
+            'n': n,
+            'seconds': round(seconds, 6),
+            'bytes': retained,
+            'bytes_per_photo': round(retained / n, 1),
+            'peak_bytes': peak,
+            'table_bytes': table.nbytes(),
+            'groups': len(groups),
+        })
+        print(f"  {'memory_' + str(n):<28} n={n:<9} {retained / 2 ** 20:10.1f} MiB "
+              f"({retained / n:.0f} B/张，峰值 {peak / 2 ** 20:.1f} MiB)", file=sys.stderr)
+        del table, graph, groups
+    return results
+
+
+def bench_lookup(sizes: list[int], queries: int = 1000) -> list[dict]:
+    """
+    图库索引：写入 n 张照片，再逐张查询 queries 个与已有照片相差 0..6 位的哈希（默认阈值）。
+
+    seconds 为单次查询的平均耗时。
+    """
+    import random
+    import tempfile
+    import numpy as np
+    from benchmarks.corpus import synthetic_hashes
+    from backend.config import DEFAULT_SIMILARITY_THRESHOLD
+    from backend.core.archive import ArchiveIndex
+    from backend.core.phototable import PhotoTableBuilder
+
+    results = []
+    rng = random.Random(0)
+    for n in sizes:
+        hashes, times = synthetic_hashes(n)
+        builder = PhotoTableBuilder()
+        for i, (h, t) in enumerate(zip(hashes, times)):
+            builder.add(f'/archive/{i // 300:05d}/DSC_{i:07d}.NEF', 25_000_000, t, t, h, 'BenchCam')
+        with tempfile.TemporaryDirectory(prefix='photodedup-archive-') as tmp:
+            index = ArchiveIndex(tmp)
+            start = time.perf_counter()
+            index.add(builder.build())
+            add_seconds = time.perf_counter() - start
+
+            probes = []
+            for _ in range(queries):
+                h = int(hashes[rng.randrange(n)], 16)
+                for _ in range(rng.randint(0, 6)):
+                    h ^= 1 << rng.randrange(64)
+                probes.append(h)
+            probes = np.array(probes, dtype=np.uint64)
+            index.lookup(probes[:1], DEFAULT_SIMILARITY_THRESHOLD)  # 预热（掩码表、页缓存）
+            start = time.perf_counter()
+            found = sum(bool(index.lookup(probes[q:q + 1], DEFAULT_SIMILARITY_THRESHOLD)[0]) for q in range(queries))
+            per_query = (time.perf_counter() - start) / queries
+            size = index.stats()['bytes']
+        results.append({
+            'name': f'lookup_{n}',
+            'n': n,
+            'seconds': round(per_query, 6),
+            'add_seconds': round(add_seconds, 3),
+            'index_bytes': size,
+            'found': found,
+        })
+        print(f"  {'lookup_' + str(n):<28} n={n:<9} {per_query * 1000:10.3f} ms/次 "
+              f"(写入 {add_seconds:.2f}s，{size / n:.0f} B/张，命中 {found}/{queries})", file=sys.stderr)
+    return results
+
+
+# ─── 结果与基线对比 ──────────────────────────────────────
+
+def _metadata(args) -> dict:
+    try:
+        rev = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except Exception:
+        rev = ''
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_rev': rev,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scenes': args.scenes,
+        'variants': args.variants,
+        'seed': args.seed,
+        'repeat': args.repeat,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    与基线逐项对比。
+
+    Returns:
+        [{'name', 'baseline', 'current', 'ratio', 'regression'}, ...]
+        ratio = 当前耗时 / 基线耗时，超过 1 + tolerance 视为回归
+    """
+    base = {r['name']: r for r in baseline.get('results', [])}
+    rows = []
+    for r in current.get('results', []):
+        b = base.get(r['name'])
+        if not b or not b['seconds']:
+            continue
+        ratio = r['seconds'] / b['seconds']
+        rows.append({
+            'name': r['name'],
+            'baseline': b['seconds'],
+            'current': r['seconds'],
+            'ratio': round(ratio, 3),
+            'regression': ratio > 1 + tolerance,
+        })
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="PhotoDedup 性能基准")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"逗号分隔，可选: {','.join(STAGES)}")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="分组/推荐/序列化的哈希数量")
+    parser.add_argument('--max-global', type=int, default=DEFAULT_MAX_GLOBAL,
+                        help="全局（两两比较）分组的最大规模")
+    parser.add_argument('--scenes', type=int, default=100, help="合成语料的场景数")
+    parser.add_argument('--variants', type=int, default=4, help="每个场景的变体数")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--corpus', help="复用已生成的语料目录（默认每次生成到临时目录）")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help="基线结果 JSON，对比并报告回归")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="允许的变慢比例（默认 0.2 = 20%%）")
+    args = parser.parse_args(argv)
+
+    stages = {s for s in args.stages.split(',') if s}
+    unknown = stages - set(STAGES)
+    if unknown:
+        parser.error(f"未知阶段: {','.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+
+    with tempfile.TemporaryDirectory(prefix='photodedup-bench-') as tmp:
+        # 必须在导入 backend 之前设置，缩略图缓存写入临时目录
+        os.environ['PHOTODEDUP_HOME'] = os.path.join(tmp, 'home')
+
+        results = []
+        if stages & {'walk', 'exif', 'extract', 'hash'}:
+            corpus_dir = args.corpus
+            if not corpus_dir:
+                from benchmarks.corpus import generate_corpus
+                corpus_dir = os.path.join(tmp, 'corpus')
+                print(f"生成合成语料: {args.scenes} 场景 × {args.variants} 变体", file=sys.stderr)
+                generate_corpus(corpus_dir, args.scenes, args.variants, seed=args.seed)
+            results += bench_files(corpus_dir, stages, args.repeat)
+
+        if stages & {'group', 'recommend', 'serialize'}:
+            results += bench_hash_stages(stages, sizes, args.max_global, args.repeat)
+
+        if 'memory' in stages:
+            results += bench_memory(sizes)
+
+        if 'lookup' in stages:
+            results += bench_lookup(sizes)
+
+    report = {'meta': _metadata(args), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"结果已写入 {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        for row in rows:
+            flag = '  ← 回归' if row['regression'] else ''
+            print(f"  {row['name']:<28} {row['baseline'] * 1000:10.1f} → "
+                  f"{row['current'] * 1000:10.1f} ms  ×{row['ratio']:.2f}{flag}", file=sys.stderr)
+        if any(row['regression'] for row in rows):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+启动耗时检查 — 测量命令行入口和 backend.main 的冷启动时间，并确认没有导入重量级依赖。
+
+每个场景在独立的冷启动子进程中运行多次取中位数：子进程先执行参照代码（默认为空；
+backend.main 的参照为导入 FastAPI 本身），再在同一进程内计时场景代码，只把这部分耗时与预算比较。
+参照与场景在同一进程中依次执行，不再用两个进程的耗时相减，结果不会因进程间的波动变成负数；
+超出预算或导入了禁止的模块时退出码为 1，CI（.github/workflows/checks.yml）每次提交都会运行；
+tests/test_startup.py 同时检查禁止的导入，并按宽松的倍数检查耗时。
+
+用法:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget-scale 2    # 慢机器上放宽预算
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 命令行入口不应加载的模块（Web 框架、窗口、图像解码）
+HEAVY_MODULES = ('fastapi', 'starlette', 'uvicorn', 'webview', 'PIL', 'rawpy', 'imagehash', 'scipy', 'exifread')
+
+# backend.main 导入时只应加载 FastAPI，解码/哈希/分组依赖在服务就绪后后台预热
+SERVER_DEFERRED_MODULES = ('uvicorn', 'webview', 'numpy', 'PIL', 'rawpy', 'imagehash', 'scipy', 'exifread', 'send2trash')
+
+# (名称, 子进程中执行的代码, 参照代码, 预算毫秒（扣除参照后）, 禁止导入的模块)
+SCENARIOS = [
+    (
+        'cli_help',
+        "import sys; sys.argv = ['cli', '--help']\n"
+        "from backend import cli\n"
+        "try:\n    cli.main()\nexcept SystemExit:\n    pass",
+        'pass',
+        150,
+        HEAVY_MODULES,
+    ),
+    (
+        'cli_group_import',
+        "from backend import cli\nfrom backend.core import grouper, recommender",
+        'pass',
+        250,
+        ('fastapi', 'starlette', 'uvicorn', 'webview', 'PIL', 'rawpy', 'imagehash', 'scipy'),
+    ),
+    (
+        'backend_main',
+        "import backend.main",
+        "import fastapi, fastapi.staticfiles, fastapi.responses, pydantic",
+        100,
+        SERVER_DEFERRED_MODULES,
+    ),
+]
+
+_PROBE = """
+import json, sys, time
+_start = time.perf_counter()
+{reference}
+_mid = time.perf_counter()
+{code}
+_end = time.perf_counter()
+sys.stdout.flush()
+sys.__stderr__.write('\\n@@RESULT@@' + json.dumps({{
+    'reference': _mid - _start, 'own': _end - _mid, 'modules': sorted(sys.modules),
+}}))
+"""
+
+
+def _run_once(code: str, reference: str, env: dict) -> dict:
+    """
+    在冷启动的子进程中执行一次场景。
+
+    Returns:
+        {'total': 子进程总耗时, 'reference': 参照代码耗时, 'own': 场景代码耗时（秒）, 'modules': 已导入的模块}
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-c', _PROBE.format(code=code, reference=reference)],
+        capture_output=True, text=True, env=env,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0 or '@@RESULT@@' not in proc.stderr:
+        raise RuntimeError(proc.stderr)
+    return {'total': elapsed, **json.loads(proc.stderr.rsplit('@@RESULT@@', 1)[1])}
+
+
+def _median_ms(code: str, reference: str, env: dict, repeat: int) -> tuple[dict, list[str]]:
+    """各项耗时的中位数（毫秒）与最后一次运行导入的模块"""
+    runs = [_run_once(code, reference, env) for _ in range(repeat)]
+    medians = {key: statistics.median(r[key] for r in runs) * 1000 for key in ('total', 'reference', 'own')}
+    return medians, runs[-1]['modules']
+
+
+def _env(home: str) -> dict:
+    """子进程环境：临时的数据目录，仓库根目录加入 PYTHONPATH"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return dict(os.environ, PHOTODEDUP_HOME=home,
+                PYTHONPATH=root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+
+
+def forbidden_imports() -> dict[str, list[str]]:
+    """
+    每个场景各运行一次（不计时），返回其中导入了的禁止模块（tests/test_startup.py 使用）。
+
+    Returns:
+        {场景名: [禁止但被导入的顶层模块]}
+    """
+    with tempfile.TemporaryDirectory(prefix='photodedup-startup-') as home:
+        env = _env(home)
+        return {
+            name: sorted({m.split('.')[0] for m in _run_once(code, reference, env)['modules']} & set(forbidden))
+            for name, code, reference, _, forbidden in SCENARIOS
+        }
+
+
+def import_costs(repeat: int = 3) -> dict[str, tuple[float, float]]:
+    """
+    每个场景代码本身的耗时中位数与预算（tests/test_startup.py 使用，按宽松的倍数断言）。
+
+    Returns:
+        {场景名: (耗时毫秒, 预算毫秒)}
+    """
+    with tempfile.TemporaryDirectory(prefix='photodedup-startup-') as home:
+        env = _env(home)
+        return {
+            name: (_median_ms(code, reference, env, repeat)[0]['own'], budget_ms)
+            for name, code, reference, budget_ms, _ in SCENARIOS
+        }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="PhotoDedup 启动耗时检查")
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--budget-scale', type=float, default=1.0, help="预算倍数（慢机器上调大）")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    home = tempfile.TemporaryDirectory(prefix='photodedup-startup-')
+    env = _env(home.name)
+
+    results, failed = [], False
+    for name, code, reference, budget_ms, forbidden in SCENARIOS:
+        times, modules = _median_ms(code, reference, env, args.repeat)
+        own_ms = times['own']
+        budget = budget_ms * args.budget_scale
+        loaded = sorted({m.split('.')[0] for m in modules} & set(forbidden))
+        ok = own_ms <= budget and not loaded
+        failed |= not ok
+        results.append({
+            'name': name,
+            'total_ms': round(times['total'], 1),
+            'reference_ms': round(times['reference'], 1),
+            'own_ms': round(own_ms, 1),
+            'budget_ms': budget,
+            'forbidden_loaded': loaded,
+            'ok': ok,
+        })
+        if not args.json:
+            flag = '' if ok else '  ← 超出预算' if not loaded else f"  ← 导入了 {', '.join(loaded)}"
+            print(f"  {name:<24} {own_ms:7.1f} ms / {budget:.0f} ms{flag}", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps({'results': results}, indent=2))
+    else:
+        print("  （只计场景代码本身，不含解释器启动和参照代码的导入）", file=sys.stderr)
+    home.cleanup()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
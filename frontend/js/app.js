@@ -6,6 +6,10 @@
 // ─── 常量 ─────────────────────────────────────────────
 const API = '/api';
 const WS_URL = `ws://${location.host}/api/ws/progress`;
+const LIBRARY_WS_URL = `ws://${location.host}/api/ws/library`;
+const DELETE_WS_URL = `ws://${location.host}/api/ws/delete`;
+// 审核时预取当前组之后多少组的缩略图（另加前一组）
+const PREFETCH_AHEAD = 10;
 
 // ─── 状态 ─────────────────────────────────────────────
 const state = {
@@ -14,8 +18,17 @@ const state = {
     recommendations: null,
     currentGroupIndex: 0,
     ws: null,
+    libraryWs: null,
+    deleteJob: null,  // 最近一次删除任务的 id（用于撤销）
+    regroupTimer: null,
+    prefetchTimer: null,
+    thresholdPreview: null,
     // 用户在审核模式中的操作记录：{ path: 'keep' | 'delete' }
     decisions: {},
+    // 扫描进行中的临时分组：是否为临时结果、已收到的版本、用户手动改过决策的照片
+    provisional: false,
+    provisionalVersion: 0,
+    touched: new Set(),
 };
 
 // ─── DOM 引用 ──────────────────────────────────────────
@@ -41,8 +54,15 @@ function initEventListeners() {
 
     // 结果页
     $('#btn-review-mode').addEventListener('click', () => enterReviewMode());
+    $('#btn-review-early').addEventListener('click', reviewEarly);
     $('#btn-auto-mode').addEventListener('click', () => enterAutoMode());
     $('#btn-new-scan').addEventListener('click', resetAndGoHome);
+    $('#regroup-threshold').addEventListener('input', (e) => {
+        $('#regroup-threshold-val').textContent = e.target.value;
+        showThresholdPreview(parseInt(e.target.value));
+        clearTimeout(state.regroupTimer);
+        state.regroupTimer = setTimeout(() => applyThreshold(parseInt(e.target.value)), 150);
+    });
     $('#btn-go-home').addEventListener('click', resetAndGoHome);
 
     // 审核导航
@@ -61,6 +81,7 @@ function initEventListeners() {
 
     // 完成页
     $('#btn-back-home').addEventListener('click', resetAndGoHome);
+    $('#btn-restore-delete').addEventListener('click', restoreDeleted);
 
     // Lightbox
     $('.lightbox-overlay').addEventListener('click', closeLightbox);
@@ -92,8 +113,18 @@ async function startScan() {
 
     const threshold = parseInt($('#threshold').value);
     const includeImages = $('#include-images').checked;
+    const timeWindow = parseFloat($('#time-window').value) || 0;
 
     // 切换到进度页
+    state.groups = [];
+    state.recommendations = null;
+    state.decisions = {};
+    state.provisional = false;
+    state.provisionalVersion = 0;
+    state.touched = new Set();
+    $('#btn-review-early').classList.add('hidden');
+    $('#review-panel').classList.add('hidden');
+    $('#auto-panel').classList.add('hidden');
     showPage('progress');
     updateStatusBadge('scanning');
 
@@ -109,6 +140,7 @@ async function startScan() {
                 directory,
                 threshold,
                 include_images: includeImages,
+                time_window: timeWindow > 0 ? timeWindow : null,
             }),
         });
 
@@ -136,7 +168,8 @@ function connectWebSocket() {
 
     state.ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
-        handleProgress(data);
+        if (data.type === 'groups') handleProvisionalGroups(data);
+        else handleProgress(data);
     };
 
     state.ws.onerror = () => {
@@ -162,6 +195,12 @@ function startPolling() {
             });
             if (data.status === 'done' || data.status === 'error') {
                 clearInterval(poll);
+                return;
+            }
+            const groupsRes = await fetch(`${API}/groups/provisional?since=${state.provisionalVersion}`);
+            if (groupsRes.ok) {
+                const groups = await groupsRes.json();
+                if (groups.version > state.provisionalVersion) handleProvisionalGroups(groups);
             }
         } catch (e) {
             clearInterval(poll);
@@ -169,6 +208,30 @@ function startPolling() {
     }, 1000);
 }
 
+// ─── 扫描中的临时分组 ──────────────────────────────────
+function handleProvisionalGroups(data) {
+    // 扫描已结束（最终结果已加载）后到达的临时结果忽略
+    if (state.currentPage === 'results' && !state.provisional) return;
+
+    state.provisional = true;
+    state.provisionalVersion = data.version;
+    if (!state.recommendations) {
+        state.recommendations = { recommendations: [], summary: data.summary };
+    }
+    applyGroupChanges(data);
+
+    const btn = $('#btn-review-early');
+    btn.classList.toggle('hidden', state.groups.length === 0);
+    $('#review-early-label').textContent =
+        `开始审核已发现的 ${state.groups.length} 组（已处理 ${data.hashed} / ${data.total}）`;
+}
+
+function reviewEarly() {
+    if (state.groups.length === 0) return;
+    showPage('results');
+    enterReviewMode();
+}
+
 function handleProgress(data) {
     const { stage, progress, total, message, summary } = data;
 
@@ -227,6 +290,10 @@ function handleProgress(data) {
 
 // ─── 加载结果 ──────────────────────────────────────────
 async function loadResultsFromAPI() {
+    // 扫描中已开始审核时，最终结果到达后保持当前分组和手动做出的决策（分组 id 不变）
+    const reviewing = state.provisional && !$('#review-panel').classList.contains('hidden');
+    const current = state.groups[state.currentGroupIndex];
+    const currentId = current ? current.group_id : null;
     try {
         const [groupsRes, recRes] = await Promise.all([
             fetch(`${API}/groups`),
@@ -237,12 +304,17 @@ async function loadResultsFromAPI() {
 
         state.groups = groupsData.groups || [];
         state.recommendations = recData;
+        state.provisional = false;
+        syncRegroupSlider(groupsData);
 
         populateResultsSummary(recData.summary);
         showPage('results');
+        connectLibrarySocket();
 
         // 扫描完成后自动进入逐组审核模式
-        if (state.groups.length > 0) {
+        if (reviewing && state.groups.length > 0) {
+            resumeReview(currentId);
+        } else if (state.groups.length > 0) {
             enterReviewMode();
         }
     } catch (e) {
@@ -251,6 +323,22 @@ async function loadResultsFromAPI() {
     }
 }
 
+function resumeReview(currentId) {
+    // 按最终推荐重新填充决策，用户手动改过的照片保留原决策
+    const previous = state.decisions;
+    state.decisions = {};
+    for (const rec of state.recommendations.recommendations) {
+        for (const p of rec.keep) state.decisions[p] = 'keep';
+        for (const p of rec.delete) state.decisions[p] = 'delete';
+    }
+    for (const p of state.touched) {
+        if (p in previous) state.decisions[p] = previous[p];
+    }
+    const idx = state.groups.findIndex(g => g.group_id === currentId);
+    state.currentGroupIndex = idx >= 0 ? idx : 0;
+    renderCurrentGroup();
+}
+
 function loadResults(summary) {
     // 先显示摘要，再异步加载详细数据
     populateResultsSummary(summary);
@@ -260,6 +348,116 @@ function loadResults(summary) {
     loadResultsFromAPI().catch(() => { });
 }
 
+function syncRegroupSlider(groupsData) {
+    if (groupsData.max_threshold == null) return;
+    const slider = $('#regroup-threshold');
+    slider.max = groupsData.max_threshold;
+    slider.value = groupsData.threshold;
+    $('#regroup-threshold-val').textContent = groupsData.threshold;
+
+    fetch(`${API}/threshold-preview`)
+        .then(res => res.ok ? res.json() : null)
+        .then(data => {
+            state.thresholdPreview = data;
+            showThresholdPreview(groupsData.threshold);
+        })
+        .catch(() => { });
+}
+
+function showThresholdPreview(threshold) {
+    const preview = state.thresholdPreview;
+    const row = preview && preview.thresholds[threshold];
+    $('#regroup-preview').textContent = row
+        ? `${row.groups} 组 · ${row.grouped_photos} 张 · 最大组 ${row.largest_group} 张`
+        : '';
+}
+
+// ─── 即时重新分组（不重新扫描） ──────────────────────────
+async function applyThreshold(threshold) {
+    try {
+        const res = await fetch(`${API}/regroup`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ threshold }),
+        });
+        if (!res.ok) return;
+
+        const [groupsRes, recRes] = await Promise.all([
+            fetch(`${API}/groups`),
+            fetch(`${API}/recommendations`),
+        ]);
+        state.groups = (await groupsRes.json()).groups || [];
+        state.recommendations = await recRes.json();
+        populateResultsSummary(state.recommendations.summary);
+
+        // 分组变化后，按新推荐刷新当前视图
+        if (!$('#auto-panel').classList.contains('hidden')) {
+            enterAutoMode();
+        } else if (!$('#review-panel').classList.contains('hidden')) {
+            if (state.groups.length > 0) {
+                enterReviewMode();
+            } else {
+                $('#group-gallery').innerHTML = '';
+                $('#group-indicator').textContent = '没有相似照片组';
+            }
+        }
+    } catch (e) {
+        console.warn('重新分组失败', e);
+    }
+}
+
+// ─── 增量更新推送（监视模式 / 新导入的照片） ─────────────────
+function connectLibrarySocket() {
+    if (state.libraryWs) return;
+    state.libraryWs = new WebSocket(LIBRARY_WS_URL);
+    state.libraryWs.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.type === 'groups') applyGroupChanges(data);
+    };
+    state.libraryWs.onclose = () => {
+        state.libraryWs = null;
+    };
+}
+
+function applyGroupChanges(data) {
+    // 按分组 id 局部替换，当前正在审核的分组保持不变（除非它被移除）
+    const current = state.groups[state.currentGroupIndex];
+    const currentId = current ? current.group_id : null;
+    const changed = new Map(data.groups.map(g => [g.group_id, g]));
+    const removed = new Set(data.removed);
+    state.groups = state.groups
+        .filter(g => !removed.has(g.group_id))
+        .map(g => changed.get(g.group_id) || g);
+    for (const id of data.created) {
+        if (changed.has(id)) state.groups.push(changed.get(id));
+    }
+
+    if (state.recommendations) {
+        const recs = new Map(data.recommendations.map(r => [r.group_id, r]));
+        state.recommendations.recommendations = state.recommendations.recommendations
+            .filter(r => !removed.has(r.group_id))
+            .map(r => recs.get(r.group_id) || r);
+        for (const id of data.created) {
+            if (recs.has(id)) state.recommendations.recommendations.push(recs.get(id));
+        }
+        state.recommendations.summary = data.summary;
+    }
+    // 新出现的照片按推荐预填决策，用户已做的决策不覆盖
+    for (const rec of data.recommendations) {
+        for (const p of rec.keep) if (!(p in state.decisions)) state.decisions[p] = 'keep';
+        for (const p of rec.delete) if (!(p in state.decisions)) state.decisions[p] = 'delete';
+    }
+    populateResultsSummary(data.summary);
+
+    if (!$('#review-panel').classList.contains('hidden') && state.groups.length > 0) {
+        const idx = state.groups.findIndex(g => g.group_id === currentId);
+        state.currentGroupIndex = idx >= 0 ? idx : Math.min(state.currentGroupIndex, state.groups.length - 1);
+        renderCurrentGroup();
+    } else if (!$('#auto-panel').classList.contains('hidden')) {
+        enterAutoMode();
+    }
+}
+
 function populateResultsSummary(summary) {
     if (!summary) return;
     $('#stat-total').textContent = summary.total_photos || 0;
@@ -304,7 +502,8 @@ function renderCurrentGroup() {
 
     // 更新导航
     $('#group-indicator').textContent =
-        `第 ${state.currentGroupIndex + 1} / ${state.groups.length} 组（${group.count} 张）`;
+        `第 ${state.currentGroupIndex + 1} / ${state.groups.length} 组（${group.count} 张）` +
+        (group.may_grow ? ' · 扫描中，可能继续增加' : '');
 
     // 渲染照片卡片
     const gallery = $('#group-gallery');
@@ -315,6 +514,23 @@ function renderCurrentGroup() {
         const card = createPhotoCard(photo, decision);
         gallery.appendChild(card);
     }
+
+    schedulePrefetch();
+}
+
+function schedulePrefetch() {
+    // 按显示顺序（当前组、之后几组、前一组）预热缩略图；快速连续翻页时只提交最后一次的位置
+    clearTimeout(state.prefetchTimer);
+    state.prefetchTimer = setTimeout(() => {
+        const idx = state.currentGroupIndex;
+        const order = state.groups.slice(idx, idx + PREFETCH_AHEAD + 1);
+        if (idx > 0) order.push(state.groups[idx - 1]);
+        fetch(`${API}/prefetch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ groups: order.map(g => g.photos.map(p => p.path)) }),
+        }).catch(() => { });
+    }, 150);
 }
 
 function createPhotoCard(photo, decision) {
@@ -330,6 +546,10 @@ function createPhotoCard(photo, decision) {
     let badges = '';
     if (photo.is_edited) badges += '<span class="badge badge-edited">已编辑</span>';
     if (photo.is_flagged) badges += '<span class="badge badge-flagged">⭐</span>';
+    if (photo.siblings && photo.siblings.length > 0) {
+        const exts = [photo.path, ...photo.siblings].map(p => p.split('.').pop().toUpperCase());
+        badges += `<span class="badge badge-pair" title="${photo.siblings.join('\n')}">${exts.join('+')}</span>`;
+    }
 
     // 操作按钮内容
     const actionIcon = decision === 'keep' ? '✓' : decision === 'delete' ? '✕' : '';
@@ -348,7 +568,7 @@ function createPhotoCard(photo, decision) {
     // 点击图片 → 预览
     card.querySelector('img').addEventListener('click', (e) => {
         e.stopPropagation();
-        openLightbox(thumbUrl, filename, sizeStr);
+        openLightbox(thumbUrl, `${thumbUrl}&preview=true`, filename, sizeStr);
     });
 
     // 点击操作按钮 → 切换状态
@@ -368,6 +588,7 @@ function togglePhotoDecision(path, card) {
     else next = 'keep';
 
     state.decisions[path] = next;
+    state.touched.add(path);
 
     // 更新 UI
     card.className = `photo-card ${next}`;
@@ -390,6 +611,7 @@ function bulkAction(type) {
 
     for (let i = 0; i < group.photos.length; i++) {
         const photo = group.photos[i];
+        state.touched.add(photo.path);
         if (type === 'all') {
             state.decisions[photo.path] = 'keep';
         } else if (type === 'first') {
@@ -404,6 +626,10 @@ function bulkAction(type) {
 
 // ─── 自动清理模式 ──────────────────────────────────────
 function enterAutoMode() {
+    if (state.provisional) {
+        alert('扫描尚未完成，完成后才能自动清理');
+        return;
+    }
     if (!state.recommendations) {
         alert('推荐数据暂未就绪');
         return;
@@ -458,10 +684,17 @@ function enterAutoMode() {
 
 // ─── 执行删除 ──────────────────────────────────────────
 async function executeDelete() {
-    const toDelete = Object.entries(state.decisions)
+    const selected = Object.entries(state.decisions)
         .filter(([_, v]) => v === 'delete')
         .map(([k]) => k);
 
+    // RAW+JPEG 拍摄单元整体删除
+    const siblingsOf = {};
+    for (const g of state.groups) {
+        for (const ph of g.photos) siblingsOf[ph.path] = ph.siblings || [];
+    }
+    const toDelete = selected.flatMap(p => [p, ...(siblingsOf[p] || [])]);
+
     if (toDelete.length === 0) {
         alert('没有选择要删除的照片');
         return;
@@ -475,30 +708,32 @@ async function executeDelete() {
     $('#btn-confirm-delete').textContent = '正在删除...';
 
     try {
+        // 删除在后台执行，立即返回任务；进度通过 WebSocket 推送
         const res = await fetch(`${API}/delete`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ paths: toDelete }),
         });
+        if (!res.ok) throw new Error((await res.json()).detail || res.statusText);
+        const job = await res.json();
+        state.deleteJob = job.id;
 
-        const result = await res.json();
-
-        // 计算释放空间
-        let savedSize = 0;
-        for (const p of result.deleted) {
-            const group = state.groups.find(g => g.photos.some(ph => ph.path === p));
-            if (group) {
-                const photo = group.photos.find(ph => ph.path === p);
-                if (photo) savedSize += photo.size;
-            }
-        }
+        const result = await followDeleteJob(job.id, (s) => {
+            $('#btn-confirm-delete').textContent = `正在删除 ${s.progress}/${s.total}...`;
+        });
+        if (result.state === 'error') throw new Error(result.message);
 
+        // 释放空间按实际移入回收站的文件（含 XMP sidecar）计算
         $('#complete-message').textContent =
-            `已成功清理 ${result.deleted_count} 张照片，释放 ${formatFileSize(savedSize)} 空间`;
+            `已成功清理 ${result.deleted_count} 张照片，释放 ${formatFileSize(result.bytes)} 空间`;
 
         if (result.error_count > 0) {
             $('#complete-message').textContent += `\n（${result.error_count} 个文件删除失败）`;
         }
+        $('#complete-hint').textContent = result.restorable_count > 0
+            ? '所有文件已移入回收站，删除记录已保存，可以撤销。'
+            : '所有文件已移入回收站，如需恢复请从回收站中找回。';
+        $('#btn-restore-delete').classList.toggle('hidden', result.restorable_count === 0);
 
         showPage('complete');
     } catch (e) {
@@ -509,9 +744,93 @@ async function executeDelete() {
     }
 }
 
+// 跟踪删除/还原任务直到结束，返回最终状态（WebSocket 不可用时轮询）
+function followDeleteJob(jobId, onUpdate) {
+    return new Promise((resolve, reject) => {
+        const finished = (s) => s.state !== 'pending' && s.state !== 'running';
+        let done = false;
+
+        const poll = () => {
+            const timer = setInterval(async () => {
+                try {
+                    const res = await fetch(`${API}/delete/${jobId}`);
+                    const s = await res.json();
+                    onUpdate(s);
+                    if (finished(s)) {
+                        clearInterval(timer);
+                        resolve(s);
+                    }
+                } catch (e) {
+                    clearInterval(timer);
+                    reject(e);
+                }
+            }, 1000);
+        };
+
+        const ws = new WebSocket(`${DELETE_WS_URL}/${jobId}`);
+        ws.onmessage = (event) => {
+            const s = JSON.parse(event.data);
+            onUpdate(s);
+            if (finished(s)) {
+                done = true;
+                ws.close();
+                resolve(s);
+            }
+        };
+        ws.onerror = () => {
+            if (done) return;
+            done = true;
+            console.warn('WebSocket 连接失败，使用轮询模式');
+            poll();
+        };
+        ws.onclose = () => {
+            if (done) return;
+            done = true;
+            poll();
+        };
+    });
+}
+
+// ─── 撤销删除 ──────────────────────────────────────────
+async function restoreDeleted() {
+    if (!state.deleteJob) return;
+    const btn = $('#btn-restore-delete');
+    btn.disabled = true;
+    btn.textContent = '正在还原...';
+
+    try {
+        const res = await fetch(`${API}/delete/${state.deleteJob}/restore`, { method: 'POST' });
+        if (!res.ok) throw new Error((await res.json()).detail || res.statusText);
+
+        const result = await followDeleteJob(state.deleteJob, (s) => {
+            btn.textContent = `正在还原 ${s.progress}/${s.total}...`;
+        });
+        if (result.state === 'error') throw new Error(result.message);
+
+        $('#complete-message').textContent = `已还原 ${result.restored_count} 个文件`;
+        if (result.error_count > 0) {
+            $('#complete-message').textContent += `\n（${result.error_count} 个文件无法还原，如：${result.errors[0].error}）`;
+        }
+        $('#complete-hint').textContent = '文件已移回原位置，重新扫描即可看到。';
+        btn.classList.toggle('hidden', result.restorable_count === 0);
+    } catch (e) {
+        alert(`还原失败: ${e.message}`);
+    } finally {
+        btn.disabled = false;
+        btn.textContent = '撤销删除';
+    }
+}
+
 // ─── Lightbox 预览 ──────────────────────────────────────
-function openLightbox(src, filename, size) {
-    $('#lightbox-img').src = src;
+function openLightbox(src, previewSrc, filename, size) {
+    // 先显示缩略图，大预览加载完成后替换
+    const img = $('#lightbox-img');
+    img.src = src;
+    const preview = new Image();
+    preview.onload = () => {
+        if (img.src.endsWith(src)) img.src = previewSrc;  // 灯箱仍显示同一张照片
+    };
+    preview.src = previewSrc;
     $('#lightbox-filename').textContent = filename;
     $('#lightbox-size').textContent = size;
     $('#lightbox').classList.remove('hidden');
@@ -584,10 +903,14 @@ async function resetAndGoHome() {
         await fetch(`${API}/reset`, { method: 'POST' });
     } catch (e) { }
 
+    if (state.libraryWs) state.libraryWs.close();
     state.groups = [];
     state.recommendations = null;
     state.currentGroupIndex = 0;
     state.decisions = {};
+    state.provisional = false;
+    state.provisionalVersion = 0;
+    state.touched = new Set();
 
     updateStatusBadge('idle');
     showPage('scan');
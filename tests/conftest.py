@@ -0,0 +1,67 @@
+"""测试环境：数据目录（缓存、索引、删除日志等）和回收站指向临时目录，不读写 ~/.photodedup 与用户的回收站"""
+
+import os
+import tempfile
+
+import pytest
+
+os.environ["PHOTODEDUP_HOME"] = tempfile.mkdtemp(prefix="photodedup-test-")
+os.environ["XDG_DATA_HOME"] = tempfile.mkdtemp(prefix="photodedup-test-xdg-")
+
+
+@pytest.fixture
+def client():
+    """FastAPI 测试客户端（首次使用时才导入 backend.main）"""
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+    return TestClient(app)
+
+
+@pytest.fixture
+def imported_scan(client, tmp_path):
+    """把照片表写成快照并通过 /api/import 载入，作为当前的扫描结果"""
+    from backend.config import MAX_REGROUP_THRESHOLD
+    from backend.core.grouper import build_neighbor_graph
+    from backend.core.snapshot import write_snapshot
+
+    def load(table, threshold=10):
+        graph = build_neighbor_graph(table, MAX_REGROUP_THRESHOLD)
+        path = write_snapshot(tmp_path / 'scan.pdscan', {
+            'table': table, 'graph': graph, 'groups': graph.groups(threshold), 'threshold': threshold,
+        })
+        response = client.post('/api/import', json={'path': str(path)})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return load
+
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory):
+    """小型合成语料：4 个场景 × 3 个变体（JPEG / TIFF / DNG 轮换）"""
+    from benchmarks.corpus import generate_corpus
+
+    root = tmp_path_factory.mktemp('corpus')
+    generate_corpus(str(root), scenes=4, variants=3, image_size=(160, 120))
+    return root
+
+
+@pytest.fixture
+def run_scan(client):
+    """通过 /api/scan 扫描并等待完成，返回最终状态"""
+    import time
+
+    def scan(directory, **options):
+        response = client.post('/api/scan', json={'directory': str(directory), 'include_images': True, **options})
+        assert response.status_code == 200, response.text
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            status = client.get('/api/scan/status').json()
+            if status['status'] in ('done', 'error'):
+                assert status['status'] == 'done', status['message']
+                return status
+            time.sleep(0.05)
+        raise AssertionError('扫描没有结束')
+
+    return scan
@@ -0,0 +1,89 @@
+"""图库索引：多索引哈希查询与暴力比较一致、同一路径以新记录为准、合并段"""
+
+import shutil
+
+import numpy as np
+import pytest
+
+from backend.config import ARCHIVE_MAX_SEGMENTS
+from backend.core.archive import ArchiveIndex, ArchiveSegment
+from backend.core.hashindex import pack_hashes, popcount64
+from backend.core.phototable import PhotoTableBuilder
+from benchmarks.corpus import synthetic_hashes
+
+
+def _table(hashes, prefix='/lib', start=0):
+    builder = PhotoTableBuilder()
+    for i, h in enumerate(hashes, start):
+        builder.add(f'{prefix}/{i:06d}.NEF', 1000 + i, float(i), float(i), h)
+    return builder.build()
+
+
+def _brute_force(paths, packed, query, threshold):
+    dist = popcount64(packed ^ np.uint64(query))
+    return sorted((int(d), paths[i]) for i, d in enumerate(dist.tolist()) if d <= threshold)
+
+
+@pytest.mark.parametrize('threshold', [0, 3, 10, 13])
+def test_lookup_matches_brute_force(tmp_path, threshold):
+    hashes, _ = synthetic_hashes(6000, cluster_size=6, max_flips=8, seed=9)
+    index = ArchiveIndex(tmp_path / 'archive')
+    for start in (0, 4000):  # 两个段，第一个段足够大，走多索引哈希
+        index.add(_table(hashes[start:start + (4000 if start == 0 else 2000)], start=start))
+    paths = [f'/lib/{i:06d}.NEF' for i in range(6000)]
+    packed = pack_hashes(hashes)
+
+    rng = np.random.default_rng(threshold)
+    queries = packed[rng.choice(len(packed), 20, replace=False)] ^ np.uint64(1 << int(rng.integers(64)))
+    found = index.lookup(queries, threshold, limit=1000)
+    for query, matches in zip(queries.tolist(), found):
+        assert sorted((m['distance'], m['path']) for m in matches) == _brute_force(paths, packed, query, threshold)
+
+
+def test_rescanned_path_supersedes_older_rows(tmp_path):
+    index = ArchiveIndex(tmp_path / 'archive')
+    index.add(_table(['0' * 16, 'f' * 16]))
+    index.add(_table(['00ff' * 4]))  # /lib/000000.NEF 的新哈希
+
+    assert index.lookup(pack_hashes(['0' * 16]), 0) == [[]]
+    [[match]] = index.lookup(pack_hashes(['00ff' * 4]), 0)
+    assert match['path'] == '/lib/000000.NEF' and match['size'] == 1000
+
+
+def test_segments_are_compacted(tmp_path):
+    hashes, _ = synthetic_hashes(400, seed=10)
+    index = ArchiveIndex(tmp_path / 'archive')
+    for k in range(ARCHIVE_MAX_SEGMENTS + 2):
+        index.add(_table(hashes[k * 20:(k + 1) * 20], start=k * 20))
+    index.add(_table(hashes[:20]))  # 重复的路径
+    assert len(index.segments) <= ARCHIVE_MAX_SEGMENTS
+
+    before = index.lookup(pack_hashes(hashes[:50]), 6, limit=100)
+    stats = index.compact(full=True)
+    assert len(stats['segments']) == 1 and stats['rows'] == (ARCHIVE_MAX_SEGMENTS + 2) * 20
+    assert index.lookup(pack_hashes(hashes[:50]), 6, limit=100) == before
+    # 其他进程打开同一目录时看到的是合并后的段
+    assert len(ArchiveIndex(tmp_path / 'archive')) == stats['rows']
+
+
+def test_corrupt_segment_is_skipped(tmp_path):
+    index = ArchiveIndex(tmp_path / 'archive')
+    index.add(_table(['0' * 16]))
+    (tmp_path / 'archive' / 'seg-999999-1.pdidx').write_bytes(b'PDINDEX')
+    assert len(ArchiveIndex(tmp_path / 'archive')) == 1
+    with pytest.raises(ValueError):
+        ArchiveSegment(tmp_path / 'archive' / 'seg-999999-1.pdidx')
+
+
+def test_lookup_endpoint_finds_scanned_copies(client, corpus, run_scan, tmp_path):
+    run_scan(corpus)
+    original = next(p for p in sorted(corpus.rglob('*.jpg')))
+    copy = tmp_path / 'card' / 'copy.jpg'
+    copy.parent.mkdir()
+    shutil.copy(original, copy)
+
+    body = client.post('/api/archive/lookup', json={'paths': [str(copy)], 'threshold': 4}).json()
+    [query] = body['queries']
+    assert query['path'] == str(copy) and body['matched'] == 1
+    assert query['matches'][0] == {**query['matches'][0], 'path': str(original), 'distance': 0}
+    assert client.get('/api/archive').json()['rows'] >= 8
@@ -0,0 +1,56 @@
+"""基准套件：合成语料、合成哈希与基线对比"""
+
+import json
+import os
+
+import numpy as np
+
+from backend.core.hashindex import pack_hashes, popcount64
+from benchmarks import run
+from benchmarks.corpus import generate_corpus, synthetic_hashes
+
+
+def test_synthetic_hashes_are_reproducible_bursts():
+    hashes, times = synthetic_hashes(40, cluster_size=4, max_flips=3, seed=7)
+    assert (hashes, times) == synthetic_hashes(40, cluster_size=4, max_flips=3, seed=7)
+    assert hashes != synthetic_hashes(40, cluster_size=4, max_flips=3, seed=8)[0]
+
+    packed = pack_hashes(hashes).reshape(10, 4)
+    # 簇内最多相差 2 × max_flips 位，簇内相隔 1 秒、簇间相隔 60 秒以上
+    assert popcount64(packed[:, :, None] ^ packed[:, None, :]).max() <= 6
+    gaps = np.diff(times).reshape(-1)
+    assert set(gaps[np.arange(len(gaps)) % 4 != 3].tolist()) == {1.0}
+    assert gaps[3::4].min() >= 60
+
+
+def test_generate_corpus_writes_manifest(tmp_path):
+    manifest = generate_corpus(str(tmp_path), scenes=2, variants=3, image_size=(96, 64), files_per_dir=4)
+    assert len(manifest['files']) == 6
+    assert {f['format'] for f in manifest['files']} == {'jpg', 'tif', 'dng'}
+    assert all(os.path.isfile(tmp_path / f['path']) for f in manifest['files'])
+    assert len(os.listdir(tmp_path)) == 3  # roll_0000、roll_0001、manifest.json
+    with open(tmp_path / 'manifest.json', encoding='utf-8') as f:
+        assert json.load(f) == manifest
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {'results': [{'name': 'a', 'seconds': 1.0}, {'name': 'b', 'seconds': 1.0}, {'name': 'c', 'seconds': 0}]}
+    current = {'results': [{'name': 'a', 'seconds': 1.1}, {'name': 'b', 'seconds': 1.5},
+                           {'name': 'c', 'seconds': 1.0}, {'name': 'new', 'seconds': 1.0}]}
+    rows = {r['name']: r for r in run.compare(current, baseline, tolerance=0.2)}
+    assert set(rows) == {'a', 'b'}
+    assert not rows['a']['regression'] and rows['b']['regression']
+    assert rows['b']['ratio'] == 1.5
+
+
+def test_run_writes_results_and_fails_on_regression(tmp_path, monkeypatch):
+    monkeypatch.setenv('PHOTODEDUP_HOME', os.environ['PHOTODEDUP_HOME'])  # run.main 会改写，测试后恢复
+    output = tmp_path / 'bench.json'
+    args = ['--stages', 'group,recommend', '--sizes', '200', '--repeat', '1', '--output', str(output)]
+    assert run.main(args) == 0
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert report['results'] and all(r['n'] == 200 for r in report['results'])
+
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({'results': [{**r, 'seconds': 1e-9} for r in report['results']]}))
+    assert run.main(args + ['--baseline', str(baseline)]) == 1
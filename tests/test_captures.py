@@ -0,0 +1,48 @@
+"""RAW 与机内 JPEG 配对为拍摄单元"""
+
+import numpy as np
+
+from backend.core.grouper import PhotoGroup
+from backend.core.phototable import PhotoTableBuilder
+from backend.core.recommender import recommend_for_group
+from backend.core.scanner import pair_captures, scan_directory
+
+
+def _scan(tmp_path, files):
+    for name, size in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x' * size)
+    return pair_captures(scan_directory(str(tmp_path), include_images=True, read_exif=False))
+
+
+def test_raw_and_jpeg_with_same_stem_form_one_unit(tmp_path):
+    units = _scan(tmp_path, {'DSC_1.NEF': 30, 'dsc_1.JPG': 5, 'DSC_2.NEF': 30})
+    assert len(units) == 2
+    unit = next(u for u in units if u.siblings)
+    # 机内 JPEG 作为代表（缩略图和哈希的来源），大小为所有成员之和
+    assert unit.path == str(tmp_path / 'dsc_1.JPG')
+    assert unit.siblings == [str(tmp_path / 'DSC_1.NEF')]
+    assert unit.size == 35
+
+
+def test_files_without_raw_or_in_other_directories_stay_separate(tmp_path):
+    units = _scan(tmp_path, {
+        'IMG_1.JPG': 1, 'IMG_1.HEIC': 1,          # 没有 RAW，不配对
+        'a/DSC_3.NEF': 1, 'b/DSC_3.JPG': 1,      # 主干相同但目录不同
+        'DSC_4.NEF': 1, 'DSC_4.png': 1,          # PNG 不是机内预览格式
+    })
+    assert len(units) == 6
+    assert all(u.siblings == [] for u in units)
+
+
+def test_edited_sibling_keeps_the_whole_unit():
+    builder = PhotoTableBuilder()
+    builder.add('/lib/DSC_1.JPG', 5, phash='0' * 16, siblings=['/lib/DSC_1.NEF'])
+    builder.add('/lib/DSC_2.JPG', 5, phash='0' * 16)
+    table = builder.build()
+    group = PhotoGroup(0, table, np.arange(2))
+
+    rec = recommend_for_group(group, {'/lib/DSC_1.NEF'}, {})
+    assert rec.keep == ['/lib/DSC_1.JPG']
+    assert rec.delete == ['/lib/DSC_2.JPG']
@@ -0,0 +1,87 @@
+"""两级匹配：签名核验与 PHOTODEDUP_CASCADE 开关"""
+
+import numpy as np
+import pytest
+
+from backend.core import grouper, incremental
+from backend.core.grouper import build_neighbor_graph
+from backend.core.incremental import IncrementalGrouper
+from backend.core.phototable import PhotoTableBuilder
+
+HASH = '0f' * 8
+SIG_A = '80' + 'ab' * 31
+SIG_B = 'ff' + '54' * 31     # 与 SIG_A 相差约 250 bit：pHash 相同的不同照片
+
+
+def _table(rows):
+    builder = PhotoTableBuilder()
+    for path, signature in rows:
+        builder.add(path, 1, 0.0, 0.0, HASH, signature=signature)
+    return builder.build()
+
+
+def _grouped_full(table):
+    return [sorted(g.ids.tolist()) for g in build_neighbor_graph(table, 10).groups(10)]
+
+
+def _grouped_incremental(first, rest):
+    grouped = IncrementalGrouper.from_table(first, 10)
+    grouped.insert(rest)
+    return [sorted(g.ids.tolist()) for g in grouped.groups()], grouped.cascade
+
+
+def test_signatures_reject_colliding_pairs():
+    assert _grouped_full(_table([('/a.jpg', SIG_A), ('/b.jpg', SIG_B)])) == []
+    assert _grouped_full(_table([('/a.jpg', SIG_A), ('/b.jpg', SIG_A)])) == [[0, 1]]
+    groups, stats = _grouped_incremental(_table([('/a.jpg', SIG_A)]), _table([('/b.jpg', SIG_B)]))
+    assert groups == [] and stats['candidates'] - stats['verified'] == 1
+
+
+def test_pairs_without_signatures_are_kept():
+    assert _grouped_full(_table([('/a.jpg', SIG_A), ('/b.jpg', None)])) == [[0, 1]]
+
+
+@pytest.fixture
+def cascade_off(monkeypatch):
+    monkeypatch.setattr(grouper, 'CASCADE_VERIFICATION', False)
+    monkeypatch.setattr(incremental, 'CASCADE_VERIFICATION', False)
+
+
+def test_disabled_cascade_ignores_existing_signatures(cascade_off):
+    table = _table([('/a.jpg', SIG_A), ('/b.jpg', SIG_B)])
+    graph = build_neighbor_graph(table, 10)
+    assert [sorted(g.ids.tolist()) for g in graph.groups(10)] == [[0, 1]]
+    assert graph.cascade['candidates'] == graph.cascade['verified'] == 1
+
+    groups, stats = _grouped_incremental(_table([('/a.jpg', SIG_A)]), _table([('/b.jpg', SIG_B)]))
+    assert groups == [[0, 1]] and stats['candidates'] == stats['verified']
+
+
+def test_verified_edges_keep_phash_distance():
+    """核验只决定保留与否，边的距离仍是 pHash 距离（阈值与直方图的含义不变）"""
+    builder = PhotoTableBuilder()
+    builder.add('/a.jpg', 1, 0.0, 0.0, '0' * 16, signature=SIG_A)
+    builder.add('/b.jpg', 1, 0.0, 0.0, '0' * 13 + 'fff', signature=SIG_A)
+    graph = build_neighbor_graph(builder.build(), 16)
+    assert graph.edges_d.tolist() == [12]
+    assert graph.groups(10) == []
+
+
+def _random_table(paths, seed):
+    rng = np.random.default_rng(seed)
+    builder = PhotoTableBuilder()
+    for path in paths:
+        builder.add(path, 1, 0.0, 0.0, f'{int(rng.integers(0, 2**63)):016x}')
+    return builder.build()
+
+
+def test_incremental_compared_count_matches_batch():
+    """逐批插入与一次构建比较的是同一组照片对：新照片之间的对只计一次，不计与自身的比较"""
+    paths = [f'/lib/{i:03d}.jpg' for i in range(60)]
+    full = build_neighbor_graph(_random_table(paths, 0), 10)
+    assert full.cascade['compared'] == 60 * 59 // 2
+
+    grouped = IncrementalGrouper.from_table(_random_table(paths[:20], 0), 10)
+    for start in (20, 45):
+        grouped.insert(_random_table(paths[start:start + 25], start))
+    assert grouped.cascade['compared'] == full.cascade['compared']
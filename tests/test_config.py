@@ -0,0 +1,26 @@
+"""环境变量配置的校验"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _orientation(value: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PHOTODEDUP_ORIENTATION=value, PYTHONPATH=ROOT)
+    return subprocess.run(
+        [sys.executable, '-c', 'from backend.config import ORIENTATION_MATCHING; print(ORIENTATION_MATCHING)'],
+        capture_output=True, text=True, env=env, cwd=ROOT,
+    )
+
+
+def test_orientation_mode_is_normalised():
+    assert _orientation(' OFF ').stdout.strip() == 'off'
+    assert _orientation('Any').stdout.strip() == 'any'
+
+
+def test_unknown_orientation_mode_is_rejected():
+    proc = _orientation('anny')
+    assert proc.returncode != 0
+    assert 'PHOTODEDUP_ORIENTATION' in proc.stderr
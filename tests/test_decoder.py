@@ -0,0 +1,81 @@
+"""隔离的 RAW 解码：工作进程超时/崩溃后被替换，出问题的文件进入隔离名单"""
+
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from backend.core.decoder import CRASHED, FAILED, OK, QUARANTINED, TIMEOUT, Decoder, Quarantine
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='用命名管道模拟卡死的文件')
+
+
+@pytest.fixture
+def decoder(tmp_path):
+    decoder = Decoder(workers=1, full_workers=1, timeout=1.0, full_timeout=1.0,
+                      quarantine=Quarantine(tmp_path / 'quarantine.json'))
+    yield decoder
+    decoder.close()
+
+
+@pytest.fixture
+def hanging(tmp_path):
+    """打开时一直阻塞的「RAW 文件」（没有写端的命名管道）"""
+    path = tmp_path / 'hang.NEF'
+    os.mkfifo(path)
+    return str(path)
+
+
+def test_preview_runs_in_a_worker_process(decoder, corpus):
+    dng = next(str(p) for p in sorted(corpus.rglob('*.dng')))
+    status, thumb = decoder.preview(dng)
+    assert status == OK and thumb.is_file()
+    assert decoder.preview(str(next(corpus.rglob('*.jpg'))))[0] == FAILED  # 不是 RAW：没有结果
+
+
+def test_hanging_file_times_out_and_is_quarantined(tmp_path, decoder, hanging, corpus):
+    start = time.monotonic()
+    assert decoder.preview(hanging) == (TIMEOUT, None)
+    assert time.monotonic() - start < 10
+    assert decoder.status()['restarts'] == 1
+
+    # 之后的请求直接跳过，名单写入文件，下次启动仍然有效
+    assert decoder.preview(hanging) == (QUARANTINED, None)
+    assert decoder.full(hanging) == (QUARANTINED, None)
+    assert hanging in Quarantine(tmp_path / 'quarantine.json')
+
+    # 卡死的进程已被替换，其他文件照常解码
+    assert decoder.preview(str(next(corpus.rglob('*.dng'))))[0] == OK
+
+    # 文件被替换（修改时间变化）后重新尝试
+    os.utime(hanging, (0, 12345))
+    assert hanging not in decoder.quarantine
+
+
+def test_crashed_worker_is_detected(decoder, hanging):
+    result = []
+    request = threading.Thread(target=lambda: result.append(decoder.full(hanging)))
+    decoder.full_decodes.timeout = 60
+    request.start()
+    deadline = time.monotonic() + 20
+    workers = []
+    while not workers and time.monotonic() < deadline:
+        time.sleep(0.2)
+        workers = [c for c in multiprocessing.active_children() if c.name.startswith('photodedup-fulldecode')]
+    for child in workers:
+        child.kill()
+    request.join(timeout=20)
+    assert result == [(CRASHED, None)]
+    assert decoder.quarantine.entries()[0]['path'] == hanging
+
+
+def test_quarantine_endpoints(client, hanging):
+    from backend.core.decoder import get_decoder
+
+    get_decoder().quarantine.add(hanging, 'test')
+    body = client.get('/api/quarantine').json()
+    assert [f['path'] for f in body['files']] == [hanging]
+    assert client.delete('/api/quarantine', params={'path': hanging}).json() == {'removed': 1}
+    assert client.get('/api/quarantine').json()['files'] == []
@@ -0,0 +1,76 @@
+"""全局分组与按拍摄时间窗口分组"""
+
+import pytest
+
+from backend.core.grouper import build_neighbor_graph, build_neighbor_graph_windowed
+from backend.core.phototable import PhotoTableBuilder
+from benchmarks.corpus import synthetic_hashes
+
+
+def _table(n=200, undated=(), cameras=('A',)):
+    hashes, times = synthetic_hashes(n, seed=1)
+    builder = PhotoTableBuilder()
+    for i, (h, t) in enumerate(zip(hashes, times)):
+        builder.add(f'/lib/{i:04d}.NEF', 100, timestamp=None if i in undated else t,
+                    phash=h, camera=cameras[i % len(cameras)])
+    return builder.build()
+
+
+def _members(groups):
+    return sorted(sorted(g.ids.tolist()) for g in groups)
+
+
+def _edges(graph):
+    nodes = graph.nodes
+    return {tuple(sorted((int(nodes[i]), int(nodes[j])))): int(d)
+            for i, j, d in zip(graph.edges_i, graph.edges_j, graph.edges_d)}
+
+
+def test_window_covering_everything_equals_full_grouping():
+    table = _table()
+    full = build_neighbor_graph(table, 12)
+    windowed = build_neighbor_graph_windowed(table, 1e9, 12)
+    assert _edges(windowed) == _edges(full)
+    for threshold in (4, 8, 12):
+        assert _members(windowed.groups(threshold)) == _members(full.groups(threshold))
+    assert windowed.cascade['compared'] == full.cascade['compared'] == 200 * 199 // 2
+
+
+def test_bursts_inside_the_window_group_like_full_grouping():
+    """簇内相隔 1 秒、簇间 60 秒以上：5 秒窗口的分组与全局分组相同，比较次数少得多"""
+    table = _table()
+    full = build_neighbor_graph(table, 10)
+    windowed = build_neighbor_graph_windowed(table, 5, 10)
+    assert _members(windowed.groups(10)) == _members(full.groups(10))
+    assert windowed.cascade['compared'] == 50 * (4 * 3 // 2)
+
+
+def test_different_cameras_are_never_compared():
+    table = _table(cameras=('A', 'B'))
+    graph = build_neighbor_graph_windowed(table, 1e9, 12)
+    assert all(table.camera_id[a] == table.camera_id[b] for a, b in _edges(graph))
+
+
+@pytest.mark.parametrize('include_undated', [True, False])
+def test_undated_photos(include_undated):
+    """无拍摄时间的照片与所有照片比较，或不参与分组"""
+    table = _table(undated={1, 2})
+    graph = build_neighbor_graph_windowed(table, 5, 10, include_undated=include_undated)
+    grouped = {int(u) for g in graph.groups(10) for u in g.ids}
+    full = {int(u) for g in build_neighbor_graph(table, 10).groups(10) for u in g.ids}
+    if include_undated:
+        assert grouped == full
+        assert {1, 2} <= set(graph.nodes.tolist())
+    else:
+        assert not {1, 2} & set(graph.nodes.tolist())
+        # 只有 1、2 所在的第一簇（0..3）可能因此变小
+        assert full - {0, 1, 2, 3} <= grouped <= full - {1, 2}
+
+
+def test_window_excludes_pairs_far_apart_in_time():
+    builder = PhotoTableBuilder()
+    builder.add('/lib/a.NEF', 1, timestamp=0.0, phash='0' * 16, camera='A')
+    builder.add('/lib/b.NEF', 1, timestamp=100.0, phash='0' * 16, camera='A')
+    table = builder.build()
+    assert build_neighbor_graph_windowed(table, 10, 10).groups(10) == []
+    assert _members(build_neighbor_graph_windowed(table, 100, 10).groups(10)) == [[0, 1]]
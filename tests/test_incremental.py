@@ -0,0 +1,94 @@
+"""增量分组：分批插入/移除与一次完整分组的结果一致，并报告变化的分组"""
+
+import pytest
+
+from backend.core.grouper import build_neighbor_graph, build_neighbor_graph_windowed
+from backend.core.incremental import IncrementalGrouper, related_units
+from backend.core.phototable import PhotoTableBuilder
+from backend.core.recommender import recommend_all
+from benchmarks.corpus import synthetic_hashes
+
+N = 160
+HASHES, TIMES = synthetic_hashes(N, cluster_size=4, max_flips=4, seed=5)
+
+
+def _table(indices):
+    builder = PhotoTableBuilder()
+    for i in indices:
+        builder.add(f'/lib/{i:04d}.NEF', 1000 + i, timestamp=TIMES[i], phash=HASHES[i], camera='Cam')
+    return builder.build()
+
+
+def _path_groups(groups):
+    return sorted(sorted(g.table.paths(g.ids)) for g in groups)
+
+
+def _full(indices, window):
+    table = _table(indices)
+    graph = build_neighbor_graph_windowed(table, window, 10) if window else build_neighbor_graph(table, 10)
+    return _path_groups(graph.groups(10))
+
+
+@pytest.mark.parametrize('window', [None, 5])
+def test_batched_inserts_equal_full_grouping(window):
+    order = list(range(0, N, 2)) + list(range(1, N, 2))  # 每个簇分两批到达
+    grouper = IncrementalGrouper.from_table(_table(order[:50]), 10, time_window=window)
+    for start in range(50, N, 37):
+        grouper.insert(_table(order[start:start + 37]))
+    assert _path_groups(grouper.groups()) == _full(range(N), window)
+
+
+@pytest.mark.parametrize('window', [None, 5])
+def test_removes_equal_full_grouping(window):
+    grouper = IncrementalGrouper.from_table(_table(range(N)), 10, time_window=window)
+    gone = set(range(0, N, 3))
+    grouper.remove(grouper.table.id_of(f'/lib/{i:04d}.NEF') for i in gone)
+    assert _path_groups(grouper.groups()) == _full([i for i in range(N) if i not in gone], window)
+
+
+def test_changes_report_affected_group_ids():
+    """簇 0..3、4..7、8..11 各自成组（簇内最多相差 8 位）"""
+    grouper = IncrementalGrouper.from_table(_table([0, 1, 2, 4, 5, 6]), 10)
+    group_of = {p: g.group_id for g in grouper.groups() for p in g.table.paths(g.ids)}
+    first, second = group_of['/lib/0000.NEF'], group_of['/lib/0004.NEF']
+    assert first != second
+
+    # 3 加入第一组（更新），8..11 自成新组（新建）
+    changes = grouper.insert(_table([3, 8, 9, 10, 11]))
+    assert changes['updated'] == [first] and changes['removed'] == []
+    assert len(changes['created']) == 1 and changes['created'][0] not in (first, second)
+    third = changes['created'][0]
+    assert len(grouper.recommendation(first)['delete']) == 3
+
+    # 移除第二组的全部成员：该分组被删除，其余分组 id 不变
+    changes = grouper.remove(grouper.table.id_of(f'/lib/{i:04d}.NEF') for i in (4, 5, 6))
+    assert changes == {'created': [], 'updated': [], 'removed': [second]}
+    assert {g.group_id for g in grouper.groups()} == {first, third}
+    assert grouper.recommendation(second) is None
+
+
+def test_recommendations_follow_the_groups():
+    grouper = IncrementalGrouper.from_table(_table(range(0, N, 2)), 10)
+    grouper.insert(_table(range(1, N, 2)))
+    expected = recommend_all(grouper.groups())
+    assert grouper.recommendations()['summary'] == expected['summary']
+
+
+def test_to_graph_regroups_like_a_fresh_build():
+    grouper = IncrementalGrouper.from_table(_table(range(0, N, 2)), 10, max_threshold=14)
+    grouper.insert(_table(range(1, N, 2)))
+    graph = grouper.to_graph()
+    table = grouper.table
+    for threshold in (6, 10, 14):
+        fresh = build_neighbor_graph(table, threshold).groups(threshold)
+        assert _path_groups(graph.groups(threshold)) == _path_groups(fresh)
+
+
+def test_related_units_find_the_other_half_of_a_capture(tmp_path):
+    for name in ('DSC_1.NEF', 'DSC_1.JPG', 'DSC_2.NEF'):
+        (tmp_path / name).write_bytes(b'x')
+    builder = PhotoTableBuilder()
+    builder.add(str(tmp_path / 'DSC_1.NEF'), 1, phash='0' * 16)
+    builder.add(str(tmp_path / 'DSC_2.NEF'), 1, phash='0' * 16)
+    table = builder.build()
+    assert related_units(table, [str(tmp_path / 'DSC_1.JPG')]) == {0}
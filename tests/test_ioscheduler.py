@@ -0,0 +1,55 @@
+"""自适应并发下每个设备的并发数上限"""
+
+import threading
+
+from backend.core.autotune import StageTuner
+from backend.core.ioscheduler import HDD, NETWORK, SSD, DeviceQueue, IOScheduler
+
+
+def _scheduler(monkeypatch, queues):
+    scheduler = IOScheduler(overrides='', readahead=0)
+    monkeypatch.setattr(scheduler, 'queues', lambda paths, file_ids=None: queues)
+    return scheduler
+
+
+def test_tuner_keeps_device_limits(monkeypatch):
+    hdd = DeviceQueue(1, HDD, 2, '/hdd', [f'/hdd/{i}' for i in range(40)])
+    ssd = DeviceQueue(2, SSD, 8, '/ssd', [f'/ssd/{i}' for i in range(40)])
+    scheduler = _scheduler(monkeypatch, [hdd, ssd])
+    lock = threading.Lock()
+    active, peak = {'/hdd': 0, '/ssd': 0}, {'/hdd': 0, '/ssd': 0}
+
+    def read(path):
+        device = path.rsplit('/', 1)[0]
+        with lock:
+            active[device] += 1
+            peak[device] = max(peak[device], active[device])
+        threading.Event().wait(0.002)
+        with lock:
+            active[device] -= 1
+
+    tuner = StageTuner('scan', 1, 64, interval=60)
+    assert len(list(scheduler.map(read, [], tuner=tuner))) == 80
+    assert peak['/hdd'] <= 2
+    assert tuner.high == 10
+
+
+def test_slow_device_does_not_starve_others(monkeypatch):
+    """网络盘上的文件都卡住时，其他设备仍按自己的份额继续处理"""
+    net = DeviceQueue(1, NETWORK, 16, '/net', [f'/net/{i}' for i in range(16)])
+    ssd = DeviceQueue(2, SSD, 8, '/ssd', [f'/ssd/{i}' for i in range(8)])
+    scheduler = _scheduler(monkeypatch, [net, ssd])
+    ssd_done = threading.Event()
+    finished = []
+
+    def read(path):
+        if path.startswith('/net'):
+            return ssd_done.wait(5)
+        finished.append(path)
+        if len(finished) == len(ssd.paths):
+            ssd_done.set()
+        return True
+
+    tuner = StageTuner('scan', 1, 64, initial=2, interval=60)
+    results = dict(scheduler.map(read, [], tuner=tuner))
+    assert all(results.values())
@@ -0,0 +1,54 @@
+"""扫描指标：逐文件延迟分布、阶段计时与 /api/metrics"""
+
+import json
+
+from backend.core.metrics import LATENCY_BUCKETS_MS, SLOWEST_FILES, ScanMetrics, StageMetrics
+
+
+def test_latency_summary():
+    stage = StageMetrics('hash')
+    for i in range(1, 101):
+        stage.record_file(f'/lib/{i}.NEF', i / 1000, bytes_read=10, cache_hit=i % 4 == 0, ok=i != 50)
+
+    summary = stage.latency_summary()
+    assert summary['p50_ms'] == 51 and summary['p95_ms'] == 96 and summary['p99_ms'] == 100
+    assert summary['max_ms'] == 100 and summary['mean_ms'] == 50.5
+    assert sum(summary['histogram']['counts']) == 100
+    assert len(summary['histogram']['counts']) == len(LATENCY_BUCKETS_MS) + 1
+    assert [s['path'] for s in summary['slowest']] == [f'/lib/{i}.NEF' for i in range(100, 100 - SLOWEST_FILES, -1)]
+
+    result = stage.to_dict()
+    assert result['items'] == 100 and result['bytes_read'] == 1000 and result['failures'] == 1
+    assert result['cache_hits'] == 25 and result['cache_hit_rate'] == 0.25
+
+
+def test_stage_without_files_has_no_latency():
+    assert StageMetrics('group').latency_summary() is None
+
+
+def test_stages_accumulate_and_report(tmp_path):
+    metrics = ScanMetrics()
+    for _ in range(2):
+        with metrics.stage('extract') as stage:
+            assert stage.running
+            stage.record_file('/lib/a.NEF', 0.001)
+    metrics.finish()
+
+    data = metrics.to_dict()
+    assert [s['name'] for s in data['stages']] == ['extract']
+    assert data['stages'][0]['items'] == 2 and not data['stages'][0]['running']
+    path = metrics.write_report(tmp_path)
+    assert path.name == f'{metrics.report_name}.json'
+    assert json.loads(path.read_text(encoding='utf-8'))['stages'] == data['stages']
+
+
+def test_scan_reports_metrics(client, corpus, run_scan):
+    run_scan(corpus)
+    body = client.get('/api/metrics').json()
+    stages = {s['name']: s for s in body['stages']}
+    assert {'scan', 'extract', 'hash', 'group', 'recommend'} <= set(stages)
+    assert stages['scan']['items'] == 12
+    assert stages['extract']['latency']['p50_ms'] >= 0
+    assert body['status'] == 'done'
+    with open(body['report_path'], encoding='utf-8') as f:
+        assert [s['name'] for s in json.load(f)['stages']] == [s['name'] for s in body['stages']]
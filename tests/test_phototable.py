@@ -0,0 +1,48 @@
+"""照片表的路径拆分与还原"""
+
+import ntpath
+
+import pytest
+
+from backend.core import phototable
+from backend.core.grouper import group_similar_photos
+from backend.core.phototable import PhotoTableBuilder
+
+HASH = 'f' * 16
+
+
+def _table(paths):
+    builder = PhotoTableBuilder()
+    for p in paths:
+        builder.add(p, 1, 0.0, 0.0, HASH)
+    return builder.build()
+
+
+@pytest.mark.parametrize('paths', [
+    ['a.jpg', 'sub/b.jpg'],
+    ['/a.jpg', '/x/b.jpg'],
+    ['//x.jpg', '/x/y/c.jpg', 'd.jpg'],
+])
+def test_paths_round_trip(paths):
+    table = _table(paths)
+    assert table.paths() == paths
+    assert [table.path(i) for i in range(len(table))] == paths
+    assert table.paths([2 % len(paths), 0]) == [paths[2 % len(paths)], paths[0]]
+    assert [table.id_of(p) for p in paths] == list(range(len(paths)))
+
+
+def test_drive_root_round_trip(monkeypatch):
+    """Windows 存储卡根目录（'E:\\'）下的照片"""
+    monkeypatch.setattr(phototable.os, 'path', ntpath)
+    paths = ['E:\\a.jpg', 'E:\\DCIM\\b.jpg', 'c.jpg']
+    table = _table(paths)
+    assert table.paths() == paths
+    assert [table.path(i) for i in range(len(table))] == paths
+    assert [table.id_of(p) for p in paths] == [0, 1, 2]
+
+
+def test_group_keeps_relative_and_root_paths():
+    hashes = {'a.jpg': HASH, '/b.jpg': HASH}
+    groups = group_similar_photos(hashes, {p: 1 for p in hashes}, 10)
+    assert len(groups) == 1
+    assert sorted(p['path'] for p in groups[0].photos) == sorted(hashes)
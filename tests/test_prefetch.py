@@ -0,0 +1,144 @@
+"""缩略图预取：按审核顺序排队、整体替换时取消旧任务、按需请求不重复提取"""
+
+import threading
+import time
+
+import pytest
+
+from backend.config import THUMBNAIL_SIZE
+from backend.core import prefetch as prefetch_module
+from backend.core.prefetch import ThumbnailPrefetcher, review_order
+
+PREVIEW = (1600, 1600)
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    """替换缩略图提取：记录提取顺序，gate 未打开时提取阻塞（模拟慢解码）"""
+    state = {'calls': [], 'cache': set(), 'gate': threading.Event()}
+
+    def get_thumbnail(path, size):
+        state['calls'].append((path, tuple(size)))
+        assert state['gate'].wait(10)
+        state['cache'].add((path, tuple(size)))
+        return f'/cache/{path}-{size[0]}.jpg'
+
+    def cached_thumbnail(path, size):
+        return f'/cache/{path}-{size[0]}.jpg' if (path, tuple(size)) in state['cache'] else None
+
+    monkeypatch.setattr(prefetch_module, 'get_thumbnail', get_thumbnail)
+    monkeypatch.setattr(prefetch_module, 'cached_thumbnail', cached_thumbnail)
+    return state
+
+
+def _wait_idle(prefetcher):
+    deadline = time.monotonic() + 10
+    while True:
+        status = prefetcher.status()
+        if status['queued'] == 0 and status['in_progress'] == 0:
+            return status
+        assert time.monotonic() < deadline, status
+        time.sleep(0.01)
+
+
+def _wait_calls(state, count):
+    deadline = time.monotonic() + 10
+    while len(state['calls']) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_review_order_puts_previews_of_first_groups_after_their_thumbnails():
+    items = review_order([['a1', 'a2'], ['b1'], ['c1']], preview_groups=2, preview_size=PREVIEW)
+    assert items == [
+        ('a1', THUMBNAIL_SIZE), ('a2', THUMBNAIL_SIZE), ('a1', PREVIEW), ('a2', PREVIEW),
+        ('b1', THUMBNAIL_SIZE), ('b1', PREVIEW),
+        ('c1', THUMBNAIL_SIZE),
+    ]
+    assert review_order([['a1']], preview_groups=0) == [('a1', THUMBNAIL_SIZE)]
+
+
+def test_items_are_warmed_in_display_order(extractor):
+    prefetcher = ThumbnailPrefetcher(workers=1, limit=3)
+    extractor['gate'].set()
+    items = review_order([['a', 'b'], ['c', 'd']], preview_groups=0)
+    assert prefetcher.schedule(items) == 3          # 超过上限的部分丢弃
+    status = _wait_idle(prefetcher)
+    assert extractor['calls'] == items[:3]
+    assert status['warmed'] == 3 and status['scheduled'] == 3
+
+    # 已在缓存中的项不再提取
+    prefetcher.schedule(items[:2])
+    assert _wait_idle(prefetcher)['cached'] == 2
+    assert len(extractor['calls']) == 3
+    prefetcher.close()
+
+
+def test_new_order_cancels_pending_items(extractor):
+    prefetcher = ThumbnailPrefetcher(workers=1)
+    prefetcher.schedule(review_order([['a'], ['b'], ['c']], preview_groups=0))
+    _wait_calls(extractor, 1)                        # 'a' 正在提取，'b' 'c' 排队
+
+    # 用户跳到后面的分组：尚未开始的 'b' 'c' 被取消，正在提取的 'a' 不重复排入
+    assert prefetcher.schedule(review_order([['x'], ['a']], preview_groups=0)) == 1
+    assert prefetcher.status()['cancelled'] == 2
+    extractor['gate'].set()
+    _wait_idle(prefetcher)
+    assert [path for path, _ in extractor['calls']] == ['a', 'x']
+
+    prefetcher.schedule(review_order([['y'], ['z']], preview_groups=0))
+    assert prefetcher.cancel() in (1, 2)             # 'y' 可能已经开始
+    _wait_idle(prefetcher)
+    assert 'z' not in [path for path, _ in extractor['calls']]
+    prefetcher.close()
+
+
+def test_fetch_joins_inflight_extraction_and_jumps_the_queue(extractor):
+    prefetcher = ThumbnailPrefetcher(workers=1)
+    prefetcher.schedule(review_order([['a'], ['b']], preview_groups=0))
+    _wait_calls(extractor, 1)
+
+    results = {}
+    waiter = threading.Thread(target=lambda: results.update(a=prefetcher.fetch('a')))
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()                         # 等待正在进行的同一次提取
+    extractor['gate'].set()
+    waiter.join(10)
+    assert results['a'] == f'/cache/a-{THUMBNAIL_SIZE[0]}.jpg'
+
+    # 排队中的项被按需请求时移出队列直接提取，不再由预取重复提取
+    _wait_idle(prefetcher)
+    extractor['gate'].clear()
+    prefetcher.schedule(review_order([['c'], ['d']], preview_groups=0))
+    _wait_calls(extractor, 3)                        # 'a' 'b' 已完成，'c' 正在提取
+    waiter = threading.Thread(target=lambda: results.update(d=prefetcher.fetch('d')))
+    waiter.start()
+    _wait_calls(extractor, 4)
+    assert prefetcher.status()['queued'] == 0
+    extractor['gate'].set()
+    waiter.join(10)
+    _wait_idle(prefetcher)
+    assert [path for path, _ in extractor['calls']] == ['a', 'b', 'c', 'd']
+    prefetcher.close()
+
+
+def test_prefetch_endpoints_warm_the_cache(client, corpus):
+    from backend.core.thumbnail import cached_thumbnail
+
+    paths = sorted(str(p) for p in corpus.rglob('*.jpg'))[:2]
+    assert paths
+    response = client.post('/api/prefetch', json={'groups': [paths]})
+    assert response.status_code == 200 and response.json()['queued'] > 0
+
+    deadline = time.monotonic() + 30
+    while True:
+        status = client.get('/api/prefetch').json()
+        if status['queued'] == 0 and status['in_progress'] == 0:
+            break
+        assert time.monotonic() < deadline, status
+        time.sleep(0.05)
+    assert all(cached_thumbnail(p, THUMBNAIL_SIZE) is not None for p in paths)
+
+    response = client.get('/api/thumbnail', params={'path': paths[0]})
+    assert response.status_code == 200 and response.headers['content-type'] == 'image/jpeg'
@@ -0,0 +1,43 @@
+"""扫描剖析：每个阶段的 cProfile、栈采样文件与 /api/profile"""
+
+import pstats
+import threading
+import time
+
+from backend.core.profiling import ScanProfiler
+
+
+def _busy_worker(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stage_writes_profile_and_samples_other_threads(tmp_path):
+    profiler = ScanProfiler(tmp_path / 'profile', sample_interval=0.001)
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_worker, args=(stop,), name='hash-worker')
+    with profiler.stage('hash'):
+        worker.start()
+        time.sleep(0.1)
+        stop.set()
+        worker.join()
+
+    assert sorted(p.name for p in profiler.files) == ['hash.folded', 'hash.prof', 'hash.txt']
+    assert pstats.Stats(str(tmp_path / 'profile' / 'hash.prof')).total_calls > 0
+    folded = (tmp_path / 'profile' / 'hash.folded').read_text(encoding='utf-8').splitlines()
+    # 工作线程的栈以线程名开头，每行末尾为采样次数
+    assert any(line.startswith('hash-worker;') and '_busy_worker' in line for line in folded)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in folded)
+    assert (tmp_path / 'profile' / 'hash.txt').read_text(encoding='utf-8').startswith('# 阶段 hash')
+
+
+def test_profile_endpoints(client, corpus, run_scan):
+    run_scan(corpus, profile=False)
+    assert client.get('/api/profile').status_code == 404
+
+    run_scan(corpus, profile=True)
+    files = {f['name'] for f in client.get('/api/profile').json()['files']}
+    assert {'scan.prof', 'hash.folded', 'group.txt'} <= files
+    response = client.get('/api/profile/hash.txt')
+    assert response.status_code == 200 and response.text.startswith('# 阶段 hash')
+    assert client.get('/api/profile/missing.prof').status_code == 404
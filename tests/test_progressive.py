@@ -0,0 +1,124 @@
+"""扫描中的临时分组：逐批并入的结果与完整分组一致，分组 id 保持不变，按版本号提供增量"""
+
+import time
+
+import pytest
+
+from backend.core import progressive as progressive_module
+from backend.core.grouper import build_neighbor_graph
+from backend.core.phototable import PhotoTable
+from backend.core.progressive import ProgressiveGrouper
+from backend.core.scanner import pair_captures, scan_directory
+from benchmarks.corpus import synthetic_hashes
+
+N = 24
+
+
+@pytest.fixture
+def captures(tmp_path, monkeypatch):
+    """N 个占位文件，哈希由合成数据给出（不解码图像），每 4 个为一簇"""
+    for i in range(N):
+        (tmp_path / f'IMG_{i:03d}.JPG').write_bytes(b'x')
+    units = sorted(pair_captures(scan_directory(str(tmp_path), include_images=True, read_exif=False)),
+                   key=lambda c: c.path)
+    hashes = dict(zip((c.path for c in units), synthetic_hashes(N, cluster_size=4, max_flips=3, seed=2)[0]))
+
+    def fake_hash(path, thumb, metrics=None, qualities=None, orientations=None, signatures=None):
+        for extra in (qualities, orientations, signatures):
+            if extra is not None:
+                extra[path] = None
+        return hashes[path]
+
+    monkeypatch.setattr(progressive_module, 'hash_thumbnail', fake_hash)
+    return units, hashes
+
+
+def _feed(grouper, units):
+    """交给哈希线程池并等待后台线程把它们并入分组"""
+    target = grouper.hashed + len(units)
+    for c in units:
+        grouper.add(c.path, c.path)  # 缩略图路径只传给（替换后的）hash_thumbnail
+    deadline = time.monotonic() + 10
+    while grouper.hashed < target:
+        assert time.monotonic() < deadline, '临时分组没有并入新的哈希'
+        time.sleep(0.01)
+
+
+def _path_groups(groups):
+    return sorted(sorted(g.table.paths(g.ids)) for g in groups)
+
+
+def test_final_state_equals_full_grouping(captures):
+    units, hashes = captures
+    grouper = ProgressiveGrouper(units, 10, 20, interval=0.01)
+    _feed(grouper, units[::2])       # 每个簇分两批到达
+    _feed(grouper, units[1::2])
+    incremental, final_hashes = grouper.finish()
+
+    assert final_hashes == hashes
+    full = build_neighbor_graph(PhotoTable.from_captures(units, hashes), 20).groups(10)
+    assert _path_groups(incremental.groups()) == _path_groups(full)
+    assert grouper.stats()['batches'] >= 2
+    assert grouper.stats()['first_group_seconds'] is not None
+
+
+def test_deltas_keep_group_ids(captures):
+    units, _ = captures
+    grouper = ProgressiveGrouper(units, 10, 20, interval=0.01)
+    _feed(grouper, units[::2])
+    with grouper.lock:
+        first = grouper.delta()
+    first_ids = {g.group_id for g in first['groups']}
+    assert first['created'] == sorted(first_ids) and first['updated'] == [] and first['removed'] == []
+    assert first['hashed'] == N // 2 and first['total'] == N
+
+    _feed(grouper, units[1::2])
+    grouper.finish()
+    with grouper.lock:
+        second = grouper.delta(first['version'])
+        everything = grouper.delta()
+    final_ids = {g.group_id for g in grouper.grouper.groups()}
+
+    assert second['version'] > first['version']
+    # 先出现的分组要么沿用原来的 id 继续增长，要么因合并被移除（报告在 removed 中）
+    assert first_ids <= final_ids | set(second['removed'])
+    assert set(second['updated']) <= first_ids
+    assert not set(second['created']) & first_ids
+    # 未变化的分组不在增量中；since=0 时为当前全部分组
+    assert {g.group_id for g in second['groups']} == set(second['created']) | set(second['updated'])
+    assert {g.group_id for g in everything['groups']} == final_ids
+    assert len(everything['recommendations']) == len(everything['groups'])
+
+
+def test_unreadable_thumbnails_are_counted_without_groups(captures):
+    units, _ = captures
+    grouper = ProgressiveGrouper(units, 10, 20, interval=0.01)
+    for c in units:
+        grouper.add(c.path, None)
+    incremental, hashes = grouper.finish()
+    assert grouper.hashed == N and grouper.version == 0
+    assert incremental.groups() == [] and set(hashes.values()) == {None}
+
+
+def test_provisional_endpoint(client, captures):
+    from backend.api import routes
+
+    units, _ = captures
+    assert client.get('/api/groups/provisional').status_code == 404
+
+    grouper = ProgressiveGrouper(units, 10, 20, interval=0.01)
+    routes.scan_state['progressive'] = grouper
+    try:
+        _feed(grouper, units[::2])
+        payload = client.get('/api/groups/provisional').json()
+        assert payload['type'] == 'groups' and payload['provisional'] is True
+        assert payload['groups'] and all(g['may_grow'] for g in payload['groups'])
+        assert payload['total_groups'] == len(payload['groups'])
+
+        # 没有新变化时增量为空
+        unchanged = client.get('/api/groups/provisional', params={'since': payload['version']}).json()
+        assert unchanged['groups'] == [] and unchanged['version'] == payload['version']
+    finally:
+        routes.scan_state['progressive'] = None
+        grouper.close()
+    assert client.get('/api/groups/provisional').status_code == 404
@@ -0,0 +1,36 @@
+"""推荐器不修改共享的照片表"""
+
+import numpy as np
+
+from backend.core.grouper import PhotoGroup
+from backend.core.phototable import FLAG_EDITED, FLAG_REJECTED, PhotoTableBuilder
+from backend.core.recommender import recommend_all, recommend_for_group
+
+HASH = 'f' * 16
+
+
+def _groups():
+    builder = PhotoTableBuilder()
+    ids = [builder.add(f'/lib/{n}.jpg', 100, phash=HASH) for n in 'abcd']
+    table = builder.build()
+    table.apply_lightroom({'/lib/b.jpg', '/lib/d.jpg'}, {})
+    return table, [PhotoGroup(0, table, np.array(ids[:2])), PhotoGroup(1, table, np.array(ids[2:]))]
+
+
+def test_explicit_lightroom_state_does_not_touch_table():
+    table, groups = _groups()
+    before = table.flags.copy()
+
+    rec = recommend_for_group(groups[0], {'/lib/a.jpg'}, {})
+    assert rec.keep == ['/lib/a.jpg']
+    result = recommend_all(groups, {'/lib/a.jpg'}, {'/lib/c.jpg': {'pick': -1}})
+    assert [r['keep'] for r in result['recommendations']] == [['/lib/a.jpg'], ['/lib/c.jpg']]
+
+    assert (table.flags == before).all()
+    assert table.flags[1] & FLAG_EDITED and not table.flags[2] & FLAG_REJECTED
+
+
+def test_table_flags_used_by_default():
+    _, groups = _groups()
+    result = recommend_all(groups)
+    assert [r['keep'] for r in result['recommendations']] == [['/lib/b.jpg'], ['/lib/d.jpg']]
@@ -0,0 +1,64 @@
+"""邻接图：任意阈值下即时重新分组，与按该阈值重新比较的结果一致"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from backend.core.grouper import build_neighbor_graph
+from backend.core.hashindex import pack_hashes, pairs_within, popcount64
+from backend.core.phototable import PhotoTableBuilder
+from benchmarks.corpus import synthetic_hashes
+
+
+def _table(n=120):
+    hashes, _ = synthetic_hashes(n, cluster_size=5, max_flips=10, seed=2)
+    builder = PhotoTableBuilder()
+    for i, h in enumerate(hashes):
+        builder.add(f'/lib/{i:04d}.NEF', 1000 + i, phash=h)
+    return builder.build()
+
+
+def _members(groups):
+    return sorted(sorted(g.ids.tolist()) for g in groups)
+
+
+def test_pairs_within_matches_brute_force():
+    hashes, _ = synthetic_hashes(150, seed=3)
+    packed = pack_hashes(hashes)
+    i, j, d = pairs_within(packed, 12, tile=32)
+    found = {(a, b): dist for a, b, dist in zip(i.tolist(), j.tolist(), d.tolist())}
+    expected = {}
+    for a, b in itertools.combinations(range(len(packed)), 2):
+        dist = int(popcount64(packed[a:a + 1] ^ packed[b:b + 1])[0])
+        if dist <= 12:
+            expected[(a, b)] = dist
+    assert found == expected
+
+
+def test_groups_at_any_threshold_match_a_fresh_build():
+    table = _table()
+    graph = build_neighbor_graph(table, 20)
+    assert np.all(np.diff(graph.edges_d.astype(int)) >= 0)  # 边按距离排序
+    for threshold in range(0, 21, 2):
+        assert _members(graph.groups(threshold)) == _members(build_neighbor_graph(table, threshold).groups(threshold))
+
+
+def test_regroup_endpoint(client, imported_scan):
+    imported_scan(_table(), threshold=10)
+    table = _table()
+
+    response = client.post('/api/regroup', json={'threshold': 4})
+    assert response.status_code == 200
+    body = response.json()
+    expected = build_neighbor_graph(table, 4).groups(4)
+    assert body['threshold'] == 4 and body['total_groups'] == len(expected)
+
+    groups = client.get('/api/groups').json()
+    assert len(groups['groups']) == len(expected)
+
+
+@pytest.mark.parametrize('threshold', [-1, 21])
+def test_regroup_rejects_thresholds_outside_the_graph(client, imported_scan, threshold):
+    imported_scan(_table())
+    assert client.post('/api/regroup', json={'threshold': threshold}).status_code == 400
@@ -0,0 +1,60 @@
+"""目录扫描：按物理身份去重，经由符号链接、硬链接到达的路径记为别名"""
+
+import os
+
+import pytest
+
+from backend.core.scanner import scan_directory, walk_unique_dirs
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'symlink') or os.name == 'nt', reason='需要符号链接')
+
+
+@pytest.fixture
+def library(tmp_path):
+    """
+    lib/a_shoot/{A.NEF, B.NEF, sub/C.NEF, sub/back → a_shoot}
+    lib/z_link → a_shoot
+    """
+    lib = tmp_path / 'lib'
+    shoot = lib / 'a_shoot'
+    (shoot / 'sub').mkdir(parents=True)
+    for name in ('A.NEF', 'B.NEF', 'sub/C.NEF'):
+        (shoot / name).write_bytes(b'raw')
+    os.symlink(shoot, shoot / 'sub' / 'back')
+    os.symlink(shoot, lib / 'z_link')
+    return lib
+
+
+def _by_name(photos):
+    return {p.filename: p for p in photos}
+
+
+def test_symlinked_directory_paths_become_aliases(library):
+    photos = _by_name(scan_directory(str(library), read_exif=False))
+    assert sorted(photos) == ['A.NEF', 'B.NEF', 'C.NEF']
+
+    shoot, link = library / 'a_shoot', library / 'z_link'
+    assert photos['A.NEF'].path == str(shoot / 'A.NEF')
+    assert set(photos['A.NEF'].aliases) == {
+        str(shoot / 'sub' / 'back' / 'A.NEF'), str(link / 'A.NEF'), str(link / 'sub' / 'back' / 'A.NEF'),
+    }
+    # 别名目录的子目录也记下；符号链接环只记一层
+    assert str(link / 'sub' / 'C.NEF') in photos['C.NEF'].aliases
+    assert all(path.count('back') <= 1 for p in photos.values() for path in p.all_paths)
+
+
+def test_hard_link_is_an_alias(library):
+    os.link(library / 'a_shoot' / 'A.NEF', library / 'a_shoot' / 'A_copy.NEF')
+    photos = _by_name(scan_directory(str(library), read_exif=False))
+    assert 'A_copy.NEF' not in photos
+    assert str(library / 'a_shoot' / 'A_copy.NEF') in photos['A.NEF'].aliases
+
+
+def test_overlapping_roots_scan_each_file_once(library):
+    photos = scan_directory([str(library), str(library / 'a_shoot' / 'sub')], read_exif=False)
+    assert len(photos) == 3
+
+
+def test_walk_without_aliases_visits_each_directory_once(library):
+    seen = [dir_id for _, dir_id, _, _ in walk_unique_dirs([str(library)])]
+    assert len(seen) == len(set(seen)) == 3
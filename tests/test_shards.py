@@ -0,0 +1,79 @@
+"""分片扫描：分片文件往返、子树划分、合并去重"""
+
+import json
+
+import numpy as np
+import pytest
+
+from backend.core.shards import (
+    SHARD_FORMAT, Shard, build_shard, merge_shards, plan_local_shards, scan_sharded,
+)
+
+
+@pytest.fixture(scope='module')
+def full_shard(corpus):
+    return build_shard([str(corpus)], include_images=True)
+
+
+def _by_path(shard):
+    return {r['path']: r for r in shard.records()}
+
+
+def test_save_and_load_round_trip(tmp_path, full_shard):
+    assert len(full_shard) == 12
+    loaded = Shard.load(full_shard.save(tmp_path / 'a.pdshard'))
+    assert loaded.records() == full_shard.records()
+    assert loaded.meta['roots'] == full_shard.meta['roots']
+
+
+def test_version_1_shard_without_new_fields_loads(tmp_path, full_shard):
+    header = {'format': SHARD_FORMAT, 'version': 1, 'count': len(full_shard), **full_shard.meta}
+    text = {k: full_shard.text[k] for k in ('path', 'siblings', 'aliases', 'camera_model', 'date_taken')}
+    arrays = {k: full_shard.arrays[k] for k in ('size', 'mtime', 'timestamp', 'dev', 'ino', 'hash', 'has_hash')}
+    path = tmp_path / 'old.pdshard'
+    with open(path, 'wb') as f:
+        np.savez(f, header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8),
+                 text=np.frombuffer(json.dumps(text).encode(), dtype=np.uint8), **arrays)
+    loaded = Shard.load(path)
+    assert [r['hash'] for r in loaded.records()] == [r['hash'] for r in full_shard.records()]
+    assert np.isnan(loaded.arrays['sharpness']).all()
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'x.pdshard'
+    with open(path, 'wb') as f:
+        np.savez(f, header=np.frombuffer(b'{"format": "other"}', dtype=np.uint8))
+    with pytest.raises(ValueError):
+        Shard.load(path)
+
+
+def test_plan_splits_root_files_and_subtrees(corpus):
+    tasks = plan_local_shards([str(corpus)], jobs=1)
+    assert tasks[0] == ([str(corpus)], False)
+    subtrees = sorted(d for roots, recursive in tasks[1:] for d in roots if recursive)
+    assert subtrees == sorted(str(p) for p in corpus.iterdir() if p.is_dir())
+
+
+def test_merging_subtree_shards_equals_one_shard(corpus, full_shard):
+    """逐个子树构建的分片合并后与整体构建的结果一致；重叠的分片只保留一份"""
+    parts = [build_shard(roots, include_images=True, recursive=recursive)
+             for roots, recursive in plan_local_shards([str(corpus)], jobs=2)]
+    overlap = build_shard([str(next(p for p in corpus.iterdir() if p.is_dir()))], include_images=True)
+    merged = merge_shards(parts + [overlap])
+    assert len(merged) == len(full_shard)
+    expected = _by_path(full_shard)
+    for path, record in _by_path(merged).items():
+        assert record['hash'] == expected[path]['hash']
+        assert record['size'] == expected[path]['size']
+
+
+def test_merge_remaps_mount_prefixes(corpus, full_shard):
+    merged = merge_shards([full_shard], remap=[(str(corpus), '/mnt/photos')])
+    assert all(p.startswith('/mnt/photos/') for p in merged.text['path'])
+    assert merged.meta['roots'] == ['/mnt/photos']
+
+
+def test_scan_sharded_uses_worker_processes(tmp_path, corpus, full_shard):
+    paths = scan_sharded([str(corpus)], tmp_path / 'shards', jobs=2, include_images=True)
+    merged = merge_shards([Shard.load(p) for p in paths])
+    assert sorted(merged.text['path']) == sorted(full_shard.text['path'])
@@ -0,0 +1,93 @@
+"""快照的写入/读取往返，以及损坏、截断的文件"""
+
+import numpy as np
+import pytest
+
+from backend.core.grouper import build_neighbor_graph
+from backend.core.phototable import PhotoTableBuilder
+from backend.core.snapshot import SNAPSHOT_MAGIC, SNAPSHOT_VERSION, Snapshot, load_snapshot, write_sections, write_snapshot
+
+
+def _state():
+    builder = PhotoTableBuilder()
+    hashes = ['0' * 16, '0' * 15 + '1', 'f' * 16, 'f' * 15 + 'e', '0f' * 8]
+    for i, h in enumerate(hashes):
+        builder.add(f'/lib/d{i % 2}/IMG_{i}.JPG', 1000 + i, 10.0 * i, 100.0 + i, h, 'Cam',
+                    siblings=[f'/lib/d{i % 2}/IMG_{i}.NEF'] if i == 0 else ())
+    table = builder.build()
+    table.apply_lightroom({'/lib/d0/IMG_0.NEF'}, {'/lib/d0/IMG_2.JPG': {'pick': 1}})
+    graph = build_neighbor_graph(table, 12)
+    return {
+        'table': table, 'graph': graph, 'groups': graph.groups(10), 'threshold': 10,
+        'scan_dir': '/lib', 'edited_photos': {'/lib/d0/IMG_0.NEF'},
+    }
+
+
+def test_round_trip(tmp_path):
+    state = _state()
+    path = write_snapshot(tmp_path / 'scan.pdscan', state)
+    loaded = load_snapshot(path)
+
+    table, original = loaded['table'], state['table']
+    assert table.paths() == original.paths()
+    assert table.siblings == original.siblings
+    assert np.array_equal(table.packed, original.packed)
+    assert np.array_equal(table.flags, original.flags)
+    assert [g.ids.tolist() for g in loaded['groups']] == [g.ids.tolist() for g in state['groups']]
+    assert np.array_equal(loaded['graph'].edges_d, state['graph'].edges_d)
+    assert loaded['threshold'] == 10 and loaded['edited_photos'] == {'/lib/d0/IMG_0.NEF'}
+    # 导入后仍可按新阈值重新分组
+    assert len(loaded['graph'].groups(12)) == len(state['graph'].groups(12))
+
+
+# 1 版快照还没有这些段
+_V2_SECTIONS = (
+    'sharpness', 'clipping', 'noise', 'orient', 'pose', 'exif_pose', 'signature',
+    'orient_alt_offsets', 'orient_alt_hash', 'orient_alt_pose',
+)
+
+
+def test_version_1_snapshot_still_loads(tmp_path):
+    state = _state()
+    snap = Snapshot(write_snapshot(tmp_path / 'scan.pdscan', state))
+    assert SNAPSHOT_VERSION == 2
+    header = {k: v for k, v in snap.header.items() if k != 'sections'}
+    sections = {name: np.array(snap[name]) for name in snap.header['sections'] if name not in _V2_SECTIONS}
+    old = write_sections(tmp_path / 'old.pdscan', SNAPSHOT_MAGIC, 1, header, sections)
+
+    loaded = load_snapshot(old)
+    table = loaded['table']
+    assert table.paths() == state['table'].paths()
+    assert np.array_equal(table.packed, state['table'].packed)
+    assert np.isnan(table.sharpness).all()
+    assert [g.ids.tolist() for g in loaded['groups']] == [g.ids.tolist() for g in state['groups']]
+
+
+def test_unknown_version_is_rejected(tmp_path):
+    path = write_sections(tmp_path / 'new.pdscan', SNAPSHOT_MAGIC, SNAPSHOT_VERSION + 1, {}, {})
+    with pytest.raises(ValueError):
+        Snapshot(path)
+
+
+@pytest.mark.parametrize('keep', [0, 10, 20, -8])
+def test_truncated_file_is_rejected(tmp_path, keep):
+    """空文件、不足前导长度、头部被截断、数据段被截断都报 ValueError"""
+    data = write_snapshot(tmp_path / 'scan.pdscan', _state()).read_bytes()
+    broken = tmp_path / 'broken.pdscan'
+    broken.write_bytes(data[:keep] if keep >= 0 else data[:keep * 64])
+    with pytest.raises(ValueError):
+        load_snapshot(broken)
+
+
+def test_wrong_magic_is_rejected(tmp_path):
+    path = tmp_path / 'other.pdscan'
+    path.write_bytes(b'NOTASNAP' + bytes(64))
+    with pytest.raises(ValueError):
+        Snapshot(path)
+
+
+def test_import_endpoint_reports_truncated_upload(tmp_path, client):
+    path = tmp_path / 'short.pdscan'
+    path.write_bytes(SNAPSHOT_MAGIC[:5])
+    response = client.post('/api/import', json={'path': str(path)})
+    assert response.status_code == 400
@@ -0,0 +1,16 @@
+"""命令行入口和 backend.main 导入时不加载重量级依赖，导入耗时在预算内（见 benchmarks/startup.py）"""
+
+from benchmarks.startup import forbidden_imports, import_costs
+
+# 测试机器上的宽松倍数：只拦住重新在导入时加载重量级依赖这类数量级的退化
+BUDGET_SCALE = 3
+
+
+def test_entry_points_defer_heavy_modules():
+    assert forbidden_imports() == {'cli_help': [], 'cli_group_import': [], 'backend_main': []}
+
+
+def test_entry_points_import_within_budget():
+    costs = import_costs()
+    over = {name: round(ms, 1) for name, (ms, budget) in costs.items() if not 0 <= ms <= budget * BUDGET_SCALE}
+    assert not over, over
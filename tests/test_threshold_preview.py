@@ -0,0 +1,48 @@
+"""阈值预览：最近邻距离分布与各阈值下的分组规模"""
+
+import numpy as np
+
+from backend.core.grouper import build_neighbor_graph
+from backend.core.hashindex import popcount64
+from backend.core.phototable import PhotoTableBuilder
+from benchmarks.corpus import synthetic_hashes
+
+
+def _table(n=120):
+    hashes, _ = synthetic_hashes(n, cluster_size=5, max_flips=10, seed=4)
+    builder = PhotoTableBuilder()
+    for i, h in enumerate(hashes):
+        builder.add(f'/lib/{i:04d}.NEF', 1000, phash=h)
+    return builder.build()
+
+
+def test_profile_matches_grouping_at_each_threshold():
+    graph = build_neighbor_graph(_table(), 20)
+    profile = graph.threshold_profile()
+    assert [p['threshold'] for p in profile] == list(range(21))
+    for entry in profile:
+        sizes = [len(g.ids) for g in graph.groups(entry['threshold'])]
+        assert entry['groups'] == len(sizes)
+        assert entry['grouped_photos'] == sum(sizes)
+        assert entry['largest_group'] == max(sizes, default=0)
+        assert entry['deletable'] == sum(sizes) - len(sizes)
+
+
+def test_nearest_distances_match_brute_force():
+    table = _table()
+    graph = build_neighbor_graph(table, 8)
+    packed = table.packed[graph.nodes]
+    dist = popcount64(packed[:, None] ^ packed[None, :]).astype(int)
+    np.fill_diagonal(dist, 99)
+    nearest = dist.min(axis=1)
+    assert graph.nearest_distances().tolist() == np.where(nearest <= 8, nearest, -1).tolist()
+
+
+def test_threshold_preview_endpoint(client, imported_scan):
+    imported_scan(_table(), threshold=6)
+    body = client.get('/api/threshold-preview').json()
+    assert body['threshold'] == 6 and body['max_threshold'] == 20
+    nn = body['nearest_neighbor']
+    assert len(nn['histogram']) == 21
+    assert sum(nn['histogram']) + nn['beyond'] == nn['total'] == 120
+    assert body['thresholds'][6]['groups'] == len(client.get('/api/groups').json()['groups'])
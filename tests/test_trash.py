@@ -0,0 +1,184 @@
+"""回收站移动、删除任务的日志与还原"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from backend.core import trash
+from backend.core.trash import FreedesktopTrash, SystemTrash
+
+
+@pytest.fixture
+def freedesktop(tmp_path):
+    """回收站目录指向临时目录的 FreedesktopTrash（不触碰用户的回收站）"""
+    bin_ = FreedesktopTrash()
+    bin_._trash_dirs[os.lstat(tmp_path).st_dev] = (os.fsencode(tmp_path / 'Trash'), os.fsencode(tmp_path))
+    return bin_
+
+
+def test_concurrent_moves_of_same_name_get_distinct_slots(tmp_path, freedesktop):
+    sources = []
+    for i in range(40):
+        (tmp_path / f'd{i}').mkdir()
+        path = tmp_path / f'd{i}' / 'IMG_0001.JPG'
+        path.write_bytes(b'%d' % i)
+        sources.append(str(path))
+
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker(paths):
+        barrier.wait()
+        results.extend(freedesktop.move(paths))
+
+    threads = [threading.Thread(target=worker, args=(sources[i::8],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(error is None for _, _, error in results)
+    dests = [dest for _, dest, _ in results]
+    assert len(set(dests)) == len(sources)
+    # 每个文件的内容都完好地到了回收站，info 文件一一对应
+    for path, dest, _ in results:
+        assert open(dest, 'rb').read() == b'%d' % int(os.path.basename(os.path.dirname(path))[1:])
+    info = os.listdir(tmp_path / 'Trash' / 'info')
+    assert sorted(info) == sorted(os.path.basename(d) + '.trashinfo' for d in dests)
+    key = os.path.join(os.fsencode(tmp_path / 'Trash' / 'files'), b'IMG_0001.JPG')
+    assert freedesktop._counters[key] == len(sources)
+
+
+def test_missing_send2trash_internals_fall_back_to_system_trash(monkeypatch):
+    monkeypatch.setattr(trash, 'sys', type('sys', (), {'platform': 'linux'}))
+    monkeypatch.setattr(trash, '_PLAT_OTHER_NAMES', trash._PLAT_OTHER_NAMES + ('no_such_helper',))
+    assert isinstance(trash.open_trash(), SystemTrash)
+
+
+# ─── 删除任务 ────────────────────────────────────────────
+
+def _library(root):
+    """两个目录：一张带 sidecar 的 RAW、一张 JPEG"""
+    paths = []
+    for d in ('a', 'b'):
+        (root / d).mkdir()
+        for name in ('DSC_1.NEF', 'DSC_2.JPG'):
+            (root / d / name).write_bytes(b'x' * 10)
+            paths.append(str(root / d / name))
+        (root / d / 'DSC_1.xmp').write_text('<x/>')
+    return paths
+
+
+@pytest.fixture
+def library(tmp_path, freedesktop, monkeypatch):
+    monkeypatch.setattr(trash, 'open_trash', lambda: freedesktop)
+    (tmp_path / 'lib').mkdir()
+    return _library(tmp_path / 'lib')
+
+
+def test_delete_job_moves_photos_and_sidecars(tmp_path, library):
+    job = trash.DeleteJob(library, journal_dir=tmp_path / 'journal', workers=3, batch_size=1)
+    status = job.run()
+    assert status['state'] == 'done'
+    assert status['deleted_count'] == 4 and status['sidecar_count'] == 2
+    assert status['bytes'] == 40 + 2 * len('<x/>')
+    assert not any(os.path.lexists(p) for p in library)
+    assert os.listdir(tmp_path / 'lib' / 'a') == []
+
+
+def test_journal_replay_restores_after_restart(tmp_path, library):
+    job = trash.DeleteJob(library, journal_dir=tmp_path / 'journal')
+    job.run()
+
+    loaded = trash.DeleteJob.load(job.journal)
+    assert loaded.state == 'done'
+    assert loaded.status(errors=False)['restorable_count'] == 6
+    assert sorted(loaded.paths) == sorted(library)
+
+    status = loaded.restore()
+    assert status['state'] == 'done' and status['restored_count'] == 6
+    assert all(os.path.exists(p) for p in library)
+    assert os.path.exists(tmp_path / 'lib' / 'a' / 'DSC_1.xmp')
+    assert os.listdir(tmp_path / 'Trash' / 'info') == []
+    # 再次加载时已还原的文件不会重复还原
+    assert trash.DeleteJob.load(job.journal).status(errors=False)['restorable_count'] == 0
+
+
+def test_interrupted_journal_is_replayed(tmp_path, library):
+    """进程在删除中途退出：没有 end 记录、最后一行只写了一半"""
+    job = trash.DeleteJob(library, journal_dir=tmp_path / 'journal')
+    job.run()
+    lines = job.journal.read_text(encoding='utf-8').splitlines(keepends=True)
+    job.journal.write_text(''.join(lines[:3]) + lines[3][:20], encoding='utf-8')
+
+    loaded = trash.DeleteJob.load(job.journal)
+    assert loaded.state == 'interrupted'
+    assert len(loaded.entries) == 2
+    loaded.restore()
+    assert sum(os.path.exists(p) for p in library) == sum(not e['sidecar'] for e in loaded.entries)
+    assert trash.list_journals(tmp_path / 'journal')[0]['id'] == job.id
+
+
+def test_restore_skips_occupied_original_path(tmp_path, library):
+    job = trash.DeleteJob(library[:1], include_sidecars=False, journal_dir=tmp_path / 'journal')
+    job.run()
+    with open(library[0], 'wb') as f:
+        f.write(b'new')
+    status = job.restore()
+    assert status['restored_count'] == 0 and status['error_count'] == 1
+    assert open(library[0], 'rb').read() == b'new'
+
+
+def test_missing_files_are_reported(tmp_path, library):
+    job = trash.DeleteJob(library + [str(tmp_path / 'lib' / 'a' / 'gone.JPG')], journal_dir=tmp_path / 'journal')
+    status = job.run()
+    assert status['state'] == 'done'
+    assert status['error_count'] == 1 and status['deleted_count'] == 4
+    assert status['errors'][0]['path'].endswith('gone.JPG')
+
+
+# ─── /api/delete ────────────────────────────────────────
+
+def _wait_finished(client, job_id):
+    for _ in range(200):
+        status = client.get(f'/api/delete/{job_id}').json()
+        if status['state'] not in ('pending', 'running'):
+            return status
+        time.sleep(0.02)
+    raise AssertionError('删除任务没有结束')
+
+
+def test_delete_endpoint_waits_for_completion(client, library):
+    response = client.post('/api/delete', json={'paths': library, 'wait': True})
+    assert response.status_code == 200
+    status = response.json()
+    assert status['state'] == 'done' and status['deleted_count'] == 4
+    assert not any(os.path.lexists(p) for p in library)
+
+
+def test_delete_endpoint_runs_in_background(client, library):
+    response = client.post('/api/delete', json={'paths': library, 'include_sidecars': False})
+    assert response.status_code == 200
+    job = response.json()
+    assert job['state'] in ('pending', 'running', 'done')
+
+    # 进度通过 WebSocket 推送，最后一条是含错误列表的最终状态
+    with client.websocket_connect(f"/api/ws/delete/{job['id']}") as ws:
+        while True:
+            message = ws.receive_json()
+            if message['state'] not in ('pending', 'running'):
+                break
+    assert message['state'] == 'done' and message['errors'] == []
+    status = _wait_finished(client, job['id'])
+    assert status['deleted_count'] == 4 and status['sidecar_count'] == 0
+
+    assert client.post(f"/api/delete/{job['id']}/restore").status_code == 200
+    assert _wait_finished(client, job['id'])['restored_count'] == 4
+    assert all(os.path.exists(p) for p in library)
+
+
+def test_delete_endpoint_rejects_empty_and_unknown(client):
+    assert client.post('/api/delete', json={'paths': []}).status_code == 400
+    assert client.get('/api/delete/no-such-job').status_code == 404
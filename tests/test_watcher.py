@@ -0,0 +1,38 @@
+"""监视模式与扫描看到同一组文件（符号链接环）"""
+
+import os
+
+import pytest
+
+from backend.config import IMAGE_EXTENSIONS
+from backend.core.scanner import scan_directory
+from backend.core.watcher import InotifySource, PollingSource, inotify_available
+
+
+@pytest.fixture
+def looped(tmp_path):
+    """root/sub/up -> root 构成符号链接环"""
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'a.jpg').write_bytes(b'a')
+    (tmp_path / 'sub' / 'b.jpg').write_bytes(b'b')
+    os.symlink('..', tmp_path / 'sub' / 'up')
+    return str(tmp_path)
+
+
+def _scanned(root):
+    return sorted(p.path for p in scan_directory(root, include_images=True, read_exif=False))
+
+
+def test_polling_follows_each_directory_once(looped):
+    source = PollingSource([looped], IMAGE_EXTENSIONS)
+    assert sorted(source._state) == _scanned(looped)
+
+
+@pytest.mark.skipif(not inotify_available(), reason='需要 inotify')
+def test_inotify_follows_each_directory_once(looped):
+    source = InotifySource([looped], IMAGE_EXTENSIONS)
+    try:
+        assert source.watched == 2
+        assert sorted(source._watch_tree(looped)) == []      # 已监视的目录不再重复进入
+    finally:
+        source.close()